@@ -0,0 +1,3 @@
+"""
+Herramientas de benchmark con datos sintéticos
+"""
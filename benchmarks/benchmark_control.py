@@ -0,0 +1,234 @@
+"""
+Benchmark del proceso de control con datos sintéticos a distintas escalas
+
+Genera escenarios de 10/100/1.000 clientes, mide cada etapa de `control()`
+(incluida la escritura y el formato del Excel), reporta memoria y guarda los
+resultados en `benchmarks/resultados/` para compararlos entre commits.
+"""
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.generador_datos import generar_escenario
+from control import control
+from lib.inventario import listar_archivos
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+
+def commit_actual() -> str:
+    """Devuelve el hash corto del commit actual o 'sin-git' si no está disponible."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return "sin-git"
+
+
+def _memoria_maxima_mb() -> Optional[float]:
+    """Memoria residente máxima del proceso en MB (no disponible en Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(maximo / (1_048_576 if sys.platform == "darwin" else 1024), 1)
+
+
+def ejecutar_escala(clientes: int, comprobantes: int, directorio: str, formato_rcel: str = 'individual',
+                    semilla: int = 0, memoria: bool = False, incremental: float = 0.0) -> Dict[str, Any]:
+    """
+    Genera un escenario y mide cada etapa de `control()`.
+
+    Args:
+        clientes: Cantidad de clientes
+        comprobantes: Comprobantes emitidos por cliente
+        directorio: Directorio de trabajo para el escenario
+        formato_rcel: 'individual' o 'listado'
+        semilla: Semilla aleatoria
+        memoria: Si es True, mide memoria por etapa con tracemalloc (infla los tiempos)
+        incremental: Si es mayor a 0, vuelve a ejecutar el control con caché tras modificar
+            esa proporción de clientes y mide el recálculo incremental
+
+    Returns:
+        Dict[str, Any]: Tiempos por etapa, memoria y tamaño del escenario
+    """
+    inicio = time.perf_counter()
+    escenario = generar_escenario(directorio, clientes, comprobantes, formato_rcel=formato_rcel, semilla=semilla)
+    tiempo_generacion = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    archivos_mc = listar_archivos(escenario['descargas_mc'], 'mc')
+    archivos_json = listar_archivos(escenario['descargas_rcel'], 'rcel')
+    tiempo_descubrimiento = time.perf_counter() - inicio
+
+    reporte = os.path.join(directorio, "reporte.xlsx")
+    inicio = time.perf_counter()
+    control(archivos_mc, [], archivos_json, ruta_categorias=escenario['categorias'],
+            nombre_archivo=reporte, perfilar='si' if memoria else 'tiempos', cache_dir='')
+    tiempo_control = time.perf_counter() - inicio
+
+    with open(os.path.join(directorio, "reporte.perfil.json"), encoding="utf-8") as f:
+        etapas = json.load(f)["etapas"]
+
+    resultado_incremental = {}
+    if incremental > 0:
+        cache_dir = os.path.join(directorio, "cache")
+        control(archivos_mc, [], archivos_json, ruta_categorias=escenario['categorias'],
+                nombre_archivo=reporte, perfilar='no', cache_dir=cache_dir)
+
+        # Tocar los emitidos de una parte de los clientes invalida solo su caché
+        emitidos = [r for r in archivos_mc if " - MCE - " in r]
+        modificados = emitidos[:max(1, round(len(emitidos) * incremental))]
+        for ruta in modificados:
+            os.utime(ruta)
+
+        inicio = time.perf_counter()
+        control(archivos_mc, [], archivos_json, ruta_categorias=escenario['categorias'],
+                nombre_archivo=reporte, perfilar='tiempos', cache_dir=cache_dir)
+        resultado_incremental = {
+            "clientes_modificados": len(modificados),
+            "control_incremental_s": round(time.perf_counter() - inicio, 3),
+        }
+
+    return {
+        **resultado_incremental,
+        "clientes": clientes,
+        "comprobantes": escenario['comprobantes'],
+        "archivos_json": len(archivos_json),
+        "generacion_s": round(tiempo_generacion, 3),
+        "descubrimiento_s": round(tiempo_descubrimiento, 4),
+        "control_s": round(tiempo_control, 3),
+        "etapas": {e["etapa"]: e for e in etapas},
+        "memoria_maxima_mb": _memoria_maxima_mb(),
+        "reporte_mb": round(os.path.getsize(reporte) / 1_048_576, 2),
+    }
+
+
+def guardar_resultados(resultados: Dict[str, Any], directorio: str = DIRECTORIO_RESULTADOS) -> str:
+    """
+    Guarda los resultados como `<fecha>_<commit>.json`.
+
+    Returns:
+        str: Ruta del archivo guardado
+    """
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"{datetime.now():%Y%m%d-%H%M%S}_{resultados['commit']}.json"
+    ruta = os.path.join(directorio, nombre)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return ruta
+
+
+def ultimo_resultado(directorio: str = DIRECTORIO_RESULTADOS, excluir: Optional[str] = None) -> Optional[str]:
+    """Devuelve la ruta del resultado más reciente, excluyendo opcionalmente uno."""
+    rutas = sorted(glob.glob(os.path.join(directorio, "*.json")))
+    rutas = [r for r in rutas if excluir is None or os.path.abspath(r) != os.path.abspath(excluir)]
+    return rutas[-1] if rutas else None
+
+
+def comparar(actual: Dict[str, Any], anterior: Dict[str, Any], umbral: float = 0.10) -> List[str]:
+    """
+    Compara dos corridas escala por escala y etapa por etapa.
+
+    Args:
+        actual: Resultados de la corrida actual
+        anterior: Resultados de referencia
+        umbral: Variación relativa a partir de la cual se marca una regresión
+
+    Returns:
+        List[str]: Líneas del informe de comparación
+    """
+    lineas = [f"Comparación {anterior['commit']} -> {actual['commit']}"]
+    if anterior.get("memoria_por_etapa") != actual.get("memoria_por_etapa"):
+        lineas.append("  Advertencia: una de las corridas midió memoria por etapa; los tiempos no son comparables")
+    referencia = {e["clientes"]: e for e in anterior["escalas"]}
+
+    for escala in actual["escalas"]:
+        previa = referencia.get(escala["clientes"])
+        if not previa:
+            continue
+        lineas.append(f"  {escala['clientes']} clientes:")
+        pares = [("control", escala["control_s"], previa["control_s"])]
+        pares += [(nombre, e["pared_s"], previa["etapas"].get(nombre, {}).get("pared_s"))
+                  for nombre, e in escala["etapas"].items()]
+        for nombre, ahora, antes in pares:
+            if not antes:
+                continue
+            variacion = (ahora - antes) / antes
+            marca = " REGRESIÓN" if variacion > umbral else ""
+            lineas.append(f"    {nombre:<20} {antes:>9.3f}s -> {ahora:>9.3f}s ({variacion:+.1%}){marca}")
+    return lineas
+
+
+def imprimir_escala(resultado: Dict[str, Any]) -> None:
+    """Imprime los tiempos por etapa de una escala."""
+    print(f"\n{resultado['clientes']} clientes | {resultado['comprobantes']} comprobantes | "
+          f"{resultado['archivos_json']} JSON RCEL")
+    print(f"  Generación: {resultado['generacion_s']:.2f}s | Descubrimiento: {resultado['descubrimiento_s']:.3f}s | "
+          f"Control: {resultado['control_s']:.2f}s | Memoria máx.: {resultado['memoria_maxima_mb']} MB")
+    for nombre, etapa in resultado["etapas"].items():
+        linea = f"    {nombre:<20} {etapa['pared_s']:>9.3f}s  CPU {etapa['cpu_s']:>8.3f}s"
+        if "memoria_pico_mb" in etapa:
+            linea += f"  pico {etapa['memoria_pico_mb']:>8.2f} MB"
+        print(linea)
+    if "control_incremental_s" in resultado:
+        print(f"  Recálculo con caché ({resultado['clientes_modificados']} clientes modificados): "
+              f"{resultado['control_incremental_s']:.2f}s")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de control() con datos sintéticos")
+    parser.add_argument("--escalas", default="10,100", help="Cantidades de clientes separadas por coma (p.ej. 10,100,1000)")
+    parser.add_argument("--comprobantes", type=int, default=200, help="Comprobantes emitidos por cliente")
+    parser.add_argument("--formato-rcel", choices=['individual', 'listado'], default='individual')
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--comparar-con", help="Resultado de referencia (por defecto el más reciente)")
+    parser.add_argument("--memoria", action="store_true",
+                        help="Mide memoria por etapa con tracemalloc (los tiempos no son comparables con corridas sin esta opción)")
+    parser.add_argument("--incremental", type=float, default=0.0,
+                        help="Proporción de clientes a modificar para medir el recálculo con caché (p.ej. 0.01)")
+    parser.add_argument("--no-guardar", action="store_true", help="No guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = {
+        "commit": commit_actual(),
+        "fecha": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+        "comprobantes_por_cliente": args.comprobantes,
+        "formato_rcel": args.formato_rcel,
+        "memoria_por_etapa": args.memoria,
+        "escalas": [],
+    }
+
+    for clientes in [int(e) for e in args.escalas.split(",") if e.strip()]:
+        with tempfile.TemporaryDirectory(prefix=f"bench_{clientes}_") as directorio:
+            resultado = ejecutar_escala(clientes, args.comprobantes, directorio, args.formato_rcel, args.semilla,
+                                        args.memoria, args.incremental)
+        resultados["escalas"].append(resultado)
+        imprimir_escala(resultado)
+
+    referencia = args.comparar_con or ultimo_resultado()
+    if not args.no_guardar:
+        ruta = guardar_resultados(resultados)
+        print(f"\nResultados guardados en: {ruta}")
+
+    if referencia:
+        with open(referencia, encoding="utf-8") as f:
+            print("\n" + "\n".join(comparar(resultados, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Prueba de carga de la fase de descarga contra el servidor simulado
+
+Arma una planilla sintética de 10/100/1.000 clientes, ejecuta
+`procesar_descarga_mc` y `procesar_descarga_rcel` para cada uno contra
+`ServidorSimulado` (o una URL indicada) y reporta throughput, latencias por
+endpoint y errores a partir de `metricas`.
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.benchmark_control import DIRECTORIO_RESULTADOS, commit_actual, guardar_resultados
+from benchmarks.generador_datos import generar_clientes
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import procesar_descarga_mc, procesar_descarga_rcel
+from lib.metricas import metricas
+
+MIS_COMPROBANTES_ENDPOINT = "api/v1/mis_comprobantes"
+RCEL_ENDPOINT = "api/v1/rcel"
+
+
+def planilla_sintetica(clientes: int, desde: date = date(2024, 1, 1), hasta: date = date(2024, 12, 31),
+                       fuentes: tuple = ("mc", "rcel"), semilla: int = 0) -> pd.DataFrame:
+    """
+    Construye una planilla con las columnas de planilla-control-monotributistas.xlsx.
+
+    Args:
+        clientes: Cantidad de clientes
+        desde: Inicio del período a consultar
+        hasta: Fin del período a consultar
+        fuentes: Fuentes a descargar ('mc', 'rcel')
+        semilla: Semilla aleatoria
+
+    Returns:
+        pd.DataFrame: Una fila por cliente
+    """
+    mc = 'si' if 'mc' in fuentes else 'no'
+    rcel = 'si' if 'rcel' in fuentes else 'no'
+    filas = []
+    for cliente in generar_clientes(clientes, semilla):
+        filas.append({
+            'CUIT_Representante': cliente['cuit'],
+            'Clave_representante': 'clave-simulada',
+            'CUIT_Representado': cliente['cuit'],
+            'Desde_MC': pd.Timestamp(desde), 'Hasta_MC': pd.Timestamp(hasta),
+            'Denominacion_MC': cliente['nombre'],
+            'Desde_RCEL': pd.Timestamp(desde), 'Hasta_RCEL': pd.Timestamp(hasta),
+            'Denominacion_RCEL': cliente['nombre'],
+            'Descarga_MC': mc, 'Descarga_MC_emitidos': 'si', 'Descarga_MC_recibidos': 'si',
+            'Descarga_RCEL': rcel,
+        })
+    return pd.DataFrame(filas)
+
+
+def ejecutar_carga(
+    planilla: pd.DataFrame,
+    base_url: str,
+    directorio: str,
+    clientes_concurrentes: int = 1,
+    en_memoria: bool = False,
+    solo_metadata: bool = False,
+    verbose: bool = False,
+) -> Dict[str, Any]:
+    """
+    Descarga todos los clientes de la planilla y resume la ejecución.
+
+    Args:
+        planilla: Planilla de clientes
+        base_url: URL base de la API (real o simulada)
+        directorio: Directorio de descargas
+        clientes_concurrentes: Clientes procesados en paralelo
+        en_memoria: Usa el modo en memoria para MC y RCEL
+        solo_metadata: Guarda solo la metadata de RCEL, sin PDFs
+        verbose: Muestra la salida de las funciones de descarga
+
+    Returns:
+        Dict[str, Any]: Duración, throughput y resumen de métricas
+    """
+    ruta_mc = os.path.join(directorio, "descargas_mis_comprobantes")
+    ruta_rcel = os.path.join(directorio, "descargas_rcel")
+
+    def _cliente(row) -> int:
+        archivos = procesar_descarga_mc(row, "carga@simulada", "clave", base_url, MIS_COMPROBANTES_ENDPOINT,
+                                        ruta_mc, en_memoria=en_memoria)
+        archivos += procesar_descarga_rcel(row, "carga@simulada", "clave", base_url, RCEL_ENDPOINT, ruta_rcel,
+                                           en_memoria=en_memoria, solo_metadata=solo_metadata)
+        return len(archivos)
+
+    metricas.reiniciar()
+    salida = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    inicio = time.perf_counter()
+    with salida:
+        with ThreadPoolExecutor(max_workers=clientes_concurrentes) as executor:
+            archivos = sum(executor.map(_cliente, [row for _, row in planilla.iterrows()]))
+    duracion = time.perf_counter() - inicio
+
+    resumen = metricas.resumen()
+    contadores = resumen["contadores"]
+    return {
+        "clientes": len(planilla),
+        "duracion_s": round(duracion, 3),
+        "clientes_por_segundo": round(len(planilla) / duracion, 3),
+        "archivos_resultantes": archivos,
+        "archivos_descargados": contadores.get("archivos_descargados", 0),
+        "mb_descargados": round(contadores.get("bytes_descargados", 0) / 1_048_576, 2),
+        "archivos_por_segundo": round(contadores.get("archivos_descargados", 0) / duracion, 2),
+        "mb_por_segundo": round(contadores.get("bytes_descargados", 0) / 1_048_576 / duracion, 2),
+        "contadores": contadores,
+        "endpoints": resumen["endpoints"],
+        "concurrencia": resumen["concurrencia"],
+    }
+
+
+def imprimir_resultado(resultado: Dict[str, Any]) -> None:
+    """Imprime el resumen de una escala."""
+    print(f"\n{resultado['clientes']} clientes en {resultado['duracion_s']:.2f}s "
+          f"({resultado['clientes_por_segundo']:.2f} clientes/s)")
+    print(f"  Descargas: {resultado['archivos_descargados']:.0f} archivos, {resultado['mb_descargados']} MB "
+          f"({resultado['archivos_por_segundo']:.1f} archivos/s, {resultado['mb_por_segundo']:.2f} MB/s)")
+    for contador in ("clientes_mc_error", "clientes_rcel_error", "descargas_fallidas", "plazos_vencidos",
+                     "descargas_cubiertas", "coberturas_ganadas"):
+        if resultado["contadores"].get(contador):
+            print(f"  {contador}: {resultado['contadores'][contador]:.0f}")
+    for endpoint, datos in resultado["endpoints"].items():
+        print(f"    {endpoint:<18} n={datos['cantidad']:<6} errores={datos['errores']:<4} "
+              f"p50={datos['p50_s']:.3f}s p95={datos['p95_s']:.3f}s p99={datos['p99_s']:.3f}s")
+    if resultado.get("concurrencia"):
+        limites = [decision["limite"] for decision in resultado["concurrencia"]]
+        print(f"  Concurrencia adaptativa: {len(limites)} ajustes, límite final {limites[-1]} "
+              f"(mín {min(limites)}, máx {max(limites)})")
+    if resultado.get("servidor"):
+        print(f"  Servidor: {resultado['servidor']}")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prueba de carga de la fase de descarga")
+    parser.add_argument("--escalas", default="10,100", help="Cantidades de clientes separadas por coma (p.ej. 10,100,1000)")
+    parser.add_argument("--url", help="URL base de una API ya levantada; por defecto se inicia el servidor simulado")
+    parser.add_argument("--fuentes", default="mc,rcel", help="Fuentes a descargar: mc, rcel o ambas")
+    parser.add_argument("--comprobantes", type=int, default=50, help="Comprobantes emitidos por cliente")
+    parser.add_argument("--tamano-pdf", type=int, default=30_000, help="Bytes por PDF")
+    parser.add_argument("--latencia-consulta", type=float, default=1.0, help="Segundos por consulta a la API")
+    parser.add_argument("--latencia-descarga", type=float, default=0.05, help="Segundos hasta el primer byte de una descarga")
+    parser.add_argument("--ancho-banda", type=float, help="MB/s por descarga")
+    parser.add_argument("--ancho-banda-total", type=float, help="MB/s para todo el servidor")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de error por pedido")
+    parser.add_argument("--tasa-lentas", type=float, default=0.0, help="Probabilidad de que una descarga se trabe")
+    parser.add_argument("--latencia-lenta", type=float, default=5.0, help="Segundos que se traba una descarga lenta")
+    parser.add_argument("--clientes-concurrentes", type=int, default=1, help="Clientes procesados en paralelo")
+    parser.add_argument("--max-workers", type=int, help="Descargas concurrentes por cliente (MAX_WORKERS)")
+    parser.add_argument("--concurrencia-adaptativa", action="store_true",
+                        help="Ajusta las descargas simultáneas entre MIN_WORKERS y MAX_WORKERS")
+    parser.add_argument("--en-memoria", action="store_true", help="Usa el modo en memoria")
+    parser.add_argument("--solo-metadata", action="store_true", help="RCEL sin descarga de PDFs")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida de las descargas")
+    parser.add_argument("--no-guardar", action="store_true", help="No guardar los resultados")
+    args = parser.parse_args()
+
+    if args.max_workers:
+        os.environ["MAX_WORKERS"] = str(args.max_workers)
+    if args.concurrencia_adaptativa:
+        os.environ["CONCURRENCIA_ADAPTATIVA"] = "si"
+    fuentes = tuple(f.strip() for f in args.fuentes.split(",") if f.strip())
+
+    servidor: Optional[ServidorSimulado] = None
+    if not args.url:
+        servidor = ServidorSimulado(
+            mis_comprobantes_endpoint=MIS_COMPROBANTES_ENDPOINT,
+            rcel_endpoint=RCEL_ENDPOINT,
+            comprobantes_por_cliente=args.comprobantes,
+            tamano_pdf=args.tamano_pdf,
+            latencia_consulta=args.latencia_consulta,
+            latencia_descarga=args.latencia_descarga,
+            ancho_banda_conexion=args.ancho_banda * 1_048_576 if args.ancho_banda else None,
+            ancho_banda_total=args.ancho_banda_total * 1_048_576 if args.ancho_banda_total else None,
+            tasa_error=args.tasa_error,
+            tasa_lentas=args.tasa_lentas,
+            latencia_lenta=args.latencia_lenta,
+        ).iniciar()
+    base_url = args.url or servidor.url
+
+    resultados: Dict[str, Any] = {
+        "commit": commit_actual(),
+        "fecha": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("verbose", "no_guardar")},
+        "escalas": [],
+    }
+
+    try:
+        for clientes in [int(e) for e in args.escalas.split(",") if e.strip()]:
+            previas = servidor.estadisticas() if servidor else {}
+            with tempfile.TemporaryDirectory(prefix=f"carga_{clientes}_") as directorio:
+                resultado = ejecutar_carga(planilla_sintetica(clientes, fuentes=fuentes), base_url, directorio,
+                                           args.clientes_concurrentes, args.en_memoria, args.solo_metadata,
+                                           args.verbose)
+            if servidor:
+                resultado["servidor"] = {k: v - previas.get(k, 0) for k, v in servidor.estadisticas().items()}
+            resultados["escalas"].append(resultado)
+            imprimir_resultado(resultado)
+    finally:
+        if servidor:
+            servidor.detener()
+
+    if not args.no_guardar:
+        ruta = guardar_resultados(resultados, os.path.join(DIRECTORIO_RESULTADOS, "descargas"))
+        print(f"\nResultados guardados en: {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Generador de datos sintéticos con el formato de las descargas de Mis Comprobantes y RCEL
+"""
+import json
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.helpers import construir_nombre_directorio
+
+COLUMNAS_MCE = [
+    'Fecha de Emisión', 'Tipo de Comprobante', 'Punto de Venta', 'Número Desde', 'Número Hasta',
+    'Cód. Autorización', 'Tipo Doc. Receptor', 'Nro. Doc. Receptor', 'Denominación Receptor',
+    'Tipo Cambio', 'Moneda', 'Imp. Neto Gravado Total', 'Imp. Neto No Gravado', 'Imp. Op. Exentas',
+    'Otros Tributos', 'Total IVA', 'Imp. Total',
+]
+
+COLUMNAS_MCR = [c.replace('Receptor', 'Emisor') for c in COLUMNAS_MCE]
+
+# Escala de categorías usada por defecto en el Categorias.xlsx sintético
+ESCALA_CATEGORIAS = [
+    ('A', 6450000), ('B', 9450000), ('C', 13250000), ('D', 16450000), ('E', 19350000),
+    ('F', 24250000), ('G', 29000000), ('H', 44000000), ('I', 49250000), ('J', 56400000),
+    ('K', 68000000), ('Fuera de Parámetros del monotributo', 9999999999999989760),
+]
+
+NOMBRES = ['GOMEZ', 'PEREZ', 'RODRIGUEZ', 'FERNANDEZ', 'LOPEZ', 'MARTINEZ', 'GARCIA', 'SANCHEZ',
+           'ROMERO', 'SOSA', 'TORRES', 'ALVAREZ', 'RUIZ', 'DIAZ', 'BENITEZ', 'ACOSTA']
+
+
+def cuit_valido(prefijo: int, dni: int) -> str:
+    """
+    Construye un CUIT con dígito verificador válido.
+
+    Args:
+        prefijo: Prefijo de dos dígitos (20, 23, 27, 30...)
+        dni: Número de documento (8 dígitos)
+
+    Returns:
+        str: CUIT de 11 dígitos
+    """
+    base = f"{prefijo:02d}{dni:08d}"
+    pesos = [5, 4, 3, 2, 7, 6, 5, 4, 3, 2]
+    resto = 11 - sum(int(d) * p for d, p in zip(base, pesos)) % 11
+    verificador = 0 if resto == 11 else 9 if resto == 10 else resto
+    return f"{base}{verificador}"
+
+
+def generar_clientes(cantidad: int, semilla: int = 0) -> List[Dict[str, str]]:
+    """
+    Genera contribuyentes sintéticos.
+
+    Args:
+        cantidad: Cantidad de clientes
+        semilla: Semilla aleatoria
+
+    Returns:
+        List[Dict[str, str]]: Clientes con 'cuit' y 'nombre'
+    """
+    rng = np.random.default_rng(semilla)
+    clientes = []
+    for i in range(cantidad):
+        dni = 20000000 + i * 7919 + int(rng.integers(0, 7000))
+        nombre = f"{NOMBRES[i % len(NOMBRES)]} {NOMBRES[(i * 7 + 3) % len(NOMBRES)]} {i:04d}"
+        clientes.append({'cuit': cuit_valido(int(rng.choice([20, 23, 27])), dni), 'nombre': nombre})
+    return clientes
+
+
+def generar_comprobantes_mc(
+    cuit: str,
+    tipo: str,
+    cantidad: int,
+    desde: date,
+    hasta: date,
+    semilla: int = 0,
+) -> pd.DataFrame:
+    """
+    Genera un DataFrame con las columnas del CSV de Mis Comprobantes.
+
+    Args:
+        cuit: CUIT del contribuyente
+        tipo: 'MCE' (emitidos) o 'MCR' (recibidos)
+        cantidad: Cantidad de comprobantes
+        desde: Primera fecha de emisión posible
+        hasta: Última fecha de emisión posible
+        semilla: Semilla aleatoria
+
+    Returns:
+        pd.DataFrame: Comprobantes con el formato del CSV de AFIP
+    """
+    rng = np.random.default_rng(semilla)
+    dias = (hasta - desde).days + 1
+    fechas = pd.to_datetime(desde) + pd.to_timedelta(np.sort(rng.integers(0, dias, cantidad)), unit='D')
+
+    if tipo == 'MCE':
+        # Monotributista: facturas C con ~5% de notas de crédito
+        tipos = rng.choice([11, 13], size=cantidad, p=[0.95, 0.05])
+        puntos_venta = rng.choice([1, 2, 3], size=cantidad, p=[0.8, 0.15, 0.05])
+    else:
+        tipos = rng.choice([1, 6, 11, 3, 8, 13], size=cantidad, p=[0.2, 0.4, 0.3, 0.03, 0.04, 0.03])
+        puntos_venta = rng.integers(1, 20, size=cantidad)
+
+    numeros = np.arange(1, cantidad + 1) + int(rng.integers(0, 5000))
+    dolares = rng.random(cantidad) < 0.03
+    tipo_cambio = np.where(dolares, np.round(rng.uniform(800, 1200, cantidad), 2), 1.0)
+    importe = np.round(rng.lognormal(mean=10.5, sigma=1.0, size=cantidad), 2)
+    gravado = np.where(np.isin(tipos, [1, 3, 6, 8]), np.round(importe / 1.21, 2), 0.0)
+    iva = np.where(gravado > 0, np.round(importe - gravado, 2), 0.0)
+    no_gravado = np.where(gravado > 0, 0.0, importe)
+
+    prefijo = 'Receptor' if tipo == 'MCE' else 'Emisor'
+    contrapartes = np.array([cuit_valido(30, 70000000 + int(n)) for n in rng.integers(0, 400, size=min(cantidad, 50))])
+    elegidas = contrapartes[rng.integers(0, len(contrapartes), size=cantidad)] if cantidad else contrapartes[:0]
+
+    df = pd.DataFrame({
+        'Fecha de Emisión': fechas.strftime('%Y-%m-%d'),
+        'Tipo de Comprobante': tipos,
+        'Punto de Venta': puntos_venta,
+        'Número Desde': numeros,
+        'Número Hasta': numeros,
+        'Cód. Autorización': rng.integers(70_000_000_000_000, 75_999_999_999_999, size=cantidad, dtype=np.int64),
+        f'Tipo Doc. {prefijo}': 80,
+        f'Nro. Doc. {prefijo}': elegidas.astype(np.int64) if cantidad else elegidas,
+        f'Denominación {prefijo}': [f"EMPRESA {c[-4:]} SA" for c in elegidas],
+        'Tipo Cambio': tipo_cambio,
+        'Moneda': np.where(dolares, 'DOL', '$'),
+        'Imp. Neto Gravado Total': gravado,
+        'Imp. Neto No Gravado': no_gravado,
+        'Imp. Op. Exentas': 0.0,
+        'Otros Tributos': 0.0,
+        'Total IVA': iva,
+        'Imp. Total': importe,
+    })
+    return df[COLUMNAS_MCE if tipo == 'MCE' else COLUMNAS_MCR]
+
+
+def csv_mc_bytes(df: pd.DataFrame) -> bytes:
+    """Serializa comprobantes con el formato del CSV de Mis Comprobantes (';' y coma decimal)."""
+    return df.to_csv(sep=';', decimal=',', index=False).encode('utf-8-sig')
+
+
+def nombre_archivo_mc(indice: int, tipo: str, desde: date, hasta: date, cuit: str, nombre: str,
+                      extension: str = '.csv') -> str:
+    """
+    Construye el nombre de archivo de Mis Comprobantes que espera `control()`.
+
+    Returns:
+        str: Nombre del tipo '9 - MCE - 01012025 - 31122025 - CUIT - NOMBRE.csv'
+    """
+    return f"{indice} - {tipo} - {desde:%d%m%Y} - {hasta:%d%m%Y} - {cuit} - {nombre}{extension}"
+
+
+def nombre_miembro_zip(tipo: str, desde: date, hasta: date, cuit: str) -> str:
+    """Nombre del CSV dentro del ZIP; `extraer_zip` valida el CUIT en la posición 5 separada por '_'."""
+    return f"comprobantes_{tipo.lower()}_{desde:%d%m%Y}_{hasta:%d%m%Y}_afip_{cuit}_mc.csv"
+
+
+def generar_facturas_rcel(
+    cuit: str,
+    comprobantes_mce: pd.DataFrame,
+    proporcion: float = 0.7,
+    url_base: str = "http://localhost:9000/rcel",
+    semilla: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Genera la metadata de RCEL para una parte de las facturas emitidas.
+
+    Args:
+        cuit: CUIT del contribuyente
+        comprobantes_mce: Comprobantes emitidos generados con `generar_comprobantes_mc`
+        proporcion: Proporción de facturas con datos de RCEL
+        url_base: URL base para `URL_MINIO`
+        semilla: Semilla aleatoria
+
+    Returns:
+        List[Dict[str, Any]]: Facturas con el formato de `facturas_emitidas`
+    """
+    rng = np.random.default_rng(semilla)
+    facturas = []
+    seleccion = comprobantes_mce[rng.random(len(comprobantes_mce)) < proporcion]
+
+    for fila in seleccion.itertuples(index=False):
+        emision = date.fromisoformat(fila[0])
+        tipo, punto_venta, numero = int(fila[1]), int(fila[2]), int(fila[3])
+        desde = emision - timedelta(days=int(rng.integers(0, 60)))
+        hasta = desde + timedelta(days=int(rng.integers(0, 90)))
+        aux = f"{cuit}-{tipo:03d}-{punto_venta:05d}-{numero:08d}"
+        facturas.append({
+            'AUX': aux,
+            'NUMERO_FACTURA': f"{punto_venta:05d}-{numero:08d}",
+            'CUIT_EMISOR': cuit,
+            'TIPO_COMPROBANTE': tipo,
+            'FECHA_EMISION': emision.strftime('%d/%m/%Y'),
+            'Desde': desde.strftime('%d/%m/%Y'),
+            'Hasta': hasta.strftime('%d/%m/%Y'),
+            'CAE': str(fila[5]),
+            'RECEPTOR': str(fila[8]),
+            'IMPORTE_TOTAL': float(fila[16]),
+            'DETALLE': [{'descripcion': 'Servicios profesionales', 'cantidad': 1, 'precio': float(fila[16])}],
+            'URL_MINIO': f"{url_base}/{cuit}/{aux}.pdf",
+        })
+    return facturas
+
+
+def escribir_categorias(ruta: str, fecha_inicial: date, fecha_final: date) -> str:
+    """
+    Escribe un Categorias.xlsx con la escala por defecto y el rango de fechas indicado.
+
+    Returns:
+        str: Ruta del archivo escrito
+    """
+    categorias = pd.DataFrame(ESCALA_CATEGORIAS, columns=['Categoria', 'Ingresos brutos'])
+    rango = pd.DataFrame({'Inicio': [pd.Timestamp(fecha_inicial)], 'Fin': [pd.Timestamp(fecha_final)]})
+    with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+        categorias.to_excel(writer, sheet_name='categoria', index=False)
+        rango.to_excel(writer, sheet_name='Rango de Fechas', index=False)
+    return ruta
+
+
+def generar_escenario(
+    directorio: str,
+    clientes: int = 10,
+    comprobantes_por_cliente: int = 200,
+    proporcion_rcel: float = 0.7,
+    formato_rcel: str = 'individual',
+    desde: date = date(2024, 1, 1),
+    hasta: date = date(2024, 12, 31),
+    semilla: int = 0,
+) -> Dict[str, Any]:
+    """
+    Genera un árbol de descargas completo listo para `control()`.
+
+    Crea `descargas_mis_comprobantes/<CUIT>_<Nombre>/extraido/*.csv` (MCE y MCR),
+    `descargas_rcel/<CUIT>_<Nombre>/*.json` y un `Categorias.xlsx`.
+
+    Args:
+        directorio: Directorio raíz del escenario
+        clientes: Cantidad de clientes
+        comprobantes_por_cliente: Comprobantes emitidos por cliente (los recibidos son la mitad)
+        proporcion_rcel: Proporción de facturas emitidas con metadata RCEL
+        formato_rcel: 'individual' (un JSON por factura) o 'listado' (facturas_emitidas.json)
+        desde: Inicio del período generado
+        hasta: Fin del período generado
+        semilla: Semilla aleatoria
+
+    Returns:
+        Dict[str, Any]: Rutas generadas y cantidades
+    """
+    ruta_mc = os.path.join(directorio, 'descargas_mis_comprobantes')
+    ruta_rcel = os.path.join(directorio, 'descargas_rcel')
+    archivos_mc: List[str] = []
+    archivos_json: List[str] = []
+    total_comprobantes = 0
+
+    for i, cliente in enumerate(generar_clientes(clientes, semilla)):
+        cuit, nombre = cliente['cuit'], cliente['nombre']
+        dir_cliente = construir_nombre_directorio(cuit, nombre)
+        dir_extraido = os.path.join(ruta_mc, dir_cliente, 'extraido')
+        os.makedirs(dir_extraido, exist_ok=True)
+
+        mce = None
+        for tipo, cantidad in (('MCE', comprobantes_por_cliente), ('MCR', comprobantes_por_cliente // 2)):
+            df = generar_comprobantes_mc(cuit, tipo, cantidad, desde, hasta, semilla=semilla * 100003 + i * 2 + (tipo == 'MCR'))
+            ruta = os.path.join(dir_extraido, nombre_archivo_mc(9, tipo, desde, hasta, cuit, nombre))
+            with open(ruta, 'wb') as f:
+                f.write(csv_mc_bytes(df))
+            archivos_mc.append(ruta)
+            total_comprobantes += len(df)
+            if tipo == 'MCE':
+                mce = df
+
+        facturas = generar_facturas_rcel(cuit, mce, proporcion_rcel, semilla=semilla * 100003 + i)
+        dir_rcel = os.path.join(ruta_rcel, dir_cliente)
+        os.makedirs(dir_rcel, exist_ok=True)
+        if formato_rcel == 'listado':
+            ruta = os.path.join(dir_rcel, 'facturas_emitidas.json')
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(facturas, f, ensure_ascii=False)
+            archivos_json.append(ruta)
+        else:
+            for factura in facturas:
+                ruta = os.path.join(dir_rcel, f"{factura['AUX']}.json")
+                with open(ruta, 'w', encoding='utf-8') as f:
+                    json.dump(factura, f, indent=2, ensure_ascii=False)
+                archivos_json.append(ruta)
+
+    ruta_categorias = escribir_categorias(os.path.join(directorio, 'Categorias.xlsx'), desde, hasta)
+
+    return {
+        'directorio': directorio,
+        'descargas_mc': ruta_mc,
+        'descargas_rcel': ruta_rcel,
+        'categorias': ruta_categorias,
+        'archivos_mc': archivos_mc,
+        'archivos_json': archivos_json,
+        'clientes': clientes,
+        'comprobantes': total_comprobantes,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera un escenario sintético de descargas")
+    parser.add_argument("directorio")
+    parser.add_argument("--clientes", type=int, default=10)
+    parser.add_argument("--comprobantes", type=int, default=200)
+    parser.add_argument("--formato-rcel", choices=['individual', 'listado'], default='individual')
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    escenario = generar_escenario(args.directorio, args.clientes, args.comprobantes,
+                                  formato_rcel=args.formato_rcel, semilla=args.semilla)
+    print(f"Clientes: {escenario['clientes']} | Comprobantes: {escenario['comprobantes']} | "
+          f"JSON RCEL: {len(escenario['archivos_json'])}")
@@ -0,0 +1,400 @@
+"""
+Servidor local que simula la API de Mrbot y las URLs de descarga de MinIO
+
+Implementa los contratos `/mis_comprobantes/consulta`, `/rcel/consulta` y
+`/user/consultas/<email>`, y sirve ZIPs de Mis Comprobantes y PDFs de RCEL
+generados con `generador_datos`, con latencia, ancho de banda y tasa de error
+configurables. Permite ejercitar la fase de descarga sin credenciales.
+"""
+import base64
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+from zipfile import ZIP_DEFLATED, ZipFile
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.generador_datos import (
+    csv_mc_bytes,
+    generar_comprobantes_mc,
+    generar_facturas_rcel,
+    nombre_archivo_mc,
+    nombre_miembro_zip,
+)
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+@lru_cache(maxsize=4096)
+def _comprobantes(cuit: str, tipo: str, cantidad: int, desde: str, hasta: str, semilla: int):
+    """
+    Comprobantes deterministas por cliente, compartidos entre la consulta MC y la de RCEL.
+
+    La numeración se desplaza según el mes de inicio del rango para que consultas de
+    distintos períodos (p.ej. ventanas mensuales) no repitan números de comprobante.
+    """
+    inicio = datetime.strptime(desde, "%d/%m/%Y").date()
+    fin = datetime.strptime(hasta, "%d/%m/%Y").date()
+    df = generar_comprobantes_mc(cuit, tipo, cantidad, inicio, fin, semilla=(int(cuit) + semilla) % 2**32)
+    desplazamiento = ((inicio.year - 2000) * 12 + inicio.month) * 100_000
+    df['Número Desde'] += desplazamiento
+    df['Número Hasta'] += desplazamiento
+    return df
+
+
+def pdf_sintetico(aux: str, tamano: int) -> bytes:
+    """Genera un PDF mínimo de aproximadamente `tamano` bytes para la factura `aux`."""
+    encabezado = f"%PDF-1.4\n% Factura {aux}\n".encode()
+    relleno = max(tamano - len(encabezado) - 6, 0)
+    return encabezado + b"0" * relleno + b"\n%%EOF"
+
+
+class LimitadorAnchoBanda:
+    """Balde de fichas compartido entre hilos para limitar los bytes por segundo."""
+
+    def __init__(self, bytes_por_segundo: float):
+        self.tasa = bytes_por_segundo
+        self._lock = threading.Lock()
+        self._disponible_desde = time.monotonic()
+
+    def consumir(self, cantidad: int) -> None:
+        """Bloquea hasta que se puedan enviar `cantidad` bytes respetando la tasa."""
+        with self._lock:
+            ahora = time.monotonic()
+            inicio = max(ahora, self._disponible_desde)
+            self._disponible_desde = inicio + cantidad / self.tasa
+            espera = self._disponible_desde - ahora
+        if espera > 0:
+            time.sleep(espera)
+
+
+class ServidorSimulado:
+    """
+    Servidor HTTP multihilo con el comportamiento de Mrbot y MinIO.
+
+    Args:
+        puerto: Puerto a escuchar (0 elige uno libre)
+        mis_comprobantes_endpoint: Endpoint de Mis Comprobantes (como MIS_COMPROBANTES_ENDPOINT)
+        rcel_endpoint: Endpoint de RCEL (como RCEL_ENDPOINT)
+        user_endpoint: Endpoint de usuario (como USER_ENDPOINT)
+        comprobantes_por_cliente: Comprobantes emitidos por cliente (los recibidos son la mitad)
+        proporcion_rcel: Proporción de facturas emitidas que devuelve RCEL
+        tamano_pdf: Tamaño aproximado de cada PDF en bytes
+        latencia_consulta: Segundos promedio de respuesta de las consultas
+        latencia_descarga: Segundos promedio hasta el primer byte de una descarga
+        variacion: Variación relativa de las latencias (0.5 = ±50%)
+        ancho_banda_conexion: Bytes por segundo por descarga (None = sin límite)
+        ancho_banda_total: Bytes por segundo para todo el servidor (None = sin límite)
+        tasa_error: Probabilidad de responder con error a una consulta o descarga
+        tasa_error_descarga: Probabilidad de error de las descargas de MinIO (por defecto `tasa_error`)
+        tasa_lentas: Probabilidad de que la primera descarga de un archivo se trabe `latencia_lenta`
+            segundos antes del primer byte (los reintentos del mismo archivo no se traban)
+        latencia_lenta: Segundos de demora de una descarga trabada
+        consultas_disponibles: Cupo de consultas informado por el endpoint de usuario
+        soporta_json: Si es False se ignora `carga_json` y solo se devuelven las URLs de los ZIP
+        semilla: Semilla aleatoria
+    """
+
+    def __init__(
+        self,
+        puerto: int = 0,
+        mis_comprobantes_endpoint: str = "api/v1/mis_comprobantes",
+        rcel_endpoint: str = "api/v1/rcel",
+        user_endpoint: str = "api/v1/user",
+        comprobantes_por_cliente: int = 200,
+        proporcion_rcel: float = 0.7,
+        tamano_pdf: int = 30_000,
+        latencia_consulta: float = 0.0,
+        latencia_descarga: float = 0.0,
+        variacion: float = 0.5,
+        ancho_banda_conexion: Optional[float] = None,
+        ancho_banda_total: Optional[float] = None,
+        tasa_error: float = 0.0,
+        tasa_error_descarga: Optional[float] = None,
+        tasa_lentas: float = 0.0,
+        latencia_lenta: float = 5.0,
+        consultas_disponibles: int = 100_000,
+        soporta_json: bool = True,
+        semilla: int = 0,
+    ):
+        self.rutas = {
+            "/" + mis_comprobantes_endpoint.strip("/") + "/consulta": self._consulta_mc,
+            "/" + rcel_endpoint.strip("/") + "/consulta": self._consulta_rcel,
+        }
+        self.prefijo_usuario = "/" + user_endpoint.strip("/") + "/consultas/"
+        self.comprobantes_por_cliente = comprobantes_por_cliente
+        self.proporcion_rcel = proporcion_rcel
+        self.tamano_pdf = tamano_pdf
+        self.latencia_consulta = latencia_consulta
+        self.latencia_descarga = latencia_descarga
+        self.variacion = variacion
+        self.ancho_banda_conexion = ancho_banda_conexion
+        self.limitador_total = LimitadorAnchoBanda(ancho_banda_total) if ancho_banda_total else None
+        self.tasa_error = tasa_error
+        self.tasa_error_descarga = tasa_error if tasa_error_descarga is None else tasa_error_descarga
+        self.tasa_lentas = tasa_lentas
+        self.latencia_lenta = latencia_lenta
+        self.consultas_disponibles = consultas_disponibles
+        self.soporta_json = soporta_json
+        self.semilla = semilla
+
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._zips: Dict[str, Tuple[str, bytes]] = {}
+        self._estadisticas: Dict[str, int] = {}
+        self._pedidos_archivo: Dict[str, int] = {}
+
+        servidor = self
+
+        class _Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                servidor._atender(self, "POST")
+
+            def do_GET(self):
+                servidor._atender(self, "GET")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), _Manejador)
+        self._httpd.daemon_threads = True
+        self._httpd.request_queue_size = 1024
+        self._hilo: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ ciclo de vida
+
+    @property
+    def url(self) -> str:
+        """URL base del servidor, apta para BASE_URL."""
+        host, puerto = self._httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> "ServidorSimulado":
+        """Atiende pedidos en un hilo en segundo plano."""
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def servir(self) -> None:
+        """Atiende pedidos en el hilo actual hasta que se interrumpa."""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def detener(self) -> None:
+        """Detiene el servidor y libera el puerto."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._hilo:
+            self._hilo.join()
+
+    def __enter__(self) -> "ServidorSimulado":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.detener()
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Cantidad de pedidos atendidos y errores inyectados por tipo."""
+        with self._lock:
+            return dict(self._estadisticas)
+
+    # ------------------------------------------------------------------ utilidades
+
+    def _contar(self, clave: str) -> None:
+        with self._lock:
+            self._estadisticas[clave] = self._estadisticas.get(clave, 0) + 1
+
+    def _esperar(self, latencia: float) -> None:
+        if latencia <= 0:
+            return
+        with self._lock:
+            factor = self._rng.uniform(1 - self.variacion, 1 + self.variacion)
+        time.sleep(max(latencia * factor, 0))
+
+    def _falla(self, tasa: Optional[float] = None) -> bool:
+        tasa = self.tasa_error if tasa is None else tasa
+        if tasa <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < tasa
+
+    def _responder_json(self, manejador: BaseHTTPRequestHandler, estado: int, cuerpo: Any) -> None:
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        manejador.send_response(estado)
+        manejador.send_header("Content-Type", "application/json")
+        manejador.send_header("Content-Length", str(len(datos)))
+        manejador.end_headers()
+        manejador.wfile.write(datos)
+
+    def _responder_archivo(self, manejador: BaseHTTPRequestHandler, nombre: str, contenido: bytes,
+                           tipo: str) -> None:
+        manejador.send_response(200)
+        manejador.send_header("Content-Type", tipo)
+        manejador.send_header("Content-Length", str(len(contenido)))
+        manejador.send_header("Content-Disposition", f'attachment; filename="{nombre}"')
+        manejador.end_headers()
+        vista = memoryview(contenido)
+        for inicio in range(0, len(contenido), TAMANO_BLOQUE):
+            bloque = vista[inicio:inicio + TAMANO_BLOQUE]
+            if self.limitador_total:
+                self.limitador_total.consumir(len(bloque))
+            manejador.wfile.write(bloque)
+            if self.ancho_banda_conexion:
+                time.sleep(len(bloque) / self.ancho_banda_conexion)
+
+    # ------------------------------------------------------------------ rutas
+
+    def _atender(self, manejador: BaseHTTPRequestHandler, metodo: str) -> None:
+        ruta = urlparse(manejador.path).path
+        try:
+            if metodo == "POST" and ruta in self.rutas:
+                largo = int(manejador.headers.get("Content-Length") or 0)
+                payload = json.loads(manejador.rfile.read(largo) or b"{}")
+                if not manejador.headers.get("x-api-key"):
+                    self._contar("no_autorizado")
+                    self._responder_json(manejador, 401, {"detail": "API key faltante"})
+                    return
+                self._esperar(self.latencia_consulta)
+                if self._falla():
+                    self._contar("errores_consulta")
+                    self._responder_json(manejador, 500, {
+                        "success": False,
+                        "detail": {"message": "Error simulado del servidor", "error_code": "SIMULADO"},
+                    })
+                    return
+                with self._lock:
+                    self.consultas_disponibles -= 1
+                self._responder_json(manejador, 200, self.rutas[ruta](payload))
+            elif metodo == "GET" and ruta.startswith(self.prefijo_usuario):
+                self._contar("consultas_disponibles")
+                with self._lock:
+                    disponibles = self.consultas_disponibles
+                self._responder_json(manejador, 200, {"consultas_disponibles": disponibles})
+            elif metodo == "GET" and ruta.startswith("/minio/"):
+                self._descarga(manejador, ruta)
+            else:
+                self._responder_json(manejador, 404, {"detail": "No encontrado"})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _consulta_mc(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._contar("consultas_mc")
+        cuit = str(payload["representado_cuit"])
+        nombre = payload.get("representado_nombre", "")
+        desde, hasta = payload["desde"], payload["hasta"]
+        respuesta: Dict[str, Any] = {"success": True}
+
+        for tipo, clave, cantidad in (
+            ("MCE", "emitidos", self.comprobantes_por_cliente),
+            ("MCR", "recibidos", self.comprobantes_por_cliente // 2),
+        ):
+            if not payload.get(f"descarga_{clave}", True):
+                continue
+            df = _comprobantes(cuit, tipo, cantidad, desde, hasta, self.semilla)
+            if payload.get("carga_json") and self.soporta_json:
+                respuesta[f"mis_comprobantes_{clave}_json"] = json.loads(df.to_json(orient="records", force_ascii=False))
+            if not payload.get("carga_minio", True):
+                continue
+            inicio = datetime.strptime(desde, "%d/%m/%Y").date()
+            fin = datetime.strptime(hasta, "%d/%m/%Y").date()
+            buffer = io.BytesIO()
+            with ZipFile(buffer, "w", ZIP_DEFLATED) as zip_ref:
+                zip_ref.writestr(nombre_miembro_zip(tipo, inicio, fin, cuit), csv_mc_bytes(df))
+            nombre_zip = nombre_archivo_mc(9, tipo, inicio, fin, cuit, nombre, ".zip")
+            if payload.get("b64"):
+                respuesta[f"mis_comprobantes_{clave}_b64"] = base64.b64encode(buffer.getvalue()).decode("ascii")
+            token = uuid.uuid4().hex
+            with self._lock:
+                self._zips[token] = (nombre_zip, buffer.getvalue())
+            respuesta[f"mis_comprobantes_{clave}_url_minio"] = f"{self.url}/minio/mc/{token}/{quote(nombre_zip)}"
+
+        return respuesta
+
+    def _consulta_rcel(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._contar("consultas_rcel")
+        cuit = str(payload["representado_cuit"])
+        mce = _comprobantes(cuit, "MCE", self.comprobantes_por_cliente, payload["desde"], payload["hasta"], self.semilla)
+        facturas = generar_facturas_rcel(cuit, mce, self.proporcion_rcel, url_base=f"{self.url}/minio/rcel",
+                                         semilla=(int(cuit) + self.semilla) % 2**32)
+        if payload.get("b64_pdf"):
+            for factura in facturas:
+                pdf = pdf_sintetico(factura["AUX"], self.tamano_pdf)
+                factura["PDF_B64"] = base64.b64encode(pdf).decode("ascii")
+        return {"success": True, "facturas_emitidas": facturas}
+
+    def _trabada(self, ruta: str) -> bool:
+        if self.tasa_lentas <= 0:
+            return False
+        with self._lock:
+            pedidos = self._pedidos_archivo[ruta] = self._pedidos_archivo.get(ruta, 0) + 1
+            return pedidos == 1 and self._rng.random() < self.tasa_lentas
+
+    def _descarga(self, manejador: BaseHTTPRequestHandler, ruta: str) -> None:
+        self._esperar(self.latencia_descarga)
+        if self._trabada(ruta):
+            self._contar("descargas_trabadas")
+            time.sleep(self.latencia_lenta)
+        if self._falla(self.tasa_error_descarga):
+            self._contar("errores_descarga")
+            self._responder_json(manejador, 503, {"detail": "Descarga no disponible"})
+            return
+
+        partes = ruta.split("/")
+        if ruta.startswith("/minio/mc/") and len(partes) >= 5:
+            with self._lock:
+                archivo = self._zips.pop(partes[3], None)
+            if archivo is None:
+                self._responder_json(manejador, 404, {"detail": "Enlace vencido"})
+                return
+            self._contar("descargas_zip")
+            self._responder_archivo(manejador, archivo[0], archivo[1], "application/zip")
+        elif ruta.startswith("/minio/rcel/") and ruta.endswith(".pdf"):
+            nombre = unquote(partes[-1])
+            self._contar("descargas_pdf")
+            self._responder_archivo(manejador, nombre, pdf_sintetico(nombre[:-4], self.tamano_pdf), "application/pdf")
+        else:
+            self._responder_json(manejador, 404, {"detail": "No encontrado"})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor local que simula Mrbot y MinIO")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--comprobantes", type=int, default=200)
+    parser.add_argument("--latencia-consulta", type=float, default=1.0)
+    parser.add_argument("--latencia-descarga", type=float, default=0.05)
+    parser.add_argument("--ancho-banda", type=float, help="MB/s por descarga")
+    parser.add_argument("--ancho-banda-total", type=float, help="MB/s para todo el servidor")
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor = ServidorSimulado(
+        puerto=args.puerto,
+        comprobantes_por_cliente=args.comprobantes,
+        latencia_consulta=args.latencia_consulta,
+        latencia_descarga=args.latencia_descarga,
+        ancho_banda_conexion=args.ancho_banda * 1_048_576 if args.ancho_banda else None,
+        ancho_banda_total=args.ancho_banda_total * 1_048_576 if args.ancho_banda_total else None,
+        tasa_error=args.tasa_error,
+    )
+    print(f"Servidor simulado escuchando en {servidor.url} (usar como BASE_URL). Ctrl+C para salir.")
+    try:
+        servidor.servir()
+    except KeyboardInterrupt:
+        pass
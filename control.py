@@ -1,44 +1,276 @@
 import tkinter as tk
 from tkinter.messagebox import showinfo
 from lib.caller_mc import consulta_mis_comprobantes
-from lib.caller_rcel import consulta_rcel, validar_respuesta_rcel
-from lib.utils import descargar_archivo, descargar_archivos_concurrente, extraccion_urls_minio, extraer_zip, guardar_json
+from lib.caller_rcel import consulta_rcel, guardar_facturas_rcel, validar_respuesta_rcel
+from lib.utils import (contenido_base64, descargar_archivo, descargar_archivos_concurrente, descargar_contenidos_concurrente, extraccion_urls_minio,
+                       decodificar_json, extraer_zip, extraer_zip_memoria, guardar_base64, guardar_json, leer_json,
+                       nombre_archivo_descarga)
 from lib.formatos import Aplicar_formato_encabezado, Aplicar_formato_moneda, Autoajustar_columnas, Agregar_filtros, Alinear_columnas
 from lib.helpers import formatear_fecha, normalizar_si_no, construir_nombre_directorio, imprimir_encabezado
 from lib.procesadores import crear_directorios_descarga
+from lib.inventario import listar_archivos, registrar_descarga
+from lib.periodos import (TIPOS_MC, CoberturaDescargas, DescargaIncompleta, a_fecha, consultas_concurrentes,
+                          csv_extraidos, descarga_incremental, dividir_rango, fusionar_csv_memoria, fusionar_csv_mc,
+                          modo_division, tipos_en_archivos, ultimo_mes_cerrado)
+from lib.cache_control import CacheClientes, agrupar_por_cliente, cuit_archivo_json, cuit_archivo_mc, huella_cliente
+from lib.almacen import AlmacenComprobantes
+from lib.metricas import metricas, formatear_progreso, suscriptor_periodico
+from lib.bitacora import (COMPLETADO, CONSULTADO, DESCARGADO, ESTADOS_FINALES, EXTRAIDO, FALLIDO, PENDIENTE,
+                          BitacoraDescargas, clave_trabajo)
+from lib.perfilado import PerfiladorEtapas, modo_perfilado
+from lib.ingesta_mc import (dataframe_comprobantes, escribir_csv_mc, extraccion_comprobantes_json, modo_ingesta_mc,
+                            nombre_csv_mc)
+from lib.planificador import CupoConsultas, clientes_concurrentes, leer_prioridad, mas_largos_primero, planificar
+from lib.historial import HistorialClientes
+from lib.carga_inline import CAMPO_PDF_BASE64, CAMPO_ZIP_BASE64, usar_carga_inline
+from lib.registro import configurar_registro, obtener_registrador, registrar_secreto
+from lib.plazos import PlazoVencido, plazo_cliente
+from lib.almacen_pdf import obtener_almacen_pdf
+from lib.agregaciones import agrupaciones_desde_entorno, calcular_agrupaciones
+from lib.tipos_comprobante import registro_tipos
+from lib.validacion import (HOJA_VALIDACION, ErrorValidacion, ruta_validacion, unir_observaciones, validacion_estricta,
+                            validar_mc, validar_rcel)
+from lib.archivado import archivar_periodo, cerrar_archivos, existe_archivo, leer_archivado, nombres_archivados, ubicar
 from dotenv import load_dotenv
+import contextvars
+import io
 import os
 import pandas as pd
 from datetime import date, datetime
 import numpy as np
 from openpyxl import load_workbook
 import json
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 load_dotenv()
+configurar_registro()
+registro = obtener_registrador("control")
 
-notas_de_credito = [
-    3,
-    8,
-    13,
-    21,
-    38,
-    43,
-    44,
-    48,
-    53,
-    90,
-    110,
-    112,
-    113,
-    114,
-    119,
-    203,
-    208,
-    213,
-]
-
-def procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, downloads_mc_path):
+def _sin_notificar(estado, motivo=None):
+    """Notificación de estado por defecto: sin bitácora."""
+
+
+def _ventanas_consulta(rangos):
+    """
+    Divide rangos ('dd/mm/yyyy', 'dd/mm/yyyy') en las ventanas de consulta indicadas por DIVIDIR_RANGO.
+
+    Returns:
+        list: Ventanas (desde, hasta) en orden; los rangos con fechas no interpretables no se dividen
+    """
+    modo = modo_division()
+    if modo == 'no':
+        return list(rangos)
+    ventanas = []
+    for desde, hasta in rangos:
+        try:
+            ventanas.extend((formatear_fecha(d), formatear_fecha(h))
+                            for d, h in dividir_rango(a_fecha(desde), a_fecha(hasta), modo))
+        except ValueError:
+            ventanas.append((desde, hasta))
+    return ventanas
+
+
+def _consultar_en_paralelo(funcion, ventanas):
+    """
+    Ejecuta `funcion(desde, hasta)` para cada ventana con hasta CONSULTAS_CONCURRENTES hilos.
+
+    Returns:
+        list: Resultados en el orden de `ventanas`; si alguna ventana falla se propaga su error
+    """
+    if len(ventanas) == 1:
+        return [funcion(*ventanas[0])]
+    with ThreadPoolExecutor(max_workers=min(consultas_concurrentes(), len(ventanas))) as executor:
+        # Cada consulta hereda el contexto (cliente actual) para las métricas
+        futures = [executor.submit(contextvars.copy_context().run, funcion, desde, hasta) for desde, hasta in ventanas]
+        return [future.result() for future in futures]
+
+
+def _unir_facturas(listas):
+    """Une las facturas de RCEL de varias ventanas descartando repetidas (por AUX o URL_MINIO)."""
+    facturas = []
+    vistas = set()
+    for lista in listas:
+        for factura in lista or []:
+            clave = factura.get('AUX') or factura.get('URL_MINIO')
+            if clave is not None and clave in vistas:
+                continue
+            vistas.add(clave)
+            facturas.append(factura)
+    return facturas
+
+
+def _descargar_rango_mc(desde, hasta, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint,
+                        cuit_representante, clave_representante, cuit_representado, denominacion_mc,
+                        descargar_emitidos, descargar_recibidos, downloads_mc_path, directorio_cliente,
+                        en_memoria=False, directorio_archivo=None, notificar_estado=_sin_notificar,
+                        carga_inline=False):
+    """
+    Consulta Mis Comprobantes para un rango de fechas y descarga (y extrae) los ZIP resultantes.
+
+    Con MODO_INGESTA_MC=json los comprobantes llegan en la respuesta y se convierten en
+    DataFrames (en memoria) o en el CSV del cliente (en disco), sin pasar por el ZIP;
+    los tipos que la respuesta no incluya se descargan del ZIP de MinIO.
+
+    Con `carga_inline` los ZIP se piden en base64 dentro de la respuesta y se decodifican
+    sin descargarlos de MinIO (si la respuesta no los trae se usa la URL).
+
+    `notificar_estado(estado)` recibe el avance para la bitácora de descargas.
+
+    Returns:
+        list: Rutas de los CSV extraídos o, en modo en memoria, tuplas (ruta_virtual, contenido_csv o DataFrame)
+
+    Raises:
+        DescargaIncompleta: Si un tipo con ZIP o JSON en la respuesta no terminó en un CSV; lleva los
+            archivos que sí se obtuvieron
+    """
+    archivos = []
+    ingesta_json = modo_ingesta_mc() == 'json'
+
+    # Consultar API
+    response = consulta_mis_comprobantes(
+        mrbot_user=mrbot_user,
+        mrbot_api_key=mrbot_api_key,
+        base_url=base_url,
+        mis_comprobantes_endpoint=mis_comprobantes_endpoint,
+        desde=desde,
+        hasta=hasta,
+        cuit_inicio_sesion=cuit_representante,
+        representado_nombre=denominacion_mc,
+        representado_cuit=cuit_representado,
+        contrasena=clave_representante,
+        descarga_emitidos=descargar_emitidos,
+        descarga_recibidos=descargar_recibidos,
+        b64=carga_inline,
+        carga_json=ingesta_json,
+    )
+
+    notificar_estado(CONSULTADO)
+
+    # Comprobantes recibidos en la respuesta (ingesta JSON); el resto se descarga del ZIP
+    registros = extraccion_comprobantes_json(response) if ingesta_json else {}
+    tablas = {}
+    for tipo, descargar in (('emitidos', descargar_emitidos), ('recibidos', descargar_recibidos)):
+        if descargar and registros.get(tipo) is not None:
+            tablas[tipo] = dataframe_comprobantes(registros[tipo])
+    if tablas:
+        metricas.incrementar('ingestas_json_mc', len(tablas))
+        registro.info("Comprobantes recibidos en JSON: %s", ', '.join(tablas))
+
+    # ZIP recibidos en base64; se quitan de la respuesta para no retener el texto
+    zips_inline = {}
+    for tipo, descargar in (('emitidos', descargar_emitidos), ('recibidos', descargar_recibidos)):
+        texto = response.pop(CAMPO_ZIP_BASE64.format(tipo=tipo), None) if carga_inline else None
+        if descargar and tipo not in tablas and texto:
+            nombre_zip = nombre_csv_mc(TIPOS_MC[tipo], a_fecha(desde), a_fecha(hasta), cuit_representado,
+                                       denominacion_mc)[:-len('.csv')] + '.zip'
+            zips_inline[tipo] = (nombre_zip, texto)
+
+    # Extraer URLs de MinIO
+    recibidos = set(tablas) | set(zips_inline)
+    urls = extraccion_urls_minio(response) if len(recibidos) < descargar_emitidos + descargar_recibidos else {}
+
+    urls_descarga = []
+    if descargar_emitidos and 'emitidos' not in recibidos and urls.get('emitidos'):
+        registro.info("Preparando descarga de emitidos...")
+        urls_descarga.append(urls['emitidos'])
+
+    if descargar_recibidos and 'recibidos' not in recibidos and urls.get('recibidos'):
+        registro.info("Preparando descarga de recibidos...")
+        urls_descarga.append(urls['recibidos'])
+
+    # Tipos que la respuesta trae (en JSON, base64 o URL): cada uno debe terminar en un CSV
+    esperados = recibidos | {tipo for tipo in TIPOS_MC if urls.get(tipo) in urls_descarga}
+
+    nombres_json = {
+        tipo: nombre_csv_mc(TIPOS_MC[tipo], a_fecha(desde), a_fecha(hasta), cuit_representado, denominacion_mc)
+        for tipo, tabla in tablas.items() if not tabla.empty
+    }
+
+    if en_memoria:
+        # Los ZIP se procesan en memoria; solo se escriben si hay un directorio de archivo
+        directorio_zip = None
+        if directorio_archivo:
+            directorio_zip = crear_directorios_descarga(directorio_archivo, cuit_representado, denominacion_mc)['principal']
+
+        for tipo, nombre_csv in nombres_json.items():
+            if directorio_zip:
+                escribir_csv_mc(tablas[tipo], os.path.join(directorio_zip, nombre_csv))
+            archivos.append((os.path.join(directorio_cliente, 'extraido', nombre_csv), tablas[tipo]))
+
+        contenidos = []
+        for tipo in list(zips_inline):
+            nombre_zip, texto = zips_inline.pop(tipo)
+            contenidos.append((None, nombre_zip, contenido_base64(texto)))
+        if urls_descarga:
+            registro.info("Descargando en memoria %s archivo(s)...", len(urls_descarga))
+            contenidos.extend(descargar_contenidos_concurrente(urls_descarga))
+        if contenidos:
+            for url, nombre_zip, contenido in contenidos:
+                if directorio_zip:
+                    with open(os.path.join(directorio_zip, nombre_zip), 'wb') as archivo_zip:
+                        archivo_zip.write(contenido)
+                if not nombre_zip.endswith('.zip'):
+                    continue
+                try:
+                    for nombre_csv, contenido_csv in extraer_zip_memoria(nombre_zip, contenido):
+                        archivos.append((os.path.join(directorio_cliente, 'extraido', nombre_csv), contenido_csv))
+                except Exception as e:
+                    registro.error("Error al extraer %s: %s", nombre_zip, e)
+        extraido = bool(contenidos or tablas)
+    else:
+        # Crear directorios
+        directorios = crear_directorios_descarga(
+            downloads_mc_path, 
+            cuit_representado, 
+            denominacion_mc,
+            ['extraido']
+        )
+
+        for tipo, nombre_csv in nombres_json.items():
+            archivos.append(escribir_csv_mc(tablas[tipo], os.path.join(directorios['extraido'], nombre_csv)))
+
+        # Decodificar los ZIP recibidos en base64 y descargar el resto de forma concurrente
+        pedidos = len(zips_inline) + len(urls_descarga)
+        archivos_descargados = []
+        for tipo in list(zips_inline):
+            nombre_zip, texto = zips_inline.pop(tipo)
+            try:
+                archivos_descargados.append(guardar_base64(texto, os.path.join(directorios['principal'], nombre_zip)))
+            except Exception as e:
+                registro.warning("Error al decodificar %s: %s", nombre_zip, e)
+        descargas = [(url, None, directorios['principal']) for url in urls_descarga]
+        if descargas:
+            registro.info("Descargando %s archivo(s)...", len(descargas))
+            archivos_descargados.extend(descargar_archivos_concurrente(descargas))
+        if archivos_descargados or descargas:
+            # Descargado solo si llegaron todos los ZIP; si no, el trabajo termina fallido
+            if len(archivos_descargados) == pedidos:
+                notificar_estado(DESCARGADO)
+        
+            # Extraer ZIPs
+            for archivo_zip in archivos_descargados:
+                if archivo_zip and archivo_zip.endswith('.zip'):
+                    registro.debug("Extrayendo: %s", archivo_zip)
+                    try:
+                        archivos.extend(extraer_zip(archivo_zip, directorios['extraido']))
+                    except Exception as e:
+                        registro.error("Error al extraer %s: %s", archivo_zip, e)
+        extraido = bool(archivos_descargados or descargas or tablas)
+
+        registrar_descarga(downloads_mc_path, 'mc', directorios['extraido'])
+
+    faltantes = sorted(esperados - set(tablas) - tipos_en_archivos(archivos))
+    if faltantes:
+        raise DescargaIncompleta(faltantes, archivos)
+    if extraido:
+        notificar_estado(EXTRAIDO)
+    return archivos
+
+
+def procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, downloads_mc_path,
+                         en_memoria=False, directorio_archivo=None, notificar_estado=None):
     """
     Procesa la descarga de Mis Comprobantes para un contribuyente.
     
@@ -49,9 +281,19 @@ def procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comproban
         base_url: URL base de la API
         mis_comprobantes_endpoint: Endpoint de Mis Comprobantes
         downloads_mc_path: Directorio de descargas
+        en_memoria: Si es True, los ZIP se descargan y extraen en memoria sin escribir en disco
+        directorio_archivo: Directorio opcional donde archivar los ZIP descargados en modo en memoria
+        notificar_estado: Función opcional `(estado, motivo=None)` que recibe el avance para la bitácora
+
+    Returns:
+        list: Rutas de los CSV extraídos o, en modo en memoria, tuplas (ruta_virtual, contenido_csv)
     """
+    archivos = []
+    notificar_estado = notificar_estado or _sin_notificar
+
     cuit_representante = str(row['CUIT_Representante'])
     clave_representante = row['Clave_representante']
+    registrar_secreto(clave_representante)
     cuit_representado = str(row['CUIT_Representado'])
     desde = formatear_fecha(row['Desde_MC'])
     hasta = formatear_fecha(row['Hasta_MC'])
@@ -61,82 +303,120 @@ def procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comproban
     descarga_MC_recibidos = normalizar_si_no(row['Descarga_MC_recibidos'])
 
     if descarga_MC != 'si':
-        print(f"Saltando descarga MC para CUIT {cuit_representado} - Descarga_MC: {descarga_MC}")
-        return
+        registro.info("Saltando descarga MC para CUIT %s - Descarga_MC: %s", cuit_representado, descarga_MC)
+        return archivos
     
-    print(f"\n{'='*80}")
-    print(f"Procesando MC: {denominacion_mc} - CUIT: {cuit_representado}")
-    print(f"Desde {desde} hasta {hasta}")
-    print(f"Emitidos: {descarga_MC_emitidos} | Recibidos: {descarga_MC_recibidos}")
-    print(f"{'='*80}\n")
+    registro.info("Procesando MC: %s - CUIT: %s | Desde %s hasta %s | Emitidos: %s | Recibidos: %s",
+                  denominacion_mc, cuit_representado, desde, hasta, descarga_MC_emitidos, descarga_MC_recibidos)
 
     # Determinar qué descargar
     descargar_emitidos = descarga_MC_emitidos == 'si'
     descargar_recibidos = descarga_MC_recibidos == 'si'
 
     if not descargar_emitidos and not descargar_recibidos:
-        print(f"No hay nada que descargar para {cuit_representado}")
-        return
-
-    try:
-        # Consultar API
-        response = consulta_mis_comprobantes(
-            mrbot_user=mrbot_user,
-            mrbot_api_key=mrbot_api_key,
-            base_url=base_url,
-            mis_comprobantes_endpoint=mis_comprobantes_endpoint,
-            desde=desde,
-            hasta=hasta,
-            cuit_inicio_sesion=cuit_representante,
-            representado_nombre=denominacion_mc,
-            representado_cuit=cuit_representado,
-            contrasena=clave_representante,
-            descarga_emitidos=descargar_emitidos,
-            descarga_recibidos=descargar_recibidos,
-        )
-
-        # Extraer URLs de MinIO
-        urls = extraccion_urls_minio(response)
-
-        # Crear directorios
-        directorios = crear_directorios_descarga(
-            downloads_mc_path, 
-            cuit_representado, 
-            denominacion_mc,
-            ['extraido']
-        )
-
-        # Preparar descargas concurrentes
-        descargas = []
-        if descargar_emitidos and urls.get('emitidos'):
-            print(f"\nPreparando descarga de emitidos...")
-            descargas.append((urls['emitidos'], None, directorios['principal']))
-        
-        if descargar_recibidos and urls.get('recibidos'):
-            print(f"\nPreparando descarga de recibidos...")
-            descargas.append((urls['recibidos'], None, directorios['principal']))
-
-        # Descargar archivos de forma concurrente
-        if descargas:
-            print(f"\nDescargando {len(descargas)} archivo(s)...")
-            archivos_descargados = descargar_archivos_concurrente(descargas)
-            
-            # Extraer ZIPs
-            for archivo_zip in archivos_descargados:
-                if archivo_zip and archivo_zip.endswith('.zip'):
-                    print(f"\nExtrayendo: {archivo_zip}")
-                    try:
-                        extraer_zip(archivo_zip, directorios['extraido'])
-                    except Exception as e:
-                        print(f"Error al extraer {archivo_zip}: {e}")
+        registro.info("No hay nada que descargar para %s", cuit_representado)
+        return archivos
+
+    tipos = [tipo for tipo, descargar in (('emitidos', descargar_emitidos), ('recibidos', descargar_recibidos))
+             if descargar]
+    directorio_cliente = os.path.join(downloads_mc_path, construir_nombre_directorio(cuit_representado, denominacion_mc))
+
+    # Descarga incremental: solo los meses que no están en la cobertura del cliente
+    rangos = [(desde, hasta)]
+    cobertura = None
+    incremental, forzar_completa = descarga_incremental()
+    if incremental and not en_memoria:
+        cobertura = CoberturaDescargas(directorio_cliente)
+        if forzar_completa:
+            cobertura.reiniciar(tipos)
+        try:
+            faltantes = cobertura.faltantes(tipos, a_fecha(desde), a_fecha(hasta))
+        except ValueError:
+            # Fechas de la planilla no interpretables: se pide el rango tal cual, sin cobertura
+            cobertura, faltantes = None, [(desde, hasta)]
+        rangos = [(formatear_fecha(d), formatear_fecha(h)) for d, h in faltantes]
+        if not rangos:
+            registro.info("Sin meses faltantes para %s: se usan los comprobantes ya descargados", cuit_representado)
+            metricas.incrementar('clientes_mc_al_dia')
+            return cobertura.csv_registrados(tipos) or csv_extraidos(os.path.join(directorio_cliente, 'extraido'))
+        if rangos != [(desde, hasta)]:
+            registro.info("Meses faltantes: %s", ', '.join(f'{d} - {h}' for d, h in rangos))
+
+    # Carga en línea (base64) o por MinIO según el tamaño de la descarga anterior del cliente
+    carga_inline = usar_carga_inline(directorio_cliente, ('.csv',))
+
+    # PLAZO_CLIENTE acota toda la descarga del cliente (consultas, ventanas y archivos)
+    with metricas.contexto_cliente(cuit_representado), metricas.etapa('descarga_mc'), plazo_cliente():
+        try:
+            # Cada rango se divide en ventanas (DIVIDIR_RANGO) que se consultan en paralelo
+            ventanas = _ventanas_consulta(rangos)
+            if len(ventanas) > 1:
+                registro.info("Consultando %s ventanas en paralelo...", len(ventanas))
+
+            def descargar_ventana(desde_ventana, hasta_ventana):
+                # Una ventana incompleta conserva lo obtenido y deja sin cubrir los tipos faltantes
+                try:
+                    return _descargar_rango_mc(
+                        desde_ventana, hasta_ventana, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint,
+                        cuit_representante, clave_representante, cuit_representado, denominacion_mc,
+                        descargar_emitidos, descargar_recibidos, downloads_mc_path, directorio_cliente,
+                        en_memoria, directorio_archivo, notificar_estado, carga_inline,
+                    ), []
+                except DescargaIncompleta as e:
+                    return e.archivos, e.faltantes
+
+            resultados = _consultar_en_paralelo(descargar_ventana, ventanas)
+            metricas.incrementar('consultas_mc', len(ventanas))
+
+            fusionar = cobertura is not None or len(ventanas) > 1
+            nuevos = []
+            faltantes = set()
+            for (desde_ventana, hasta_ventana), (archivos_ventana, faltantes_ventana) in zip(ventanas, resultados):
+                faltantes.update(faltantes_ventana)
+                archivos.extend(archivos_ventana)
+                if fusionar:
+                    nuevos.extend((ruta, (a_fecha(desde_ventana), a_fecha(hasta_ventana))) for ruta in archivos_ventana)
+
+            if fusionar and en_memoria:
+                archivos = fusionar_csv_memoria(archivos)
+            elif fusionar:
+                # Fusionar lo descargado en un CSV por tipo (y, en modo incremental, con el CSV registrado)
+                directorio_extraido = os.path.join(directorio_cliente, 'extraido')
+                if os.path.isdir(directorio_extraido):
+                    archivos = []
+                    for tipo in tipos:
+                        anteriores = cobertura.csv_registrados([tipo]) if cobertura is not None else []
+                        fusionado = fusionar_csv_mc(directorio_extraido, TIPOS_MC[tipo], nuevos, anteriores)
+                        if fusionado:
+                            archivos.append(fusionado)
+                            if cobertura is not None:
+                                cobertura.registrar_csv(tipo, fusionado)
+                    registrar_descarga(downloads_mc_path, 'mc', directorio_extraido)
+
+            if cobertura is not None:
+                # Solo se cubren los tipos que llegaron en cada ventana: el resto se vuelve a pedir
+                for (desde_ventana, hasta_ventana), (_, faltantes_ventana) in zip(ventanas, resultados):
+                    obtenidos = [tipo for tipo in tipos if tipo not in faltantes_ventana]
+                    cobertura.registrar(obtenidos, a_fecha(desde_ventana), a_fecha(hasta_ventana))
+                cobertura.guardar()
+
+            if faltantes:
+                raise DescargaIncompleta(sorted(faltantes), archivos)
+
+            metricas.incrementar('clientes_mc_ok')
+            notificar_estado(COMPLETADO)
+            registro.info("✓ Proceso MC completado para %s", denominacion_mc)
 
-        print(f"\n✓ Proceso MC completado para {denominacion_mc}")
+        except Exception as e:
+            metricas.incrementar('clientes_mc_error')
+            notificar_estado(FALLIDO, e)
+            registro.error("✗ Error procesando MC %s (CUIT: %s): %s", denominacion_mc, cuit_representado, e)
 
-    except Exception as e:
-        print(f"\n✗ Error procesando MC {denominacion_mc} (CUIT: {cuit_representado}): {e}")
+    return archivos
 
 
-def procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoint, downloads_rcel_path):
+def procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoint, downloads_rcel_path,
+                           en_memoria=False, directorio_archivo=None, solo_metadata=False, notificar_estado=None):
     """
     Procesa la descarga de RCEL para un contribuyente.
     
@@ -147,9 +427,21 @@ def procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoi
         base_url: URL base de la API
         rcel_endpoint: Endpoint de RCEL
         downloads_rcel_path: Directorio de descargas
+        en_memoria: Si es True, la metadata de las facturas se devuelve en memoria sin escribir en disco
+        directorio_archivo: Directorio opcional donde archivar PDFs y metadata en modo en memoria
+        solo_metadata: Si es True, no se descargan los PDFs; se guarda la metadata de las facturas
+            con su URL_MINIO para descargarlos bajo demanda
+        notificar_estado: Función opcional `(estado, motivo=None)` que recibe el avance para la bitácora
+
+    Returns:
+        list: Rutas de los JSON guardados o, en modo en memoria, tuplas (ruta_virtual, metadata)
     """
+    archivos = []
+    notificar_estado = notificar_estado or _sin_notificar
+
     cuit_representante = str(row['CUIT_Representante'])
     clave_representante = row['Clave_representante']
+    registrar_secreto(clave_representante)
     cuit_representado = str(row['CUIT_Representado'])
     desde = formatear_fecha(row['Desde_RCEL'])
     hasta = formatear_fecha(row['Hasta_RCEL'])
@@ -157,96 +449,408 @@ def procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoi
     descarga_RCEL = normalizar_si_no(row['Descarga_RCEL'])
 
     if descarga_RCEL != 'si':
-        print(f"Saltando descarga RCEL para CUIT {cuit_representado} - Descarga_RCEL: {descarga_RCEL}")
-        return
+        registro.info("Saltando descarga RCEL para CUIT %s - Descarga_RCEL: %s", cuit_representado, descarga_RCEL)
+        return archivos
     
-    print(f"\n{'='*80}")
-    print(f"Procesando RCEL: {denominacion_rcel} - CUIT: {cuit_representado}")
-    print(f"Desde {desde} hasta {hasta}")
-    print(f"{'='*80}\n")
+    registro.info("Procesando RCEL: %s - CUIT: %s | Desde %s hasta %s", denominacion_rcel, cuit_representado,
+                  desde, hasta)
 
-    try:
-        # Consultar API
-        response = consulta_rcel(
-            mrbot_user=mrbot_user,
-            mrbot_api_key=mrbot_api_key,
-            base_url=base_url,
-            rcel_endpoint=rcel_endpoint,
-            desde=desde,
-            hasta=hasta,
-            cuit_inicio_sesion=cuit_representante,
-            representado_nombre=denominacion_rcel,
-            representado_cuit=cuit_representado,
-            contrasena=clave_representante,
-        )
+    # Los PDFs se piden en base64 solo si se van a guardar y el cliente es chico
+    directorio_pdfs = directorio_archivo if en_memoria else downloads_rcel_path
+    pdf_inline = bool(directorio_pdfs) and not solo_metadata and usar_carga_inline(
+        os.path.join(directorio_pdfs, construir_nombre_directorio(cuit_representado, denominacion_rcel)), ('.pdf',)
+    )
+    # Almacén por contenido (ALMACEN_PDF): cada PDF se guarda una vez y el cliente lo enlaza
+    almacen = obtener_almacen_pdf(directorio_pdfs) if directorio_pdfs and not solo_metadata else None
 
-        # Validar respuesta
-        facturas = validar_respuesta_rcel(response)
+    with metricas.contexto_cliente(cuit_representado), metricas.etapa('descarga_rcel'), plazo_cliente():
+        try:
+            # Consultar API, en ventanas paralelas si DIVIDIR_RANGO lo indica
+            def _consultar_ventana(desde_ventana, hasta_ventana):
+                response = consulta_rcel(
+                    mrbot_user=mrbot_user,
+                    mrbot_api_key=mrbot_api_key,
+                    base_url=base_url,
+                    rcel_endpoint=rcel_endpoint,
+                    desde=desde_ventana,
+                    hasta=hasta_ventana,
+                    cuit_inicio_sesion=cuit_representante,
+                    representado_nombre=denominacion_rcel,
+                    representado_cuit=cuit_representado,
+                    contrasena=clave_representante,
+                    b64_pdf=pdf_inline,
+                )
+                return validar_respuesta_rcel(response)
+
+            ventanas = _ventanas_consulta([(desde, hasta)])
+            if len(ventanas) > 1:
+                registro.info("Consultando %s ventanas en paralelo...", len(ventanas))
+            facturas = _unir_facturas(_consultar_en_paralelo(_consultar_ventana, ventanas))
+            metricas.incrementar('consultas_rcel', len(ventanas))
+            notificar_estado(CONSULTADO)
+
+            if not facturas:
+                registro.info("No se encontraron facturas RCEL para %s", denominacion_rcel)
+                notificar_estado(COMPLETADO)
+                return archivos
+
+            if en_memoria:
+                # La metadata pasa directo al control; los PDFs solo se descargan si hay directorio de archivo
+                directorio_cliente = os.path.join(downloads_rcel_path, construir_nombre_directorio(cuit_representado, denominacion_rcel))
+                for factura in facturas:
+                    if not factura.get("URL_MINIO"):
+                        registro.warning("Factura sin URL_MINIO: %s", factura.get('NUMERO_FACTURA', 'N/A'))
+                        continue
+                    archivos.append((_ruta_metadata_factura(directorio_cliente, factura), factura))
+
+                if directorio_archivo:
+                    directorio_pdf = crear_directorios_descarga(directorio_archivo, cuit_representado, denominacion_rcel)['principal']
+                    if solo_metadata:
+                        guardar_facturas_rcel(facturas, directorio_pdf)
+                    else:
+                        _descargar_pdfs_rcel(facturas, directorio_pdf, almacen)
 
-        if not facturas:
-            print(f"No se encontraron facturas RCEL para {denominacion_rcel}")
-            return
+            else:
+                # Crear directorio del contribuyente
+                directorios = crear_directorios_descarga(
+                    downloads_rcel_path, 
+                    cuit_representado, 
+                    denominacion_rcel
+                )
+
+                incompleta = None
+                if solo_metadata:
+                    archivos.append(guardar_facturas_rcel(facturas, directorios['principal']))
+                else:
+                    try:
+                        archivos.extend(_descargar_pdfs_rcel(facturas, directorios['principal'], almacen))
+                    except DescargaIncompleta as e:
+                        # Se conservan los PDFs que llegaron; el trabajo queda fallido para reintentarlo
+                        archivos.extend(e.archivos)
+                        incompleta = e
+                registrar_descarga(downloads_rcel_path, 'rcel', directorios['principal'])
+                if incompleta is not None:
+                    raise incompleta
+            notificar_estado(DESCARGADO)
+
+            metricas.incrementar('clientes_rcel_ok')
+            notificar_estado(COMPLETADO)
+            registro.info("✓ Proceso RCEL completado para %s", denominacion_rcel)
 
-        # Crear directorio del contribuyente
-        directorios = crear_directorios_descarga(
-            downloads_rcel_path, 
-            cuit_representado, 
-            denominacion_rcel
-        )
+        except Exception as e:
+            metricas.incrementar('clientes_rcel_error')
+            notificar_estado(FALLIDO, e)
+            registro.error("✗ Error procesando RCEL %s (CUIT: %s): %s", denominacion_rcel, cuit_representado, e)
 
-        # Preparar descargas concurrentes con metadata
-        print(f"\nPreparando descarga de {len(facturas)} facturas...")
-        descargas = []
-        facturas_metadata = {}
-        
-        for factura in facturas:
-            url_pdf = factura.get("URL_MINIO")
-            if url_pdf:
-                descargas.append((url_pdf, None, directorios['principal']))
-                facturas_metadata[url_pdf] = factura
-            else:
-                print(f"Factura sin URL_MINIO: {factura.get('NUMERO_FACTURA', 'N/A')}")
-        
-        # Descargar archivos de forma concurrente
-        if descargas:
-            print(f"\nDescargando {len(descargas)} archivo(s)...")
+    return archivos
+
+
+def _descargar_pdfs_rcel(facturas, directorio, almacen=None):
+    """
+    Descarga los PDFs de las facturas RCEL y guarda la metadata JSON junto a cada uno.
+
+    Con almacén, los PDFs cuya URL ya está en su índice se enlazan sin descargarlos y
+    los nuevos se guardan deduplicados por contenido. Las facturas que ya están en el
+    ZIP de un período archivado del directorio no se vuelven a descargar.
+
+    Args:
+        facturas: Lista de facturas retornadas por la API
+        directorio: Directorio donde guardar los PDFs y sus JSON
+        almacen: AlmacenPDF opcional
+
+    Returns:
+        list: Rutas de los JSON guardados
+
+    Raises:
+        DescargaIncompleta: Si algún PDF no se pudo descargar; lleva los JSON que sí se guardaron
+    """
+    rutas_json = []
+    guardadas = set()
+
+    # Preparar descargas concurrentes con metadata
+    registro.info("Preparando descarga de %s facturas...", len(facturas))
+    descargas = []
+    facturas_metadata = {}
+    archivadas = nombres_archivados(directorio)
+    
+    for factura in facturas:
+        url_pdf = factura.get("URL_MINIO")
+        # PDF recibido en base64 en la respuesta: se decodifica sin pasar por MinIO
+        pdf_b64 = factura.pop(CAMPO_PDF_BASE64, None)
+        if url_pdf and nombre_archivo_descarga(url_pdf) in archivadas:
+            metricas.incrementar('facturas_archivadas_omitidas')
+            continue
+        if pdf_b64:
+            nombre_pdf = nombre_archivo_descarga(url_pdf) if url_pdf else f"{factura.get('AUX', 'factura')}.pdf"
             try:
-                rutas_descargadas = descargar_archivos_concurrente(descargas)
-                
-                # Guardar metadata JSON para cada archivo descargado
-                for ruta in rutas_descargadas:
-                    # Buscar la factura correspondiente
-                    for url, metadata in facturas_metadata.items():
-                        if url in ruta or os.path.basename(ruta) in url:
-                            guardar_json(metadata, ruta)
-                            break
+                ruta = guardar_base64(pdf_b64, os.path.join(directorio, nombre_pdf))
+                if almacen is not None:
+                    almacen.incorporar_archivo(ruta, url_pdf)
+                guardar_json(factura, ruta)
+                rutas_json.append(os.path.splitext(ruta)[0] + ".json")
+                continue
             except Exception as e:
-                print(f"Error descargando facturas: {e}")
+                registro.warning("Error al decodificar %s: %s", nombre_pdf, e)
+        almacenado = almacen.conocido(url_pdf) if url_pdf and almacen is not None else None
+        if almacenado:
+            # Ya descargado (por este u otro cliente o rango): se enlaza por hash sin descargar
+            ruta = almacen.vincular(almacenado["sha256"], os.path.join(directorio, almacenado["nombre"]))
+            guardar_json(factura, ruta)
+            rutas_json.append(os.path.splitext(ruta)[0] + ".json")
+            metricas.incrementar('pdfs_reutilizados')
+        elif url_pdf:
+            descargas.append((url_pdf, None, directorio))
+            facturas_metadata[url_pdf] = factura
+        else:
+            registro.warning("Factura sin URL_MINIO: %s", factura.get('NUMERO_FACTURA', 'N/A'))
+    
+    # Descargar archivos de forma concurrente
+    if descargas:
+        registro.info("Descargando %s archivo(s)...", len(descargas))
+        try:
+            rutas_descargadas = descargar_archivos_concurrente(descargas, almacen=almacen)
+            
+            # Guardar metadata JSON para cada archivo descargado
+            for ruta in rutas_descargadas:
+                # Buscar la factura correspondiente
+                for url, metadata in facturas_metadata.items():
+                    if url in ruta or os.path.basename(ruta) in url:
+                        guardar_json(metadata, ruta)
+                        rutas_json.append(os.path.splitext(ruta)[0] + ".json")
+                        guardadas.add(url)
+                        break
+        except PlazoVencido:
+            raise
+        except Exception as e:
+            registro.error("Error descargando facturas: %s", e)
+        finally:
+            if almacen is not None:
+                almacen.guardar()
+    elif almacen is not None:
+        almacen.guardar()
+
+    faltantes = [nombre_archivo_descarga(url) for url in facturas_metadata if url not in guardadas]
+    if faltantes:
+        raise DescargaIncompleta(faltantes, rutas_json)
+    return rutas_json
+        
 
-        print(f"\n✓ Proceso RCEL completado para {denominacion_rcel}")
+def _clave_fila(fuente, row):
+    """Clave de bitácora de la descarga de una fila para una fuente ('mc' o 'rcel')."""
+    sufijo = 'MC' if fuente == 'mc' else 'RCEL'
+    return clave_trabajo(fuente, row['CUIT_Representado'], formatear_fecha(row[f'Desde_{sufijo}']),
+                         formatear_fecha(row[f'Hasta_{sufijo}']))
+
+
+def _consultas_estimadas(fuente, row, downloads_mc_path):
+    """
+    Estima las consultas a Mrbot que necesita la descarga de una fila para una fuente.
+
+    Cuenta una consulta por ventana de DIVIDIR_RANGO y, para MC en modo incremental,
+    solo los meses que faltan en la cobertura del cliente.
+
+    Returns:
+        int: Consultas estimadas (0 si la descarga está deshabilitada o no hay nada pendiente)
+    """
+    if fuente != 'mc':
+        if normalizar_si_no(row['Descarga_RCEL']) != 'si':
+            return 0
+        return len(_ventanas_consulta([(formatear_fecha(row['Desde_RCEL']), formatear_fecha(row['Hasta_RCEL']))]))
+
+    tipos = [tipo for tipo in TIPOS_MC if normalizar_si_no(row[f'Descarga_MC_{tipo}']) == 'si']
+    if normalizar_si_no(row['Descarga_MC']) != 'si' or not tipos:
+        return 0
+    desde, hasta = formatear_fecha(row['Desde_MC']), formatear_fecha(row['Hasta_MC'])
+    rangos = [(desde, hasta)]
+    incremental, forzar_completa = descarga_incremental()
+    if incremental and not forzar_completa:
+        directorio_cliente = os.path.join(
+            downloads_mc_path, construir_nombre_directorio(str(row['CUIT_Representado']), row['Denominacion_MC'])
+        )
+        try:
+            faltantes = CoberturaDescargas(directorio_cliente).faltantes(tipos, a_fecha(desde), a_fecha(hasta))
+            rangos = [(formatear_fecha(d), formatear_fecha(h)) for d, h in faltantes]
+        except ValueError:
+            pass
+    return len(_ventanas_consulta(rangos))
+
+
+def descargar_planilla(df, fuentes, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, rcel_endpoint,
+                       downloads_mc_path, downloads_rcel_path, rcel_solo_metadata=False, bitacora=None,
+                       solo_fallidos=False, cupo=None, historial=None, max_clientes=None):
+    """
+    Ejecuta las descargas de cada fila de la planilla registrando su avance en la bitácora.
+
+    Con bitácora, los trabajos completados en una ejecución anterior interrumpida se omiten;
+    si el lote anterior había terminado se comienza uno nuevo.
+
+    Con historial, los trabajos se ejecutan de mayor a menor duración esperada según las
+    ejecuciones anteriores (sin historial, en el orden de la planilla) y al terminar se
+    registra la duración, los archivos y los bytes de cada uno.
+
+    Con cupo, se estiman las consultas de cada trabajo, se ordenan por la columna opcional
+    'Prioridad' (menor primero) y se ejecutan solo los que entran en las consultas
+    disponibles; el resto queda diferido (y pendiente en la bitácora).
+
+    Args:
+        df: Planilla de contribuyentes
+        fuentes: Fuentes a descargar ('mc', 'rcel')
+        mrbot_user: Usuario de Mrbot
+        mrbot_api_key: API key de Mrbot
+        base_url: URL base de la API
+        mis_comprobantes_endpoint: Endpoint de Mis Comprobantes
+        rcel_endpoint: Endpoint de RCEL
+        downloads_mc_path: Directorio de descargas MC
+        downloads_rcel_path: Directorio de descargas RCEL
+        rcel_solo_metadata: Guarda solo la metadata de RCEL, sin PDFs
+        bitacora: BitacoraDescargas opcional
+        solo_fallidos: Procesa únicamente los trabajos fallidos de la bitácora
+        cupo: CupoConsultas opcional para planificar el lote según las consultas disponibles
+        historial: HistorialClientes opcional para ordenar el lote por duración esperada
+        max_clientes: Trabajos en paralelo; por defecto MAX_CLIENTES_CONCURRENTES (1)
+
+    Returns:
+        dict: Cantidad de trabajos 'procesados', 'omitidos', 'fallidos' y 'diferidos'
+    """
+    trabajos = [(indice, row, fuente, _clave_fila(fuente, row))
+                for indice, row in df.iterrows() for fuente in fuentes]
+
+    if bitacora is not None and not solo_fallidos and bitacora.iniciar_lote(clave for *_, clave in trabajos):
+        completados = sum(1 for *_, clave in trabajos if bitacora.estado(clave) == COMPLETADO)
+        registro.info("Reanudando lote interrumpido: se omiten %s descarga(s) completadas", completados)
+
+    def _a_procesar(clave):
+        return bitacora is None or bitacora.debe_procesar(clave, solo_fallidos)
+
+    # Los clientes más largos primero; el plan por cupo conserva este orden a igual prioridad
+    if historial is not None:
+        orden = mas_largos_primero([historial.duracion_esperada(fuente, str(row['CUIT_Representado']))
+                                    for _, row, fuente, _ in trabajos])
+        trabajos = [trabajos[i] for i in orden]
+
+    resumen = {'procesados': 0, 'omitidos': 0, 'fallidos': 0, 'diferidos': 0}
+    consultas = {}
+    if cupo is not None:
+        consultas = {clave: _consultas_estimadas(fuente, row, downloads_mc_path) if _a_procesar(clave) else 0
+                     for _, row, fuente, clave in trabajos}
+        prioridades = {clave: leer_prioridad(row.get('Prioridad')) for _, row, _, clave in trabajos}
+        disponibles = cupo.actualizar()
+        orden, diferidos = planificar([(c, consultas[c], prioridades[c]) for *_, c in trabajos], disponibles)
+        posicion = {clave: i for i, clave in enumerate(orden + diferidos)}
+        trabajos.sort(key=lambda t: posicion[t[3]])
+        registro.info("Consultas estimadas: %s | disponibles: %s", sum(consultas.values()),
+                      disponibles if disponibles is not None else 'desconocidas')
+        if diferidos:
+            registro.warning("El cupo no alcanza para %s descarga(s): quedan para la próxima ejecución",
+                             len(diferidos))
+
+    lock_resumen = threading.Lock()
+
+    def _ejecutar(indice, row, fuente, clave):
+        cuit = str(row['CUIT_Representado'])
+        notificar_estado = None
+        if bitacora is not None:
+            bitacora.registrar(clave, PENDIENTE, fuente=fuente, cuit=cuit, fila=int(indice))
+            notificar_estado = lambda estado, motivo=None, clave=clave: bitacora.registrar(clave, estado, motivo)
+
+        bytes_previos = metricas.contador('bytes_descargados', cuit)
+        consultas_previas = metricas.contador(f'consultas_{fuente}', cuit)
+        inicio = time.perf_counter()
+        if fuente == 'mc':
+            archivos = procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint,
+                                            downloads_mc_path, notificar_estado=notificar_estado)
+        else:
+            archivos = procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoint,
+                                              downloads_rcel_path, solo_metadata=rcel_solo_metadata,
+                                              notificar_estado=notificar_estado)
+        duracion = time.perf_counter() - inicio
+
+        fallido = False
+        if bitacora is not None:
+            # Filas sin descarga habilitada o sin nada pendiente terminan sin notificar
+            if bitacora.estado(clave) not in ESTADOS_FINALES:
+                bitacora.registrar(clave, COMPLETADO)
+            fallido = bitacora.estado(clave) == FALLIDO
+        with lock_resumen:
+            resumen['procesados'] += 1
+            resumen['fallidos'] += fallido
+        # Bytes del cliente en esta descarga (aproximado si MC y RCEL del mismo CUIT corren a la vez)
+        descargados = int(metricas.contador('bytes_descargados', cuit) - bytes_previos)
+        consultas_hechas = metricas.contador(f'consultas_{fuente}', cuit) - consultas_previas
+        # Sin consultas ni bytes (p.ej. sin meses faltantes) la duración no representa al cliente
+        if historial is not None and archivos and not fallido and (consultas_hechas or descargados):
+            historial.registrar(fuente, cuit, duracion, len(archivos), descargados)
+
+    # Los trabajos se despachan de a uno cuando se libera un hilo, así el orden y el cupo se
+    # respetan igual que en una ejecución secuencial (MAX_CLIENTES_CONCURRENTES=1)
+    paralelos = max_clientes if max_clientes is not None else clientes_concurrentes()
+    libres = threading.Semaphore(paralelos)
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=paralelos) as executor:
+            for indice, row, fuente, clave in trabajos:
+                if not _a_procesar(clave):
+                    resumen['omitidos'] += 1
+                    continue
+                libres.acquire()
+                if any(future.done() and future.exception() for future in futures):
+                    libres.release()
+                    break
+                if cupo is not None:
+                    # En lotes largos el cupo se relee: otros procesos pueden estar consumiéndolo
+                    cupo.refrescar_si_corresponde()
+                    if not cupo.alcanza(consultas[clave]):
+                        libres.release()
+                        resumen['diferidos'] += 1
+                        continue
+                    cupo.consumir(consultas[clave])
+                future = executor.submit(contextvars.copy_context().run, _ejecutar, indice, row, fuente, clave)
+                future.add_done_callback(lambda _: libres.release())
+                futures.append(future)
+        for future in futures:
+            future.result()
+    finally:
+        if historial is not None:
+            historial.guardar()
+
+    return resumen
 
-    except Exception as e:
-        print(f"\n✗ Error procesando RCEL {denominacion_rcel} (CUIT: {cuit_representado}): {e}")
-        
 
 def leer_archivos_csv_batch(archivos_mc):
     """
     Lee múltiples archivos CSV en batch de forma eficiente.
+
+    Los CSV de períodos archivados se leen directo del ZIP; si un comprobante archivado
+    también está en un CSV suelto (p.ej. tras una descarga completa forzada) se conserva
+    el suelto.
     
     Args:
-        archivos_mc: Lista de rutas de archivos CSV
+        archivos_mc: Lista de rutas de archivos CSV (o de miembros de un ZIP de período) o tuplas
+            (ruta, contenido) ya cargadas en memoria; el contenido puede ser un DataFrame recibido
+            con la ingesta JSON
         
     Returns:
         pd.DataFrame: DataFrame consolidado con todos los datos
     """
     dataframes = []
+    archivados = []
     
     for f in archivos_mc:
-        if not os.path.isfile(f):
+        contenido = None
+        if isinstance(f, tuple):
+            f, contenido = f
+        elif not existe_archivo(f):
             continue
             
         try:
-            data = pd.read_csv(f, sep=';', decimal=',', encoding='utf-8-sig')
+            archivado = contenido is None and ubicar(f) is not None
+            if archivado:
+                contenido = leer_archivado(f)
+            if isinstance(contenido, pd.DataFrame):
+                data = contenido.copy()
+            else:
+                origen = io.BytesIO(contenido) if contenido is not None else f
+                data = pd.read_csv(origen, sep=';', decimal=',', encoding='utf-8-sig')
             
             if len(data) == 0:
                 continue
@@ -284,107 +888,210 @@ def leer_archivos_csv_batch(archivos_mc):
             ]
             data = data[columnas_necesarias]
             dataframes.append(data)
+            archivados.append(archivado)
             
         except Exception as e:
-            print(f"Error leyendo {f}: {e}")
+            registro.error("Error leyendo %s: %s", f, e)
             continue
     
     # Concatenar todos los DataFrames de una vez (más eficiente que concatenación incremental)
     if dataframes:
-        return pd.concat(dataframes, ignore_index=True)
+        consolidado = pd.concat(dataframes, ignore_index=True)
+        if any(archivados) and not all(archivados):
+            consolidado = _descartar_archivados_repetidos(
+                consolidado, np.repeat(archivados, [len(data) for data in dataframes]))
+        return consolidado
     else:
         return pd.DataFrame()
 
 
-def leer_archivos_json_batch(archivos_json):
+def _descartar_archivados_repetidos(consolidado, archivado):
     """
-    Lee múltiples archivos JSON en batch de forma eficiente.
-    
+    Descarta las filas leídas de un período archivado que también figuran en un CSV suelto.
+
     Args:
-        archivos_json: Lista de rutas de archivos JSON
-        
+        consolidado: Comprobantes con las columnas de `leer_archivos_csv_batch`
+        archivado: Máscara de las filas que provienen de un ZIP de período
+
     Returns:
-        pd.DataFrame: DataFrame consolidado con todos los datos
+        pd.DataFrame: Comprobantes sin repetidos
     """
-    registros = []
-    
-    for factura in archivos_json:
-        if not os.path.isfile(factura):
+    claves = consolidado[['CUIT Cliente', 'Tipo de Comprobante', 'Punto de Venta', 'Número Desde',
+                          'Nro. Doc. Receptor/Emisor']].astype(str)
+    claves.insert(0, 'MC', consolidado['Archivo'].str.split("-").str[1].str.strip())
+    claves = pd.MultiIndex.from_frame(claves)
+    repetido = archivado & claves.isin(claves[~archivado])
+    if not repetido.any():
+        return consolidado
+    metricas.incrementar('comprobantes_archivados_repetidos', int(repetido.sum()))
+    return consolidado[~repetido].reset_index(drop=True)
+
+
+def _ruta_metadata_factura(directorio, factura):
+    """
+    Construye la ruta del JSON de una factura a partir del nombre del PDF en su URL_MINIO.
+
+    Args:
+        directorio: Directorio del contribuyente
+        factura: Metadata de la factura retornada por la API
+
+    Returns:
+        str: Ruta (real o virtual) del JSON de la factura
+    """
+    nombre_json = os.path.splitext(nombre_archivo_descarga(factura["URL_MINIO"]))[0] + ".json"
+    return os.path.join(directorio, nombre_json)
+
+
+# Campos de la metadata RCEL que usa el control; el resto de la respuesta no se conserva
+CAMPOS_RCEL = ['AUX', 'Desde', 'Hasta']
+COLUMNAS_RCEL = CAMPOS_RCEL + ['Archivo PDF', 'CUIT Cliente', 'Fin CUIT', 'Cliente']
+
+# Archivos JSON por tarea al leer en paralelo
+TAMANO_LOTE_JSON = 256
+
+
+def _proyectar_factura(ruta, data_dict):
+    """
+    Reduce la metadata de una factura a las columnas de COLUMNAS_RCEL.
+
+    Args:
+        ruta: Ruta (real o virtual) del JSON de la factura, '<CUIT>_<Cliente>/<CUIT>-...json'
+        data_dict: Metadata de la factura
+
+    Returns:
+        tuple: Valores en el orden de COLUMNAS_RCEL
+    """
+    archivo_pdf = ruta.split("/")[-1]
+    cuit = int(archivo_pdf.split("-")[0].strip())
+    directorio_padre = ruta.split("/")[-2]
+    cliente = directorio_padre.split("_", 1)[1] if "_" in directorio_padre else directorio_padre
+    return tuple(data_dict.get(campo) for campo in CAMPOS_RCEL) + (archivo_pdf, cuit, cuit, cliente)
+
+
+def _leer_lote_json(lote):
+    """
+    Lee y proyecta un lote de JSON de RCEL.
+
+    Args:
+        lote: Lista de rutas o tuplas (ruta, metadata)
+
+    Returns:
+        list: Filas proyectadas con `_proyectar_factura`
+    """
+    filas = []
+    for factura in lote:
+        data_dict = None
+        if isinstance(factura, tuple):
+            factura, data_dict = factura
+        elif not existe_archivo(factura):
             continue
-            
+
         try:
-            with open(factura, 'r', encoding='utf-8-sig') as f:
-                data_dict = json.load(f)
-            
-            # Crear la columna 'Archivo PDF'
-            data_dict['Archivo PDF'] = factura.split("/")[-1]
-            
-            # Extraer información del nombre del archivo
-            partes = data_dict["Archivo PDF"].split("-")
-            if len(partes) >= 1:
-                data_dict['CUIT Cliente'] = int(partes[0].strip())
-                data_dict['Fin CUIT'] = int(partes[0].strip())
-            
-            # Extraer Cliente del directorio padre
-            directorio_padre = factura.split("/")[-2]
-            cliente = directorio_padre.split("_", 1)[1] if "_" in directorio_padre else directorio_padre
-            data_dict['Cliente'] = cliente
-            
-            registros.append(data_dict)
-            
+            if data_dict is None:
+                data_dict = decodificar_json(leer_archivado(factura)) if ubicar(factura) else leer_json(factura)
+
+            # Listado completo de facturas (modo solo metadata): se expande en una entrada por factura
+            if isinstance(data_dict, list):
+                directorio = os.path.dirname(factura)
+                for item in data_dict:
+                    if item.get("URL_MINIO"):
+                        filas.append(_proyectar_factura(_ruta_metadata_factura(directorio, item), item))
+                continue
+
+            filas.append(_proyectar_factura(factura, data_dict))
+
         except Exception as e:
-            print(f"Error leyendo {factura}: {e}")
+            registro.error("Error leyendo %s: %s", factura, e)
             continue
+
+    return filas
+
+
+def leer_archivos_json_batch(archivos_json, max_workers=None):
+    """
+    Lee múltiples archivos JSON en batch de forma eficiente.
+
+    Acepta tanto los JSON individuales guardados junto a cada PDF (sueltos o dentro
+    del ZIP de un período archivado) como el `facturas_emitidas.json` por
+    contribuyente del modo "solo metadata".
+    Los archivos se leen en paralelo por lotes y de cada factura se conservan
+    solo los campos que usa el control (COLUMNAS_RCEL).
+    
+    Args:
+        archivos_json: Lista de rutas de archivos JSON o tuplas (ruta, metadata) ya cargadas en memoria
+        max_workers: Hilos de lectura (por defecto el de ThreadPoolExecutor)
+        
+    Returns:
+        pd.DataFrame: DataFrame consolidado con las columnas de COLUMNAS_RCEL
+    """
+    archivos_json = list(archivos_json)
+    lotes = [archivos_json[i:i + TAMANO_LOTE_JSON] for i in range(0, len(archivos_json), TAMANO_LOTE_JSON)]
+
+    if len(lotes) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            resultados = list(executor.map(_leer_lote_json, lotes))
+    else:
+        resultados = [_leer_lote_json(lote) for lote in lotes]
+
+    filas = [fila for resultado in resultados for fila in resultado]
     
     # Crear DataFrame de una vez con todos los registros
-    if registros:
-        return pd.DataFrame(registros)
+    if filas:
+        return pd.DataFrame.from_records(filas, columns=COLUMNAS_RCEL)
     else:
         return pd.DataFrame()
 
 
-def control(
-    archivos_mc: str ,
-    archivos_PDF: str,
-    archivos_PDF_JSON: str
-    ):
-    '''
-    Controla los datos de los archivos de 'Mis Comprobantes' con las escalas de categorías de AFIP
+def leer_categorias(ruta_categorias='Categorias.xlsx'):
+    """
+    Lee la escala de categorías y el rango de fechas del período a controlar.
 
+    Args:
+        ruta_categorias: Ruta del Excel con las escalas de categorías
 
-    '''
+    Returns:
+        tuple: (DataFrame de categorías, fecha_inicial, fecha_final)
+    """
     # Leer Excel con las tablas de las escalas
-    categorias = pd.read_excel('Categorias.xlsx')
+    categorias = pd.read_excel(ruta_categorias)
 
     # Leer la celda 'A2' de la hoja 'Rango de Fechas' y guardarla en la variable 'fecha_inicial' en formato datetime
-    fecha_inicial = pd.read_excel('Categorias.xlsx', sheet_name='Rango de Fechas', header=None, skiprows=1, usecols=[0]).iloc[0,0]
+    fecha_inicial = pd.read_excel(ruta_categorias, sheet_name='Rango de Fechas', header=None, skiprows=1, usecols=[0]).iloc[0,0]
     fecha_inicial = pd.to_datetime(fecha_inicial , format='%d/%m/%Y')
     # leer la celda 'B2' en fomato fecha
-    fecha_final = pd.read_excel('Categorias.xlsx', sheet_name='Rango de Fechas', header=None, skiprows=1, usecols=[1]).iloc[0,0]
+    fecha_final = pd.read_excel(ruta_categorias, sheet_name='Rango de Fechas', header=None, skiprows=1, usecols=[1]).iloc[0,0]
     fecha_final = pd.to_datetime(fecha_final , format='%d/%m/%Y')
 
-    # Leer archivos CSV en batch (optimizado)
-    print("Leyendo archivos de Mis Comprobantes...")
-    consolidado = leer_archivos_csv_batch(archivos_mc)
-    
-    # Leer archivos JSON en batch (optimizado)
-    print("Leyendo archivos JSON de RCEL...")
-    Info_Facturas_PDF = leer_archivos_json_batch(archivos_PDF_JSON)
-    
-    if consolidado.empty:
-        print("No se encontraron datos en los archivos CSV")
-        return
-    
+    return categorias, fecha_inicial, fecha_final
+
+
+def normalizar_consolidado(consolidado):
+    """
+    Renombra columnas, convierte importes a pesos, aplica el signo de cada tipo de comprobante
+    (ver `lib.tipos_comprobante`) y construye las columnas 'MC' y 'AUX'.
+
+    Args:
+        consolidado: DataFrame retornado por `leer_archivos_csv_batch`
+
+    Returns:
+        pd.DataFrame: Consolidado normalizado
+    """
     # Renombrar columnas
     consolidado.columns = [ 'Fecha' , 'Tipo' , 'Punto de Venta' , 'Número Desde' , 'Número Hasta' , 'Cód. Autorización' , 'Tipo Cambio' , 'Moneda' , 'Imp. Neto Gravado' , 'Imp. Neto No Gravado' , 'Imp. Op. Exentas' , 'Otros Tributos' , 'IVA' , 'Imp. Total' , 'Nro. Doc. Receptor/Emisor' , 'Denominación Receptor/Emisor' , 'Archivo' , 'CUIT Cliente' , 'Fin CUIT' , 'Cliente']
 
-    # multiplicar las columnas numéricas por la columna 'Tipo Cambio'
+    # Tipos de comprobante que no están en el registro: computan como facturas, pero se informan
+    desconocidos = registro_tipos.desconocidos(consolidado['Tipo'])
+    if desconocidos:
+        cantidad = sum(desconocidos.values())
+        metricas.incrementar('comprobantes_tipo_desconocido', cantidad)
+        registro.warning("%s comprobantes con tipo desconocido (se suman como facturas): %s", cantidad, desconocidos)
+
+    # multiplicar las columnas numéricas por la columna 'Tipo Cambio' y por el signo del tipo de comprobante
+    # (-1 las notas de crédito, 0 los que no computan como ingreso)
     columnas_numericas = ['Imp. Neto Gravado' , 'Imp. Neto No Gravado' , 'Imp. Op. Exentas' , 'Otros Tributos' , 'IVA' , 'Imp. Total']
+    factor = consolidado['Tipo Cambio'] * registro_tipos.signos(consolidado['Tipo'])
     for col in columnas_numericas:
-        consolidado[col] = consolidado[col] * consolidado['Tipo Cambio']
-        
-    # multiplicar las columnas numericas por -1 si el 'Tipo' es una nota de crédito
-    consolidado.loc[consolidado['Tipo'].isin(notas_de_credito), columnas_numericas] *= -1
+        consolidado[col] = consolidado[col] * factor
 
     #Eliminar las columas 'Imp. Neto Gravado' , 'Imp. Neto No Gravado' , 'Imp. Op. Exentas' , 'IVA'
     consolidado.drop(['Imp. Neto Gravado' , 'Imp. Neto No Gravado' , 'Imp. Op. Exentas' , 'IVA'], axis=1, inplace=True)
@@ -402,8 +1109,24 @@ def control(
         consolidado['Número Desde'].astype(int).astype(str).str.zfill(8)
     )
 
+    return consolidado
+
+
+def cruzar_rcel(consolidado, Info_Facturas_PDF):
+    """
+    Cruza el consolidado con la metadata de RCEL para obtener el período facturado.
+
+    Args:
+        consolidado: Consolidado normalizado
+        Info_Facturas_PDF: DataFrame retornado por `leer_archivos_json_batch`
+
+    Returns:
+        pd.DataFrame: Consolidado con las columnas 'Desde', 'Hasta', 'Archivo PDF' y 'Cruzado'
+    """
     # Merge con la tabla Info_Facturas_PDF (solo si hay datos de RCEL)
     if not Info_Facturas_PDF.empty:
+        # Una misma factura puede estar como JSON individual y en el listado de solo metadata
+        Info_Facturas_PDF = Info_Facturas_PDF.drop_duplicates(subset='AUX')
         consolidado = pd.merge(consolidado , 
                                Info_Facturas_PDF[['AUX' , 'Desde' , 'Hasta' , 'Archivo PDF']] , 
                                how='left' , 
@@ -420,6 +1143,21 @@ def control(
     consolidado.loc[consolidado['Archivo PDF'].notnull() , 'Cruzado'] = 'Si'
     consolidado.loc[consolidado['Archivo PDF'].isnull() , 'Cruzado'] = 'No'
 
+    return consolidado
+
+
+def prorratear(consolidado, fecha_inicial, fecha_final):
+    """
+    Calcula el importe de cada comprobante que corresponde al período controlado.
+
+    Args:
+        consolidado: Consolidado cruzado con RCEL
+        fecha_inicial: Inicio del período controlado
+        fecha_final: Fin del período controlado
+
+    Returns:
+        pd.DataFrame: Consolidado con 'Importe Prorrateado' y las fechas formateadas dd/mm/yyyy
+    """
     # Si las columnas 'Desde' y 'Hasta' son NaN entonces Eliminar todas filas donde la columna 'Fecha' no se encuentre entre el rango de fechas iniciales y finales
     ##########Consolidado = Consolidado[(Consolidado['Fecha'] >= fecha_inicial) & (Consolidado['Fecha'] <= fecha_final) & (Consolidado['Desde'].isnull()) & (Consolidado['Hasta'].isnull())]
 
@@ -470,12 +1208,19 @@ def control(
     consolidado['Fecha_Inicial_max'] = consolidado['Fecha_Inicial_max'].dt.strftime('%d/%m/%Y')
     consolidado['Fecha_Final_min'] = consolidado['Fecha_Final_min'].dt.strftime('%d/%m/%Y')
 
-    No_Cruzado = 0
+    return consolidado
 
-    if 'No' in consolidado['Cruzado'].values:
-        No_Cruzado = consolidado['Cruzado'].value_counts()['No']
 
+def construir_tabla_dinamica(consolidado):
+    """
+    Totaliza el importe prorrateado y la cantidad de comprobantes por 'Cliente' y 'MC'.
 
+    Args:
+        consolidado: Consolidado prorrateado
+
+    Returns:
+        pd.DataFrame: Tabla dinámica indexada por ('Cliente', 'MC')
+    """
     #Crear Tabla dinámica con los totales de las columnas  'Importe Prorrateado' por 'Archivo'
     TablaDinamica = pd.pivot_table(consolidado, values=['Importe Prorrateado' , 'Tipo'], index=['Cliente' , 'MC'], aggfunc={'Importe Prorrateado': 'sum' , 'Tipo': 'count'})
 
@@ -483,20 +1228,58 @@ def control(
     # Renombrar la columna 'Tipo' por 'Cantidad de Comprobantes' de la TablaDinamica1 , TablaDinamica2 y TablaDinamica3
     TablaDinamica.rename(columns={'Tipo': 'Cantidad de Comprobantes'}, inplace=True)
 
+    return TablaDinamica
+
+
+def asignar_categorias(TablaDinamica, categorias):
+    """
+    Asigna a cada fila de la tabla dinámica la categoría que corresponde a su importe prorrateado.
+
+    Args:
+        TablaDinamica: Tabla dinámica por cliente
+        categorias: Escala de categorías
+
+    Returns:
+        pd.DataFrame: Tabla dinámica con 'Ingresos brutos máximos por la categoría' y 'Categoría'
+    """
     # Buscar el valor de 'Importe Prorrateado' en la escala de categorias donde el valor esta en 'Ingresos brutos'
     TablaDinamica['Ingresos brutos máximos por la categoría'] = TablaDinamica['Importe Prorrateado'].apply(lambda x: categorias.loc[categorias['Ingresos brutos'] >= x, 'Ingresos brutos'].iloc[0])
 
     #Buscar la 'Categoría' en la escala de categorias donde el valor esta en 'Ingresos brutos máximos por la categoría'
     TablaDinamica['Categoría'] = TablaDinamica['Importe Prorrateado'].apply(lambda x: categorias.loc[categorias['Ingresos brutos'] >= x, 'Categoria'].iloc[0])
 
-    # Exportar el Consolidado y la Tabla Dinámica a un archivo de Excel
-    nombre_archivo = 'Reporte Recategorizaciones de Monotributistas.xlsx'
+    return TablaDinamica
+
+
+def exportar_excel(nombre_archivo, TablaDinamica, consolidado, agregaciones=(), observaciones=None):
+    """
+    Exporta el Consolidado, la Tabla Dinámica y las agrupaciones adicionales a un archivo de Excel.
+
+    Args:
+        nombre_archivo: Ruta del reporte
+        TablaDinamica: Tabla dinámica con categorías
+        consolidado: Consolidado prorrateado
+        agregaciones: Tuplas (Agrupacion, tabla) retornadas por `calcular_agrupaciones`
+        observaciones: Comprobantes en cuarentena; si hay, se exportan en la hoja 'Validación'
+    """
     Archivo_final = pd.ExcelWriter(nombre_archivo, engine='openpyxl')
     TablaDinamica.to_excel(Archivo_final, sheet_name='Tabla Dinámica', index=True)
+    for agrupacion, tabla in agregaciones:
+        tabla.to_excel(Archivo_final, sheet_name=agrupacion.hoja, index=True)
     consolidado.to_excel(Archivo_final, sheet_name='Consolidado', index=False)
+    if observaciones is not None and not observaciones.empty:
+        observaciones.to_excel(Archivo_final, sheet_name=HOJA_VALIDACION, index=False)
     Archivo_final.close()
 
-    # Aplicar formatos del archivo
+
+def formatear_excel(nombre_archivo, agregaciones=()):
+    """
+    Aplica encabezados, formato de moneda, alineación, anchos y filtros al reporte.
+
+    Args:
+        nombre_archivo: Ruta del reporte
+        agregaciones: Tuplas (Agrupacion, tabla) exportadas como hojas adicionales
+    """
     wb = load_workbook(nombre_archivo)
     
     # Formatear hoja 'Tabla Dinámica'
@@ -506,6 +1289,16 @@ def control(
     Aplicar_formato_moneda(ws_tabla, 5, 5)
     Autoajustar_columnas(ws_tabla)
     Agregar_filtros(ws_tabla)
+
+    # Formatear hojas de agrupaciones: las columnas de importes van después de las claves
+    for agrupacion, tabla in agregaciones:
+        ws_agrupacion = wb[agrupacion.hoja]
+        Aplicar_formato_encabezado(ws_agrupacion)
+        for columna in agrupacion.columnas_moneda(tabla):
+            posicion = len(agrupacion.claves) + tabla.columns.get_loc(columna) + 1
+            Aplicar_formato_moneda(ws_agrupacion, posicion, posicion)
+        Autoajustar_columnas(ws_agrupacion)
+        Agregar_filtros(ws_agrupacion)
     
     # Formatear hoja 'Consolidado'
     ws_consolidado = wb['Consolidado']
@@ -515,18 +1308,356 @@ def control(
     Alinear_columnas(ws_consolidado, 1, ws_consolidado.max_column, 'left')
     Autoajustar_columnas(ws_consolidado)
     Agregar_filtros(ws_consolidado)
+
+    # Formatear hoja 'Validación' (solo existe si hay comprobantes observados)
+    if HOJA_VALIDACION in wb.sheetnames:
+        ws_validacion = wb[HOJA_VALIDACION]
+        Aplicar_formato_encabezado(ws_validacion)
+        Alinear_columnas(ws_validacion, 1, ws_validacion.max_column, 'left')
+        Autoajustar_columnas(ws_validacion)
+        Agregar_filtros(ws_validacion)
     
     # Guardar el archivo con formato
     wb.save(nombre_archivo)
     wb.close()
 
-    #Mostrar mensaje de finalización
-    #showinfo(title="Finalizado", message=f"El archivo se ha generado correctamente.\n \nCantidad de Facturas no cruzados: {No_Cruzado}")
+
+def _auxs_en_ventana(Info_Facturas_PDF, fecha_inicial, fecha_final):
+    """AUX de las facturas de RCEL cuyo período facturado (Desde..Hasta) intersecta el período controlado."""
+    if Info_Facturas_PDF.empty:
+        return []
+    desde = pd.to_datetime(Info_Facturas_PDF['Desde'], format='%d/%m/%Y', errors='coerce')
+    hasta = pd.to_datetime(Info_Facturas_PDF['Hasta'], format='%d/%m/%Y', errors='coerce')
+    en_ventana = (desde <= fecha_final) & (hasta >= fecha_inicial)
+    return Info_Facturas_PDF.loc[en_ventana, 'AUX'].dropna().unique().tolist()
+
+
+def _leer_desde_almacen(almacen, archivos_mc, Info_Facturas_PDF, fecha_inicial, fecha_final, perfilador):
+    """
+    Ingresa al almacén los CSV nuevos o modificados y consulta los comprobantes del período.
+
+    Se consultan los comprobantes emitidos entre `fecha_inicial` y `fecha_final` más los que,
+    emitidos fuera, tienen en RCEL un período facturado que intersecta el controlado.
+
+    Returns:
+        pd.DataFrame: Comprobantes con las columnas de `leer_archivos_csv_batch`
+    """
+    with perfilador.etapa('almacen_ingesta'):
+        pendientes = almacen.archivos_pendientes(archivos_mc)
+        if pendientes:
+            almacen.ingerir(pendientes, leer_archivos_csv_batch(pendientes))
+    metricas.incrementar('archivos_ingeridos_almacen', len(pendientes))
+
+    with perfilador.etapa('almacen_consulta'):
+        cuits = {cuit for cuit in (cuit_archivo_mc(a) for a in archivos_mc) if cuit.isdigit()}
+        return almacen.consultar(fecha_inicial, fecha_final,
+                                 auxs=_auxs_en_ventana(Info_Facturas_PDF, fecha_inicial, fecha_final),
+                                 cuits=cuits)
+
+
+def _calcular_consolidado(archivos_mc, archivos_PDF_JSON, fecha_inicial, fecha_final, perfilador, almacen=None):
+    """
+    Lee, normaliza, cruza con RCEL y prorratea los comprobantes de los archivos indicados.
+
+    Con `almacen` los comprobantes se consultan en el almacén local en lugar de leer todos los CSV.
+    Antes de normalizar se validan los comprobantes y la metadata de RCEL (ver `lib.validacion`);
+    las filas observadas quedan fuera del cálculo.
+
+    Returns:
+        tuple: (consolidado prorrateado (vacío si no hay comprobantes), observaciones de la validación)
+    """
+    # Leer archivos JSON en batch (optimizado)
+    print("Leyendo archivos JSON de RCEL...")
+    with perfilador.etapa('lectura_json'):
+        Info_Facturas_PDF = leer_archivos_json_batch(archivos_PDF_JSON)
+    metricas.incrementar('facturas_rcel_leidas', len(Info_Facturas_PDF))
+
+    if almacen is not None:
+        print("Consultando el almacén de comprobantes...")
+        consolidado = _leer_desde_almacen(almacen, archivos_mc, Info_Facturas_PDF, fecha_inicial, fecha_final,
+                                          perfilador)
+    else:
+        # Leer archivos CSV en batch (optimizado)
+        print("Leyendo archivos de Mis Comprobantes...")
+        with perfilador.etapa('lectura_csv'):
+            consolidado = leer_archivos_csv_batch(archivos_mc)
+    metricas.incrementar('comprobantes_leidos', len(consolidado))
+
+    with perfilador.etapa('validacion'):
+        Info_Facturas_PDF, observaciones_rcel = validar_rcel(Info_Facturas_PDF)
+        consolidado, observaciones_mc = validar_mc(consolidado)
+        observaciones = unir_observaciones([observaciones_mc, observaciones_rcel])
+    metricas.incrementar('comprobantes_en_cuarentena', len(observaciones_mc))
+    metricas.incrementar('facturas_rcel_en_cuarentena', len(observaciones_rcel))
+
+    if consolidado.empty:
+        return consolidado, observaciones
+
+    with perfilador.etapa('normalizacion'):
+        consolidado = normalizar_consolidado(consolidado)
+
+    with perfilador.etapa('cruce_rcel'):
+        consolidado = cruzar_rcel(consolidado, Info_Facturas_PDF)
+
+    with perfilador.etapa('prorrateo'):
+        consolidado = prorratear(consolidado, fecha_inicial, fecha_final)
+
+    # Al final: la hoja 'Consolidado' da formato a las columnas de importes por posición
+    consolidado['Clase Comprobante'] = registro_tipos.clases_de(consolidado['Tipo'])
+
+    return consolidado, observaciones
+
+
+def _calcular_con_cache(cache, archivos_mc, archivos_PDF_JSON, fecha_inicial, fecha_final, perfilador,
+                        almacen=None):
+    """
+    Calcula el consolidado y la tabla dinámica recalculando solo los clientes cuyas entradas cambiaron.
+
+    Cada cliente (CUIT) se procesa de forma independiente: el cruce con RCEL es por AUX,
+    que incluye el CUIT del cliente, y la tabla dinámica agrupa por cliente.
+
+    Returns:
+        tuple: (consolidado, TablaDinamica sin categorizar, observaciones de la validación)
+    """
+    grupos_mc = agrupar_por_cliente(archivos_mc, cuit_archivo_mc)
+    grupos_json = agrupar_por_cliente(archivos_PDF_JSON, cuit_archivo_json)
+
+    resultados = {}
+    huellas = {}
+    with perfilador.etapa('cache'):
+        for cuit, archivos in grupos_mc.items():
+            if not cuit:
+                continue
+            huellas[cuit] = huella_cliente(archivos, grupos_json.get(cuit, []), fecha_inicial, fecha_final,
+                                           origen='almacen' if almacen is not None else 'archivos')
+            guardado = cache.cargar(cuit, huellas[cuit])
+            if guardado is not None:
+                resultados[cuit] = guardado
+
+    pendientes = [cuit for cuit in grupos_mc if cuit not in resultados]
+    metricas.incrementar('clientes_en_cache', len(resultados))
+    metricas.incrementar('clientes_recalculados', len(pendientes))
+    print(f"Clientes en caché: {len(resultados)} | Clientes a recalcular: {len(pendientes)}")
+
+    if pendientes:
+        consolidado, observaciones = _calcular_consolidado(
+            [a for cuit in pendientes for a in grupos_mc[cuit]],
+            [a for cuit in pendientes for a in grupos_json.get(cuit, [])],
+            fecha_inicial, fecha_final, perfilador, almacen,
+        )
+        with perfilador.etapa('tabla_dinamica'):
+            porciones = dict(tuple(consolidado.groupby('CUIT Cliente', sort=False))) if not consolidado.empty else {}
+            observadas = dict(tuple(observaciones.groupby('CUIT Cliente', sort=False)))
+            for cuit in pendientes:
+                porcion = porciones.get(int(cuit)) if cuit.isdigit() else None
+                if porcion is None:
+                    # Cliente sin comprobantes: se recuerda para no volver a leerlo
+                    porcion = consolidado.iloc[0:0]
+                porcion = porcion.reset_index(drop=True)
+                tabla = construir_tabla_dinamica(porcion) if not porcion.empty else None
+                observadas_cliente = observadas.get(int(cuit)) if cuit.isdigit() else None
+                resultados[cuit] = (porcion, tabla, observadas_cliente)
+                if huellas.get(cuit):
+                    cache.guardar(cuit, huellas[cuit], porcion, tabla, observadas_cliente)
+
+    # Reensamblar en el orden original de los archivos
+    orden = [cuit for cuit in grupos_mc if cuit in resultados]
+    observaciones = unir_observaciones([resultados[cuit][2] for cuit in orden])
+    porciones = [resultados[cuit][0] for cuit in orden if not resultados[cuit][0].empty]
+    if not porciones:
+        return pd.DataFrame(), None, observaciones
+
+    consolidado = pd.concat(porciones, ignore_index=True)
+    # Un mismo nombre de cliente podría corresponder a más de un CUIT: se vuelve a totalizar
+    TablaDinamica = pd.concat([resultados[cuit][1] for cuit in orden if resultados[cuit][1] is not None])
+    TablaDinamica = TablaDinamica.groupby(level=['Cliente', 'MC']).sum()
+
+    return consolidado, TablaDinamica, observaciones
+
+
+def control(
+    archivos_mc: str ,
+    archivos_PDF: str,
+    archivos_PDF_JSON: str,
+    ruta_categorias: str = 'Categorias.xlsx',
+    nombre_archivo: str = 'Reporte Recategorizaciones de Monotributistas.xlsx',
+    perfilar: str | None = None,
+    cache_dir: str | None = None,
+    almacen: str | None = None,
+    ):
+    '''
+    Controla los datos de los archivos de 'Mis Comprobantes' con las escalas de categorías de AFIP
+
+    Cada etapa se mide con nombre propio. `perfilar` (por defecto PERFILAR_CONTROL) agrega
+    tiempo de CPU ('tiempos'), memoria ('si') o un volcado de cProfile ('cprofile') por etapa;
+    los resultados se guardan junto al reporte.
+
+    Con `cache_dir` (por defecto CACHE_CONTROL_DIR; '' desactiva la caché) se reutilizan los
+    resultados intermedios de los clientes cuyos archivos y rango de fechas no cambiaron.
+
+    Con `almacen` (por defecto ALMACEN_COMPROBANTES; '' lo desactiva) los CSV se ingresan a un
+    almacén SQLite que se conserva entre períodos y solo se consultan los comprobantes del
+    período de Categorias.xlsx (más los que RCEL prorratea dentro de él).
+    '''
+    cache = CacheClientes.desde_entorno() if cache_dir is None else (CacheClientes(cache_dir) if cache_dir else None)
+    almacen = AlmacenComprobantes.desde_entorno() if almacen is None else (AlmacenComprobantes(almacen) if almacen else None)
+
+    perfilador = PerfiladorEtapas(modo_perfilado() if perfilar is None else perfilar)
+    perfilador.iniciar()
+    try:
+        with perfilador.etapa('categorias'):
+            categorias, fecha_inicial, fecha_final = leer_categorias(ruta_categorias)
+
+        if cache is not None:
+            consolidado, TablaDinamica, observaciones = _calcular_con_cache(
+                cache, archivos_mc, archivos_PDF_JSON, fecha_inicial, fecha_final, perfilador, almacen)
+        else:
+            consolidado, observaciones = _calcular_consolidado(archivos_mc, archivos_PDF_JSON, fecha_inicial,
+                                                               fecha_final, perfilador, almacen)
+            TablaDinamica = None
+
+        if not observaciones.empty:
+            print(f"Comprobantes observados en la validación: {len(observaciones)} (hoja '{HOJA_VALIDACION}')")
+            registro.warning("%s comprobantes observados en la validación", len(observaciones))
+            if validacion_estricta():
+                # Se detiene antes de escribir el reporte; las observaciones quedan en un archivo aparte
+                ruta = ruta_validacion(nombre_archivo)
+                observaciones.to_excel(ruta, sheet_name=HOJA_VALIDACION, index=False)
+                raise ErrorValidacion(observaciones, ruta)
+
+        if consolidado.empty:
+            print("No se encontraron datos en los archivos CSV")
+            return
+
+        No_Cruzado = 0
+
+        if 'No' in consolidado['Cruzado'].values:
+            No_Cruzado = consolidado['Cruzado'].value_counts()['No']
+
+        if TablaDinamica is None:
+            with perfilador.etapa('tabla_dinamica'):
+                TablaDinamica = construir_tabla_dinamica(consolidado)
+
+        with perfilador.etapa('categorizacion'):
+            TablaDinamica = asignar_categorias(TablaDinamica, categorias)
+
+        # Agrupaciones adicionales (AGRUPACIONES_REPORTE), todas con los mismos códigos de grupo
+        with perfilador.etapa('agregaciones'):
+            agregaciones = calcular_agrupaciones(consolidado, agrupaciones_desde_entorno(), fecha_inicial, fecha_final)
+
+        # Exportar el Consolidado, la Tabla Dinámica y las agrupaciones a un archivo de Excel
+        with perfilador.etapa('exportar_excel'):
+            exportar_excel(nombre_archivo, TablaDinamica, consolidado, agregaciones, observaciones)
+
+        # Aplicar formatos del archivo
+        with perfilador.etapa('formato_excel'):
+            formatear_excel(nombre_archivo, agregaciones)
+
+        #Mostrar mensaje de finalización
+        #showinfo(title="Finalizado", message=f"El archivo se ha generado correctamente.\n \nCantidad de Facturas no cruzados: {No_Cruzado}")
+    finally:
+        if almacen is not None:
+            almacen.cerrar()
+        cerrar_archivos()
+        perfilador.detener()
+        perfilador.guardar(nombre_archivo)
+
+
+def archivar_periodo_cerrado(desde, hasta, downloads_mc_path, downloads_rcel_path):
+    """
+    Empaqueta por cliente un período cerrado de las descargas MC y RCEL en ZIPs de período.
+
+    El control y el inventario siguen leyendo los comprobantes archivados desde los ZIP,
+    y la descarga de RCEL no vuelve a bajar las facturas que ya están archivadas.
+
+    Args:
+        desde: Inicio del período (date)
+        hasta: Fin del período (date); debe ser a más tardar el último día del mes anterior
+        downloads_mc_path: Directorio de descargas MC
+        downloads_rcel_path: Directorio de descargas RCEL
+
+    Returns:
+        dict: Totales por fuente ('mc', 'rcel') retornados por `archivar_periodo`
+    """
+    if hasta > ultimo_mes_cerrado():
+        raise ValueError(f"Solo se pueden archivar meses cerrados (hasta {ultimo_mes_cerrado():%d/%m/%Y})")
+    totales = {}
+    for fuente, base in (('mc', downloads_mc_path), ('rcel', downloads_rcel_path)):
+        totales[fuente] = archivar_periodo(base, fuente, desde, hasta)
+        print(f"Archivado {fuente.upper()}: {totales[fuente]['clientes']} cliente(s), "
+              f"{totales[fuente]['archivos']} archivo(s), "
+              f"{totales[fuente]['bytes'] / 1_048_576:.1f} MB sueltos -> "
+              f"{totales[fuente]['bytes_archivo'] / 1_048_576:.1f} MB en ZIP")
+    return totales
+
+
+def ejecutar_control_en_memoria(df, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, rcel_endpoint,
+                                downloads_mc_path, downloads_rcel_path, directorio_archivo=None, rcel_solo_metadata=False):
+    """
+    Ejecuta descarga y control de punta a punta sin escribir archivos intermedios en disco.
+
+    Los CSV de Mis Comprobantes y la metadata de RCEL pasan directamente de la etapa de
+    descarga a la de control, sin redescubrirlos en disco.
+
+    Args:
+        df: DataFrame de la planilla de contribuyentes
+        mrbot_user: Usuario de Mrbot
+        mrbot_api_key: API key de Mrbot
+        base_url: URL base de la API
+        mis_comprobantes_endpoint: Endpoint de Mis Comprobantes
+        rcel_endpoint: Endpoint de RCEL
+        downloads_mc_path: Directorio de descargas MC (solo se usa para nombrar los archivos)
+        downloads_rcel_path: Directorio de descargas RCEL (solo se usa para nombrar los archivos)
+        directorio_archivo: Directorio opcional donde archivar ZIPs, PDFs y metadata descargados
+        rcel_solo_metadata: Si es True, el archivo de RCEL guarda solo la metadata sin descargar los PDFs
+
+    Returns:
+        tuple: Cantidad de archivos MC y de facturas RCEL procesadas
+    """
+    archivos_mc = []
+    archivos_PDF_JSON = []
+
+    for index, row in df.iterrows():
+        archivos_mc.extend(procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint,
+                                                downloads_mc_path, en_memoria=True, directorio_archivo=directorio_archivo))
+        archivos_PDF_JSON.extend(procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoint,
+                                                        downloads_rcel_path, en_memoria=True, directorio_archivo=directorio_archivo,
+                                                        solo_metadata=rcel_solo_metadata))
+
+    if archivos_mc or archivos_PDF_JSON:
+        control(archivos_mc, [], archivos_PDF_JSON)
+
+    return len(archivos_mc), len(archivos_PDF_JSON)
 
 
 
 if __name__ == "__main__":
-    import glob
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Descarga y control de monotributistas")
+    parser.add_argument("--perfilar", nargs="?", const="si", choices=["tiempos", "si", "cprofile"],
+                        help="Perfila cada etapa del control: tiempos (pared y CPU), si (además memoria) "
+                             "o cprofile (además guarda un perfil de cProfile junto al reporte)")
+    parser.add_argument("--reintentar-fallidos", action="store_true",
+                        help="Descarga solo los trabajos fallidos según la bitácora (BITACORA_DESCARGAS)")
+    parser.add_argument("--reiniciar-bitacora", action="store_true",
+                        help="Descarta la bitácora y procesa todas las filas desde el principio")
+    parser.add_argument("--sin-bitacora", action="store_true", help="No registra ni reanuda desde la bitácora")
+    parser.add_argument("--sin-planificar", action="store_true",
+                        help="No consulta el cupo de consultas disponibles antes de descargar")
+    parser.add_argument("--archivar-periodo", nargs=2, metavar=("DESDE", "HASTA"),
+                        help="Empaqueta por cliente el período cerrado DESDE-HASTA (dd/mm/yyyy) de las "
+                             "descargas en un ZIP con índice y termina, sin descargar ni controlar")
+    args = parser.parse_args()
+
+    if args.perfilar:
+        os.environ["PERFILAR_CONTROL"] = args.perfilar
+
+    if args.archivar_periodo:
+        archivar_periodo_cerrado(a_fecha(args.archivar_periodo[0]), a_fecha(args.archivar_periodo[1]),
+                                 os.getenv("DOWNLOADS_MC_PATH", "descargas_mis_comprobantes"),
+                                 os.getenv("DOWNLOADS_RCEL_PATH", "descargas_rcel"))
+        raise SystemExit(0)
     
     print("\n" + "="*80)
     print("INICIANDO PROCESO DE DESCARGA Y CONTROL DE MONOTRIBUTISTAS")
@@ -548,38 +1679,69 @@ if __name__ == "__main__":
     rcel_endpoint = os.getenv("RCEL_ENDPOINT")
     downloads_mc_path = os.getenv("DOWNLOADS_MC_PATH", "descargas_mis_comprobantes")
     downloads_rcel_path = os.getenv("DOWNLOADS_RCEL_PATH", "descargas_rcel")
-
-    # Procesar cada fila
-    for index, row in df.iterrows():
-        # Procesar Mis Comprobantes
-        procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, downloads_mc_path)
+    modo_en_memoria = normalizar_si_no(os.getenv("MODO_EN_MEMORIA", "no")) == 'si'
+    directorio_archivo = os.getenv("DIRECTORIO_ARCHIVO") or None
+    rcel_solo_metadata = normalizar_si_no(os.getenv("RCEL_SOLO_METADATA", "no")) == 'si'
+    resumen_metricas = os.getenv("RESUMEN_METRICAS") or None
+
+    # Progreso en vivo: una línea cada pocos segundos con archivos/s y MB/s
+    if normalizar_si_no(os.getenv("MOSTRAR_PROGRESO", "no")) == 'si':
+        metricas.suscribir(suscriptor_periodico(lambda evento: print(formatear_progreso(evento))))
+
+    if modo_en_memoria:
+        # Descarga y control sin archivos intermedios
+        cantidad_mc, cantidad_rcel = ejecutar_control_en_memoria(
+            df, mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, rcel_endpoint,
+            downloads_mc_path, downloads_rcel_path, directorio_archivo, rcel_solo_metadata
+        )
+        print(f"Archivos MC procesados en memoria: {cantidad_mc}")
+        print(f"Facturas RCEL procesadas en memoria: {cantidad_rcel}")
+        if cantidad_mc or cantidad_rcel:
+            print("\nReporte generado: 'Reporte Recategorizaciones de Monotributistas.xlsx'")
+        else:
+            print("\nNo se encontraron archivos para procesar.")
+    else:
+        # Procesar cada fila, reanudando lo que haya quedado pendiente en la bitácora
+        bitacora = None if args.sin_bitacora else BitacoraDescargas.desde_entorno()
+        if bitacora is not None and args.reiniciar_bitacora:
+            bitacora.reiniciar()
+        resumen_descargas = descargar_planilla(
+            df, ('mc', 'rcel'), mrbot_user, mrbot_api_key, base_url, mis_comprobantes_endpoint, rcel_endpoint,
+            downloads_mc_path, downloads_rcel_path, rcel_solo_metadata, bitacora,
+            solo_fallidos=args.reintentar_fallidos,
+            cupo=None if args.sin_planificar else CupoConsultas.desde_entorno(mrbot_user, mrbot_api_key, base_url),
+            historial=HistorialClientes.desde_entorno(),
+        )
+        print(f"\nDescargas procesadas: {resumen_descargas['procesados']} | "
+              f"omitidas: {resumen_descargas['omitidos']} | fallidas: {resumen_descargas['fallidos']} | "
+              f"diferidas por cupo: {resumen_descargas['diferidos']}")
         
-        # Procesar RCEL
-        procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, rcel_endpoint, downloads_rcel_path)
-    
-    # Ejecutar control con los archivos descargados
-    print("\n" + "="*80)
-    print("INICIANDO CONTROL DE ARCHIVOS DESCARGADOS")
-    print("="*80 + "\n")
-    
-    # Buscar archivos de Mis Comprobantes y RCEL
-    archivos_mc = glob.glob(f"{downloads_mc_path}/**/extraido/*.csv", recursive=True)
-    archivos_PDF = []  # No se usan archivos PDF directamente
-    archivos_PDF_JSON = glob.glob(f"{downloads_rcel_path}/**/*.json", recursive=True)
-    
-    print(f"Archivos MC encontrados: {len(archivos_mc)}")
-    print(f"Archivos JSON RCEL encontrados: {len(archivos_PDF_JSON)}")
-    
-    if archivos_mc or archivos_PDF_JSON:
-        print("\nEjecutando función control...\n")
-        control(archivos_mc, archivos_PDF, archivos_PDF_JSON)
+        # Ejecutar control con los archivos descargados
         print("\n" + "="*80)
-        print("CONTROL COMPLETADO")
-        print("="*80)
-        print("\nReporte generado: 'Reporte Recategorizaciones de Monotributistas.xlsx'")
-    else:
-        print("\nNo se encontraron archivos para procesar.")
+        print("INICIANDO CONTROL DE ARCHIVOS DESCARGADOS")
+        print("="*80 + "\n")
+        
+        # Buscar archivos de Mis Comprobantes y RCEL
+        archivos_mc = listar_archivos(downloads_mc_path, 'mc')
+        archivos_PDF = []  # No se usan archivos PDF directamente
+        archivos_PDF_JSON = listar_archivos(downloads_rcel_path, 'rcel')
+        
+        print(f"Archivos MC encontrados: {len(archivos_mc)}")
+        print(f"Archivos JSON RCEL encontrados: {len(archivos_PDF_JSON)}")
         
+        if archivos_mc or archivos_PDF_JSON:
+            print("\nEjecutando función control...\n")
+            control(archivos_mc, archivos_PDF, archivos_PDF_JSON)
+            print("\n" + "="*80)
+            print("CONTROL COMPLETADO")
+            print("="*80)
+            print("\nReporte generado: 'Reporte Recategorizaciones de Monotributistas.xlsx'")
+        else:
+            print("\nNo se encontraron archivos para procesar.")
+        
+    if resumen_metricas:
+        metricas.guardar_resumen(resumen_metricas)
+
     print("\n" + "="*80)
     print("PROCESO COMPLETADO")
     print("="*80 + "\n")
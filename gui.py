@@ -6,13 +6,20 @@ import webbrowser
 import subprocess
 import sys
 import pandas as pd
-import glob
 import threading
 from pathlib import Path
 from dotenv import load_dotenv
-from control import procesar_descarga_mc, procesar_descarga_rcel, control
+from control import descargar_planilla, control
+from lib.bitacora import BitacoraDescargas
+from lib.planificador import CupoConsultas
+from lib.historial import HistorialClientes
+from lib.helpers import normalizar_si_no
+from lib.inventario import listar_archivos
+from lib.metricas import metricas, formatear_progreso, suscriptor_periodico
+from lib.registro import configurar_registro
 
 load_dotenv()
+configurar_registro()
 
 
 def asset_path(*relative_parts):
@@ -25,7 +32,7 @@ class MonotributistasGUI(tk.Tk):
         super().__init__()
         
         self.title("Control de Monotributistas")
-        self.geometry("650x780")
+        self.geometry("650x860")
         self.resizable(False, False)
         self.configure(bg='#1e1e1e')
         try:
@@ -39,6 +46,9 @@ class MonotributistasGUI(tk.Tk):
         # Crear interfaz
         self.crear_interfaz()
         
+        # Progreso en vivo de descargas y control
+        metricas.suscribir(suscriptor_periodico(self._actualizar_progreso, intervalo=0.5))
+        
     def crear_interfaz(self):
         """Crea todos los elementos de la interfaz"""
         # ==================== HEADER CON LOGOS ====================
@@ -193,7 +203,41 @@ class MonotributistasGUI(tk.Tk):
                                            borderwidth=0,
                                            state=tk.DISABLED,
                                            disabledforeground='#666666')
-        self.btn_descargar_rcel.pack(fill=tk.X, padx=8, pady=(4, 8))
+        self.btn_descargar_rcel.pack(fill=tk.X, padx=8, pady=(4, 4))
+        
+        self.btn_reintentar = tk.Button(descargas_container,
+                                       text="Reintentar descargas fallidas",
+                                       command=self.reintentar_fallidos,
+                                       bg='#4a5568',
+                                       fg='white',
+                                       activebackground='#5a6578',
+                                       activeforeground='white',
+                                       font=("Segoe UI", 10, "bold"),
+                                       relief=tk.FLAT,
+                                       cursor='hand2',
+                                       padx=20,
+                                       pady=10,
+                                       borderwidth=0,
+                                       state=tk.DISABLED,
+                                       disabledforeground='#666666')
+        self.btn_reintentar.pack(fill=tk.X, padx=8, pady=(4, 4))
+        
+        self.btn_nuevo_lote = tk.Button(descargas_container,
+                                       text="Comenzar un lote nuevo",
+                                       command=self.comenzar_lote_nuevo,
+                                       bg='#4a5568',
+                                       fg='white',
+                                       activebackground='#5a6578',
+                                       activeforeground='white',
+                                       font=("Segoe UI", 10, "bold"),
+                                       relief=tk.FLAT,
+                                       cursor='hand2',
+                                       padx=20,
+                                       pady=10,
+                                       borderwidth=0,
+                                       state=tk.DISABLED,
+                                       disabledforeground='#666666')
+        self.btn_nuevo_lote.pack(fill=tk.X, padx=8, pady=(4, 8))
         
         # Sección: Procesamiento
         self.create_section_label("⚙️  Procesamiento y Reporte", main_frame)
@@ -218,6 +262,15 @@ class MonotributistasGUI(tk.Tk):
                                      disabledforeground='#666666')
         self.btn_procesar.pack(fill=tk.X, padx=8, pady=8)
         
+        self.label_progreso = tk.Label(main_frame,
+                                      text="",
+                                      bg='#1e1e1e',
+                                      fg='#999999',
+                                      font=("Segoe UI", 9),
+                                      anchor="w",
+                                      padx=5)
+        self.label_progreso.pack(fill=tk.X, pady=(3, 0))
+        
         # ==================== FOOTER ====================
         footer_frame = tk.Frame(self, bg='#1e1e1e')
         footer_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=30, pady=(15, 25))
@@ -288,6 +341,16 @@ class MonotributistasGUI(tk.Tk):
                 bg='#2563eb',
                 cursor='hand2'
             )
+            self.btn_reintentar.config(
+                state=tk.NORMAL,
+                bg='#2563eb',
+                cursor='hand2'
+            )
+            self.btn_nuevo_lote.config(
+                state=tk.NORMAL,
+                bg='#2563eb',
+                cursor='hand2'
+            )
             self.btn_procesar.config(
                 state=tk.NORMAL,
                 bg='#059669',
@@ -301,6 +364,12 @@ class MonotributistasGUI(tk.Tk):
             self.btn_descargar_rcel.bind('<Enter>', lambda e: self.btn_descargar_rcel.config(bg='#3b82f6'))
             self.btn_descargar_rcel.bind('<Leave>', lambda e: self.btn_descargar_rcel.config(bg='#2563eb'))
             
+            self.btn_reintentar.bind('<Enter>', lambda e: self.btn_reintentar.config(bg='#3b82f6'))
+            self.btn_reintentar.bind('<Leave>', lambda e: self.btn_reintentar.config(bg='#2563eb'))
+            
+            self.btn_nuevo_lote.bind('<Enter>', lambda e: self.btn_nuevo_lote.config(bg='#3b82f6'))
+            self.btn_nuevo_lote.bind('<Leave>', lambda e: self.btn_nuevo_lote.config(bg='#2563eb'))
+            
             self.btn_procesar.bind('<Enter>', lambda e: self.btn_procesar.config(bg='#10b981'))
             self.btn_procesar.bind('<Leave>', lambda e: self.btn_procesar.config(bg='#059669'))
             
@@ -342,6 +411,7 @@ class MonotributistasGUI(tk.Tk):
         try:
             # Deshabilitar botones durante el proceso
             self.after(0, lambda: self.btn_descargar_mc.config(state=tk.DISABLED, text="Descargando..."))
+            metricas.reiniciar()
             
             # Leer variables de entorno
             mrbot_user = os.getenv("MRBOT_USER")
@@ -361,14 +431,16 @@ class MonotributistasGUI(tk.Tk):
             # Leer Excel
             df = pd.read_excel(self.archivo_seleccionado)
             
-            # Procesar cada fila
-            for index, row in df.iterrows():
-                procesar_descarga_mc(row, mrbot_user, mrbot_api_key, base_url, 
-                                    mis_comprobantes_endpoint, downloads_mc_path)
+            # Procesar cada fila, reanudando lo pendiente de una descarga interrumpida
+            resumen = descargar_planilla(df, ('mc',), mrbot_user, mrbot_api_key, base_url,
+                                         mis_comprobantes_endpoint, None, downloads_mc_path, None,
+                                         bitacora=BitacoraDescargas.desde_entorno(),
+                                         cupo=CupoConsultas.desde_entorno(mrbot_user, mrbot_api_key, base_url),
+                                         historial=HistorialClientes.desde_entorno())
             
             self.after(0, lambda: messagebox.showinfo(
                 "Éxito",
-                "Descarga de Mis Comprobantes completada."
+                f"Descarga de Mis Comprobantes completada.\n\n{self._texto_resumen(resumen)}"
             ))
             
         except Exception as e:
@@ -382,6 +454,7 @@ class MonotributistasGUI(tk.Tk):
                 state=tk.NORMAL,
                 text="Descargar Mis Comprobantes"
             ))
+            self._guardar_resumen_metricas()
     
     def descargar_rcel(self):
         """Ejecuta la descarga de RCEL"""
@@ -404,6 +477,7 @@ class MonotributistasGUI(tk.Tk):
         try:
             # Deshabilitar botones durante el proceso
             self.after(0, lambda: self.btn_descargar_rcel.config(state=tk.DISABLED, text="Descargando..."))
+            metricas.reiniciar()
             
             # Leer variables de entorno
             mrbot_user = os.getenv("MRBOT_USER")
@@ -411,6 +485,7 @@ class MonotributistasGUI(tk.Tk):
             base_url = os.getenv("BASE_URL")
             rcel_endpoint = os.getenv("RCEL_ENDPOINT")
             downloads_rcel_path = os.getenv("DOWNLOADS_RCEL_PATH", "descargas_rcel")
+            solo_metadata = normalizar_si_no(os.getenv("RCEL_SOLO_METADATA", "no")) == 'si'
             
             # Verificar variables
             if not all([mrbot_user, mrbot_api_key, base_url, rcel_endpoint]):
@@ -423,14 +498,16 @@ class MonotributistasGUI(tk.Tk):
             # Leer Excel
             df = pd.read_excel(self.archivo_seleccionado)
             
-            # Procesar cada fila
-            for index, row in df.iterrows():
-                procesar_descarga_rcel(row, mrbot_user, mrbot_api_key, base_url, 
-                                      rcel_endpoint, downloads_rcel_path)
+            # Procesar cada fila, reanudando lo pendiente de una descarga interrumpida
+            resumen = descargar_planilla(df, ('rcel',), mrbot_user, mrbot_api_key, base_url, None,
+                                         rcel_endpoint, None, downloads_rcel_path, solo_metadata,
+                                         bitacora=BitacoraDescargas.desde_entorno(),
+                                         cupo=CupoConsultas.desde_entorno(mrbot_user, mrbot_api_key, base_url),
+                                         historial=HistorialClientes.desde_entorno())
             
             self.after(0, lambda: messagebox.showinfo(
                 "Éxito",
-                "Descarga de RCEL completada."
+                f"Descarga de RCEL completada.\n\n{self._texto_resumen(resumen)}"
             ))
             
         except Exception as e:
@@ -444,6 +521,89 @@ class MonotributistasGUI(tk.Tk):
                 state=tk.NORMAL,
                 text="Descargar RCEL"
             ))
+            self._guardar_resumen_metricas()
+    
+    def reintentar_fallidos(self):
+        """Vuelve a ejecutar solo las descargas que fallaron según la bitácora"""
+        if not self.archivo_seleccionado:
+            messagebox.showwarning("Advertencia", "Primero debes seleccionar un archivo Excel")
+            return
+        
+        bitacora = BitacoraDescargas.desde_entorno()
+        if bitacora is None or not bitacora.trabajos('fallido'):
+            messagebox.showinfo("Reintentar", "No hay descargas fallidas registradas en la bitácora.")
+            return
+        
+        respuesta = messagebox.askyesno(
+            "Confirmar Reintento",
+            f"¿Deseas reintentar {len(bitacora.trabajos('fallido'))} descarga(s) fallida(s)?"
+        )
+        
+        if respuesta:
+            thread = threading.Thread(target=self._ejecutar_reintento, args=(bitacora,), daemon=True)
+            thread.start()
+    
+    def _ejecutar_reintento(self, bitacora):
+        """Ejecuta el reintento de descargas fallidas en segundo plano"""
+        try:
+            self.after(0, lambda: self.btn_reintentar.config(state=tk.DISABLED, text="Reintentando..."))
+            metricas.reiniciar()
+            
+            df = pd.read_excel(self.archivo_seleccionado)
+            resumen = descargar_planilla(
+                df, ('mc', 'rcel'),
+                os.getenv("MRBOT_USER"), os.getenv("MRBOT_API_KEY"), os.getenv("BASE_URL"),
+                os.getenv("MIS_COMPROBANTES_ENDPOINT"), os.getenv("RCEL_ENDPOINT"),
+                os.getenv("DOWNLOADS_MC_PATH", "descargas_mis_comprobantes"),
+                os.getenv("DOWNLOADS_RCEL_PATH", "descargas_rcel"),
+                normalizar_si_no(os.getenv("RCEL_SOLO_METADATA", "no")) == 'si',
+                bitacora=bitacora, solo_fallidos=True,
+                cupo=CupoConsultas.desde_entorno(os.getenv("MRBOT_USER"), os.getenv("MRBOT_API_KEY"),
+                                                 os.getenv("BASE_URL")),
+                historial=HistorialClientes.desde_entorno(),
+            )
+            
+            self.after(0, lambda: messagebox.showinfo(
+                "Reintento finalizado",
+                self._texto_resumen(resumen)
+            ))
+            
+        except Exception as e:
+            self.after(0, lambda: messagebox.showerror(
+                "Error",
+                f"Error durante el reintento:\n{str(e)}"
+            ))
+        finally:
+            self.after(0, lambda: self.btn_reintentar.config(
+                state=tk.NORMAL,
+                text="Reintentar descargas fallidas"
+            ))
+            self._guardar_resumen_metricas()
+    
+    def comenzar_lote_nuevo(self):
+        """Descarta la bitácora para que la próxima descarga procese todas las filas"""
+        bitacora = BitacoraDescargas.desde_entorno()
+        if bitacora is None or not bitacora.trabajos():
+            messagebox.showinfo("Lote nuevo", "No hay descargas registradas en la bitácora.")
+            return
+        
+        respuesta = messagebox.askyesno(
+            "Confirmar Lote Nuevo",
+            "¿Deseas descartar la bitácora? La próxima descarga procesará todas las filas "
+            "desde el principio, incluidas las ya completadas."
+        )
+        
+        if respuesta:
+            try:
+                bitacora.reiniciar()
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo reiniciar la bitácora:\n{e}")
+    
+    @staticmethod
+    def _texto_resumen(resumen):
+        """Texto con el resultado de un lote de descargas"""
+        return (f"Procesadas: {resumen['procesados']} | Omitidas (ya completas): {resumen['omitidos']} | "
+                f"Fallidas: {resumen['fallidos']} | Diferidas por cupo: {resumen['diferidos']}")
     
     def procesar_datos(self):
         """Procesa los datos y genera el reporte"""
@@ -467,14 +627,15 @@ class MonotributistasGUI(tk.Tk):
         try:
             # Deshabilitar botón durante el proceso
             self.after(0, lambda: self.btn_procesar.config(state=tk.DISABLED, text="Procesando..."))
+            metricas.reiniciar()
             
             downloads_mc_path = os.getenv("DOWNLOADS_MC_PATH", "descargas_mis_comprobantes")
             downloads_rcel_path = os.getenv("DOWNLOADS_RCEL_PATH", "descargas_rcel")
             
             # Buscar archivos de Mis Comprobantes y RCEL
-            archivos_mc = glob.glob(f"{downloads_mc_path}/**/extraido/*.csv", recursive=True)
+            archivos_mc = listar_archivos(downloads_mc_path, 'mc')
             archivos_PDF = []  # No se usan archivos PDF directamente
-            archivos_PDF_JSON = glob.glob(f"{downloads_rcel_path}/**/*.json", recursive=True)
+            archivos_PDF_JSON = listar_archivos(downloads_rcel_path, 'rcel')
             
             if not archivos_mc and not archivos_PDF_JSON:
                 self.after(0, lambda: messagebox.showwarning(
@@ -504,6 +665,21 @@ class MonotributistasGUI(tk.Tk):
                 state=tk.NORMAL,
                 text="🚀 Procesar y Generar Reporte"
             ))
+            self._guardar_resumen_metricas()
+    
+    def _actualizar_progreso(self, evento):
+        """Muestra el último evento de progreso (se invoca desde hilos de trabajo)"""
+        texto = formatear_progreso(evento)
+        self.after(0, lambda: self.label_progreso.config(text=texto))
+    
+    def _guardar_resumen_metricas(self):
+        """Guarda el resumen de métricas si está configurado RESUMEN_METRICAS"""
+        ruta = os.getenv("RESUMEN_METRICAS")
+        if ruta:
+            try:
+                metricas.guardar_resumen(ruta)
+            except Exception as e:
+                print(f"Error guardando resumen de métricas: {e}")
     
     def abrir_donaciones(self):
         """Abre el link de donaciones en el navegador"""
@@ -0,0 +1,240 @@
+"""
+Módulo de agregaciones del reporte en una sola pasada
+
+Calcula sobre el consolidado prorrateado las agrupaciones configuradas en
+AGRUPACIONES_REPORTE (totales mensuales prorrateados por cliente, totales por
+contraparte, comprobantes no cruzados con RCEL) sin un `pivot_table` por hoja:
+
+- cada columna de agrupamiento se factoriza una sola vez y sus códigos se
+  comparten entre todas las agrupaciones que la usan;
+- los códigos de las columnas de una agrupación se combinan en un código de grupo
+  (índice mixto) y cada medida es un `np.bincount` sobre ese código;
+- el importe mensual reparte el 'Importe por día' de cada comprobante entre los
+  días efectivos que caen en cada mes del período controlado.
+
+Cada agrupación se exporta como una hoja propia del reporte.
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# (columna de salida, operación, columna de valores, filtro (columna, valor))
+#   operación: 'suma', 'cantidad' o 'primero' (valor de la primera fila del grupo)
+Medida = Tuple[str, str, Optional[str], Optional[Tuple[str, Any]]]
+
+OPERACIONES = ("suma", "cantidad", "primero")
+
+# Combinaciones de claves hasta las que los grupos se numeran con un conteo en lugar de ordenar
+DENSO_MAXIMO = 1 << 22
+
+
+class Agrupacion:
+    """
+    Agrupación del consolidado que se exporta como hoja del reporte.
+
+    Args:
+        hoja: Nombre de la hoja
+        claves: Columnas de agrupamiento (índice de la hoja)
+        medidas: Medidas a calcular por grupo (ver `Medida`)
+        por_mes: Si es True agrega una columna por mes del período con el importe prorrateado
+            que corresponde a ese mes, y su total
+    """
+
+    def __init__(self, hoja: str, claves: Sequence[str], medidas: Sequence[Medida] = (), por_mes: bool = False):
+        for _, operacion, _, _ in medidas:
+            if operacion not in OPERACIONES:
+                raise ValueError(f"Operación de agregación desconocida: {operacion}")
+        self.hoja = hoja
+        self.claves = list(claves)
+        self.medidas = list(medidas)
+        self.por_mes = por_mes
+
+    def columnas_moneda(self, tabla: pd.DataFrame) -> List[str]:
+        """Columnas de importes de la tabla resultante (sumas y meses)."""
+        cantidades = {nombre for nombre, operacion, _, _ in self.medidas if operacion != "suma"}
+        return [columna for columna in tabla.columns if columna not in cantidades]
+
+
+# Agrupaciones disponibles para AGRUPACIONES_REPORTE
+AGRUPACIONES = {
+    "mensual": Agrupacion(
+        "Mensual por Cliente", ["Cliente", "MC"], por_mes=True,
+    ),
+    "contraparte": Agrupacion(
+        "Por Contraparte", ["Cliente", "MC", "Nro. Doc. Receptor/Emisor"],
+        [
+            ("Denominación", "primero", "Denominación Receptor/Emisor", None),
+            ("Cantidad de Comprobantes", "cantidad", None, None),
+            ("Imp. Total", "suma", "Imp. Total", None),
+            ("Importe Prorrateado", "suma", "Importe Prorrateado", None),
+        ],
+    ),
+    "no_cruzados": Agrupacion(
+        "No Cruzados", ["Cliente", "MC"],
+        [
+            ("Cantidad de Comprobantes", "cantidad", None, None),
+            ("No Cruzados", "cantidad", None, ("Cruzado", "No")),
+            ("Importe No Cruzado", "suma", "Importe Prorrateado", ("Cruzado", "No")),
+        ],
+    ),
+}
+
+
+def agrupaciones_desde_entorno() -> List[Agrupacion]:
+    """
+    Agrupaciones configuradas en AGRUPACIONES_REPORTE (nombres de AGRUPACIONES separados por coma).
+
+    Returns:
+        List[Agrupacion]: Por defecto todas; ninguna si la variable está vacía o en 'no'
+    """
+    valor = os.getenv("AGRUPACIONES_REPORTE", ",".join(AGRUPACIONES)).strip().lower()
+    if not valor or valor == "no":
+        return []
+    nombres = [nombre.strip() for nombre in valor.split(",") if nombre.strip()]
+    desconocidas = [nombre for nombre in nombres if nombre not in AGRUPACIONES]
+    if desconocidas:
+        raise ValueError(f"AGRUPACIONES_REPORTE: agrupaciones desconocidas {desconocidas}; "
+                         f"disponibles: {', '.join(AGRUPACIONES)}")
+    return [AGRUPACIONES[nombre] for nombre in nombres]
+
+
+def meses_del_periodo(fecha_inicial: Any, fecha_final: Any) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """(inicio, fin) de cada mes calendario del período, recortando el primero y el último."""
+    inicio, fin = pd.Timestamp(fecha_inicial).normalize(), pd.Timestamp(fecha_final).normalize()
+    meses = []
+    while inicio <= fin:
+        fin_mes = min(inicio + pd.offsets.MonthEnd(0), fin)
+        meses.append((inicio, fin_mes))
+        inicio = fin_mes + pd.Timedelta(days=1)
+    return meses
+
+
+def _sin_nan(valores: np.ndarray) -> np.ndarray:
+    """Reemplaza NaN por 0 para que las sumas los omitan, como `pivot_table`."""
+    return np.where(np.isnan(valores), 0.0, valores)
+
+
+class _Codigos:
+    """Códigos de grupo del consolidado compartidos entre agrupaciones."""
+
+    def __init__(self, consolidado: pd.DataFrame):
+        self.consolidado = consolidado
+        self._columnas: Dict[str, Tuple[np.ndarray, pd.Index]] = {}
+        self._grupos: Dict[Tuple[str, ...], Tuple[np.ndarray, pd.MultiIndex]] = {}
+        self._filtros: Dict[Tuple[str, Any], np.ndarray] = {}
+
+    def columna(self, nombre: str) -> Tuple[np.ndarray, pd.Index]:
+        """Códigos (ordenados) y niveles de una columna, factorizada una sola vez."""
+        if nombre not in self._columnas:
+            self._columnas[nombre] = pd.factorize(self.consolidado[nombre], sort=True, use_na_sentinel=False)
+        return self._columnas[nombre]
+
+    def grupos(self, claves: Tuple[str, ...]) -> Tuple[np.ndarray, pd.MultiIndex]:
+        """
+        Grupo de cada fila para una combinación de columnas.
+
+        Returns:
+            Tuple[np.ndarray, pd.MultiIndex]: Índice de grupo de cada fila (0..n-1) y claves de cada grupo
+        """
+        if claves not in self._grupos:
+            codigos = [self.columna(clave) for clave in claves]
+            dimensiones = tuple(max(len(niveles), 1) for _, niveles in codigos)
+            combinado = np.ravel_multi_index(tuple(c.astype(np.int64) for c, _ in codigos), dimensiones)
+            if np.prod(dimensiones, dtype=np.float64) <= max(2 * len(combinado), DENSO_MAXIMO):
+                # Espacio de claves chico: los grupos presentes salen de un conteo, sin ordenar
+                presentes = np.flatnonzero(np.bincount(combinado, minlength=int(np.prod(dimensiones))))
+                posicion = np.empty(int(np.prod(dimensiones)), dtype=np.int64)
+                posicion[presentes] = np.arange(len(presentes))
+                inversa = posicion[combinado]
+            else:
+                presentes, inversa = np.unique(combinado, return_inverse=True)
+            niveles, codigos_indice = [], []
+            for (_, nivel), codigo in zip(codigos, np.unravel_index(presentes, dimensiones)):
+                if nivel.hasnans:
+                    # Con sort=True el faltante es el último nivel; en un MultiIndex va como código -1
+                    codigo = np.where(codigo == len(nivel) - 1, -1, codigo)
+                    nivel = nivel[:-1]
+                niveles.append(nivel)
+                codigos_indice.append(codigo)
+            indice = pd.MultiIndex(levels=niveles, codes=codigos_indice, names=list(claves), verify_integrity=False)
+            self._grupos[claves] = (inversa.reshape(-1), indice)
+        return self._grupos[claves]
+
+    def filtro(self, filtro: Optional[Tuple[str, Any]]) -> Optional[np.ndarray]:
+        """Máscara de las filas que cumplen `columna == valor`."""
+        if filtro is None:
+            return None
+        if filtro not in self._filtros:
+            self._filtros[filtro] = (self.consolidado[filtro[0]] == filtro[1]).to_numpy()
+        return self._filtros[filtro]
+
+
+def _importes_mensuales(consolidado: pd.DataFrame, fecha_inicial: Any,
+                        fecha_final: Any) -> List[Tuple[str, np.ndarray]]:
+    """Importe prorrateado de cada comprobante que corresponde a cada mes del período."""
+    inicio = pd.to_datetime(consolidado['Fecha_Inicial_max'], format='%d/%m/%Y').to_numpy('datetime64[D]')
+    fin = pd.to_datetime(consolidado['Fecha_Final_min'], format='%d/%m/%Y').to_numpy('datetime64[D]')
+    por_dia = consolidado['Importe por día'].to_numpy(dtype=np.float64)
+    importes = []
+    for inicio_mes, fin_mes in meses_del_periodo(fecha_inicial, fecha_final):
+        desde = np.maximum(inicio, np.datetime64(inicio_mes.date(), 'D'))
+        hasta = np.minimum(fin, np.datetime64(fin_mes.date(), 'D'))
+        dias = np.clip((hasta - desde).astype(np.int64) + 1, 0, None)
+        importes.append((f"{inicio_mes:%m/%Y}", _sin_nan(np.where(dias > 0, por_dia * dias, 0.0))))
+    return importes
+
+
+def calcular_agrupaciones(consolidado: pd.DataFrame, agrupaciones: Sequence[Agrupacion], fecha_inicial: Any,
+                          fecha_final: Any) -> List[Tuple[Agrupacion, pd.DataFrame]]:
+    """
+    Calcula todas las agrupaciones sobre el consolidado compartiendo sus códigos de grupo.
+
+    Args:
+        consolidado: Consolidado prorrateado (ver `prorratear`)
+        agrupaciones: Agrupaciones a calcular
+        fecha_inicial: Inicio del período controlado
+        fecha_final: Fin del período controlado
+
+    Returns:
+        List[Tuple[Agrupacion, pd.DataFrame]]: Cada agrupación con su tabla, indexada por sus claves
+    """
+    if consolidado.empty or not agrupaciones:
+        return []
+    codigos = _Codigos(consolidado)
+    mensuales = None
+    resultados = []
+
+    for agrupacion in agrupaciones:
+        grupo, indice = codigos.grupos(tuple(agrupacion.claves))
+        cantidad_grupos = len(indice)
+        columnas: Dict[str, Any] = {}
+
+        for nombre, operacion, valores, filtro in agrupacion.medidas:
+            mascara = codigos.filtro(filtro)
+            if operacion == "cantidad":
+                pesos = None if mascara is None else mascara.astype(np.float64)
+                columnas[nombre] = np.bincount(grupo, weights=pesos, minlength=cantidad_grupos).astype(np.int64)
+            elif operacion == "suma":
+                pesos = _sin_nan(consolidado[valores].to_numpy(dtype=np.float64))
+                if mascara is not None:
+                    pesos = np.where(mascara, pesos, 0.0)
+                columnas[nombre] = np.bincount(grupo, weights=pesos, minlength=cantidad_grupos)
+            else:
+                # La última escritura gana: recorriendo al revés queda la primera fila de cada grupo
+                primero = np.empty(cantidad_grupos, dtype=object)
+                primero[grupo[::-1]] = consolidado[valores].to_numpy(dtype=object)[::-1]
+                columnas[nombre] = primero
+
+        if agrupacion.por_mes:
+            if mensuales is None:
+                mensuales = _importes_mensuales(consolidado, fecha_inicial, fecha_final)
+            total = np.zeros(cantidad_grupos)
+            for mes, importes in mensuales:
+                columnas[mes] = np.bincount(grupo, weights=importes, minlength=cantidad_grupos)
+                total += columnas[mes]
+            columnas["Total"] = total
+
+        resultados.append((agrupacion, pd.DataFrame(columnas, index=indice)))
+    return resultados
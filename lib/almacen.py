@@ -0,0 +1,253 @@
+"""
+Módulo de almacén local de comprobantes de Mis Comprobantes (SQLite)
+
+Conserva entre períodos los comprobantes leídos de los CSV, con clave
+(CUIT cliente, MC, tipo, punto de venta, número, documento de la contraparte),
+para que el control consulte solo la ventana de fechas de Categorias.xlsx en
+lugar de volver a leer todos los archivos.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, List, Optional
+
+import pandas as pd
+
+from lib.archivado import estado_archivo, existe_archivo
+from lib.ingesta_mc import firma_dataframe
+
+# Columnas de `leer_archivos_csv_batch` y su nombre en la tabla
+COLUMNAS_ALMACEN = {
+    'Fecha de Emisión': 'fecha',
+    'Tipo de Comprobante': 'tipo',
+    'Punto de Venta': 'punto_venta',
+    'Número Desde': 'numero_desde',
+    'Número Hasta': 'numero_hasta',
+    'Cód. Autorización': 'cod_autorizacion',
+    'Tipo Cambio': 'tipo_cambio',
+    'Moneda': 'moneda',
+    'Imp. Neto Gravado Total': 'neto_gravado',
+    'Imp. Neto No Gravado': 'neto_no_gravado',
+    'Imp. Op. Exentas': 'op_exentas',
+    'Otros Tributos': 'otros_tributos',
+    'Total IVA': 'total_iva',
+    'Imp. Total': 'importe_total',
+    'Nro. Doc. Receptor/Emisor': 'nro_doc_contraparte',
+    'Denominación Receptor/Emisor': 'denominacion_contraparte',
+    'Archivo': 'archivo',
+    'CUIT Cliente': 'cuit_cliente',
+    'Fin CUIT': 'fin_cuit',
+    'Cliente': 'cliente',
+}
+
+# Los recibidos de distintos emisores pueden compartir tipo, punto de venta y número
+CLAVE_ALMACEN = ['cuit_cliente', 'mc', 'tipo', 'punto_venta', 'numero_desde', 'nro_doc_contraparte']
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS comprobantes (
+    fecha TEXT NOT NULL,
+    tipo INTEGER NOT NULL,
+    punto_venta INTEGER NOT NULL,
+    numero_desde INTEGER NOT NULL,
+    numero_hasta INTEGER,
+    cod_autorizacion NUMERIC,
+    tipo_cambio REAL,
+    moneda TEXT,
+    neto_gravado REAL,
+    neto_no_gravado REAL,
+    op_exentas REAL,
+    otros_tributos REAL,
+    total_iva REAL,
+    importe_total REAL,
+    nro_doc_contraparte NUMERIC NOT NULL DEFAULT '',
+    denominacion_contraparte TEXT,
+    archivo TEXT,
+    cuit_cliente INTEGER NOT NULL,
+    fin_cuit INTEGER,
+    cliente TEXT,
+    mc TEXT NOT NULL,
+    aux TEXT NOT NULL,
+    PRIMARY KEY (cuit_cliente, mc, tipo, punto_venta, numero_desde, nro_doc_contraparte)
+);
+CREATE INDEX IF NOT EXISTS idx_comprobantes_cliente_fecha ON comprobantes (cuit_cliente, fecha);
+CREATE INDEX IF NOT EXISTS idx_comprobantes_fecha ON comprobantes (fecha);
+CREATE INDEX IF NOT EXISTS idx_comprobantes_aux ON comprobantes (aux);
+CREATE INDEX IF NOT EXISTS idx_comprobantes_archivo ON comprobantes (archivo);
+
+CREATE TABLE IF NOT EXISTS archivos_ingeridos (
+    ruta TEXT PRIMARY KEY,
+    firma TEXT NOT NULL,
+    filas INTEGER NOT NULL,
+    ingerido_en REAL NOT NULL
+);
+"""
+
+
+def _firma(archivo: Any) -> str:
+    """Tamaño y mtime de un archivo en disco, o hash del contenido si está en memoria."""
+    if isinstance(archivo, tuple):
+        if isinstance(archivo[1], pd.DataFrame):
+            return firma_dataframe(archivo[1])
+        return hashlib.sha1(archivo[1]).hexdigest()
+    stat = estado_archivo(archivo)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _clave_archivo(archivo: Any) -> str:
+    return archivo[0] if isinstance(archivo, tuple) else os.path.abspath(archivo)
+
+
+def _nombre_archivo(archivo: Any) -> str:
+    """Valor de la columna 'Archivo' que `leer_archivos_csv_batch` asigna a sus filas."""
+    return (archivo[0] if isinstance(archivo, tuple) else archivo).split("/")[-1]
+
+
+class AlmacenComprobantes:
+    """
+    Almacén SQLite de comprobantes de Mis Comprobantes.
+
+    Args:
+        ruta: Ruta del archivo SQLite (se crea si no existe)
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(ESQUEMA)
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["AlmacenComprobantes"]:
+        """
+        Abre el almacén configurado en ALMACEN_COMPROBANTES.
+
+        Returns:
+            Optional[AlmacenComprobantes]: None si la variable está vacía
+        """
+        ruta = os.getenv("ALMACEN_COMPROBANTES", "").strip()
+        return cls(ruta) if ruta else None
+
+    def cerrar(self) -> None:
+        """Cierra la conexión."""
+        with self._lock:
+            self._conexion.close()
+
+    # ------------------------------------------------------------------ ingesta
+
+    def archivos_pendientes(self, archivos: Iterable[Any]) -> List[Any]:
+        """
+        Filtra los archivos nuevos o modificados desde su última ingesta.
+
+        Args:
+            archivos: Rutas de CSV o tuplas (ruta, contenido o DataFrame)
+
+        Returns:
+            List[Any]: Archivos que deben (re)ingerirse
+        """
+        with self._lock:
+            ingeridos = dict(self._conexion.execute("SELECT ruta, firma FROM archivos_ingeridos"))
+        pendientes = []
+        for archivo in archivos:
+            if not isinstance(archivo, tuple) and not existe_archivo(archivo):
+                continue
+            if ingeridos.get(_clave_archivo(archivo)) != _firma(archivo):
+                pendientes.append(archivo)
+        return pendientes
+
+    def ingerir(self, archivos: List[Any], comprobantes: pd.DataFrame) -> int:
+        """
+        Inserta o actualiza los comprobantes leídos de `archivos`.
+
+        Las filas que tenía el almacén para esos mismos archivos se reemplazan, de modo
+        que una nueva descarga del mismo rango reemplaza a la anterior.
+
+        Args:
+            archivos: Archivos de los que se leyeron los comprobantes
+            comprobantes: DataFrame retornado por `leer_archivos_csv_batch`
+
+        Returns:
+            int: Cantidad de comprobantes escritos
+        """
+        filas = []
+        if not comprobantes.empty:
+            datos = comprobantes[list(COLUMNAS_ALMACEN)].rename(columns=COLUMNAS_ALMACEN)
+            datos['nro_doc_contraparte'] = datos['nro_doc_contraparte'].fillna('')
+            datos['mc'] = datos['archivo'].str.split("-").str[1].str.strip()
+            datos['aux'] = (
+                datos['fin_cuit'].astype('int64').astype(str) + "-" +
+                datos['tipo'].astype('int64').astype(str).str.zfill(3) + "-" +
+                datos['punto_venta'].astype('int64').astype(str).str.zfill(5) + "-" +
+                datos['numero_desde'].astype('int64').astype(str).str.zfill(8)
+            )
+            datos = datos.astype(object).where(datos.notna(), None)
+            filas = list(datos.itertuples(index=False, name=None))
+            columnas = list(datos.columns)
+
+        nombres_archivo = [_nombre_archivo(a) for a in archivos]
+        ahora = time.time()
+
+        with self._lock, self._conexion:
+            self._conexion.executemany("DELETE FROM comprobantes WHERE archivo = ?", [(n,) for n in nombres_archivo])
+            if filas:
+                actualizacion = ", ".join(f"{c} = excluded.{c}" for c in columnas if c not in CLAVE_ALMACEN)
+                self._conexion.executemany(
+                    f"INSERT INTO comprobantes ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))}) "
+                    f"ON CONFLICT ({', '.join(CLAVE_ALMACEN)}) DO UPDATE SET {actualizacion}",
+                    filas,
+                )
+            conteo = comprobantes['Archivo'].value_counts().to_dict() if not comprobantes.empty else {}
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO archivos_ingeridos (ruta, firma, filas, ingerido_en) VALUES (?, ?, ?, ?)",
+                [(_clave_archivo(a), _firma(a), int(conteo.get(n, 0)), ahora) for a, n in zip(archivos, nombres_archivo)],
+            )
+        return len(filas)
+
+    # ------------------------------------------------------------------ consulta
+
+    def consultar(self, fecha_inicial: Any, fecha_final: Any, auxs: Optional[Iterable[str]] = None,
+                  cuits: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """
+        Devuelve los comprobantes emitidos dentro de la ventana de fechas.
+
+        Args:
+            fecha_inicial: Inicio de la ventana
+            fecha_final: Fin de la ventana
+            auxs: AUX que deben incluirse aunque se hayan emitido fuera de la ventana
+                (facturas de RCEL cuyo período facturado la intersecta)
+            cuits: Limitar a estos CUIT de cliente
+
+        Returns:
+            pd.DataFrame: Comprobantes con las columnas de `leer_archivos_csv_batch`
+        """
+        columnas = ", ".join(f'{sql} AS "{nombre}"' for nombre, sql in COLUMNAS_ALMACEN.items())
+        condiciones = ["fecha BETWEEN ? AND ?"]
+        parametros: List[Any] = [pd.Timestamp(fecha_inicial).strftime('%Y-%m-%d'),
+                                 pd.Timestamp(fecha_final).strftime('%Y-%m-%d')]
+
+        with self._lock:
+            self._conexion.execute("CREATE TEMP TABLE IF NOT EXISTS auxs_ventana (aux TEXT PRIMARY KEY)")
+            self._conexion.execute("DELETE FROM auxs_ventana")
+            if auxs is not None:
+                self._conexion.executemany("INSERT OR IGNORE INTO auxs_ventana VALUES (?)", ((a,) for a in auxs))
+                condiciones.append("aux IN (SELECT aux FROM auxs_ventana)")
+            consulta = f"SELECT {columnas} FROM comprobantes WHERE ({' OR '.join(condiciones)})"
+
+            if cuits is not None:
+                cuits = [int(c) for c in cuits]
+                if not cuits:
+                    return pd.DataFrame(columns=list(COLUMNAS_ALMACEN))
+                consulta += f" AND cuit_cliente IN ({', '.join('?' * len(cuits))})"
+                parametros += cuits
+
+            consulta += " ORDER BY archivo, rowid"
+            comprobantes = pd.read_sql_query(consulta, self._conexion, params=parametros)
+
+        comprobantes['Nro. Doc. Receptor/Emisor'] = comprobantes['Nro. Doc. Receptor/Emisor'].replace('', None)
+        return comprobantes
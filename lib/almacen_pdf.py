@@ -0,0 +1,195 @@
+"""
+Módulo de almacén de PDFs direccionado por contenido
+
+Con ALMACEN_PDF=si cada PDF de RCEL se guarda una sola vez en
+`<directorio base>/.objetos/<ab>/<sha256>.pdf` (el hash se calcula mientras se
+descarga) y el directorio de cada cliente lo expone con un enlace duro (o una
+copia si el sistema de archivos no los admite). Un índice en `.objetos/indice.json`
+asocia cada URL de MinIO (sin la firma) con el hash de su contenido, de modo que en
+las siguientes ejecuciones un PDF ya almacenado se enlaza sin volver a descargarlo.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from lib.helpers import normalizar_si_no
+from lib.metricas import metricas
+
+# Subdirectorio oculto: el inventario y el control no lo recorren
+DIRECTORIO_OBJETOS = ".objetos"
+ARCHIVO_INDICE = "indice.json"
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+
+def clave_url(url: str) -> str:
+    """Clave de un PDF en el índice: la ruta de su URL, sin la firma temporal de MinIO."""
+    return urlparse(url).path
+
+
+def hash_archivo(ruta: str) -> str:
+    """SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(ruta, "rb") as file:
+        for bloque in iter(lambda: file.read(TAMANO_BLOQUE_HASH), b""):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+class AlmacenPDF:
+    """
+    Almacén de PDFs deduplicados por SHA-256 bajo un directorio de descargas.
+
+    Args:
+        base: Directorio de descargas de RCEL (DOWNLOADS_RCEL_PATH o DIRECTORIO_ARCHIVO)
+    """
+
+    def __init__(self, base: str):
+        self.raiz = os.path.join(base, DIRECTORIO_OBJETOS)
+        self.ruta_indice = os.path.join(self.raiz, ARCHIVO_INDICE)
+        self._lock = threading.Lock()
+        self._indice: Dict[str, Dict[str, str]] = {}
+        self._modificado = False
+        try:
+            with open(self.ruta_indice, "r", encoding="utf-8") as file:
+                datos = json.load(file)
+            if isinstance(datos, dict):
+                self._indice = datos
+        except (OSError, ValueError):
+            pass
+
+    def ruta_objeto(self, digest: str) -> str:
+        """Ruta del objeto con hash `digest` dentro del almacén."""
+        return os.path.join(self.raiz, digest[:2], f"{digest}.pdf")
+
+    def conocido(self, url: str) -> Optional[Dict[str, str]]:
+        """
+        Busca en el índice un PDF ya almacenado.
+
+        Args:
+            url: URL de MinIO del PDF
+
+        Returns:
+            Optional[Dict[str, str]]: {'sha256', 'nombre'} si el objeto existe en el almacén
+        """
+        with self._lock:
+            entrada = self._indice.get(clave_url(url))
+        if entrada and os.path.exists(self.ruta_objeto(entrada["sha256"])):
+            return dict(entrada)
+        return None
+
+    def incorporar(self, temporal: str, digest: str, destino: str, url: Optional[str] = None) -> str:
+        """
+        Mueve un archivo recién descargado al almacén y lo enlaza en `destino`.
+
+        Si el contenido ya estaba almacenado el temporal se descarta.
+
+        Args:
+            temporal: Archivo descargado (se consume)
+            digest: SHA-256 de su contenido
+            destino: Ruta del PDF en el directorio del cliente
+            url: URL de origen, para registrarla en el índice
+
+        Returns:
+            str: `destino`
+        """
+        objeto = self.ruta_objeto(digest)
+        if os.path.exists(objeto):
+            metricas.incrementar("pdfs_deduplicados")
+            metricas.incrementar("bytes_deduplicados", os.path.getsize(temporal))
+            os.remove(temporal)
+        else:
+            os.makedirs(os.path.dirname(objeto), exist_ok=True)
+            os.replace(temporal, objeto)
+            metricas.incrementar("pdfs_almacenados")
+        self.vincular(digest, destino)
+        if url is not None:
+            self.registrar(url, digest, os.path.basename(destino))
+        return destino
+
+    def incorporar_archivo(self, ruta: str, url: Optional[str] = None) -> str:
+        """
+        Incorpora al almacén un PDF ya escrito en el directorio del cliente (p.ej. recibido en base64).
+
+        Args:
+            ruta: PDF en el directorio del cliente; queda reemplazado por el enlace al objeto
+            url: URL de origen, para registrarla en el índice
+
+        Returns:
+            str: `ruta`
+        """
+        temporal = f"{ruta}.{uuid.uuid4().hex[:8]}.tmp"
+        os.replace(ruta, temporal)
+        return self.incorporar(temporal, hash_archivo(temporal), ruta, url)
+
+    def vincular(self, digest: str, destino: str) -> str:
+        """
+        Expone un objeto del almacén en `destino` con un enlace duro (o una copia).
+
+        Args:
+            digest: SHA-256 del objeto
+            destino: Ruta del PDF en el directorio del cliente
+
+        Returns:
+            str: `destino`
+        """
+        objeto = self.ruta_objeto(digest)
+        try:
+            if os.path.samefile(objeto, destino):
+                return destino
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+        temporal = f"{destino}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.link(objeto, temporal)
+        except OSError:
+            # Sistemas de archivos sin enlaces duros (o el almacén en otro volumen)
+            shutil.copyfile(objeto, temporal)
+        os.replace(temporal, destino)
+        return destino
+
+    def registrar(self, url: str, digest: str, nombre: str) -> None:
+        """Asocia la URL de un PDF con el hash de su contenido y su nombre de archivo."""
+        with self._lock:
+            self._indice[clave_url(url)] = {"sha256": digest, "nombre": nombre}
+            self._modificado = True
+
+    def guardar(self) -> None:
+        """Guarda el índice si cambió (temporal y reemplazo)."""
+        with self._lock:
+            if not self._modificado:
+                return
+            os.makedirs(self.raiz, exist_ok=True)
+            temporal = f"{self.ruta_indice}.tmp"
+            with open(temporal, "w", encoding="utf-8") as file:
+                json.dump(self._indice, file, ensure_ascii=False)
+            os.replace(temporal, self.ruta_indice)
+            self._modificado = False
+
+
+_almacenes: Dict[str, AlmacenPDF] = {}
+_lock_almacenes = threading.Lock()
+
+
+def obtener_almacen_pdf(base: str) -> Optional[AlmacenPDF]:
+    """
+    Devuelve el almacén de PDFs compartido del directorio `base` según ALMACEN_PDF.
+
+    Args:
+        base: Directorio de descargas de RCEL
+
+    Returns:
+        Optional[AlmacenPDF]: Instancia compartida por todo el proceso, o None si ALMACEN_PDF no es 'si'
+    """
+    if normalizar_si_no(os.getenv("ALMACEN_PDF", "no")) != "si":
+        return None
+    clave = os.path.abspath(base)
+    with _lock_almacenes:
+        if clave not in _almacenes:
+            _almacenes[clave] = AlmacenPDF(base)
+        return _almacenes[clave]
@@ -0,0 +1,419 @@
+"""
+Módulo de archivado comprimido de períodos cerrados
+
+Empaqueta, por cliente, los archivos de un período ya cerrado en un único ZIP
+`periodo_<desde>_<hasta>.zip` que reemplaza a los archivos sueltos:
+
+- RCEL: cada factura emitida en el rango (FECHA_EMISION, o 'Hasta' si falta), con su JSON y su PDF.
+- Mis Comprobantes: las filas de los CSV de `extraido` con fecha de emisión en el rango
+  (los CSV conservan el resto de las filas).
+
+Dentro de cada ZIP, `indice.json` lista los miembros y, para RCEL, ubica el JSON y el
+PDF de cada factura por AUX. Los miembros se referencian con rutas virtuales
+`<ruta del ZIP>/<miembro>`, que el inventario incluye en el descubrimiento y que los
+lectores del control (`leer_archivos_csv_batch`, `leer_archivos_json_batch`) leen
+sin extraer el ZIP.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import uuid
+import zipfile
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from lib.caller_rcel import ARCHIVO_FACTURAS_RCEL
+from lib.metricas import metricas
+
+PREFIJO_ARCHIVO = "periodo_"
+ARCHIVO_INDICE = "indice.json"
+VERSION_ARCHIVO = 1
+
+_PATRON_ARCHIVO = re.compile(r"^periodo_(\d{8})_(\d{8})\.zip$")
+
+# Los PDF ya vienen comprimidos: se guardan tal cual para no gastar CPU sin ganar espacio
+_SIN_COMPRIMIR = (".pdf",)
+
+Ubicacion = Tuple[str, str]
+
+
+def nombre_archivo_periodo(desde: date, hasta: date) -> str:
+    """Nombre del ZIP de un período: 'periodo_<yyyymmdd>_<yyyymmdd>.zip'."""
+    return f"{PREFIJO_ARCHIVO}{desde:%Y%m%d}_{hasta:%Y%m%d}.zip"
+
+
+def es_archivo_periodo(nombre: str) -> bool:
+    """Indica si un nombre de archivo corresponde a un ZIP de período."""
+    return _PATRON_ARCHIVO.match(os.path.basename(nombre)) is not None
+
+
+def ubicar(ruta: str) -> Optional[Ubicacion]:
+    """
+    Separa una ruta virtual en el ZIP de período que la contiene y el nombre del miembro.
+
+    Args:
+        ruta: Ruta de un archivo, p.ej. '<cliente>/periodo_20240101_20241231.zip/<cliente>/<factura>.json'
+
+    Returns:
+        Optional[Tuple[str, str]]: (ruta del ZIP, miembro), o None si no es una ruta archivada
+    """
+    normal = ruta.replace(os.sep, "/")
+    fin = normal.find(".zip/")
+    while fin != -1:
+        contenedor = normal[:fin + 4]
+        if es_archivo_periodo(contenedor):
+            return contenedor, normal[fin + 5:]
+        fin = normal.find(".zip/", fin + 1)
+    return None
+
+
+# ---------------------------------------------------------------------- lectura
+
+_abiertos: Dict[str, Tuple[int, zipfile.ZipFile, Dict[str, Any]]] = {}
+_lock_abiertos = threading.Lock()
+
+
+def _abrir(ruta_zip: str) -> Tuple[zipfile.ZipFile, Dict[str, Any]]:
+    """ZIP abierto y su índice, compartidos mientras el archivo no cambie."""
+    mtime_ns = os.stat(ruta_zip).st_mtime_ns
+    with _lock_abiertos:
+        abierto = _abiertos.get(ruta_zip)
+        if abierto is not None and abierto[0] == mtime_ns:
+            return abierto[1], abierto[2]
+        if abierto is not None:
+            abierto[1].close()
+        contenedor = zipfile.ZipFile(ruta_zip)
+        try:
+            indice = json.loads(contenedor.read(ARCHIVO_INDICE))
+        except KeyError:
+            indice = {"miembros": {nombre: {} for nombre in contenedor.namelist()}, "facturas": {}}
+        _abiertos[ruta_zip] = (mtime_ns, contenedor, indice)
+        return contenedor, indice
+
+
+def cerrar_archivos() -> None:
+    """Cierra los ZIP que quedaron abiertos para lectura."""
+    with _lock_abiertos:
+        for _, contenedor, _ in _abiertos.values():
+            contenedor.close()
+        _abiertos.clear()
+
+
+def indice_archivo(ruta_zip: str) -> Dict[str, Any]:
+    """Índice de un ZIP de período ('miembros' y, en RCEL, 'facturas' por AUX)."""
+    return _abrir(ruta_zip)[1]
+
+
+def miembros_archivo(ruta_zip: str, extension: str) -> List[str]:
+    """Miembros de un ZIP de período con la extensión indicada, en orden."""
+    return sorted(m for m in indice_archivo(ruta_zip)["miembros"] if m.endswith(extension))
+
+
+def existe_archivo(ruta: str) -> bool:
+    """Como `os.path.isfile`, pero también reconoce los miembros de un ZIP de período."""
+    ubicacion = ubicar(ruta)
+    if ubicacion is None:
+        return os.path.isfile(ruta)
+    try:
+        return ubicacion[1] in indice_archivo(ubicacion[0])["miembros"]
+    except (OSError, zipfile.BadZipFile, ValueError):
+        return False
+
+
+def estado_archivo(ruta: str) -> os.stat_result:
+    """`os.stat` de un archivo; para un miembro archivado, el de su ZIP."""
+    ubicacion = ubicar(ruta)
+    return os.stat(ubicacion[0] if ubicacion else ruta)
+
+
+def leer_archivado(ruta: str) -> bytes:
+    """
+    Lee el contenido de un miembro de un ZIP de período sin extraerlo.
+
+    Args:
+        ruta: Ruta virtual '<ruta del ZIP>/<miembro>'
+
+    Returns:
+        bytes: Contenido del miembro
+    """
+    ubicacion = ubicar(ruta)
+    if ubicacion is None:
+        raise FileNotFoundError(ruta)
+    contenedor, _ = _abrir(ubicacion[0])
+    return contenedor.read(ubicacion[1])
+
+
+def leer_factura_archivada(ruta_zip: str, aux: str, extension: str = ".pdf") -> Optional[bytes]:
+    """
+    Lee el PDF (o el JSON) de una factura archivada a partir de su AUX.
+
+    Args:
+        ruta_zip: ZIP de período del cliente
+        aux: AUX de la factura ('<CUIT>-<COD>-<PtoVenta>-<Numero>')
+        extension: '.pdf' o '.json'
+
+    Returns:
+        Optional[bytes]: Contenido, o None si la factura no está en el ZIP
+    """
+    contenedor, indice = _abrir(ruta_zip)
+    miembro = indice.get("facturas", {}).get(aux, {}).get(extension.lstrip("."))
+    return contenedor.read(miembro) if miembro else None
+
+
+def nombres_archivados(directorio: str) -> Set[str]:
+    """Nombres de archivo (sin directorio) guardados en los ZIP de período de un directorio."""
+    nombres: Set[str] = set()
+    if not os.path.isdir(directorio):
+        return nombres
+    for nombre in os.listdir(directorio):
+        if es_archivo_periodo(nombre):
+            try:
+                miembros = indice_archivo(os.path.join(directorio, nombre))["miembros"]
+            except (OSError, zipfile.BadZipFile, ValueError):
+                continue
+            nombres.update(m.rsplit("/", 1)[-1] for m in miembros)
+    return nombres
+
+
+# ---------------------------------------------------------------------- escritura
+
+def _escribir_archivo(ruta_zip: str, miembros: Dict[str, bytes], indice: Dict[str, Any]) -> int:
+    """
+    Escribe (o amplía) un ZIP de período: temporal y reemplazo.
+
+    Los miembros que ya tenía el ZIP se conservan salvo que `miembros` los reemplace.
+
+    Returns:
+        int: Tamaño del ZIP resultante en bytes
+    """
+    anteriores: Dict[str, bytes] = {}
+    if os.path.exists(ruta_zip):
+        with zipfile.ZipFile(ruta_zip) as existente:
+            anterior = json.loads(existente.read(ARCHIVO_INDICE))
+            anteriores = {m: existente.read(m) for m in anterior["miembros"] if m not in miembros}
+        indice["miembros"] = {**anterior["miembros"], **indice["miembros"]}
+        indice["facturas"] = {**anterior.get("facturas", {}), **indice.get("facturas", {})}
+
+    temporal = f"{ruta_zip}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with zipfile.ZipFile(temporal, "w") as contenedor:
+            for nombre, contenido in sorted({**anteriores, **miembros}.items()):
+                compresion = zipfile.ZIP_STORED if nombre.lower().endswith(_SIN_COMPRIMIR) else zipfile.ZIP_DEFLATED
+                contenedor.writestr(nombre, contenido, compress_type=compresion)
+            contenedor.writestr(ARCHIVO_INDICE, json.dumps(indice, ensure_ascii=False, indent=2),
+                                compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(temporal, ruta_zip)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return os.path.getsize(ruta_zip)
+
+
+def _nuevo_indice(tipo: str, desde: date, hasta: date) -> Dict[str, Any]:
+    return {
+        "version": VERSION_ARCHIVO,
+        "tipo": tipo,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "miembros": {},
+        "facturas": {},
+    }
+
+
+def _registrar_miembro(indice: Dict[str, Any], nombre: str, contenido: bytes) -> None:
+    indice["miembros"][nombre] = {"bytes": len(contenido), "sha256": hashlib.sha256(contenido).hexdigest()}
+
+
+def _fecha_factura(metadata: Dict[str, Any]) -> Optional[date]:
+    """Fecha de emisión de una factura RCEL (o, si falta, el fin de su período facturado)."""
+    for campo in ("FECHA_EMISION", "Hasta", "Desde"):
+        try:
+            return datetime.strptime(str(metadata[campo]), "%d/%m/%Y").date()
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def archivar_cliente_rcel(directorio: str, desde: date, hasta: date) -> Dict[str, int]:
+    """
+    Archiva las facturas RCEL de un cliente emitidas dentro del rango.
+
+    Args:
+        directorio: Directorio del cliente ('<CUIT>_<Nombre>')
+        desde: Inicio del período a archivar
+        hasta: Fin del período a archivar
+
+    Returns:
+        Dict[str, int]: 'archivos' archivados, 'bytes' sueltos liberados (sin contar los PDF
+            enlazados al almacén, cuyo borrado no libera espacio) y 'bytes_archivo' del ZIP
+    """
+    cliente = os.path.basename(os.path.normpath(directorio))
+    indice = _nuevo_indice("rcel", desde, hasta)
+    miembros: Dict[str, bytes] = {}
+    originales: List[str] = []
+
+    for nombre in sorted(os.listdir(directorio)):
+        if not nombre.endswith(".json") or nombre == ARCHIVO_FACTURAS_RCEL:
+            continue
+        ruta_json = os.path.join(directorio, nombre)
+        try:
+            with open(ruta_json, "rb") as file:
+                contenido = file.read()
+            metadata = json.loads(contenido.decode("utf-8-sig"))
+        except (OSError, ValueError):
+            continue
+        fecha = _fecha_factura(metadata) if isinstance(metadata, dict) else None
+        if fecha is None or not desde <= fecha <= hasta:
+            continue
+
+        factura = {"json": f"{cliente}/{nombre}"}
+        miembros[factura["json"]] = contenido
+        originales.append(ruta_json)
+        ruta_pdf = os.path.splitext(ruta_json)[0] + ".pdf"
+        if os.path.isfile(ruta_pdf):
+            factura["pdf"] = f"{cliente}/{os.path.basename(ruta_pdf)}"
+            with open(ruta_pdf, "rb") as file:
+                miembros[factura["pdf"]] = file.read()
+            originales.append(ruta_pdf)
+        indice["facturas"][metadata.get("AUX") or os.path.splitext(nombre)[0]] = factura
+
+    return _cerrar_archivo(directorio, desde, hasta, miembros, indice, originales)
+
+
+def archivar_cliente_mc(directorio: str, desde: date, hasta: date) -> Dict[str, int]:
+    """
+    Archiva los comprobantes de Mis Comprobantes de un cliente emitidos dentro del rango.
+
+    Las filas del período de cada CSV de `extraido` pasan a un CSV con el rango del
+    período en el nombre dentro del ZIP; el CSV suelto conserva el resto (o se borra
+    si no le queda ninguna).
+
+    Args:
+        directorio: Directorio `extraido` del cliente
+        desde: Inicio del período a archivar
+        hasta: Fin del período a archivar
+
+    Returns:
+        Dict[str, int]: 'archivos' archivados, 'bytes' sueltos liberados y 'bytes_archivo' del ZIP
+    """
+    indice = _nuevo_indice("mc", desde, hasta)
+    miembros: Dict[str, bytes] = {}
+    reescribir: List[Tuple[str, pd.DataFrame]] = []
+    liberados = 0
+
+    for nombre in sorted(os.listdir(directorio)):
+        partes = nombre.split(" - ", 5)
+        if not nombre.endswith(".csv") or len(partes) != 6:
+            continue
+        ruta = os.path.join(directorio, nombre)
+        datos = pd.read_csv(ruta, sep=';', dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        if 'Fecha de Emisión' not in datos.columns:
+            continue
+        fecha = datos['Fecha de Emisión'].str[:10]
+        en_periodo = (fecha >= desde.isoformat()) & (fecha <= hasta.isoformat())
+        if not en_periodo.any():
+            continue
+
+        archivado = " - ".join([partes[0], partes[1], f"{desde:%d%m%Y}", f"{hasta:%d%m%Y}", partes[4], partes[5]])
+        miembros[archivado] = datos[en_periodo].to_csv(sep=';', index=False).encode('utf-8-sig')
+        reescribir.append((ruta, datos[~en_periodo]))
+
+    if not miembros:
+        return {"archivos": 0, "bytes": 0, "bytes_archivo": 0}
+    ruta_zip = os.path.join(directorio, nombre_archivo_periodo(desde, hasta))
+    if os.path.exists(ruta_zip):
+        # Período ya archivado que recibió comprobantes nuevos: se suman a los que ya tenía
+        with zipfile.ZipFile(ruta_zip) as existente:
+            for nombre in set(miembros) & set(existente.namelist()):
+                miembros[nombre] = _unir_csv(existente.read(nombre), miembros[nombre])
+    for nombre, contenido in miembros.items():
+        _registrar_miembro(indice, nombre, contenido)
+    tamano = _escribir_archivo(ruta_zip, miembros, indice)
+
+    # Recién con el ZIP en su lugar se recortan los CSV sueltos
+    for ruta, restantes in reescribir:
+        anterior = os.path.getsize(ruta)
+        if restantes.empty:
+            os.remove(ruta)
+            liberados += anterior
+            continue
+        temporal = f"{ruta}.tmp"
+        restantes.to_csv(temporal, sep=';', index=False, encoding='utf-8-sig')
+        os.replace(temporal, ruta)
+        liberados += max(0, anterior - os.path.getsize(ruta))
+    return {"archivos": len(miembros), "bytes": liberados, "bytes_archivo": tamano}
+
+
+def _unir_csv(anterior: bytes, nuevo: bytes) -> bytes:
+    """Une dos CSV de Mis Comprobantes; ante comprobantes repetidos se conserva el nuevo."""
+    datos = pd.concat([pd.read_csv(io.BytesIO(contenido), sep=';', dtype=str, keep_default_na=False,
+                                   encoding='utf-8-sig') for contenido in (anterior, nuevo)], ignore_index=True)
+    clave = [c for c in ('Tipo de Comprobante', 'Punto de Venta', 'Número Desde', 'Nro. Doc. Emisor')
+             if c in datos.columns]
+    datos = datos.drop_duplicates(subset=clave or None, keep='last').sort_values('Fecha de Emisión', kind='stable')
+    return datos.to_csv(sep=';', index=False).encode('utf-8-sig')
+
+
+def _cerrar_archivo(directorio: str, desde: date, hasta: date, miembros: Dict[str, bytes],
+                    indice: Dict[str, Any], originales: List[str]) -> Dict[str, int]:
+    """Escribe el ZIP del período y recién entonces borra los archivos sueltos."""
+    if not miembros:
+        return {"archivos": 0, "bytes": 0, "bytes_archivo": 0}
+    for nombre, contenido in miembros.items():
+        _registrar_miembro(indice, nombre, contenido)
+    tamano = _escribir_archivo(os.path.join(directorio, nombre_archivo_periodo(desde, hasta)), miembros, indice)
+    liberados = 0
+    for ruta in originales:
+        # Un PDF enlazado al almacén (ALMACEN_PDF) sigue ocupando su espacio en `.objetos`
+        estado = os.stat(ruta)
+        if estado.st_nlink == 1:
+            liberados += estado.st_size
+        os.remove(ruta)
+    return {"archivos": len(originales), "bytes": liberados, "bytes_archivo": tamano}
+
+
+def archivar_periodo(base: str, tipo: str, desde: date, hasta: date) -> Dict[str, int]:
+    """
+    Archiva un período cerrado de todos los clientes de un árbol de descargas.
+
+    Args:
+        base: Directorio de descargas (DOWNLOADS_MC_PATH o DOWNLOADS_RCEL_PATH)
+        tipo: 'mc' o 'rcel'
+        desde: Inicio del período
+        hasta: Fin del período (debe ser un mes cerrado)
+
+    Returns:
+        Dict[str, int]: Totales 'clientes', 'archivos', 'bytes' liberados y 'bytes_archivo'
+    """
+    if tipo not in ("mc", "rcel"):
+        raise ValueError(f"Tipo de archivado desconocido: {tipo}")
+    if desde > hasta:
+        raise ValueError("El inicio del período es posterior a su fin")
+    totales = {"clientes": 0, "archivos": 0, "bytes": 0, "bytes_archivo": 0}
+    if not os.path.isdir(base):
+        return totales
+
+    for cliente in sorted(os.listdir(base)):
+        directorio = os.path.join(base, cliente)
+        if cliente.startswith(".") or not os.path.isdir(directorio):
+            continue
+        with metricas.contexto_cliente(cliente.split("_", 1)[0]):
+            if tipo == "rcel":
+                resultado = archivar_cliente_rcel(directorio, desde, hasta)
+            elif os.path.isdir(os.path.join(directorio, "extraido")):
+                resultado = archivar_cliente_mc(os.path.join(directorio, "extraido"), desde, hasta)
+            else:
+                continue
+        if resultado["archivos"]:
+            totales["clientes"] += 1
+            for clave in ("archivos", "bytes", "bytes_archivo"):
+                totales[clave] += resultado[clave]
+
+    metricas.incrementar(f"archivos_archivados_{tipo}", totales["archivos"])
+    return totales
@@ -0,0 +1,185 @@
+"""
+Módulo de bitácora de descargas por lote
+
+Registra en un archivo JSONL (una línea por evento, con `fsync`) el estado de cada
+trabajo de descarga: una fila de la planilla para una fuente (MC o RCEL) y un rango
+de fechas. Si el proceso se interrumpe, la siguiente ejecución reanuda solo los
+trabajos que no terminaron; también permite reintentar únicamente los fallidos.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+PENDIENTE = "pendiente"
+CONSULTADO = "consultado"
+DESCARGADO = "descargado"
+EXTRAIDO = "extraido"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+
+ESTADOS = (PENDIENTE, CONSULTADO, DESCARGADO, EXTRAIDO, COMPLETADO, FALLIDO)
+ESTADOS_FINALES = (COMPLETADO, FALLIDO)
+
+
+def clave_trabajo(fuente: str, cuit: Any, desde: str, hasta: str) -> str:
+    """Identificador de un trabajo: 'fuente|CUIT|desde|hasta'."""
+    return f"{fuente}|{cuit}|{desde}|{hasta}"
+
+
+class BitacoraDescargas:
+    """
+    Bitácora persistente de trabajos de descarga.
+
+    Args:
+        ruta: Archivo JSONL de la bitácora (se crea si no existe)
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._trabajos: Dict[str, Dict[str, Any]] = {}
+        self._cargar()
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["BitacoraDescargas"]:
+        """
+        Abre la bitácora configurada en BITACORA_DESCARGAS.
+
+        Returns:
+            Optional[BitacoraDescargas]: None si la variable está vacía o en 'no'
+        """
+        ruta = os.getenv("BITACORA_DESCARGAS", "bitacora_descargas.jsonl").strip()
+        if not ruta or ruta.lower() == "no":
+            return None
+        return cls(ruta)
+
+    # ------------------------------------------------------------------ persistencia
+
+    def _cargar(self) -> None:
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as file:
+                lineas = file.readlines()
+        except OSError:
+            return
+        for linea in lineas:
+            try:
+                evento = json.loads(linea)
+            except ValueError:
+                # Última línea cortada por una interrupción durante la escritura
+                continue
+            self._aplicar(evento)
+
+    def _aplicar(self, evento: Dict[str, Any]) -> None:
+        trabajo = self._trabajos.setdefault(evento["clave"], {"clave": evento["clave"]})
+        trabajo.update({k: v for k, v in evento.items() if v is not None})
+        if evento.get("estado") != FALLIDO:
+            trabajo.pop("motivo", None)
+
+    def _escribir(self, evento: Dict[str, Any]) -> None:
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(self.ruta, "a", encoding="utf-8") as file:
+            file.write(json.dumps(evento, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def registrar(self, clave: str, estado: str, motivo: Optional[str] = None, **datos: Any) -> None:
+        """
+        Registra el nuevo estado de un trabajo.
+
+        Args:
+            clave: Identificador del trabajo (ver `clave_trabajo`)
+            estado: Uno de ESTADOS
+            motivo: Motivo del fallo (solo para FALLIDO)
+            **datos: Datos adicionales del trabajo (fuente, cuit, fila, ...)
+        """
+        if estado not in ESTADOS:
+            raise ValueError(f"Estado de bitácora desconocido: {estado}")
+        evento = {"ts": f"{datetime.now():%Y-%m-%d %H:%M:%S}", "clave": clave, "estado": estado, **datos}
+        if motivo is not None:
+            evento["motivo"] = str(motivo)
+        with self._lock:
+            self._escribir(evento)
+            self._aplicar(evento)
+
+    def reiniciar(self, claves: Optional[Iterable[str]] = None) -> None:
+        """
+        Descarta trabajos de la bitácora para comenzar un lote nuevo.
+
+        Args:
+            claves: Trabajos a descartar; por defecto todos. Los demás (p.ej. un lote de otra
+                fuente que comparte el archivo) se conservan reescribiendo la bitácora compactada
+        """
+        with self._lock:
+            if claves is None:
+                self._trabajos.clear()
+            else:
+                for clave in claves:
+                    self._trabajos.pop(clave, None)
+            if not self._trabajos:
+                try:
+                    os.remove(self.ruta)
+                except FileNotFoundError:
+                    pass
+                return
+            # Un evento por trabajo restante con su último estado (temporal y reemplazo)
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, "w", encoding="utf-8") as file:
+                for trabajo in self._trabajos.values():
+                    file.write(json.dumps(trabajo, ensure_ascii=False) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporal, self.ruta)
+
+    # ------------------------------------------------------------------ consultas
+
+    def estado(self, clave: str) -> Optional[str]:
+        """Último estado registrado del trabajo, o None si no figura."""
+        with self._lock:
+            trabajo = self._trabajos.get(clave)
+            return trabajo.get("estado") if trabajo else None
+
+    def trabajos(self, estado: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Trabajos registrados (opcionalmente solo los que están en `estado`)."""
+        with self._lock:
+            return [dict(t) for t in self._trabajos.values() if estado is None or t.get("estado") == estado]
+
+    def debe_procesar(self, clave: str, solo_fallidos: bool = False) -> bool:
+        """
+        Indica si un trabajo debe ejecutarse en esta corrida.
+
+        Args:
+            clave: Identificador del trabajo
+            solo_fallidos: Si es True solo se procesan los trabajos fallidos
+
+        Returns:
+            bool: False para los completados (y, con `solo_fallidos`, para los no fallidos)
+        """
+        estado = self.estado(clave)
+        if solo_fallidos:
+            return estado == FALLIDO
+        return estado != COMPLETADO
+
+    def iniciar_lote(self, claves: Iterable[str]) -> bool:
+        """
+        Prepara la bitácora para procesar los trabajos indicados.
+
+        Si todos ya estaban en un estado final (completados o fallidos) el lote anterior
+        terminó y se comienza uno nuevo: se descartan solo esos trabajos, sin tocar los de
+        otros lotes del mismo archivo. Los fallidos de un lote sin terminar se reintentan
+        con `solo_fallidos`; un fallido permanente no deja al lote reanudándose para siempre.
+
+        Args:
+            claves: Trabajos del lote
+
+        Returns:
+            bool: True si se reanuda un lote interrumpido
+        """
+        claves = list(claves)
+        if claves and all(self.estado(c) in ESTADOS_FINALES for c in claves):
+            self.reiniciar(claves)
+            return False
+        return any(self.estado(c) is not None for c in claves)
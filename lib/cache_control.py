@@ -0,0 +1,161 @@
+"""
+Módulo de caché por cliente de los resultados intermedios del control
+
+Guarda, para cada CUIT, la porción prorrateada del consolidado y sus filas de la
+tabla dinámica junto con una huella de sus archivos de entrada y del rango de
+fechas de Categorias.xlsx. En una nueva ejecución solo se recalculan los
+clientes cuya huella cambió.
+"""
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from lib.archivado import estado_archivo
+from lib.caller_rcel import ARCHIVO_FACTURAS_RCEL
+from lib.helpers import normalizar_si_no
+from lib.ingesta_mc import firma_dataframe
+
+# Incrementar cuando cambie el cálculo del consolidado o de la tabla dinámica
+VERSION_CACHE = 3
+
+
+def _ruta(archivo: Any) -> str:
+    return archivo[0] if isinstance(archivo, tuple) else archivo
+
+
+def cuit_archivo_mc(archivo: Any) -> str:
+    """CUIT del cliente de un CSV de Mis Comprobantes ('9 - MCE - desde - hasta - CUIT - Nombre.csv')."""
+    try:
+        return os.path.basename(_ruta(archivo)).split("-")[4].strip()
+    except IndexError:
+        return ""
+
+
+def cuit_archivo_json(archivo: Any) -> str:
+    """CUIT del cliente de un JSON de RCEL ('<CUIT>-COD-PV-NUM.json' o '<CUIT>_<Nombre>/facturas_emitidas.json')."""
+    ruta = _ruta(archivo)
+    nombre = os.path.basename(ruta)
+    if nombre == ARCHIVO_FACTURAS_RCEL:
+        return os.path.basename(os.path.dirname(ruta)).split("_")[0]
+    return nombre.split("-")[0].strip()
+
+
+def agrupar_por_cliente(archivos: Iterable[Any], obtener_cuit) -> Dict[str, List[Any]]:
+    """
+    Agrupa archivos (rutas o tuplas (ruta, contenido)) por CUIT de cliente, conservando el orden.
+
+    Args:
+        archivos: Archivos a agrupar
+        obtener_cuit: Función que devuelve el CUIT de un archivo
+
+    Returns:
+        Dict[str, List[Any]]: Archivos por CUIT ('' si no se pudo determinar)
+    """
+    grupos: Dict[str, List[Any]] = {}
+    for archivo in archivos:
+        grupos.setdefault(obtener_cuit(archivo), []).append(archivo)
+    return grupos
+
+
+def _firma_archivo(archivo: Any) -> List[Any]:
+    """Ruta, tamaño y mtime de un archivo en disco, o hash del contenido si está en memoria."""
+    if isinstance(archivo, tuple):
+        ruta, contenido = archivo
+        if isinstance(contenido, pd.DataFrame):
+            return [ruta, firma_dataframe(contenido)]
+        if not isinstance(contenido, (bytes, bytearray)):
+            contenido = json.dumps(contenido, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        return [ruta, hashlib.sha1(contenido).hexdigest()]
+    try:
+        stat = estado_archivo(archivo)
+    except OSError:
+        return [archivo, None]
+    return [os.path.abspath(archivo), stat.st_size, stat.st_mtime_ns]
+
+
+def huella_cliente(archivos_mc: List[Any], archivos_json: List[Any], fecha_inicial: Any, fecha_final: Any,
+                   origen: str = "archivos") -> str:
+    """
+    Calcula la huella de las entradas de un cliente.
+
+    Args:
+        archivos_mc: CSV de Mis Comprobantes del cliente
+        archivos_json: JSON de RCEL del cliente
+        fecha_inicial: Inicio del período controlado
+        fecha_final: Fin del período controlado
+        origen: De dónde se leen los comprobantes ('archivos' o 'almacen')
+
+    Returns:
+        str: Hash SHA-256 de las firmas de los archivos, el rango de fechas y VERSION_CACHE
+    """
+    datos = {
+        "version": VERSION_CACHE,
+        "origen": origen,
+        "rango": [str(fecha_inicial), str(fecha_final)],
+        "mc": sorted(_firma_archivo(a) for a in archivos_mc),
+        "json": sorted(_firma_archivo(a) for a in archivos_json),
+    }
+    return hashlib.sha256(json.dumps(datos, default=str).encode("utf-8")).hexdigest()
+
+
+class CacheClientes:
+    """
+    Caché en disco de resultados intermedios por cliente.
+
+    Args:
+        directorio: Directorio donde se guarda un archivo `<CUIT>.pkl` por cliente
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["CacheClientes"]:
+        """
+        Crea la caché configurada en CACHE_CONTROL_DIR.
+
+        Returns:
+            Optional[CacheClientes]: None si la variable está vacía o en 'no'
+        """
+        directorio = os.getenv("CACHE_CONTROL_DIR", ".cache_control").strip()
+        if not directorio or normalizar_si_no(directorio) == "no":
+            return None
+        return cls(directorio)
+
+    def _ruta(self, cuit: str) -> str:
+        return os.path.join(self.directorio, f"{cuit}.pkl")
+
+    def cargar(self, cuit: str, huella: str) -> Optional[Tuple[Any, Any, Any]]:
+        """
+        Devuelve (consolidado, tabla_dinamica, observaciones de la validación) del cliente si la huella coincide.
+
+        Args:
+            cuit: CUIT del cliente
+            huella: Huella actual de sus entradas
+
+        Returns:
+            Optional[Tuple]: Resultados guardados, o None si no hay o están desactualizados
+        """
+        try:
+            with open(self._ruta(cuit), "rb") as file:
+                datos = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if datos.get("huella") != huella:
+            return None
+        return datos["consolidado"], datos["tabla"], datos.get("observaciones")
+
+    def guardar(self, cuit: str, huella: str, consolidado: Any, tabla: Any, observaciones: Any = None) -> None:
+        """Guarda los resultados intermedios de un cliente."""
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self._ruta(cuit)
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "wb") as file:
+            pickle.dump({"huella": huella, "consolidado": consolidado, "tabla": tabla,
+                         "observaciones": observaciones}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta)
@@ -1,6 +1,8 @@
 import json
+import logging
 import os
 import sys
+import time
 from pathlib import Path
 from typing import Any, Dict
 
@@ -10,8 +12,13 @@ from dotenv import load_dotenv
 if __name__ == "__main__":
     sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from lib.metricas import metricas
+from lib.plazos import timeout_consulta
+from lib.registro import configurar_registro, obtener_registrador, recortar
 from lib.utils import descargar_archivo, descargar_archivos_concurrente, extraccion_urls_minio
 
+registro = obtener_registrador("caller_mc")
+
 def consulta_mis_comprobantes(
     mrbot_user: str,
     mrbot_api_key: str,
@@ -85,15 +92,27 @@ def consulta_mis_comprobantes(
         "Accept": "application/json",
     }
 
-    response = requests.post(url, headers=headers, data=payload)
+    timeout = timeout_consulta()
+    inicio = time.perf_counter()
+    try:
+        response = requests.post(url, headers=headers, data=payload, timeout=timeout)
+    except Exception:
+        metricas.registrar_latencia("mis_comprobantes", time.perf_counter() - inicio, exito=False)
+        raise
+    metricas.registrar_latencia("mis_comprobantes", time.perf_counter() - inicio, exito=response.ok)
     response.raise_for_status()
 
-    print(response.text)
+    if b64:
+        # Respuesta con los ZIP en base64: se decodifica desde los bytes sin armar además el texto
+        return json.loads(response.content)
+    if registro.isEnabledFor(logging.DEBUG):
+        registro.debug("Respuesta de Mis Comprobantes: %s", recortar(response.text))
     return response.json()
 
 
 def test_caller_mc() -> None:
     load_dotenv()
+    configurar_registro()
 
     mrbot_user = os.getenv("MRBOT_USER")
     mrbot_api_key = os.getenv("MRBOT_API_KEY")
@@ -126,7 +145,7 @@ def test_caller_mc() -> None:
     descargas = []
     for tipo, enlace in urls.items():
         if not enlace:
-            print(f"Saltando descarga de {tipo} porque no hay URL.")
+            registro.info("Saltando descarga de %s porque no hay URL.", tipo)
             continue
         descargas.append((enlace, None, "descargas_mis_comprobantes"))
     
@@ -1,8 +1,10 @@
 import json
+import logging
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Optional
 
 import requests
 from dotenv import load_dotenv
@@ -10,7 +12,15 @@ from dotenv import load_dotenv
 if __name__ == "__main__":
     sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from lib.utils import descargar_archivo, descargar_archivos_concurrente, guardar_json
+from lib.metricas import metricas
+from lib.plazos import timeout_consulta
+from lib.registro import configurar_registro, obtener_registrador, recortar
+from lib.utils import descargar_archivo, descargar_archivos_concurrente, guardar_json, nombre_archivo_descarga
+
+registro = obtener_registrador("caller_rcel")
+
+# Archivo por contribuyente con la metadata de facturas en modo "solo metadata"
+ARCHIVO_FACTURAS_RCEL = "facturas_emitidas.json"
 
 
 def consulta_rcel(
@@ -68,14 +78,23 @@ def consulta_rcel(
         "Accept": "application/json",
     }
 
-    response = requests.post(url, headers=headers, data=payload)
+    timeout = timeout_consulta()
+    inicio = time.perf_counter()
+    try:
+        response = requests.post(url, headers=headers, data=payload, timeout=timeout)
+    except Exception:
+        metricas.registrar_latencia("rcel", time.perf_counter() - inicio, exito=False)
+        raise
+    metricas.registrar_latencia("rcel", time.perf_counter() - inicio, exito=response.ok)
     try:
-        parsed = response.json()
+        # Con PDFs en base64 se decodifica desde los bytes sin armar además el texto
+        parsed = json.loads(response.content) if b64_pdf else response.json()
     except ValueError:
         response.raise_for_status()
         raise
 
-    print(response.text)
+    if not b64_pdf and registro.isEnabledFor(logging.DEBUG):
+        registro.debug("Respuesta de RCEL: %s", recortar(response.text))
     return parsed
 
 
@@ -138,8 +157,70 @@ def iter_urls_facturas(facturas: Iterable[Dict[str, Any]]) -> Iterable[str]:
             yield url
 
 
+def guardar_facturas_rcel(facturas: List[Dict[str, Any]], directorio: str) -> str:
+    """
+    Guarda el listado `facturas_emitidas` completo en un único JSON por contribuyente.
+
+    Cada factura conserva su `URL_MINIO`, de modo que el PDF puede descargarse más adelante
+    con `descargar_pdfs_facturas` solo si se necesita.
+
+    Args:
+        facturas (List[Dict[str, Any]]): facturas retornadas por la API.
+        directorio (str): directorio del contribuyente.
+
+    Returns:
+        str: Ruta del JSON guardado.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    ruta_json = os.path.join(directorio, ARCHIVO_FACTURAS_RCEL)
+
+    with open(ruta_json, "w", encoding="utf-8") as file:
+        json.dump(facturas, file, indent=2, ensure_ascii=False)
+
+    registro.info("Metadata de %d facturas guardada como: %s", len(facturas), ruta_json)
+    return ruta_json
+
+
+def descargar_pdfs_facturas(
+    ruta_json: str,
+    auxs: Optional[Iterable[str]] = None,
+    directorio_objetivo: Optional[str] = None,
+) -> List[str]:
+    """
+    Descarga bajo demanda los PDFs de facturas registradas en modo "solo metadata".
+
+    Args:
+        ruta_json (str): ruta del `facturas_emitidas.json` del contribuyente.
+        auxs (Optional[Iterable[str]]): valores `AUX` a descargar; si es None se descargan todas.
+        directorio_objetivo (Optional[str]): destino de los PDFs; por defecto el directorio del JSON.
+
+    Returns:
+        List[str]: Rutas de los PDFs descargados.
+    """
+    with open(ruta_json, "r", encoding="utf-8-sig") as f:
+        facturas = json.load(f)
+
+    seleccion = set(auxs) if auxs is not None else None
+    directorio = directorio_objetivo or os.path.dirname(ruta_json)
+
+    descargas = []
+    for factura in facturas:
+        url = factura.get("URL_MINIO")
+        if not url or (seleccion is not None and factura.get("AUX") not in seleccion):
+            continue
+        if os.path.exists(os.path.join(directorio, nombre_archivo_descarga(url))):
+            continue
+        descargas.append((url, None, directorio))
+
+    if not descargas:
+        return []
+
+    return descargar_archivos_concurrente(descargas)
+
+
 def main() -> None:
     load_dotenv()
+    configurar_registro()
 
     mrbot_user = os.getenv("MRBOT_USER")
     mrbot_api_key = os.getenv("MRBOT_API_KEY")
@@ -1,10 +1,23 @@
 import json
+import logging
 import os
+import sys
+import time
+from pathlib import Path
 from typing import Any, Dict
 
 import requests
 from dotenv import load_dotenv
 
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.metricas import metricas
+from lib.plazos import timeout_consulta
+from lib.registro import configurar_registro, obtener_registrador, recortar
+
+registro = obtener_registrador("caller_user")
+
 
 def crear_usuario(
     mrbot_user: str,
@@ -30,14 +43,15 @@ def crear_usuario(
         "Accept": "application/json",
     }
 
-    response = requests.post(url, headers=headers, data=payload)
+    response = requests.post(url, headers=headers, data=payload, timeout=timeout_consulta())
     try:
         parsed = response.json()
     except ValueError:
         response.raise_for_status()
         raise
 
-    print(response.text)
+    if registro.isEnabledFor(logging.DEBUG):
+        registro.debug("Respuesta de %s: %s", url, recortar(response.text))
     return parsed
 
 
@@ -65,14 +79,15 @@ def resetear_api_key(
         "Accept": "application/json",
     }
 
-    response = requests.post(url, headers=headers, params=params)
+    response = requests.post(url, headers=headers, params=params, timeout=timeout_consulta())
     try:
         parsed = response.json()
     except ValueError:
         response.raise_for_status()
         raise
 
-    print(response.text)
+    if registro.isEnabledFor(logging.DEBUG):
+        registro.debug("Respuesta de %s: %s", url, recortar(response.text))
     return parsed
 
 
@@ -102,19 +117,28 @@ def obtener_consultas_disponibles(
         "Accept": "application/json",
     }
 
-    response = requests.get(url, headers=headers)
+    timeout = timeout_consulta()
+    inicio = time.perf_counter()
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+    except Exception:
+        metricas.registrar_latencia("consultas_disponibles", time.perf_counter() - inicio, exito=False)
+        raise
+    metricas.registrar_latencia("consultas_disponibles", time.perf_counter() - inicio, exito=response.ok)
     try:
         parsed = response.json()
     except ValueError:
         response.raise_for_status()
         raise
 
-    print(response.text)
+    if registro.isEnabledFor(logging.DEBUG):
+        registro.debug("Respuesta de %s: %s", url, recortar(response.text))
     return parsed
 
 
 def main() -> None:
     load_dotenv()
+    configurar_registro()
 
     mrbot_user = os.getenv("MAIL") or os.getenv("MAIL")
     mrbot_api_key = os.getenv("MRBOT_API_KEY")
@@ -0,0 +1,87 @@
+"""
+Módulo de selección de carga en línea (base64) o por MinIO
+
+Las consultas pueden devolver los archivos codificados en base64 dentro de la misma
+respuesta (`b64` en Mis Comprobantes, `b64_pdf` en RCEL). Para clientes chicos eso
+evita el segundo viaje a MinIO; para clientes grandes infla la respuesta y conviene
+descargar de MinIO. Con CARGA_INLINE=auto se decide por cliente según el tamaño de
+su descarga anterior.
+"""
+import os
+from typing import Iterable, Optional
+
+MODOS_CARGA_INLINE = ("no", "si", "auto")
+
+# Campos de la respuesta con los archivos en base64
+CAMPO_ZIP_BASE64 = "mis_comprobantes_{tipo}_b64"
+CAMPO_PDF_BASE64 = "PDF_B64"
+
+
+def modo_carga_inline() -> str:
+    """
+    Lee CARGA_INLINE: si los archivos se reciben en base64 dentro de la respuesta.
+
+    Returns:
+        str: Uno de MODOS_CARGA_INLINE ('no' si el valor no es válido)
+    """
+    modo = os.getenv("CARGA_INLINE", "no").strip().lower()
+    return modo if modo in MODOS_CARGA_INLINE else "no"
+
+
+def umbral_carga_inline() -> int:
+    """Tamaño máximo esperado (bytes) para pedir la carga en línea (UMBRAL_CARGA_INLINE, 5 MB por defecto)."""
+    try:
+        return max(0, int(os.getenv("UMBRAL_CARGA_INLINE", str(5 * 1024 * 1024))))
+    except ValueError:
+        return 5 * 1024 * 1024
+
+
+def tamano_descarga_anterior(directorio: str, extensiones: Iterable[str]) -> Optional[int]:
+    """
+    Tamaño de los archivos que dejó la descarga anterior de un cliente.
+
+    Args:
+        directorio: Directorio del cliente
+        extensiones: Extensiones a contar (p.ej. ('.csv',) o ('.pdf',))
+
+    Returns:
+        Optional[int]: Bytes en disco, o None si el cliente no tiene descargas anteriores
+    """
+    extensiones = tuple(extensiones)
+    total, encontrados = 0, 0
+    pendientes = [directorio]
+    while pendientes:
+        try:
+            entradas = list(os.scandir(pendientes.pop()))
+        except OSError:
+            continue
+        for entrada in entradas:
+            if entrada.name.startswith("."):
+                continue
+            if entrada.is_dir(follow_symlinks=False):
+                pendientes.append(entrada.path)
+            elif entrada.name.lower().endswith(extensiones):
+                total += entrada.stat().st_size
+                encontrados += 1
+    return total if encontrados else None
+
+
+def usar_carga_inline(directorio: str, extensiones: Iterable[str]) -> bool:
+    """
+    Decide si la descarga de un cliente se pide en base64 dentro de la respuesta.
+
+    En modo 'auto' se usa la carga en línea solo si la descarga anterior del cliente
+    no superó UMBRAL_CARGA_INLINE; un cliente sin historial se descarga de MinIO.
+
+    Args:
+        directorio: Directorio del cliente
+        extensiones: Extensiones de los archivos descargados del cliente
+
+    Returns:
+        bool: True para pedir los archivos en base64
+    """
+    modo = modo_carga_inline()
+    if modo != "auto":
+        return modo == "si"
+    tamano = tamano_descarga_anterior(directorio, extensiones)
+    return tamano is not None and tamano <= umbral_carga_inline()
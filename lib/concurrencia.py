@@ -0,0 +1,203 @@
+"""
+Módulo de control adaptativo de la concurrencia de descargas (AIMD)
+
+Con CONCURRENCIA_ADAPTATIVA=si la cantidad de descargas simultáneas a MinIO deja
+de ser el valor fijo de MAX_WORKERS: arranca en MIN_WORKERS, suma una descarga por
+ventana mientras el throughput acompañe y la reduce en forma multiplicativa ante
+errores o cuando la latencia crece sin mejorar el throughput (señal de que el
+ancho de banda ya está saturado). El límite es compartido por todas las descargas
+del proceso y cada decisión queda en el resumen de métricas.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from lib.helpers import normalizar_si_no
+from lib.metricas import metricas, percentil
+
+# Proporción de descargas fallidas de una ventana a partir de la cual se reduce a la mitad
+TASA_ERROR_MAXIMA = 0.1
+# Crecimiento de la latencia (respecto de la mejor observada) que se toma como congestión
+TOLERANCIA_LATENCIA = 1.5
+# Mejora mínima de throughput para considerar que la concurrencia agregada sirvió
+MEJORA_MINIMA = 1.05
+# Descargas mínimas por ventana de evaluación
+VENTANA_MINIMA = 4
+
+
+class ControladorConcurrencia:
+    """
+    Limita las descargas en curso y ajusta el límite según lo observado.
+
+    Cada descarga se ejecuta dentro de `turno()`, que bloquea mientras el límite
+    esté ocupado. Al completar una ventana (tantas descargas como el límite, con un
+    mínimo de VENTANA_MINIMA) se decide:
+
+    - errores por encima de TASA_ERROR_MAXIMA: el límite se reduce a la mitad;
+    - latencia mayor que TOLERANCIA_LATENCIA veces la mejor observada sin mejora de
+      throughput: el límite se reduce un cuarto;
+    - en otro caso se suma una descarga.
+
+    Args:
+        minimo: Descargas simultáneas mínimas
+        maximo: Descargas simultáneas máximas
+        inicial: Límite inicial (por defecto `minimo`)
+    """
+
+    def __init__(self, minimo: int = 2, maximo: int = 10, inicial: Optional[int] = None):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.limite = min(self.maximo, max(self.minimo, inicial if inicial is not None else self.minimo))
+        self._condicion = threading.Condition()
+        self._en_curso = 0
+        self._muestras: List[Tuple[int, float, bool]] = []
+        self._inicio_ventana = time.perf_counter()
+        self._latencia_base: Optional[float] = None
+        self._throughput_anterior = 0.0
+        self.decisiones: List[Dict[str, Any]] = []
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["ControladorConcurrencia"]:
+        """
+        Crea el controlador según CONCURRENCIA_ADAPTATIVA, MIN_WORKERS y MAX_WORKERS.
+
+        Returns:
+            Optional[ControladorConcurrencia]: None si la concurrencia adaptativa está desactivada
+        """
+        if normalizar_si_no(os.getenv("CONCURRENCIA_ADAPTATIVA", "no")) != "si":
+            return None
+        try:
+            minimo = int(os.getenv("MIN_WORKERS", "2"))
+            maximo = int(os.getenv("MAX_WORKERS", "10"))
+        except ValueError:
+            minimo, maximo = 2, 10
+        return cls(minimo, maximo)
+
+    @property
+    def en_curso(self) -> int:
+        """Descargas ejecutándose en este momento."""
+        with self._condicion:
+            return self._en_curso
+
+    @contextmanager
+    def turno(self) -> Iterator[Dict[str, int]]:
+        """
+        Ocupa un lugar de descarga durante el bloque y registra su resultado.
+
+        El bloque debe cargar en `medicion['bytes']` los bytes descargados; si el
+        bloque lanza una excepción la descarga se cuenta como fallida.
+
+        Yields:
+            Dict[str, int]: Medición de la descarga
+        """
+        with self._condicion:
+            while self._en_curso >= self.limite:
+                self._condicion.wait()
+            if self._en_curso == 0 and not self._muestras:
+                # Tras un período sin descargas la ventana empieza ahora, para no contar la espera
+                self._inicio_ventana = time.perf_counter()
+            self._en_curso += 1
+        medicion = {"bytes": 0}
+        inicio = time.perf_counter()
+        exito = False
+        try:
+            yield medicion
+            exito = True
+        finally:
+            self._liberar(medicion["bytes"], time.perf_counter() - inicio, exito)
+
+    def reservar(self) -> Optional[Callable[[], None]]:
+        """
+        Ocupa un lugar sin esperar, para una descarga adicional que no se mide por separado
+        (el duplicado de una descarga cubierta: la medición es la del turno original).
+
+        Returns:
+            Optional[Callable[[], None]]: Función que libera el lugar, o None si el límite está ocupado
+        """
+        with self._condicion:
+            if self._en_curso >= self.limite:
+                return None
+            self._en_curso += 1
+
+        def liberar() -> None:
+            with self._condicion:
+                self._en_curso -= 1
+                self._condicion.notify_all()
+        return liberar
+
+    def _liberar(self, cantidad_bytes: int, segundos: float, exito: bool) -> None:
+        with self._condicion:
+            self._en_curso -= 1
+            self._muestras.append((cantidad_bytes, segundos, exito))
+            decision = None
+            if len(self._muestras) >= max(self.limite, VENTANA_MINIMA):
+                decision = self._evaluar()
+            self._condicion.notify_all()
+        if decision:
+            metricas.registrar_concurrencia(decision)
+
+    def _evaluar(self) -> Dict[str, Any]:
+        """Cierra la ventana actual y ajusta el límite (se llama con el lock tomado)."""
+        ahora = time.perf_counter()
+        muestras, self._muestras = self._muestras, []
+        duracion = max(ahora - self._inicio_ventana, 1e-9)
+        self._inicio_ventana = ahora
+
+        errores = sum(1 for _, _, exito in muestras if not exito)
+        tasa_error = errores / len(muestras)
+        latencias = [segundos for _, segundos, exito in muestras if exito]
+        latencia = percentil(latencias, 50)
+        throughput = sum(cantidad for cantidad, _, _ in muestras) / duracion
+
+        anterior = self.limite
+        if tasa_error > TASA_ERROR_MAXIMA:
+            self.limite = max(self.minimo, anterior // 2)
+            motivo = "errores"
+        elif (self._latencia_base and latencia > self._latencia_base * TOLERANCIA_LATENCIA
+              and throughput < self._throughput_anterior * MEJORA_MINIMA):
+            self.limite = max(self.minimo, anterior * 3 // 4)
+            motivo = "latencia"
+        else:
+            self.limite = min(self.maximo, anterior + 1)
+            motivo = "aumento"
+        if latencias:
+            self._latencia_base = min(self._latencia_base or latencia, latencia)
+        self._throughput_anterior = throughput
+
+        decision = {
+            "anterior": anterior,
+            "limite": self.limite,
+            "motivo": motivo,
+            "descargas": len(muestras),
+            "tasa_error": round(tasa_error, 3),
+            "latencia_p50_s": round(latencia, 4),
+            "bytes_por_segundo": round(throughput, 1),
+        }
+        self.decisiones.append(decision)
+        return decision
+
+
+_controlador: Optional[ControladorConcurrencia] = None
+_configuracion: Optional[Tuple[str, str, str]] = None
+_lock = threading.Lock()
+
+
+def controlador_descargas() -> Optional[ControladorConcurrencia]:
+    """
+    Controlador compartido por todas las descargas del proceso.
+
+    Se vuelve a crear si cambian CONCURRENCIA_ADAPTATIVA, MIN_WORKERS o MAX_WORKERS.
+
+    Returns:
+        Optional[ControladorConcurrencia]: None si la concurrencia adaptativa está desactivada
+    """
+    global _controlador, _configuracion
+    configuracion = tuple(os.getenv(variable, "") for variable in
+                          ("CONCURRENCIA_ADAPTATIVA", "MIN_WORKERS", "MAX_WORKERS"))
+    with _lock:
+        if configuracion != _configuracion:
+            _controlador = ControladorConcurrencia.desde_entorno()
+            _configuracion = configuracion
+        return _controlador
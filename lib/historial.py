@@ -0,0 +1,110 @@
+"""
+Módulo de historial de descargas por cliente
+
+Guarda en un archivo JSON, por fuente y CUIT, cuánto tardó la descarga de cada
+cliente y cuántos archivos y bytes trajo en las ejecuciones anteriores. El lote
+usa la duración esperada para empezar por los clientes más largos y no terminar
+con uno solo descargando mientras el resto de los hilos espera.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Peso de la última ejecución en la duración esperada (promedio móvil exponencial)
+PESO_ULTIMA = 0.5
+
+
+def clave_cliente(fuente: str, cuit: Any) -> str:
+    """Identificador de un cliente en el historial: 'fuente|CUIT'."""
+    return f"{fuente}|{cuit}"
+
+
+class HistorialClientes:
+    """
+    Historial persistente de duraciones, archivos y bytes por cliente.
+
+    Args:
+        ruta: Archivo JSON del historial (se crea al guardar)
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._clientes: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(ruta, "r", encoding="utf-8") as file:
+                datos = json.load(file)
+            if isinstance(datos, dict):
+                self._clientes = datos
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["HistorialClientes"]:
+        """
+        Abre el historial configurado en HISTORIAL_CLIENTES.
+
+        Returns:
+            Optional[HistorialClientes]: None si la variable está vacía o en 'no'
+        """
+        ruta = os.getenv("HISTORIAL_CLIENTES", "historial_clientes.json").strip()
+        if not ruta or ruta.lower() == "no":
+            return None
+        return cls(ruta)
+
+    def registrar(self, fuente: str, cuit: Any, segundos: float, archivos: int, cantidad_bytes: int) -> None:
+        """
+        Registra una descarga terminada de un cliente.
+
+        Args:
+            fuente: 'mc' o 'rcel'
+            cuit: CUIT del cliente
+            segundos: Duración de la descarga
+            archivos: Archivos resultantes
+            cantidad_bytes: Bytes descargados
+        """
+        clave = clave_cliente(fuente, cuit)
+        with self._lock:
+            anterior = self._clientes.get(clave)
+            esperado = segundos if anterior is None else (
+                PESO_ULTIMA * segundos + (1 - PESO_ULTIMA) * anterior["segundos_esperados"])
+            self._clientes[clave] = {
+                "segundos_esperados": round(esperado, 3),
+                "segundos": round(segundos, 3),
+                "archivos": archivos,
+                "bytes": cantidad_bytes,
+                "ejecuciones": (anterior or {}).get("ejecuciones", 0) + 1,
+                "ultima": datetime.now().isoformat(timespec="seconds"),
+            }
+
+    def duracion_esperada(self, fuente: str, cuit: Any) -> Optional[float]:
+        """Segundos que se espera que tarde el cliente, o None si no tiene historial."""
+        with self._lock:
+            datos = self._clientes.get(clave_cliente(fuente, cuit))
+        return None if datos is None else datos["segundos_esperados"]
+
+    def cliente(self, fuente: str, cuit: Any) -> Optional[Dict[str, Any]]:
+        """Último registro del cliente, o None si no tiene historial."""
+        with self._lock:
+            datos = self._clientes.get(clave_cliente(fuente, cuit))
+        return dict(datos) if datos is not None else None
+
+    def guardar(self) -> str:
+        """
+        Guarda el historial (temporal y reemplazo, para no dejarlo a medio escribir).
+
+        Returns:
+            str: Ruta del archivo guardado
+        """
+        with self._lock:
+            datos = json.dumps(self._clientes, indent=2, ensure_ascii=False)
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as file:
+            file.write(datos)
+        os.replace(temporal, self.ruta)
+        return self.ruta
@@ -0,0 +1,109 @@
+"""
+Módulo de ingesta de Mis Comprobantes en JSON
+
+Con MODO_INGESTA_MC=json la consulta pide los comprobantes en la propia respuesta
+(`carga_json`) y se convierten directamente en un DataFrame con los tipos del CSV
+de Mis Comprobantes, sin descargar el ZIP de MinIO, extraerlo ni volver a leer el
+CSV. Si la respuesta no trae los comprobantes de un tipo se usa la URL del ZIP.
+"""
+import hashlib
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+MODOS_INGESTA = ("zip", "json")
+
+# Columnas numéricas del CSV de Mis Comprobantes
+COLUMNAS_NUMERICAS = (
+    'Tipo de Comprobante', 'Punto de Venta', 'Número Desde', 'Número Hasta', 'Cód. Autorización',
+    'Tipo Doc. Receptor', 'Nro. Doc. Receptor', 'Tipo Doc. Emisor', 'Nro. Doc. Emisor', 'Tipo Cambio',
+    'Imp. Neto Gravado', 'Imp. Neto No Gravado', 'Imp. Op. Exentas', 'Otros Tributos', 'IVA', 'Imp. Total',
+    'Imp. Neto Gravado Total', 'Total IVA',
+)
+
+
+def modo_ingesta_mc() -> str:
+    """
+    Lee MODO_INGESTA_MC: cómo se reciben los comprobantes de Mis Comprobantes.
+
+    Returns:
+        str: Uno de MODOS_INGESTA ('zip' si el valor no es válido)
+    """
+    modo = os.getenv("MODO_INGESTA_MC", "zip").strip().lower()
+    return modo if modo in MODOS_INGESTA else "zip"
+
+
+def extraccion_comprobantes_json(response: Dict[str, Any]) -> Dict[str, Optional[List[Dict[str, Any]]]]:
+    """
+    Extrae los comprobantes de emitidos y recibidos de una respuesta con `carga_json`.
+
+    Args:
+        response: JSON retornado por la API
+
+    Returns:
+        Dict[str, Optional[List[Dict]]]: Registros por tipo ('emitidos', 'recibidos'); None si no vinieron
+    """
+    comprobantes: Dict[str, Optional[List[Dict[str, Any]]]] = {'emitidos': None, 'recibidos': None}
+    if not isinstance(response, dict):
+        return comprobantes
+    for tipo in comprobantes:
+        registros = response.get(f'mis_comprobantes_{tipo}_json')
+        if isinstance(registros, list):
+            comprobantes[tipo] = registros
+    return comprobantes
+
+
+def dataframe_comprobantes(registros: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Convierte los registros JSON en un DataFrame con los tipos del CSV de Mis Comprobantes.
+
+    Args:
+        registros: Un diccionario por comprobante, con los encabezados del CSV como claves
+
+    Returns:
+        pd.DataFrame: Comprobantes (numéricos como números, fechas como 'yyyy-mm-dd')
+    """
+    df = pd.DataFrame.from_records(registros)
+    for columna in COLUMNAS_NUMERICAS:
+        if columna in df.columns and not pd.api.types.is_numeric_dtype(df[columna]):
+            # Importes en texto con coma decimal, como en el CSV
+            texto = df[columna].astype('string').str.replace(',', '.', regex=False)
+            df[columna] = pd.to_numeric(texto, errors='coerce')
+    if 'Fecha de Emisión' in df.columns:
+        df['Fecha de Emisión'] = df['Fecha de Emisión'].astype(str).str[:10]
+    return df
+
+
+def nombre_csv_mc(tipo: str, desde: date, hasta: date, cuit: str, denominacion: str) -> str:
+    """
+    Nombre del CSV con el formato de los ZIP de Mrbot.
+
+    Returns:
+        str: '9 - MCE - ddmmyyyy - ddmmyyyy - CUIT - NOMBRE.csv'
+    """
+    return f"9 - {tipo} - {desde:%d%m%Y} - {hasta:%d%m%Y} - {cuit} - {denominacion}.csv"
+
+
+def escribir_csv_mc(comprobantes: pd.DataFrame, ruta: str) -> str:
+    """
+    Guarda los comprobantes con el formato del CSV de Mis Comprobantes (';' y coma decimal).
+
+    Args:
+        comprobantes: DataFrame de `dataframe_comprobantes`
+        ruta: Ruta del CSV
+
+    Returns:
+        str: Ruta escrita
+    """
+    temporal = f"{ruta}.tmp"
+    comprobantes.to_csv(temporal, sep=';', decimal=',', index=False, encoding='utf-8-sig')
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def firma_dataframe(comprobantes: pd.DataFrame) -> str:
+    """Hash del contenido de un DataFrame de comprobantes (para cachés y el almacén)."""
+    valores = pd.util.hash_pandas_object(comprobantes, index=False).values
+    return hashlib.sha1(valores.tobytes() + "|".join(map(str, comprobantes.columns)).encode("utf-8")).hexdigest()
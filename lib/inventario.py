@@ -0,0 +1,252 @@
+"""
+Módulo de inventario de archivos descargados
+
+Mantiene en `<directorio base>/.inventario/<tipo>.json` la lista de archivos ingeribles
+de cada directorio del árbol de descargas junto con el mtime del directorio.
+Al descubrir archivos solo se hace `stat` de cada directorio y se vuelve a
+listar (con `os.scandir`) únicamente los que cambiaron, en lugar de recorrer
+todos los PDFs de todos los clientes con `glob`.
+
+Los ZIP de períodos archivados (ver `lib.archivado`) se inventarían por sus miembros
+ingeribles, con rutas virtuales '<ruta del ZIP>/<miembro>'.
+"""
+import json
+import os
+import threading
+import time
+import zipfile
+from typing import Any, Dict, List, Optional
+
+from lib.archivado import es_archivo_periodo, miembros_archivo
+
+# Subdirectorio oculto: guardar el inventario no modifica el mtime del directorio base
+DIRECTORIO_INVENTARIO = ".inventario"
+VERSION_INVENTARIO = 1
+
+# Archivos ingeribles por tipo de descarga: (nombre de directorio requerido, extensión)
+#   mc:   <base>/**/extraido/*.csv
+#   rcel: <base>/**/*.json
+TIPOS_INVENTARIO = {
+    "mc": ("extraido", ".csv"),
+    "rcel": (None, ".json"),
+}
+
+# Un directorio modificado dentro de este margen respecto de su último listado se
+# vuelve a listar: la resolución del mtime puede ocultar cambios en el mismo instante
+MARGEN_MTIME_NS = 2_000_000_000
+
+
+class Inventario:
+    """
+    Inventario de archivos ingeribles bajo un directorio de descargas.
+
+    Args:
+        base: Directorio de descargas (DOWNLOADS_MC_PATH o DOWNLOADS_RCEL_PATH)
+        tipo: 'mc' o 'rcel' (ver TIPOS_INVENTARIO)
+    """
+
+    def __init__(self, base: str, tipo: str):
+        if tipo not in TIPOS_INVENTARIO:
+            raise ValueError(f"Tipo de inventario desconocido: {tipo}")
+        self.base = base
+        self.tipo = tipo
+        self.ruta = os.path.join(base, DIRECTORIO_INVENTARIO, f"{tipo}.json")
+        self._lock = threading.RLock()
+        self._directorios: Dict[str, Dict[str, Any]] = {}
+        self._modificado = False
+        self._cargar()
+
+    # ------------------------------------------------------------------ persistencia
+
+    def _cargar(self) -> None:
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as file:
+                datos = json.load(file)
+        except (OSError, ValueError):
+            return
+        if datos.get("version") == VERSION_INVENTARIO and datos.get("tipo") == self.tipo:
+            self._directorios = datos.get("directorios", {})
+
+    def guardar(self) -> None:
+        """Escribe el inventario si cambió desde la última vez que se guardó."""
+        with self._lock:
+            if not self._modificado or not os.path.isdir(self.base):
+                return
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, "w", encoding="utf-8") as file:
+                json.dump({"version": VERSION_INVENTARIO, "tipo": self.tipo, "directorios": self._directorios},
+                          file, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+            self._modificado = False
+
+    # ------------------------------------------------------------------ listado
+
+    def _relativo(self, directorio: str) -> str:
+        relativo = os.path.relpath(directorio, self.base)
+        return "" if relativo == "." else relativo.replace(os.sep, "/")
+
+    def _absoluto(self, relativo: str) -> str:
+        return os.path.join(self.base, *relativo.split("/")) if relativo else self.base
+
+    def _listar(self, relativo: str, mtime_ns: int) -> Dict[str, Any]:
+        """Lista un directorio y guarda sus subdirectorios y archivos ingeribles."""
+        requerido, extension = TIPOS_INVENTARIO[self.tipo]
+        ingerible = requerido is None or os.path.basename(relativo) == requerido
+        subdirectorios, archivos = [], []
+
+        with os.scandir(self._absoluto(relativo)) as entradas:
+            for entrada in entradas:
+                if entrada.name.startswith("."):
+                    continue
+                if entrada.is_dir():
+                    subdirectorios.append(entrada.name)
+                elif ingerible and entrada.name.endswith(extension):
+                    archivos.append(entrada.name)
+                elif ingerible and es_archivo_periodo(entrada.name):
+                    try:
+                        miembros = miembros_archivo(entrada.path, extension)
+                    except (OSError, zipfile.BadZipFile, ValueError):
+                        continue
+                    archivos.extend(f"{entrada.name}/{miembro}" for miembro in miembros)
+
+        entrada = {
+            "mtime_ns": mtime_ns,
+            "listado_ns": time.time_ns(),
+            "subdirectorios": sorted(subdirectorios),
+            "archivos": sorted(archivos),
+        }
+        self._directorios[relativo] = entrada
+        self._modificado = True
+        return entrada
+
+    def _vigente(self, relativo: str, mtime_ns: int) -> Optional[Dict[str, Any]]:
+        entrada = self._directorios.get(relativo)
+        if entrada and entrada["mtime_ns"] == mtime_ns and mtime_ns < entrada["listado_ns"] - MARGEN_MTIME_NS:
+            return entrada
+        return None
+
+    def actualizar(self) -> int:
+        """
+        Valida el inventario contra el disco y vuelve a listar los directorios modificados.
+
+        Returns:
+            int: Cantidad de directorios que se volvieron a listar
+        """
+        with self._lock:
+            listados = 0
+            visitados = set()
+            pendientes = [""]
+
+            while pendientes:
+                relativo = pendientes.pop()
+                try:
+                    mtime_ns = os.stat(self._absoluto(relativo)).st_mtime_ns
+                except OSError:
+                    continue
+                visitados.add(relativo)
+
+                entrada = self._vigente(relativo, mtime_ns)
+                if entrada is None:
+                    entrada = self._listar(relativo, mtime_ns)
+                    listados += 1
+
+                pendientes.extend(f"{relativo}/{d}" if relativo else d for d in entrada["subdirectorios"])
+
+            for relativo in set(self._directorios) - visitados:
+                del self._directorios[relativo]
+                self._modificado = True
+
+            return listados
+
+    def registrar_directorio(self, directorio: str) -> None:
+        """
+        Registra un directorio recién escrito por la etapa de descarga.
+
+        Lista el directorio y sus ancestros dentro de la base (sin incluir la base,
+        que se valida una sola vez al descubrir), para que el descubrimiento posterior
+        no necesite volver a listarlos.
+
+        Args:
+            directorio: Directorio dentro de `base` donde se guardaron archivos
+        """
+        with self._lock:
+            relativo = self._relativo(directorio)
+            while relativo and not relativo.startswith(".."):
+                try:
+                    self._listar(relativo, os.stat(self._absoluto(relativo)).st_mtime_ns)
+                except OSError:
+                    return
+                relativo = relativo.rsplit("/", 1)[0] if "/" in relativo else ""
+
+    # ------------------------------------------------------------------ consultas
+
+    def archivos(self) -> List[str]:
+        """Rutas de todos los archivos ingeribles inventariados."""
+        with self._lock:
+            rutas: List[str] = []
+            for relativo in sorted(self._directorios):
+                prefijo = os.path.join(self._absoluto(relativo), "")
+                rutas.extend(prefijo + nombre for nombre in self._directorios[relativo]["archivos"])
+            return rutas
+
+    def por_cliente(self) -> Dict[str, List[str]]:
+        """Rutas de archivos ingeribles agrupadas por directorio de cliente (`<CUIT>_<Nombre>`)."""
+        with self._lock:
+            clientes: Dict[str, List[str]] = {}
+            for relativo in sorted(self._directorios):
+                nombres = self._directorios[relativo]["archivos"]
+                if nombres:
+                    cliente = relativo.split("/", 1)[0]
+                    prefijo = os.path.join(self._absoluto(relativo), "")
+                    clientes.setdefault(cliente, []).extend(prefijo + nombre for nombre in nombres)
+            return clientes
+
+
+_inventarios: Dict[tuple, Inventario] = {}
+_lock_inventarios = threading.Lock()
+
+
+def obtener_inventario(base: str, tipo: str) -> Inventario:
+    """
+    Devuelve el inventario compartido del directorio `base`.
+
+    Args:
+        base: Directorio de descargas
+        tipo: 'mc' o 'rcel'
+
+    Returns:
+        Inventario: Instancia compartida por todo el proceso
+    """
+    clave = (os.path.abspath(base), tipo)
+    with _lock_inventarios:
+        if clave not in _inventarios:
+            _inventarios[clave] = Inventario(base, tipo)
+        return _inventarios[clave]
+
+
+def registrar_descarga(base: str, tipo: str, directorio: str) -> None:
+    """Registra en el inventario de `base` un directorio escrito por la descarga."""
+    obtener_inventario(base, tipo).registrar_directorio(directorio)
+
+
+def listar_archivos(base: str, tipo: str) -> List[str]:
+    """
+    Descubre los archivos ingeribles de un árbol de descargas.
+
+    Equivale a `glob('<base>/**/extraido/*.csv')` (mc) o `glob('<base>/**/*.json')` (rcel),
+    pero solo vuelve a listar los directorios cuyo mtime cambió.
+
+    Args:
+        base: Directorio de descargas
+        tipo: 'mc' o 'rcel'
+
+    Returns:
+        List[str]: Rutas de los archivos encontrados
+    """
+    if not os.path.isdir(base):
+        return []
+    inventario = obtener_inventario(base, tipo)
+    inventario.actualizar()
+    inventario.guardar()
+    return inventario.archivos()
@@ -0,0 +1,310 @@
+"""
+Módulo de métricas de ejecución: tiempos por etapa, contadores y latencias por endpoint
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_cliente_actual: contextvars.ContextVar = contextvars.ContextVar("cliente_actual", default=None)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """
+    Calcula el percentil `p` (0-100) por interpolación lineal.
+
+    Args:
+        valores: Lista de valores
+        p: Percentil a calcular
+
+    Returns:
+        float: Valor del percentil, o 0.0 si la lista está vacía
+    """
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    fraccion = posicion - inferior
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * fraccion
+
+
+class RegistroMetricas:
+    """
+    Acumula métricas de una ejecución de forma segura entre hilos.
+
+    Registra tiempos por etapa (globales y por cliente), contadores, latencias por
+    endpoint y volumen descargado, y notifica cada evento a los suscriptores
+    registrados para alimentar un progreso en vivo (CLI o GUI).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores: List[Callable[[Dict[str, Any]], None]] = []
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        """Descarta todas las métricas acumuladas y reinicia el reloj de la ejecución."""
+        with self._lock:
+            self.inicio = time.time()
+            self._etapas: Dict[str, List[float]] = {}
+            self._etapas_cliente: Dict[str, Dict[str, float]] = {}
+            self._contadores: Dict[str, float] = {}
+            self._contadores_cliente: Dict[str, Dict[str, float]] = {}
+            self._latencias: Dict[str, List[float]] = {}
+            self._errores: Dict[str, int] = {}
+            self._concurrencia: List[Dict[str, Any]] = []
+
+    # ------------------------------------------------------------------ contexto
+
+    @contextmanager
+    def contexto_cliente(self, cliente: Optional[str]) -> Iterator[None]:
+        """Asocia las métricas registradas dentro del bloque al cliente indicado."""
+        token = _cliente_actual.set(str(cliente) if cliente is not None else None)
+        try:
+            yield
+        finally:
+            _cliente_actual.reset(token)
+
+    def cliente_actual(self) -> Optional[str]:
+        """Devuelve el cliente asociado al contexto actual, si lo hay."""
+        return _cliente_actual.get()
+
+    # ------------------------------------------------------------------ registro
+
+    @contextmanager
+    def etapa(self, nombre: str, cliente: Optional[str] = None) -> Iterator[None]:
+        """
+        Mide el tiempo de pared de un bloque y lo acumula en la etapa `nombre`.
+
+        Args:
+            nombre: Nombre de la etapa
+            cliente: Cliente asociado; por defecto el del contexto actual
+        """
+        cliente = cliente if cliente is not None else self.cliente_actual()
+        self._emitir({"evento": "inicio_etapa", "etapa": nombre, "cliente": cliente})
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.registrar_etapa(nombre, duracion, cliente)
+
+    def registrar_etapa(self, nombre: str, duracion: float, cliente: Optional[str] = None) -> None:
+        """Acumula una duración (en segundos) para la etapa `nombre`."""
+        with self._lock:
+            self._etapas.setdefault(nombre, []).append(duracion)
+            if cliente is not None:
+                etapas = self._etapas_cliente.setdefault(str(cliente), {})
+                etapas[nombre] = etapas.get(nombre, 0.0) + duracion
+        self._emitir({"evento": "fin_etapa", "etapa": nombre, "cliente": cliente, "segundos": duracion})
+
+    def incrementar(self, contador: str, valor: float = 1, cliente: Optional[str] = None) -> None:
+        """Suma `valor` al contador global y, si corresponde, al del cliente."""
+        cliente = cliente if cliente is not None else self.cliente_actual()
+        with self._lock:
+            self._contadores[contador] = self._contadores.get(contador, 0) + valor
+            if cliente is not None:
+                contadores = self._contadores_cliente.setdefault(str(cliente), {})
+                contadores[contador] = contadores.get(contador, 0) + valor
+
+    def contador(self, contador: str, cliente: Optional[str] = None) -> float:
+        """Valor actual de un contador, global o del cliente indicado."""
+        with self._lock:
+            if cliente is None:
+                return self._contadores.get(contador, 0)
+            return self._contadores_cliente.get(str(cliente), {}).get(contador, 0)
+
+    def registrar_latencia(self, endpoint: str, segundos: float, exito: bool = True) -> None:
+        """Registra la latencia de una llamada a un endpoint y si terminó con error."""
+        with self._lock:
+            self._latencias.setdefault(endpoint, []).append(segundos)
+            if not exito:
+                self._errores[endpoint] = self._errores.get(endpoint, 0) + 1
+        self._emitir({"evento": "llamada", "endpoint": endpoint, "segundos": segundos,
+                      "exito": exito, "cliente": self.cliente_actual()})
+
+    def registrar_descarga(self, cantidad_bytes: int, segundos: float, endpoint: str = "minio",
+                           exito: bool = True) -> None:
+        """Registra una descarga de archivo: latencia, bytes transferidos y cantidad de archivos."""
+        if exito:
+            self.incrementar("archivos_descargados")
+            self.incrementar("bytes_descargados", cantidad_bytes)
+        else:
+            self.incrementar("descargas_fallidas")
+        self.registrar_latencia(endpoint, segundos, exito)
+
+    def registrar_concurrencia(self, decision: Dict[str, Any]) -> None:
+        """Registra un ajuste del límite de descargas simultáneas (ver `lib.concurrencia`)."""
+        with self._lock:
+            self._concurrencia.append(dict(decision))
+        self._emitir({"evento": "concurrencia", **decision})
+
+    # ------------------------------------------------------------------ progreso
+
+    def suscribir(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Registra un callback que recibe cada evento de progreso."""
+        with self._lock:
+            self._suscriptores.append(callback)
+
+    def desuscribir(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Quita un callback registrado con `suscribir`."""
+        with self._lock:
+            if callback in self._suscriptores:
+                self._suscriptores.remove(callback)
+
+    def _emitir(self, evento: Dict[str, Any]) -> None:
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        if not suscriptores:
+            return
+        evento["instante"] = time.time()
+        evento["totales"] = self.totales()
+        for callback in suscriptores:
+            try:
+                callback(evento)
+            except Exception as exc:
+                # lib.registro importa este módulo: se usa su registrador por nombre
+                logging.getLogger("mrbot.metricas").warning("Error notificando progreso: %s", exc)
+
+    # ------------------------------------------------------------------ resumen
+
+    def totales(self) -> Dict[str, float]:
+        """Devuelve los totales de descarga y el throughput desde el inicio de la ejecución."""
+        with self._lock:
+            archivos = self._contadores.get("archivos_descargados", 0)
+            cantidad_bytes = self._contadores.get("bytes_descargados", 0)
+        transcurrido = max(time.time() - self.inicio, 1e-9)
+        return {
+            "segundos": round(transcurrido, 3),
+            "archivos_descargados": archivos,
+            "bytes_descargados": cantidad_bytes,
+            "archivos_por_segundo": round(archivos / transcurrido, 3),
+            "bytes_por_segundo": round(cantidad_bytes / transcurrido, 1),
+        }
+
+    def resumen(self) -> Dict[str, Any]:
+        """
+        Construye el resumen de la ejecución.
+
+        Returns:
+            Dict[str, Any]: Totales, etapas, contadores, latencias por endpoint, detalle por cliente
+                y ajustes de la concurrencia de descargas
+        """
+        totales = self.totales()
+        with self._lock:
+            etapas = {
+                nombre: {
+                    "cantidad": len(duraciones),
+                    "total_s": round(sum(duraciones), 4),
+                    "promedio_s": round(sum(duraciones) / len(duraciones), 4),
+                    "max_s": round(max(duraciones), 4),
+                }
+                for nombre, duraciones in self._etapas.items()
+            }
+            endpoints = {
+                endpoint: {
+                    "cantidad": len(latencias),
+                    "errores": self._errores.get(endpoint, 0),
+                    "p50_s": round(percentil(latencias, 50), 4),
+                    "p90_s": round(percentil(latencias, 90), 4),
+                    "p95_s": round(percentil(latencias, 95), 4),
+                    "p99_s": round(percentil(latencias, 99), 4),
+                    "max_s": round(max(latencias), 4),
+                }
+                for endpoint, latencias in self._latencias.items()
+            }
+            clientes = sorted(set(self._etapas_cliente) | set(self._contadores_cliente))
+            por_cliente = {
+                cliente: {
+                    "etapas_s": {k: round(v, 4) for k, v in self._etapas_cliente.get(cliente, {}).items()},
+                    "contadores": dict(self._contadores_cliente.get(cliente, {})),
+                }
+                for cliente in clientes
+            }
+            contadores = dict(self._contadores)
+            concurrencia = list(self._concurrencia)
+
+        return {
+            "inicio": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.inicio)),
+            "totales": totales,
+            "etapas": etapas,
+            "contadores": contadores,
+            "endpoints": endpoints,
+            "clientes": por_cliente,
+            "concurrencia": concurrencia,
+        }
+
+    def guardar_resumen(self, ruta: str) -> str:
+        """
+        Guarda el resumen de la ejecución como JSON.
+
+        Args:
+            ruta: Ruta del archivo JSON
+
+        Returns:
+            str: Ruta del archivo guardado
+        """
+        with open(ruta, "w", encoding="utf-8") as file:
+            json.dump(self.resumen(), file, indent=2, ensure_ascii=False)
+        print(f"Resumen de métricas guardado como: {ruta}")
+        return ruta
+
+
+def formatear_progreso(evento: Dict[str, Any]) -> str:
+    """
+    Formatea un evento de progreso en una línea legible.
+
+    Args:
+        evento: Evento emitido por `RegistroMetricas`
+
+    Returns:
+        str: Línea de progreso
+    """
+    totales = evento.get("totales", {})
+    linea = (
+        f"[{totales.get('segundos', 0):.0f}s] "
+        f"{totales.get('archivos_descargados', 0):.0f} archivos "
+        f"({totales.get('archivos_por_segundo', 0):.1f}/s, "
+        f"{totales.get('bytes_por_segundo', 0) / 1_048_576:.2f} MB/s)"
+    )
+    if evento.get("etapa"):
+        linea += f" | etapa: {evento['etapa']}"
+    if evento.get("cliente"):
+        linea += f" | cliente: {evento['cliente']}"
+    return linea
+
+
+def suscriptor_periodico(callback: Callable[[Dict[str, Any]], None], intervalo: float = 2.0) -> Callable[[Dict[str, Any]], None]:
+    """
+    Envuelve un callback para que reciba como máximo un evento cada `intervalo` segundos.
+
+    Los eventos de fin de etapa se entregan siempre.
+
+    Args:
+        callback: Función que recibe el evento
+        intervalo: Segundos mínimos entre notificaciones
+
+    Returns:
+        Callable: Callback limitado, apto para `RegistroMetricas.suscribir`
+    """
+    ultimo = [0.0]
+    lock = threading.Lock()
+
+    def _callback(evento: Dict[str, Any]) -> None:
+        with lock:
+            ahora = time.monotonic()
+            if evento.get("evento") != "fin_etapa" and ahora - ultimo[0] < intervalo:
+                return
+            ultimo[0] = ahora
+        callback(evento)
+
+    return _callback
+
+
+# Registro compartido por la CLI, la GUI y los módulos de descarga
+metricas = RegistroMetricas()
@@ -0,0 +1,152 @@
+"""
+Módulo de perfilado por etapas del proceso de control
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from lib.helpers import normalizar_si_no
+from lib.metricas import metricas
+
+
+MODOS_PERFILADO = ("no", "tiempos", "si", "cprofile")
+
+
+def modo_perfilado() -> str:
+    """
+    Lee el modo de perfilado desde la variable de entorno PERFILAR_CONTROL.
+
+    Valores: 'tiempos' (pared y CPU por etapa), 'si' (además memoria por etapa) o
+    'cprofile' (además vuelca un perfil de cProfile). Cualquier otro valor desactiva el perfilado.
+
+    Returns:
+        str: Uno de MODOS_PERFILADO
+    """
+    valor = normalizar_si_no(os.getenv("PERFILAR_CONTROL", "no"))
+    return valor if valor in MODOS_PERFILADO else "no"
+
+
+class PerfiladorEtapas:
+    """
+    Mide las etapas con nombre de un proceso.
+
+    Siempre acumula el tiempo de pared de cada etapa en `metricas`. Según el modo,
+    registra además tiempo de CPU ('tiempos'), variación y pico de memoria vía
+    `tracemalloc` ('si') y un perfil completo de `cProfile` ('cprofile').
+    `tracemalloc` agrega un costo considerable en código Python puro (p.ej. openpyxl),
+    por lo que para comparar tiempos conviene el modo 'tiempos'.
+    """
+
+    def __init__(self, modo: str = "no"):
+        self.modo = modo if modo in MODOS_PERFILADO else "no"
+        self.activo = self.modo != "no"
+        self.memoria = self.modo in ("si", "cprofile")
+        self.cprofile = self.modo == "cprofile"
+        self.etapas: List[Dict[str, Any]] = []
+        self._perfil: Optional[cProfile.Profile] = None
+        self._tracemalloc_propio = False
+
+    def iniciar(self) -> None:
+        """Comienza la medición de memoria y, si corresponde, el perfil de cProfile."""
+        if not self.memoria:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_propio = True
+        if self.cprofile:
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+
+    def detener(self) -> None:
+        """Detiene las mediciones iniciadas con `iniciar`."""
+        if self._perfil is not None:
+            self._perfil.disable()
+        if self._tracemalloc_propio:
+            tracemalloc.stop()
+            self._tracemalloc_propio = False
+
+    @contextmanager
+    def etapa(self, nombre: str) -> Iterator[None]:
+        """
+        Mide un bloque como la etapa `nombre`.
+
+        Args:
+            nombre: Nombre de la etapa
+        """
+        if not self.activo:
+            with metricas.etapa(nombre):
+                yield
+            return
+
+        if self.memoria:
+            tracemalloc.reset_peak()
+            memoria_inicial, _ = tracemalloc.get_traced_memory()
+        cpu_inicial = time.process_time()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            pared = time.perf_counter() - inicio
+            cpu = time.process_time() - cpu_inicial
+            metricas.registrar_etapa(nombre, pared)
+            resultado = {"etapa": nombre, "pared_s": round(pared, 4), "cpu_s": round(cpu, 4)}
+            if self.memoria:
+                memoria_final, pico = tracemalloc.get_traced_memory()
+                resultado["memoria_delta_mb"] = round((memoria_final - memoria_inicial) / 1_048_576, 3)
+                resultado["memoria_pico_mb"] = round((pico - memoria_inicial) / 1_048_576, 3)
+            self.etapas.append(resultado)
+
+    def resumen_texto(self) -> str:
+        """Devuelve una tabla de texto con los resultados por etapa."""
+        encabezado = f"{'Etapa':<20} {'Pared (s)':>10} {'CPU (s)':>10}"
+        if self.memoria:
+            encabezado += f" {'Δ Mem (MB)':>11} {'Pico (MB)':>10}"
+        lineas = [encabezado]
+        for e in self.etapas:
+            linea = f"{e['etapa']:<20} {e['pared_s']:>10.3f} {e['cpu_s']:>10.3f}"
+            if self.memoria:
+                linea += f" {e['memoria_delta_mb']:>11.2f} {e['memoria_pico_mb']:>10.2f}"
+            lineas.append(linea)
+        return "\n".join(lineas)
+
+    def guardar(self, ruta_reporte: str) -> List[str]:
+        """
+        Guarda los resultados junto al reporte.
+
+        Escribe `<reporte>.perfil.json` y, si se usó cProfile, `<reporte>.prof`
+        (legible con `pstats` o snakeviz) y `<reporte>.prof.txt` con las funciones más costosas.
+
+        Args:
+            ruta_reporte: Ruta del reporte Excel generado
+
+        Returns:
+            List[str]: Rutas de los archivos escritos
+        """
+        if not self.activo:
+            return []
+
+        base = os.path.splitext(ruta_reporte)[0]
+        rutas = [f"{base}.perfil.json"]
+        with open(rutas[0], "w", encoding="utf-8") as file:
+            json.dump({"reporte": ruta_reporte, "modo": self.modo, "etapas": self.etapas}, file, indent=2, ensure_ascii=False)
+
+        if self._perfil is not None:
+            rutas.append(f"{base}.prof")
+            self._perfil.dump_stats(rutas[-1])
+
+            salida = io.StringIO()
+            pstats.Stats(self._perfil, stream=salida).sort_stats("cumulative").print_stats(40)
+            rutas.append(f"{base}.prof.txt")
+            with open(rutas[-1], "w", encoding="utf-8") as file:
+                file.write(salida.getvalue())
+
+        print(self.resumen_texto())
+        for ruta in rutas:
+            print(f"Perfil guardado como: {ruta}")
+        return rutas
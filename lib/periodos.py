@@ -0,0 +1,416 @@
+"""
+Módulo de períodos descargados de Mis Comprobantes
+
+Con DESCARGA_INCREMENTAL=si guarda por cliente, en `<directorio del cliente>/.cobertura.json`,
+los rangos de fechas ya descargados de emitidos y recibidos y el CSV fusionado de cada
+tipo. La descarga pide a Mrbot solo los meses que faltan y luego fusiona los CSV nuevos
+con ese CSV; los demás archivos del directorio no se tocan. Solo se registran como
+cubiertos los meses cerrados: el mes en curso se vuelve a pedir en cada ejecución.
+
+También divide los rangos en ventanas mensuales o trimestrales para consultarlas
+en paralelo y fusiona sus resultados.
+"""
+import io
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from lib.helpers import normalizar_si_no
+
+ARCHIVO_COBERTURA = ".cobertura.json"
+VERSION_COBERTURA = 1
+
+# Tipo de descarga de la planilla y su abreviatura en el nombre del CSV
+TIPOS_MC = {"emitidos": "MCE", "recibidos": "MCR"}
+
+
+class DescargaIncompleta(Exception):
+    """
+    Algún tipo o archivo pedido no llegó (descarga o extracción fallida).
+
+    Args:
+        faltantes: Tipos ('emitidos', 'recibidos') o archivos que no se obtuvieron
+        archivos: Lo que sí se obtuvo, para no descartarlo
+    """
+
+    def __init__(self, faltantes: List[Any], archivos: Optional[List[Any]] = None):
+        self.faltantes = list(faltantes)
+        self.archivos = list(archivos or [])
+        detalle = ", ".join(str(f) for f in self.faltantes[:5])
+        if len(self.faltantes) > 5:
+            detalle += f" y {len(self.faltantes) - 5} más"
+        super().__init__(f"Descarga incompleta, no se obtuvo: {detalle}")
+
+FORMATO_FECHA = "%d/%m/%Y"
+
+MODOS_DIVISION = ("no", "mensual", "trimestral")
+
+Rango = Tuple[date, date]
+
+
+def descarga_incremental() -> Tuple[bool, bool]:
+    """
+    Lee la configuración de descarga incremental.
+
+    Returns:
+        Tuple[bool, bool]: (DESCARGA_INCREMENTAL activa, FORZAR_DESCARGA_COMPLETA)
+    """
+    activa = normalizar_si_no(os.getenv("DESCARGA_INCREMENTAL", "no")) == "si"
+    forzar = normalizar_si_no(os.getenv("FORZAR_DESCARGA_COMPLETA", "no")) == "si"
+    return activa, forzar
+
+
+def a_fecha(valor: str) -> date:
+    """Convierte una fecha 'dd/mm/yyyy' a `date`."""
+    return datetime.strptime(valor, FORMATO_FECHA).date()
+
+
+def fin_de_mes(dia: date) -> date:
+    """Último día del mes de `dia`."""
+    siguiente = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return siguiente - timedelta(days=1)
+
+
+def meses_del_rango(desde: date, hasta: date) -> List[Rango]:
+    """
+    Divide un rango de fechas en meses calendario, recortando el primero y el último.
+
+    Args:
+        desde: Inicio del rango
+        hasta: Fin del rango
+
+    Returns:
+        List[Rango]: Un (inicio, fin) por mes
+    """
+    meses = []
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(fin_de_mes(inicio), hasta)
+        meses.append((inicio, fin))
+        inicio = fin + timedelta(days=1)
+    return meses
+
+
+def unir_rangos(rangos: List[Rango]) -> List[Rango]:
+    """Ordena y une rangos superpuestos o contiguos."""
+    unidos: List[Rango] = []
+    for inicio, fin in sorted(rangos):
+        if unidos and inicio <= unidos[-1][1] + timedelta(days=1):
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fin))
+        else:
+            unidos.append((inicio, fin))
+    return unidos
+
+
+def ultimo_mes_cerrado(hoy: Optional[date] = None) -> date:
+    """Último día del mes anterior a `hoy`."""
+    hoy = hoy or date.today()
+    return hoy.replace(day=1) - timedelta(days=1)
+
+
+def modo_division() -> str:
+    """
+    Lee DIVIDIR_RANGO: cómo dividir el rango de una fila en consultas concurrentes.
+
+    Returns:
+        str: Uno de MODOS_DIVISION ('no' si el valor no es válido)
+    """
+    modo = os.getenv("DIVIDIR_RANGO", "no").strip().lower()
+    return modo if modo in MODOS_DIVISION else "no"
+
+
+def consultas_concurrentes() -> int:
+    """Cantidad máxima de consultas simultáneas por cliente (CONSULTAS_CONCURRENTES, 4 por defecto)."""
+    try:
+        return max(1, int(os.getenv("CONSULTAS_CONCURRENTES", "4")))
+    except ValueError:
+        return 4
+
+
+def dividir_rango(desde: date, hasta: date, modo: str) -> List[Rango]:
+    """
+    Divide un rango en ventanas mensuales o trimestrales (calendario) para consultarlas en paralelo.
+
+    Args:
+        desde: Inicio del rango
+        hasta: Fin del rango
+        modo: 'no', 'mensual' o 'trimestral'
+
+    Returns:
+        List[Rango]: Ventanas que cubren el rango, en orden
+    """
+    if modo == "mensual":
+        return meses_del_rango(desde, hasta)
+    if modo == "trimestral":
+        ventanas: List[Rango] = []
+        for inicio, fin in meses_del_rango(desde, hasta):
+            if ventanas and (inicio.month - 1) // 3 == (ventanas[-1][0].month - 1) // 3 \
+                    and inicio.year == ventanas[-1][0].year:
+                ventanas[-1] = (ventanas[-1][0], fin)
+            else:
+                ventanas.append((inicio, fin))
+        return ventanas
+    return [(desde, hasta)]
+
+
+class CoberturaDescargas:
+    """
+    Rangos de fechas ya descargados de Mis Comprobantes para un cliente.
+
+    Args:
+        directorio: Directorio del cliente (`<DOWNLOADS_MC_PATH>/<CUIT>_<Nombre>`)
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, ARCHIVO_COBERTURA)
+        self._rangos: Dict[str, List[Rango]] = {tipo: [] for tipo in TIPOS_MC}
+        self._csv: Dict[str, str] = {}
+        self._cargar()
+
+    def _cargar(self) -> None:
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as file:
+                datos = json.load(file)
+        except (OSError, ValueError):
+            return
+        if datos.get("version") != VERSION_COBERTURA:
+            return
+        for tipo in TIPOS_MC:
+            self._rangos[tipo] = [(date.fromisoformat(d), date.fromisoformat(h)) for d, h in datos.get(tipo, [])]
+        self._csv = {tipo: nombre for tipo, nombre in datos.get("csv", {}).items() if tipo in TIPOS_MC}
+
+    def guardar(self) -> None:
+        """Escribe la cobertura del cliente."""
+        os.makedirs(self.directorio, exist_ok=True)
+        datos = {"version": VERSION_COBERTURA}
+        for tipo, rangos in self._rangos.items():
+            datos[tipo] = [[d.isoformat(), h.isoformat()] for d, h in rangos]
+        datos["csv"] = self._csv
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as file:
+            json.dump(datos, file)
+        os.replace(temporal, self.ruta)
+
+    def cubierto(self, tipo: str, desde: date, hasta: date) -> bool:
+        """Indica si el rango ya se descargó completo para el tipo indicado."""
+        return any(d <= desde and hasta <= h for d, h in self._rangos[tipo])
+
+    def faltantes(self, tipos: List[str], desde: date, hasta: date) -> List[Rango]:
+        """
+        Calcula los rangos a pedir: meses del rango no cubiertos para alguno de los tipos.
+
+        Args:
+            tipos: Tipos a descargar ('emitidos', 'recibidos')
+            desde: Inicio del rango de la planilla
+            hasta: Fin del rango de la planilla
+
+        Returns:
+            List[Rango]: Rangos contiguos de meses faltantes
+        """
+        meses = [(d, h) for d, h in meses_del_rango(desde, hasta)
+                 if not all(self.cubierto(tipo, d, h) for tipo in tipos)]
+        return unir_rangos(meses)
+
+    def registrar(self, tipos: List[str], desde: date, hasta: date, hoy: Optional[date] = None) -> None:
+        """
+        Registra un rango descargado, limitado a los meses cerrados.
+
+        Args:
+            tipos: Tipos descargados
+            desde: Inicio del rango descargado
+            hasta: Fin del rango descargado
+            hoy: Fecha de la descarga (por defecto, hoy)
+        """
+        hasta = min(hasta, ultimo_mes_cerrado(hoy))
+        if hasta < desde:
+            return
+        for tipo in tipos:
+            self._rangos[tipo] = unir_rangos(self._rangos[tipo] + [(desde, hasta)])
+
+    def registrar_csv(self, tipo: str, ruta: str) -> None:
+        """Registra el CSV fusionado del tipo, el único que se vuelve a fusionar en la próxima descarga."""
+        self._csv[tipo] = os.path.basename(ruta)
+
+    def csv_registrados(self, tipos: List[str]) -> List[str]:
+        """
+        Rutas de los CSV fusionados de los tipos indicados que siguen existiendo.
+
+        Args:
+            tipos: Tipos ('emitidos', 'recibidos')
+
+        Returns:
+            List[str]: Rutas dentro del directorio `extraido` del cliente
+        """
+        rutas = [os.path.join(self.directorio, "extraido", self._csv[tipo]) for tipo in tipos if tipo in self._csv]
+        return [ruta for ruta in rutas if os.path.isfile(ruta)]
+
+    def reiniciar(self, tipos: List[str]) -> None:
+        """Olvida la cobertura de los tipos indicados (descarga completa forzada)."""
+        for tipo in tipos:
+            self._rangos[tipo] = []
+
+
+def csv_extraidos(directorio: str) -> List[str]:
+    """Rutas de los CSV de un directorio `extraido` (lista vacía si no existe)."""
+    if not os.path.isdir(directorio):
+        return []
+    return [os.path.join(directorio, nombre) for nombre in sorted(os.listdir(directorio)) if nombre.endswith(".csv")]
+
+
+def tipos_en_archivos(archivos: List[Any]) -> set:
+    """
+    Tipos ('emitidos', 'recibidos') que tienen al menos un CSV entre los archivos.
+
+    Args:
+        archivos: Rutas de CSV o tuplas (ruta_virtual, contenido) del modo en memoria
+    """
+    tipos = {codigo: tipo for tipo, codigo in TIPOS_MC.items()}
+    encontrados = set()
+    for archivo in archivos:
+        partes = _partes_nombre_csv(archivo[0] if isinstance(archivo, tuple) else archivo)
+        if partes and partes[1].strip() in tipos:
+            encontrados.add(tipos[partes[1].strip()])
+    return encontrados
+
+
+def _partes_nombre_csv(ruta: str) -> Optional[List[str]]:
+    """Partes de '9 - MCE - ddmmyyyy - ddmmyyyy - CUIT - NOMBRE.csv', o None si no respeta el formato."""
+    partes = os.path.basename(ruta).split(" - ", 5)
+    if len(partes) != 6:
+        return None
+    try:
+        datetime.strptime(partes[2], "%d%m%Y")
+        datetime.strptime(partes[3], "%d%m%Y")
+    except ValueError:
+        return None
+    return partes
+
+
+def _fusionar(datos: List[Tuple[bool, pd.DataFrame]], rangos_nuevos: List[Rango]) -> pd.DataFrame:
+    """
+    Une CSV de un mismo tipo leídos como texto.
+
+    Las filas de los archivos anteriores con fecha dentro de `rangos_nuevos` se descartan y,
+    ante comprobantes repetidos, se conserva la versión de los archivos nuevos.
+    """
+    rangos = [(d.isoformat(), h.isoformat()) for d, h in rangos_nuevos]
+    anteriores, nuevos = [], []
+    for nuevo, df in datos:
+        if not nuevo and not df.empty and rangos:
+            fecha = df['Fecha de Emisión'].str[:10]
+            reemplazadas = pd.Series(False, index=df.index)
+            for desde, hasta in rangos:
+                reemplazadas |= (fecha >= desde) & (fecha <= hasta)
+            df = df[~reemplazadas]
+        (nuevos if nuevo else anteriores).append(df)
+
+    fusion = pd.concat(anteriores + nuevos, ignore_index=True)
+    clave = [c for c in ('Tipo de Comprobante', 'Punto de Venta', 'Número Desde', 'Nro. Doc. Emisor')
+             if c in fusion.columns]
+    fusion = fusion.drop_duplicates(subset=clave, keep='last')
+    return fusion.sort_values('Fecha de Emisión', kind='stable')
+
+
+def _nombre_fusionado(partes: List[List[str]]) -> str:
+    """Nombre del CSV fusionado: el del último archivo con el rango de fechas de todos."""
+    desde = min(datetime.strptime(p[2], "%d%m%Y") for p in partes)
+    hasta = max(datetime.strptime(p[3], "%d%m%Y") for p in partes)
+    ultimo = partes[-1]
+    return " - ".join([ultimo[0], ultimo[1], f"{desde:%d%m%Y}", f"{hasta:%d%m%Y}", ultimo[4], ultimo[5]])
+
+
+def _leer_texto(origen) -> pd.DataFrame:
+    return pd.read_csv(origen, sep=';', dtype=str, keep_default_na=False, encoding='utf-8-sig')
+
+
+def _como_csv(contenido: Any) -> io.BytesIO:
+    """Contenido CSV en memoria; un DataFrame se serializa con el formato de Mis Comprobantes."""
+    if isinstance(contenido, pd.DataFrame):
+        contenido = contenido.to_csv(sep=';', decimal=',', index=False).encode('utf-8-sig')
+    return io.BytesIO(contenido)
+
+
+def fusionar_csv_mc(directorio: str, tipo: str, nuevos: List[Tuple[str, Rango]],
+                    anteriores: Sequence[str] = ()) -> Optional[str]:
+    """
+    Fusiona en un único CSV los archivos de un tipo (MCE o MCR) de un directorio `extraido`.
+
+    Los comprobantes de los archivos recién descargados reemplazan a los que los archivos
+    anteriores tenían con fecha de emisión dentro de los rangos descargados. Solo se
+    fusionan (y se borran) `nuevos` y `anteriores`: el resto del directorio no se toca.
+
+    Args:
+        directorio: Directorio `extraido` del cliente
+        tipo: 'MCE' o 'MCR'
+        nuevos: (ruta, rango consultado) de los CSV recién extraídos
+        anteriores: Rutas de CSV ya descargados a fusionar (ver `CoberturaDescargas.csv_registrados`)
+
+    Returns:
+        Optional[str]: Ruta del CSV fusionado, o None si no hay archivos del tipo
+    """
+    rutas_nuevas = {os.path.abspath(ruta) for ruta, _ in nuevos}
+    rutas_anteriores = {os.path.abspath(ruta) for ruta in anteriores}
+    archivos = []
+    for nombre in sorted(os.listdir(directorio)):
+        ruta = os.path.join(directorio, nombre)
+        partes = _partes_nombre_csv(ruta)
+        if not (partes and partes[1].strip() == tipo and nombre.endswith(".csv")):
+            continue
+        if os.path.abspath(ruta) in rutas_nuevas | rutas_anteriores:
+            archivos.append((ruta, partes))
+    if not archivos:
+        return None
+    if len(archivos) == 1:
+        return archivos[0][0]
+
+    rutas_tipo = {os.path.abspath(ruta) for ruta, _ in archivos}
+    fusion = _fusionar(
+        [(os.path.abspath(ruta) in rutas_nuevas, _leer_texto(ruta)) for ruta, _ in archivos],
+        [rango for ruta, rango in nuevos if os.path.abspath(ruta) in rutas_tipo],
+    )
+
+    destino = os.path.join(directorio, _nombre_fusionado([p for _, p in archivos]))
+    temporal = f"{destino}.tmp"
+    fusion.to_csv(temporal, sep=';', index=False, encoding='utf-8-sig')
+    os.replace(temporal, destino)
+    for ruta, _ in archivos:
+        if os.path.abspath(ruta) != os.path.abspath(destino):
+            os.remove(ruta)
+    return destino
+
+
+def fusionar_csv_memoria(archivos: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    """
+    Fusiona por tipo (MCE/MCR) los CSV en memoria descargados en varios sub-rangos.
+
+    Args:
+        archivos: Tuplas (ruta_virtual, contenido_csv) o, con ingesta JSON, (ruta_virtual, DataFrame)
+
+    Returns:
+        List[Tuple[str, Any]]: Una tupla por tipo; los archivos con nombre no reconocido se conservan.
+            Si todos los del tipo eran DataFrames la fusión también es un DataFrame
+    """
+    grupos: Dict[str, List[Tuple[str, bytes, List[str]]]] = {}
+    resultado = []
+    for ruta, contenido in archivos:
+        partes = _partes_nombre_csv(ruta)
+        if partes is None:
+            resultado.append((ruta, contenido))
+        else:
+            grupos.setdefault(partes[1].strip(), []).append((ruta, contenido, partes))
+
+    for grupo in grupos.values():
+        if len(grupo) == 1:
+            resultado.append(grupo[0][:2])
+            continue
+        tablas = all(isinstance(contenido, pd.DataFrame) for _, contenido, _ in grupo)
+        fusion = _fusionar([(True, contenido if tablas else _leer_texto(_como_csv(contenido)))
+                            for _, contenido, _ in grupo], [])
+        ruta = os.path.join(os.path.dirname(grupo[-1][0]), _nombre_fusionado([p for _, _, p in grupo]))
+        resultado.append((ruta, fusion.reset_index(drop=True) if tablas
+                          else fusion.to_csv(sep=';', index=False).encode('utf-8-sig')))
+    return resultado
@@ -0,0 +1,216 @@
+"""
+Módulo de planificación de descargas según el cupo de consultas
+
+Antes de ejecutar un lote se estima cuántas consultas a Mrbot necesita cada trabajo
+(una por ventana de fechas) y se consulta el cupo disponible del usuario. Los trabajos
+se ordenan por prioridad y se ejecutan mientras el cupo alcance; los que no entran se
+difieren para la próxima ejecución. En lotes largos el cupo se vuelve a consultar
+periódicamente, ya que otros procesos pueden estar consumiéndolo.
+
+A igual prioridad los trabajos se ordenan de mayor a menor duración esperada según
+el historial de ejecuciones anteriores (`lib.historial`), para que con varios
+clientes en paralelo (MAX_CLIENTES_CONCURRENTES) el lote no termine con un único
+cliente largo descargando mientras el resto de los hilos espera.
+"""
+import os
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from lib.helpers import normalizar_si_no
+
+# Trabajo a planificar: (identificador, consultas estimadas, prioridad)
+Trabajo = Tuple[Any, int, float]
+
+
+def leer_prioridad(valor: Any) -> float:
+    """
+    Interpreta la columna opcional 'Prioridad' de la planilla.
+
+    Args:
+        valor: Valor de la celda (número; menor es más prioritario)
+
+    Returns:
+        float: Prioridad numérica; infinito si la celda está vacía o no es un número
+    """
+    try:
+        prioridad = float(valor)
+    except (TypeError, ValueError):
+        return float("inf")
+    return prioridad if prioridad == prioridad else float("inf")
+
+
+def planificar(trabajos: Sequence[Trabajo], disponibles: Optional[int]) -> Tuple[List[Any], List[Any]]:
+    """
+    Ordena los trabajos por prioridad y selecciona los que entran en el cupo.
+
+    Se recorren en orden de prioridad (a igual prioridad, en el orden de la planilla) y
+    se incluye cada trabajo cuyas consultas todavía entran en el cupo restante; un
+    trabajo caro que no entra no impide ejecutar los siguientes más baratos. Los
+    trabajos sin consultas (filas deshabilitadas o ya al día) siempre se incluyen.
+
+    Args:
+        trabajos: Trabajos (identificador, consultas estimadas, prioridad)
+        disponibles: Cupo de consultas; None si se desconoce (se incluye todo)
+
+    Returns:
+        Tuple[List, List]: Identificadores a ejecutar en orden y diferidos
+    """
+    ordenados = sorted(enumerate(trabajos), key=lambda par: (par[1][2], par[0]))
+    ejecutar, diferidos = [], []
+    restante = disponibles
+    for _, (identificador, costo, _prioridad) in ordenados:
+        if restante is None or costo <= restante:
+            ejecutar.append(identificador)
+            if restante is not None:
+                restante -= costo
+        else:
+            diferidos.append(identificador)
+    return ejecutar, diferidos
+
+
+def mas_largos_primero(duraciones: Sequence[Optional[float]]) -> List[int]:
+    """
+    Orden de ejecución de mayor a menor duración esperada (longest job first).
+
+    Los trabajos sin historial se estiman con la mediana de los que sí lo tienen; a
+    igual duración se respeta el orden original. Sin ningún historial el orden no cambia.
+
+    Args:
+        duraciones: Duración esperada de cada trabajo (None si no tiene historial)
+
+    Returns:
+        List[int]: Índices de los trabajos en el orden en que conviene ejecutarlos
+    """
+    conocidas = [d for d in duraciones if d is not None]
+    if not conocidas:
+        return list(range(len(duraciones)))
+    mediana = statistics.median(conocidas)
+    return sorted(range(len(duraciones)), key=lambda i: -(duraciones[i] if duraciones[i] is not None else mediana))
+
+
+def clientes_concurrentes() -> int:
+    """Cantidad de trabajos del lote que se descargan en paralelo (MAX_CLIENTES_CONCURRENTES, 1 por defecto)."""
+    try:
+        return max(1, int(os.getenv("MAX_CLIENTES_CONCURRENTES", "1")))
+    except ValueError:
+        return 1
+
+
+class CupoConsultas:
+    """
+    Cupo de consultas disponibles del usuario de Mrbot durante un lote.
+
+    Descuenta localmente lo que consume cada trabajo y lo vuelve a leer de la API
+    cada `refresco_segundos`.
+
+    Args:
+        obtener: Función sin argumentos que devuelve el cupo disponible (int)
+        refresco_segundos: Intervalo entre lecturas del cupo durante el lote
+        reserva: Consultas que se dejan sin usar (para consultas manuales u otros procesos)
+    """
+
+    def __init__(self, obtener: Callable[[], int], refresco_segundos: float = 300.0, reserva: int = 0):
+        self._obtener = obtener
+        self.refresco_segundos = refresco_segundos
+        self.reserva = reserva
+        self._lock = threading.Lock()
+        self._disponibles: Optional[int] = None
+        self._leido_en: Optional[float] = None
+
+    @classmethod
+    def desde_entorno(cls, mrbot_user: str, mrbot_api_key: str, base_url: str) -> Optional["CupoConsultas"]:
+        """
+        Crea el cupo según PLANIFICAR_CUPO, USER_ENDPOINT, CUPO_REFRESCO_SEGUNDOS y CUPO_RESERVA.
+
+        Args:
+            mrbot_user: Email del usuario
+            mrbot_api_key: API key del usuario
+            base_url: URL base de Mrbot
+
+        Returns:
+            Optional[CupoConsultas]: None si la planificación está deshabilitada
+        """
+        if normalizar_si_no(os.getenv("PLANIFICAR_CUPO", "si")) != "si":
+            return None
+        from lib.caller_user import obtener_consultas_disponibles
+
+        user_endpoint = os.getenv("USER_ENDPOINT", "api/v1/user")
+
+        def obtener() -> int:
+            respuesta = obtener_consultas_disponibles(mrbot_user, mrbot_api_key, base_url, user_endpoint)
+            return leer_cupo(respuesta)
+
+        try:
+            refresco = float(os.getenv("CUPO_REFRESCO_SEGUNDOS", "300"))
+        except ValueError:
+            refresco = 300.0
+        try:
+            reserva = max(0, int(os.getenv("CUPO_RESERVA", "0")))
+        except ValueError:
+            reserva = 0
+        return cls(obtener, refresco, reserva)
+
+    @property
+    def disponibles(self) -> Optional[int]:
+        """Cupo utilizable (descontada la reserva), o None si no se pudo leer."""
+        with self._lock:
+            if self._disponibles is None:
+                return None
+            return max(0, self._disponibles - self.reserva)
+
+    def actualizar(self) -> Optional[int]:
+        """
+        Lee el cupo desde la API.
+
+        Si la lectura falla se conserva el último valor conocido; si nunca se pudo leer
+        el lote se ejecuta sin restricción de cupo.
+
+        Returns:
+            Optional[int]: Cupo utilizable
+        """
+        try:
+            valor = int(self._obtener())
+        except Exception as e:
+            print(f"No se pudo consultar el cupo de consultas disponibles: {e}")
+            valor = None
+        with self._lock:
+            self._leido_en = time.monotonic()
+            if valor is not None:
+                self._disponibles = valor
+        return self.disponibles
+
+    def refrescar_si_corresponde(self) -> None:
+        """Vuelve a leer el cupo si pasó el intervalo de refresco desde la última lectura."""
+        with self._lock:
+            vencido = self._leido_en is None or time.monotonic() - self._leido_en >= self.refresco_segundos
+        if vencido:
+            self.actualizar()
+
+    def alcanza(self, consultas: int) -> bool:
+        """Indica si el cupo permite ejecutar un trabajo de `consultas` consultas."""
+        disponibles = self.disponibles
+        return disponibles is None or consultas <= disponibles
+
+    def consumir(self, consultas: int) -> None:
+        """Descuenta localmente las consultas de un trabajo ejecutado."""
+        with self._lock:
+            if self._disponibles is not None:
+                self._disponibles -= consultas
+
+
+def leer_cupo(respuesta: Dict[str, Any]) -> int:
+    """
+    Extrae el cupo de la respuesta de `obtener_consultas_disponibles`.
+
+    Args:
+        respuesta: JSON de la API (el cupo puede venir en la raíz o dentro de 'data')
+
+    Returns:
+        int: Consultas disponibles
+    """
+    for datos in (respuesta, respuesta.get("data") if isinstance(respuesta, dict) else None):
+        if isinstance(datos, dict) and datos.get("consultas_disponibles") is not None:
+            return int(datos["consultas_disponibles"])
+    raise ValueError(f"Respuesta sin 'consultas_disponibles': {respuesta}")
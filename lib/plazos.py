@@ -0,0 +1,306 @@
+"""
+Módulo de timeouts, plazos por cliente y descargas cubiertas
+
+- Todas las llamadas HTTP usan timeouts de conexión y de lectura (TIMEOUT_CONEXION,
+  TIMEOUT_LECTURA para MinIO y TIMEOUT_CONSULTA para la API), de modo que una
+  conexión trabada no retiene un hilo de descarga para siempre.
+- PLAZO_CLIENTE limita el tiempo total de la descarga de cada cliente: los timeouts
+  se recortan al tiempo restante y al vencer se lanza `PlazoVencido`, con lo que el
+  cliente queda fallido en la bitácora y se reintenta en la próxima ejecución.
+- Con DESCARGA_CUBIERTA=si, una descarga que supera el p95 de las anteriores lanza
+  un duplicado y se conserva la que termine primero (la otra se cancela). El
+  duplicado solo se lanza si hay un lugar libre dentro del límite de descargas.
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+from lib.helpers import normalizar_si_no
+from lib.metricas import metricas, percentil
+
+T = TypeVar("T")
+
+_limite_cliente: contextvars.ContextVar = contextvars.ContextVar("limite_cliente", default=None)
+
+# Descargas observadas antes de empezar a cubrir las lentas, y cuántas se conservan para el p95
+MUESTRAS_MINIMAS_COBERTURA = 20
+MUESTRAS_COBERTURA = 200
+
+
+class PlazoVencido(TimeoutError):
+    """Se agotó el plazo de descarga del cliente (PLAZO_CLIENTE)."""
+
+
+class DescargaCancelada(Exception):
+    """La descarga fue cancelada porque su duplicado terminó primero."""
+
+
+def _segundos(variable: str, defecto: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(variable, str(defecto))))
+    except ValueError:
+        return defecto
+
+
+def plazo_cliente_segundos() -> float:
+    """Segundos máximos para la descarga de un cliente (PLAZO_CLIENTE; 0 = sin plazo)."""
+    return _segundos("PLAZO_CLIENTE", 0)
+
+
+@contextmanager
+def plazo_cliente(segundos: Optional[float] = None) -> Iterator[None]:
+    """
+    Fija el plazo de descarga del cliente en curso durante el bloque.
+
+    El plazo viaja en el contexto, así que lo heredan los hilos que se lanzan con
+    `contextvars.copy_context()` (consultas por ventana y descargas concurrentes).
+
+    Args:
+        segundos: Plazo en segundos; por defecto PLAZO_CLIENTE (0 = sin plazo)
+    """
+    segundos = plazo_cliente_segundos() if segundos is None else segundos
+    token = _limite_cliente.set(time.monotonic() + segundos if segundos > 0 else None)
+    try:
+        yield
+    finally:
+        _limite_cliente.reset(token)
+
+
+def tiempo_restante() -> Optional[float]:
+    """Segundos que le quedan al cliente en curso, o None si no tiene plazo."""
+    limite = _limite_cliente.get()
+    return None if limite is None else limite - time.monotonic()
+
+
+def verificar_plazo() -> None:
+    """Lanza `PlazoVencido` si se agotó el plazo del cliente en curso."""
+    restante = tiempo_restante()
+    if restante is not None and restante <= 0:
+        metricas.incrementar("plazos_vencidos")
+        raise PlazoVencido("Se agotó el plazo de descarga del cliente (PLAZO_CLIENTE)")
+
+
+def _timeout(lectura: float) -> Tuple[float, float]:
+    verificar_plazo()
+    conexion = _segundos("TIMEOUT_CONEXION", 10)
+    restante = tiempo_restante()
+    if restante is not None:
+        conexion, lectura = min(conexion, restante), min(lectura, restante)
+    return conexion, lectura
+
+
+def timeout_descarga() -> Tuple[float, float]:
+    """
+    Timeouts (conexión, lectura) de una descarga de MinIO, recortados al plazo del cliente.
+
+    Raises:
+        PlazoVencido: Si el plazo del cliente ya se agotó
+    """
+    return _timeout(_segundos("TIMEOUT_LECTURA", 60))
+
+
+def timeout_consulta() -> Tuple[float, float]:
+    """
+    Timeouts (conexión, lectura) de una consulta a la API, recortados al plazo del cliente.
+
+    La lectura es más larga que en las descargas porque la API consulta ARCA antes de responder.
+
+    Raises:
+        PlazoVencido: Si el plazo del cliente ya se agotó
+    """
+    return _timeout(_segundos("TIMEOUT_CONSULTA", 300))
+
+
+class HistorialLatencias:
+    """Latencias recientes de descarga para estimar el umbral de cobertura (p95)."""
+
+    def __init__(self, maximo: int = MUESTRAS_COBERTURA, minimo: int = MUESTRAS_MINIMAS_COBERTURA):
+        self.minimo = minimo
+        self._lock = threading.Lock()
+        self._latencias: Deque[float] = deque(maxlen=maximo)
+
+    def registrar(self, segundos: float) -> None:
+        with self._lock:
+            self._latencias.append(segundos)
+
+    def p95(self) -> Optional[float]:
+        """p95 de las latencias recientes, o None si todavía no hay suficientes."""
+        with self._lock:
+            if len(self._latencias) < self.minimo:
+                return None
+            latencias = list(self._latencias)
+        return percentil(latencias, 95)
+
+
+# Latencias de las descargas de MinIO de todo el proceso
+latencias_descarga = HistorialLatencias()
+
+
+def umbral_cobertura() -> Optional[float]:
+    """
+    Segundos tras los cuales se lanza un duplicado de una descarga (DESCARGA_CUBIERTA).
+
+    Returns:
+        Optional[float]: p95 de las descargas recientes; None si la cobertura está
+            desactivada o todavía no hay historial suficiente
+    """
+    if normalizar_si_no(os.getenv("DESCARGA_CUBIERTA", "no")) != "si":
+        return None
+    return latencias_descarga.p95()
+
+
+class DescargasEnCurso:
+    """
+    Descargas cubiertas en curso, para limitar los duplicados sin concurrencia adaptativa.
+
+    Con CONCURRENCIA_ADAPTATIVA el límite lo pone `ControladorConcurrencia`; sin ella, un
+    duplicado solo se lanza si las descargas en curso (originales y duplicados) no llegan a
+    MAX_WORKERS, así las cubiertas aprovechan los lugares libres sin duplicar las conexiones.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._en_curso = 0
+
+    @property
+    def en_curso(self) -> int:
+        """Descargas ejecutándose en este momento."""
+        with self._condicion:
+            return self._en_curso
+
+    def _liberar(self) -> None:
+        with self._condicion:
+            self._en_curso -= 1
+            self._condicion.notify_all()
+
+    @contextmanager
+    def ocupar(self) -> Iterator[None]:
+        """Cuenta una descarga original durante el bloque (nunca espera)."""
+        with self._condicion:
+            self._en_curso += 1
+        try:
+            yield
+        finally:
+            self._liberar()
+
+    def reservar(self) -> Optional[Callable[[], None]]:
+        """
+        Ocupa un lugar para un duplicado si hay menos de MAX_WORKERS descargas en curso.
+
+        Returns:
+            Optional[Callable[[], None]]: Función que libera el lugar, o None si no hay lugar
+        """
+        try:
+            limite = int(os.getenv("MAX_WORKERS", "10"))
+        except ValueError:
+            limite = 10
+        with self._condicion:
+            if self._en_curso >= limite:
+                return None
+            self._en_curso += 1
+        return self._liberar
+
+    def esperar_libres(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que terminen todas las descargas en curso (incluidos los intentos perdidos).
+
+        Returns:
+            bool: False si venció `timeout` antes
+        """
+        with self._condicion:
+            return self._condicion.wait_for(lambda: self._en_curso == 0, timeout)
+
+
+# Descargas cubiertas de todo el proceso
+descargas_en_curso = DescargasEnCurso()
+
+
+def ejecutar_con_cobertura(intento: Callable[[threading.Event], T], umbral: float,
+                           reservar: Optional[Callable[[], Optional[Callable[[], None]]]] = None) -> T:
+    """
+    Ejecuta una descarga y, si tarda más que `umbral`, lanza un duplicado.
+
+    Devuelve el resultado del primer intento que termine bien y cancela el otro
+    (cada intento recibe un `threading.Event` que debe revisar entre bloques y
+    lanzar `DescargaCancelada` si está activo). Si ambos fallan se propaga el error
+    del último.
+
+    Args:
+        intento: Función que hace la descarga completa y devuelve su resultado
+        umbral: Segundos de espera antes de lanzar el duplicado
+        reservar: Función opcional que ocupa un lugar de descarga para el duplicado sin esperar
+            (`ControladorConcurrencia.reservar` o `DescargasEnCurso.reservar`); devuelve la función
+            que lo libera, o None si no hay lugar. Mientras no haya lugar se vuelve a intentar
+            cada `umbral` segundos. El lugar se libera cuando terminan los dos intentos, porque
+            el que pierde sigue usando una conexión hasta notar la cancelación o su timeout
+
+    Returns:
+        El resultado del intento ganador
+    """
+    resultados: "queue.Queue[Tuple[int, bool, Any]]" = queue.Queue()
+    cancelaciones = [threading.Event(), threading.Event()]
+    lock = threading.Lock()
+    estado: Dict[str, Any] = {"vivos": 0, "liberar": None}
+
+    def _correr(indice: int) -> None:
+        try:
+            resultados.put((indice, True, intento(cancelaciones[indice])))
+        except BaseException as exc:
+            resultados.put((indice, False, exc))
+        finally:
+            with lock:
+                estado["vivos"] -= 1
+                liberar = estado["liberar"] if estado["vivos"] == 0 else None
+            if liberar is not None:
+                liberar()
+
+    def _lanzar(indice: int, liberar: Optional[Callable[[], None]] = None) -> None:
+        with lock:
+            estado["vivos"] += 1
+            if liberar is not None:
+                estado["liberar"] = liberar
+        # El duplicado hereda el contexto (cliente y plazo) del intento original
+        hilo = threading.Thread(target=contextvars.copy_context().run, args=(_correr, indice), daemon=True)
+        hilo.start()
+
+    _lanzar(0)
+    lanzados = 1
+    try:
+        resultado = resultados.get(timeout=umbral)
+    except queue.Empty:
+        resultado = None
+        while resultado is None:
+            liberar = reservar() if reservar is not None else None
+            if reservar is None or liberar is not None:
+                metricas.incrementar("descargas_cubiertas")
+                _lanzar(1, liberar)
+                lanzados = 2
+                resultado = resultados.get()
+            else:
+                # Límite de descargas ocupado: duplicar ahora solo sumaría congestión
+                try:
+                    resultado = resultados.get(timeout=umbral)
+                except queue.Empty:
+                    pass
+        if lanzados == 1:
+            metricas.incrementar("coberturas_omitidas")
+
+    pendientes = lanzados - 1
+    while True:
+        indice, exito, valor = resultado
+        if exito:
+            for otro, cancelacion in enumerate(cancelaciones):
+                if otro != indice:
+                    cancelacion.set()
+            if indice == 1:
+                metricas.incrementar("coberturas_ganadas")
+            return valor
+        if not pendientes:
+            raise valor
+        pendientes -= 1
+        resultado = resultados.get()
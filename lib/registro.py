@@ -0,0 +1,155 @@
+"""
+Módulo de registro (logging) no bloqueante
+
+Los mensajes de las descargas se encolan desde los hilos de trabajo y un único
+hilo los escribe en consola, de modo que la E/S de consola no frena las descargas.
+Cada mensaje lleva el cliente en curso (ver `metricas.contexto_cliente`) y se
+ocultan API keys, claves y contraseñas. El nivel se configura con LOG_LEVEL; las
+respuestas completas de la API solo se registran en DEBUG y recortadas.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+from typing import Optional, Set
+
+from lib.metricas import metricas
+
+NOMBRE_RAIZ = "mrbot"
+FORMATO = "%(asctime)s %(levelname)-7s [%(cliente)s] %(message)s"
+
+# Claves cuyos valores se ocultan en los mensajes ("x-api-key": "...", contrasena=..., etc.)
+_PATRON_CREDENCIALES = re.compile(
+    r"""(?P<clave>["']?(?:x-api-key|api[_-]?key|contrasena|contraseña|clave(?:_representante)?|password|token)["']?"""
+    r"""\s*[:=]\s*)(?P<comillas>["']?)(?P<valor>[^"',\s}]+)""",
+    re.IGNORECASE,
+)
+OCULTO = "***"
+
+_lock = threading.Lock()
+_oyente: Optional[logging.handlers.QueueListener] = None
+_secretos: Set[str] = set()
+
+
+def registrar_secreto(valor: Optional[str]) -> None:
+    """Agrega un valor (API key, clave fiscal) que nunca debe aparecer en el registro."""
+    if valor and len(str(valor)) >= 6:
+        with _lock:
+            _secretos.add(str(valor))
+
+
+def ocultar_credenciales(texto: str) -> str:
+    """
+    Reemplaza por '***' los valores de credenciales en un texto.
+
+    Args:
+        texto: Mensaje a registrar
+
+    Returns:
+        str: Mensaje sin API keys, claves ni secretos registrados
+    """
+    texto = _PATRON_CREDENCIALES.sub(lambda m: f"{m['clave']}{m['comillas']}{OCULTO}", texto)
+    with _lock:
+        secretos = sorted(_secretos, key=len, reverse=True)
+    for secreto in secretos:
+        texto = texto.replace(secreto, OCULTO)
+    return texto
+
+
+def recortar(texto: str, limite: Optional[int] = None) -> str:
+    """
+    Recorta un texto largo (p.ej. el cuerpo de una respuesta) para el registro.
+
+    Args:
+        texto: Texto a recortar
+        limite: Caracteres a conservar (por defecto LOG_MAX_RESPUESTA, 2000)
+
+    Returns:
+        str: Texto recortado con la cantidad de caracteres omitidos
+    """
+    if limite is None:
+        try:
+            limite = int(os.getenv("LOG_MAX_RESPUESTA", "2000"))
+        except ValueError:
+            limite = 2000
+    if len(texto) <= limite:
+        return texto
+    return f"{texto[:limite]}... ({len(texto) - limite} caracteres omitidos)"
+
+
+class _FiltroContexto(logging.Filter):
+    """Agrega el cliente en curso y oculta credenciales antes de encolar el mensaje."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.cliente = metricas.cliente_actual() or "-"
+        record.msg = ocultar_credenciales(record.getMessage())
+        record.args = None
+        return True
+
+
+def nivel_registro() -> int:
+    """Nivel configurado en LOG_LEVEL (DEBUG, INFO, WARNING, ERROR; INFO por defecto)."""
+    nivel = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").strip().upper())
+    return nivel if isinstance(nivel, int) else logging.INFO
+
+
+def configurar_registro(nivel: Optional[int] = None) -> logging.Logger:
+    """
+    Configura el registro asíncrono (una sola vez por proceso).
+
+    Args:
+        nivel: Nivel de registro; por defecto LOG_LEVEL
+
+    Returns:
+        logging.Logger: Registrador raíz del proyecto
+    """
+    global _oyente
+    raiz = logging.getLogger(NOMBRE_RAIZ)
+    with _lock:
+        if _oyente is None:
+            consola = logging.StreamHandler(sys.stdout)
+            consola.setFormatter(logging.Formatter(FORMATO, "%H:%M:%S"))
+            cola: queue.Queue = queue.Queue(-1)
+            manejador = logging.handlers.QueueHandler(cola)
+            manejador.addFilter(_FiltroContexto())
+            raiz.addHandler(manejador)
+            raiz.propagate = False
+            _oyente = logging.handlers.QueueListener(cola, consola, respect_handler_level=True)
+            _oyente.start()
+            atexit.register(detener_registro)
+    registrar_secreto(os.getenv("MRBOT_API_KEY"))
+    raiz.setLevel(nivel if nivel is not None else nivel_registro())
+    return raiz
+
+
+def detener_registro() -> None:
+    """Vacía la cola de mensajes pendientes y detiene el hilo de escritura."""
+    global _oyente
+    with _lock:
+        oyente, _oyente = _oyente, None
+    if oyente is not None:
+        oyente.stop()
+        raiz = logging.getLogger(NOMBRE_RAIZ)
+        for manejador in list(raiz.handlers):
+            if isinstance(manejador, logging.handlers.QueueHandler):
+                raiz.removeHandler(manejador)
+
+
+def obtener_registrador(nombre: str) -> logging.Logger:
+    """
+    Registrador de un módulo del proyecto.
+
+    Los mensajes se escriben una vez llamado `configurar_registro` (lo hacen `control.py`
+    y la GUI después de cargar el .env); antes solo se muestran advertencias y errores.
+
+    Args:
+        nombre: Nombre del módulo (p.ej. 'caller_mc')
+
+    Returns:
+        logging.Logger: Registrador 'mrbot.<nombre>'
+    """
+    return logging.getLogger(f"{NOMBRE_RAIZ}.{nombre}")
@@ -0,0 +1,176 @@
+"""
+Módulo de tipos de comprobante de AFIP
+
+Registro de los códigos de 'Tipo de Comprobante' de Mis Comprobantes con su letra,
+su clase (factura, nota de débito, nota de crédito, recibo, otro) y si computa como
+ingreso. El registro se compila en arreglos densos indexados por código, de modo que
+el signo, la inclusión y la clase de millones de comprobantes se obtienen con una
+sola indexación de NumPy. Los códigos que no están en el registro se informan en
+lugar de tratarse en silencio como facturas.
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+FACTURA = "Factura"
+NOTA_DEBITO = "Nota de Débito"
+NOTA_CREDITO = "Nota de Crédito"
+RECIBO = "Recibo"
+OTRO = "Otro"
+DESCONOCIDO = "Desconocido"
+
+# Signo con que cada clase suma al importe facturado
+SIGNOS = {FACTURA: 1, NOTA_DEBITO: 1, NOTA_CREDITO: -1, RECIBO: 1, OTRO: 1}
+
+# (código, descripción, letra, clase, computa como ingreso)
+TIPOS_COMPROBANTE: List[Tuple[int, str, str, str, bool]] = [
+    (1, "Factura A", "A", FACTURA, True),
+    (2, "Nota de Débito A", "A", NOTA_DEBITO, True),
+    (3, "Nota de Crédito A", "A", NOTA_CREDITO, True),
+    (4, "Recibo A", "A", RECIBO, True),
+    (5, "Nota de Venta al Contado A", "A", FACTURA, True),
+    (6, "Factura B", "B", FACTURA, True),
+    (7, "Nota de Débito B", "B", NOTA_DEBITO, True),
+    (8, "Nota de Crédito B", "B", NOTA_CREDITO, True),
+    (9, "Recibo B", "B", RECIBO, True),
+    (10, "Nota de Venta al Contado B", "B", FACTURA, True),
+    (11, "Factura C", "C", FACTURA, True),
+    (12, "Nota de Débito C", "C", NOTA_DEBITO, True),
+    (13, "Nota de Crédito C", "C", NOTA_CREDITO, True),
+    (15, "Recibo C", "C", RECIBO, True),
+    (16, "Nota de Venta al Contado C", "C", FACTURA, True),
+    (17, "Liquidación de Servicios Públicos Clase A", "A", FACTURA, True),
+    (18, "Liquidación de Servicios Públicos Clase B", "B", FACTURA, True),
+    (19, "Factura de Exportación E", "E", FACTURA, True),
+    (20, "Nota de Débito por Operaciones con el Exterior E", "E", NOTA_DEBITO, True),
+    (21, "Nota de Crédito por Operaciones con el Exterior E", "E", NOTA_CREDITO, True),
+    (22, "Factura - Permiso de Exportación Simplificado", "E", FACTURA, True),
+    (27, "Liquidación Única Comercial Impositiva Clase A", "A", FACTURA, True),
+    (28, "Liquidación Única Comercial Impositiva Clase B", "B", FACTURA, True),
+    (29, "Liquidación Única Comercial Impositiva Clase C", "C", FACTURA, True),
+    (33, "Liquidación Primaria de Granos", "", OTRO, True),
+    (34, "Comprobante A del Apartado A inc. f) RG 1415", "A", FACTURA, True),
+    (35, "Comprobante B del Anexo I, Apartado A inc. f) RG 1415", "B", FACTURA, True),
+    (37, "Nota de Débito o Documento Equivalente RG 1415", "", NOTA_DEBITO, True),
+    (38, "Nota de Crédito o Documento Equivalente RG 1415", "", NOTA_CREDITO, True),
+    (39, "Otros Comprobantes A RG 1415", "A", OTRO, True),
+    (40, "Otros Comprobantes B RG 1415", "B", OTRO, True),
+    (41, "Otros Comprobantes C RG 1415", "C", OTRO, True),
+    (43, "Nota de Crédito Liquidación Única Comercial Impositiva Clase B", "B", NOTA_CREDITO, True),
+    (44, "Nota de Crédito Liquidación Única Comercial Impositiva Clase C", "C", NOTA_CREDITO, True),
+    (45, "Nota de Débito Liquidación Única Comercial Impositiva Clase A", "A", NOTA_DEBITO, True),
+    (46, "Nota de Débito Liquidación Única Comercial Impositiva Clase B", "B", NOTA_DEBITO, True),
+    (47, "Nota de Débito Liquidación Única Comercial Impositiva Clase C", "C", NOTA_DEBITO, True),
+    (48, "Nota de Crédito Liquidación Única Comercial Impositiva Clase A", "A", NOTA_CREDITO, True),
+    # Lo emite el comprador: no es un ingreso del emisor
+    (49, "Comprobante de Compra de Bienes Usados a Consumidor Final", "", OTRO, False),
+    (51, "Factura M", "M", FACTURA, True),
+    (52, "Nota de Débito M", "M", NOTA_DEBITO, True),
+    (53, "Nota de Crédito M", "M", NOTA_CREDITO, True),
+    (54, "Recibo M", "M", RECIBO, True),
+    (55, "Nota de Venta al Contado M", "M", FACTURA, True),
+    (60, "Cuenta de Venta y Líquido Producto A", "A", OTRO, True),
+    (61, "Cuenta de Venta y Líquido Producto B", "B", OTRO, True),
+    (63, "Liquidación A", "A", OTRO, True),
+    (64, "Liquidación B", "B", OTRO, True),
+    (81, "Tique Factura A", "A", FACTURA, True),
+    (82, "Tique Factura B", "B", FACTURA, True),
+    (83, "Tique", "", FACTURA, True),
+    (90, "Nota de Crédito Otros Comprobantes que no Cumplen con la RG 1415", "", NOTA_CREDITO, True),
+    (110, "Tique Nota de Crédito", "", NOTA_CREDITO, True),
+    (111, "Tique Factura C", "C", FACTURA, True),
+    (112, "Tique Nota de Crédito A", "A", NOTA_CREDITO, True),
+    (113, "Tique Nota de Crédito B", "B", NOTA_CREDITO, True),
+    (114, "Tique Nota de Crédito C", "C", NOTA_CREDITO, True),
+    (115, "Tique Nota de Débito A", "A", NOTA_DEBITO, True),
+    (116, "Tique Nota de Débito B", "B", NOTA_DEBITO, True),
+    (117, "Tique Nota de Débito C", "C", NOTA_DEBITO, True),
+    (118, "Tique Factura M", "M", FACTURA, True),
+    (119, "Tique Nota de Crédito M", "M", NOTA_CREDITO, True),
+    (120, "Tique Nota de Débito M", "M", NOTA_DEBITO, True),
+    (201, "Factura de Crédito Electrónica MiPyMEs (FCE) A", "A", FACTURA, True),
+    (202, "Nota de Débito Electrónica MiPyMEs (FCE) A", "A", NOTA_DEBITO, True),
+    (203, "Nota de Crédito Electrónica MiPyMEs (FCE) A", "A", NOTA_CREDITO, True),
+    (206, "Factura de Crédito Electrónica MiPyMEs (FCE) B", "B", FACTURA, True),
+    (207, "Nota de Débito Electrónica MiPyMEs (FCE) B", "B", NOTA_DEBITO, True),
+    (208, "Nota de Crédito Electrónica MiPyMEs (FCE) B", "B", NOTA_CREDITO, True),
+    (211, "Factura de Crédito Electrónica MiPyMEs (FCE) C", "C", FACTURA, True),
+    (212, "Nota de Débito Electrónica MiPyMEs (FCE) C", "C", NOTA_DEBITO, True),
+    (213, "Nota de Crédito Electrónica MiPyMEs (FCE) C", "C", NOTA_CREDITO, True),
+]
+
+
+class RegistroTipos:
+    """
+    Registro de tipos de comprobante compilado en arreglos de búsqueda.
+
+    Cada atributo es un arreglo indexado por código; la última posición corresponde
+    a los códigos desconocidos (fuera del registro, negativos o faltantes), que
+    computan como facturas.
+
+    Args:
+        tipos: Filas (código, descripción, letra, clase, computa) del registro
+    """
+
+    def __init__(self, tipos: Sequence[Tuple[int, str, str, str, bool]]):
+        self.tipos = {codigo: (descripcion, letra, clase, computa) for codigo, descripcion, letra, clase, computa in tipos}
+        self.maximo = max(self.tipos)
+        self.desconocido = self.maximo + 1
+        self.clases = np.array(list(SIGNOS) + [DESCONOCIDO], dtype=object)
+        indice_clase = {clase: posicion for posicion, clase in enumerate(self.clases)}
+
+        tamano = self.maximo + 2
+        self.conocido = np.zeros(tamano, dtype=bool)
+        self.signo = np.ones(tamano, dtype=np.int8)
+        self.clase = np.full(tamano, indice_clase[DESCONOCIDO], dtype=np.int8)
+        self.letra = np.full(tamano, "", dtype=object)
+        for codigo, (_, letra, clase, computa) in self.tipos.items():
+            self.conocido[codigo] = True
+            self.signo[codigo] = SIGNOS[clase] if computa else 0
+            self.clase[codigo] = indice_clase[clase]
+            self.letra[codigo] = letra
+
+    def posiciones(self, codigos: Any) -> np.ndarray:
+        """Posición de cada código en los arreglos (los desconocidos van a la última)."""
+        valores = pd.to_numeric(pd.Series(codigos, copy=False), errors="coerce").to_numpy(dtype=np.float64)
+        valido = ~np.isnan(valores) & (valores >= 0) & (valores <= self.maximo)
+        posiciones = np.where(valido, valores, self.desconocido).astype(np.int64)
+        # Un código no entero (p.ej. 1.5) tampoco es conocido
+        posiciones[valido & (valores != posiciones)] = self.desconocido
+        return posiciones
+
+    def signos(self, codigos: Any) -> np.ndarray:
+        """Signo de cada comprobante: 1, -1 (notas de crédito) o 0 (no computa como ingreso)."""
+        return self.signo[self.posiciones(codigos)]
+
+    def clases_de(self, codigos: Any) -> np.ndarray:
+        """Clase de cada comprobante ('Factura', 'Nota de Crédito', ..., 'Desconocido')."""
+        return self.clases[self.clase[self.posiciones(codigos)]]
+
+    def letras(self, codigos: Any) -> np.ndarray:
+        """Letra de cada comprobante ('' si no tiene o es desconocido)."""
+        return self.letra[self.posiciones(codigos)]
+
+    def desconocidos(self, codigos: Any) -> Dict[Any, int]:
+        """
+        Códigos que no están en el registro y cuántos comprobantes tienen.
+
+        Args:
+            codigos: Columna 'Tipo' del consolidado
+
+        Returns:
+            Dict[Any, int]: Cantidad de comprobantes por código desconocido
+        """
+        serie = pd.Series(codigos, copy=False)
+        fuera = ~self.conocido[self.posiciones(serie)]
+        if not fuera.any():
+            return {}
+        return serie[fuera].value_counts(dropna=False).to_dict()
+
+    def codigos(self, clase: str) -> List[int]:
+        """Códigos del registro de una clase, en orden."""
+        return sorted(codigo for codigo, (_, _, clase_tipo, _) in self.tipos.items() if clase_tipo == clase)
+
+
+registro_tipos = RegistroTipos(TIPOS_COMPROBANTE)
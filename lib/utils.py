@@ -1,65 +1,202 @@
+import base64
+import contextvars
+import hashlib
+import io
 import json
 import os
 import re
 import shutil
+import sys
+import threading
+import time
+import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
 from zipfile import ZipFile
 
 import requests
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: decodificador JSON más rápido
+    orjson = None
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.almacen_pdf import AlmacenPDF
+from lib.concurrencia import ControladorConcurrencia, controlador_descargas
+from lib.metricas import metricas
+from lib.plazos import (DescargaCancelada, PlazoVencido, descargas_en_curso, ejecutar_con_cobertura,
+                        latencias_descarga, timeout_descarga, umbral_cobertura, verificar_plazo)
+from lib.registro import obtener_registrador
+
+registro = obtener_registrador("utils")
+
+
+def nombre_archivo_descarga(url: str, content_disposition: Optional[str] = None) -> str:
+    """
+    Determina el nombre de archivo de una descarga a partir del encabezado `content-disposition` o de la URL.
+
+    Args:
+        url (str): URL del recurso.
+        content_disposition (Optional[str]): valor del encabezado `content-disposition`, si existe.
+
+    Returns:
+        str: Nombre de archivo sugerido.
+    """
+    filename = None
+
+    if content_disposition:
+        m = re.search(r"filename\*?=(?:UTF-8''|\"?)([^\";]+)\"?", content_disposition, flags=re.IGNORECASE)
+        if m:
+            filename = m.group(1)
+
+    if not filename:
+        path = urlparse(url).path
+        filename = unquote(path.rsplit('/', 1)[-1]) or 'downloaded_file'
+
+    return filename
+
 
 def descargar_archivo(
     url: str,
     nombre_archivo: None | str = None,
-    directorio_objetivo: str | None = None
+    directorio_objetivo: str | None = None,
+    almacen: Optional[AlmacenPDF] = None
 ) -> str:
     """
     Descarga un recurso binario via URL conservando el nombre sugerido por el servidor cuando sea posible.
 
+    La descarga usa los timeouts de `lib.plazos` y se escribe en un temporal que
+    reemplaza al destino al terminar. Con DESCARGA_CUBIERTA=si, si tarda más que el
+    p95 de las descargas anteriores se lanza un duplicado y se conserva el primero
+    que termine.
+
     Args:
         url (str): URL desde donde se descarga el archivo.
         nombre_archivo (Optional[str]): nombre local en el que guardar el archivo.
         directorio_objetivo (Optional[str]): directorio donde guardar el archivo.
+        almacen (Optional[AlmacenPDF]): almacén por contenido; el hash se calcula
+            durante la descarga y el destino queda enlazado al objeto almacenado.
 
     Returns:
         str: Ruta completa del archivo descargado.
     """
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
+    umbral = umbral_cobertura()
+    if umbral is None:
+        return _intento_descarga_archivo(url, nombre_archivo, directorio_objetivo, almacen)
+    return _descarga_cubierta(
+        lambda cancelar: _intento_descarga_archivo(url, nombre_archivo, directorio_objetivo, almacen, cancelar), umbral
+    )
 
-    filename = None
-    cd = response.headers.get('content-disposition')
 
-    if cd:
-        m = re.search(r"filename\*?=(?:UTF-8''|\"?)([^\";]+)\"?", cd, flags=re.IGNORECASE)
-        if m:
-            filename = m.group(1)
+def _descarga_cubierta(intento, umbral: float):
+    """
+    Ejecuta `intento` con `ejecutar_con_cobertura` respetando el límite de concurrencia.
 
-    if not filename:
-        from urllib.parse import unquote, urlparse
-        path = urlparse(url).path
-        filename = unquote(path.rsplit('/', 1)[-1]) or 'downloaded_file'
+    El duplicado solo se lanza si hay un lugar libre: en el controlador adaptativo si
+    lo hay, o por debajo de MAX_WORKERS descargas cubiertas en curso si no. Los intentos cubiertos no registran sus fallas: un intento cancelado o que
+    falló mientras el otro terminaba bien no es una descarga fallida. Se registra una
+    sola falla si la descarga no se pudo completar con ningún intento.
+    """
+    controlador = controlador_descargas()
+    inicio = time.perf_counter()
+    try:
+        if controlador is not None:
+            # El intento original ya ocupa un turno del controlador (`_descargar_con_turno`)
+            return ejecutar_con_cobertura(intento, umbral, reservar=controlador.reservar)
+        with descargas_en_curso.ocupar():
+            return ejecutar_con_cobertura(intento, umbral, reservar=descargas_en_curso.reservar)
+    except Exception:
+        metricas.registrar_descarga(0, time.perf_counter() - inicio, exito=False)
+        raise
+
+
+def _intento_descarga_archivo(
+    url: str,
+    nombre_archivo: Optional[str],
+    directorio_objetivo: Optional[str],
+    almacen: Optional[AlmacenPDF] = None,
+    cancelar: Optional[threading.Event] = None
+) -> str:
+    """Un intento de `descargar_archivo`; se interrumpe si se activa `cancelar`."""
+    inicio = time.perf_counter()
+    total_bytes = 0
+    temporal = None
+    digest = hashlib.sha256() if almacen is not None else None
+    try:
+        with requests.get(url, stream=True, timeout=timeout_descarga()) as response:
+            response.raise_for_status()
+
+            filename = nombre_archivo_descarga(url, response.headers.get('content-disposition'))
+
+            save_as = nombre_archivo if nombre_archivo else filename
+
+            if directorio_objetivo:
+                os.makedirs(directorio_objetivo, exist_ok=True)
+                save_as = os.path.join(directorio_objetivo, save_as)
+
+            # Temporal propio de cada intento: una descarga cubierta corre dos a la vez
+            temporal = f"{save_as}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(temporal, "wb") as file:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if cancelar is not None and cancelar.is_set():
+                        raise DescargaCancelada(url)
+                    verificar_plazo()
+                    if chunk:
+                        file.write(chunk)
+                        total_bytes += len(chunk)
+                        if digest is not None:
+                            digest.update(chunk)
+        if almacen is not None:
+            almacen.incorporar(temporal, digest.hexdigest(), save_as, url)
+        else:
+            os.replace(temporal, save_as)
+    except DescargaCancelada:
+        os.remove(temporal)
+        raise
+    except Exception:
+        if temporal and os.path.exists(temporal):
+            os.remove(temporal)
+        if cancelar is None:
+            metricas.registrar_descarga(total_bytes, time.perf_counter() - inicio, exito=False)
+        raise
+
+    segundos = time.perf_counter() - inicio
+    metricas.registrar_descarga(total_bytes, segundos)
+    latencias_descarga.registrar(segundos)
+    registro.debug("Archivo guardado como: %s", save_as)
+    return save_as
 
-    save_as = nombre_archivo if nombre_archivo else filename
-    
-    if directorio_objetivo:
-        os.makedirs(directorio_objetivo, exist_ok=True)
-        save_as = os.path.join(directorio_objetivo, save_as)
 
-    with open(save_as, "wb") as file:
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                file.write(chunk)
+def _descargar_con_turno(controlador: Optional[ControladorConcurrencia], descarga, *args):
+    """
+    Ejecuta una descarga dentro de un turno del controlador de concurrencia, si lo hay.
 
-    print(f"Archivo guardado como: {save_as}")
-    return save_as
+    Args:
+        controlador (Optional[ControladorConcurrencia]): Controlador adaptativo o None.
+        descarga: `descargar_archivo` o `descargar_contenido`.
+        *args: Argumentos de la descarga.
+
+    Returns:
+        El resultado de la descarga.
+    """
+    if controlador is None:
+        return descarga(*args)
+    with controlador.turno() as medicion:
+        resultado = descarga(*args)
+        medicion["bytes"] = len(resultado[1]) if isinstance(resultado, tuple) else os.path.getsize(resultado)
+    return resultado
 
 
 def descargar_archivos_concurrente(
     urls: List[Tuple[str, Optional[str], Optional[str]]],
-    max_workers: Optional[int] = None
+    max_workers: Optional[int] = None,
+    almacen: Optional[AlmacenPDF] = None
 ) -> List[str]:
     """
     Descarga múltiples archivos de forma concurrente usando ThreadPoolExecutor.
@@ -68,20 +205,28 @@ def descargar_archivos_concurrente(
         urls (List[Tuple[str, Optional[str], Optional[str]]]): Lista de tuplas con 
             (url, nombre_archivo, directorio_objetivo) para cada descarga.
         max_workers (Optional[int]): Número máximo de workers concurrentes. 
-            Si es None, se obtiene de la variable de entorno MAX_WORKERS (default: 10).
+            Si es None, se obtiene de la variable de entorno MAX_WORKERS (default: 10),
+            o lo ajusta el controlador adaptativo con CONCURRENCIA_ADAPTATIVA=si.
+        almacen (Optional[AlmacenPDF]): almacén por contenido donde guardar los archivos.
 
     Returns:
         List[str]: Lista de rutas de archivos descargados exitosamente.
     """
+    controlador = None
     if max_workers is None:
         load_dotenv()
-        max_workers = int(os.getenv("MAX_WORKERS", "10"))
+        controlador = controlador_descargas()
+        max_workers = controlador.maximo if controlador else int(os.getenv("MAX_WORKERS", "10"))
 
     rutas_descargadas = []
-    
+    plazo_vencido = None
+    fallidas = 0
+
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Cada tarea hereda el contexto (cliente actual) para las métricas
         futures = {
-            executor.submit(descargar_archivo, url, nombre, directorio): (url, nombre, directorio)
+            executor.submit(contextvars.copy_context().run, _descargar_con_turno, controlador,
+                            descargar_archivo, url, nombre, directorio, almacen): (url, nombre, directorio)
             for url, nombre, directorio in urls
         }
         
@@ -90,12 +235,195 @@ def descargar_archivos_concurrente(
             try:
                 ruta = future.result()
                 rutas_descargadas.append(ruta)
+            except PlazoVencido as exc:
+                plazo_vencido = exc
             except Exception as exc:
-                print(f"Error descargando {url}: {exc}")
-    
+                fallidas += 1
+                registro.warning("Error descargando %s: %s", url, exc)
+
+    if plazo_vencido:
+        # Descarga incompleta: el cliente debe quedar fallido para reintentarlo
+        raise plazo_vencido
+    if fallidas:
+        # Un timeout recortado al plazo del cliente también deja la descarga incompleta
+        verificar_plazo()
     return rutas_descargadas
 
 
+# Caracteres base64 decodificados por bloque (múltiplo de 4)
+TAMANO_BLOQUE_BASE64 = 256 * 1024
+
+
+def decodificar_base64(texto: str, destino: BinaryIO) -> int:
+    """
+    Decodifica un contenido base64 por bloques escribiéndolo en `destino`.
+
+    Evita crear una segunda copia completa del contenido (el texto y los bytes
+    decodificados) y tolera saltos de línea y el prefijo `data:...;base64,`.
+
+    Args:
+        texto (str): Contenido en base64.
+        destino (BinaryIO): Archivo o buffer binario donde escribir.
+
+    Returns:
+        int: Cantidad de bytes escritos.
+    """
+    inicio = texto.find(",", 0, 100) + 1 if texto.startswith("data:") else 0
+    total = 0
+    resto = ""
+    for posicion in range(inicio, len(texto), TAMANO_BLOQUE_BASE64):
+        bloque = resto + "".join(texto[posicion:posicion + TAMANO_BLOQUE_BASE64].split())
+        corte = len(bloque) - len(bloque) % 4
+        if corte:
+            total += destino.write(base64.b64decode(bloque[:corte], validate=True))
+        resto = bloque[corte:]
+    if resto:
+        raise ValueError("Contenido base64 incompleto")
+    return total
+
+
+def guardar_base64(texto: str, ruta: str) -> str:
+    """
+    Guarda en disco un archivo recibido en base64 dentro de la respuesta de la API.
+
+    Se escribe en un temporal que reemplaza al destino al terminar.
+
+    Args:
+        texto (str): Contenido en base64.
+        ruta (str): Ruta del archivo a guardar.
+
+    Returns:
+        str: Ruta del archivo guardado.
+    """
+    inicio = time.perf_counter()
+    temporal = f"{ruta}.tmp"
+    try:
+        with open(temporal, "wb") as file:
+            total_bytes = decodificar_base64(texto, file)
+        os.replace(temporal, ruta)
+    except Exception:
+        metricas.registrar_descarga(0, time.perf_counter() - inicio, endpoint="inline", exito=False)
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    metricas.registrar_descarga(total_bytes, time.perf_counter() - inicio, endpoint="inline")
+    registro.debug("Archivo guardado como: %s", ruta)
+    return ruta
+
+
+def contenido_base64(texto: str) -> bytes:
+    """
+    Decodifica en memoria un archivo recibido en base64 dentro de la respuesta de la API.
+
+    Args:
+        texto (str): Contenido en base64.
+
+    Returns:
+        bytes: Contenido decodificado.
+    """
+    inicio = time.perf_counter()
+    buffer = io.BytesIO()
+    total_bytes = decodificar_base64(texto, buffer)
+    metricas.registrar_descarga(total_bytes, time.perf_counter() - inicio, endpoint="inline")
+    return buffer.getvalue()
+
+
+def descargar_contenido(url: str) -> Tuple[str, bytes]:
+    """
+    Descarga un recurso binario en memoria, sin escribirlo en disco.
+
+    Usa los mismos timeouts y la misma cobertura de descargas lentas que `descargar_archivo`.
+
+    Args:
+        url (str): URL desde donde se descarga el archivo.
+
+    Returns:
+        Tuple[str, bytes]: Nombre sugerido del archivo y su contenido.
+    """
+    umbral = umbral_cobertura()
+    if umbral is None:
+        return _intento_descarga_contenido(url)
+    return _descarga_cubierta(lambda cancelar: _intento_descarga_contenido(url, cancelar), umbral)
+
+
+def _intento_descarga_contenido(url: str, cancelar: Optional[threading.Event] = None) -> Tuple[str, bytes]:
+    """Un intento de `descargar_contenido`; se interrumpe si se activa `cancelar`."""
+    inicio = time.perf_counter()
+    partes = []
+    try:
+        with requests.get(url, stream=True, timeout=timeout_descarga()) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if cancelar is not None and cancelar.is_set():
+                    raise DescargaCancelada(url)
+                verificar_plazo()
+                partes.append(chunk)
+            filename = nombre_archivo_descarga(url, response.headers.get('content-disposition'))
+    except DescargaCancelada:
+        raise
+    except Exception:
+        if cancelar is None:
+            metricas.registrar_descarga(sum(map(len, partes)), time.perf_counter() - inicio, exito=False)
+        raise
+
+    contenido = b"".join(partes)
+    segundos = time.perf_counter() - inicio
+    metricas.registrar_descarga(len(contenido), segundos)
+    latencias_descarga.registrar(segundos)
+    return filename, contenido
+
+
+def descargar_contenidos_concurrente(
+    urls: List[str],
+    max_workers: Optional[int] = None
+) -> List[Tuple[str, str, bytes]]:
+    """
+    Descarga múltiples recursos en memoria de forma concurrente.
+
+    Args:
+        urls (List[str]): Lista de URLs a descargar.
+        max_workers (Optional[int]): Número máximo de workers concurrentes.
+            Si es None, se obtiene de la variable de entorno MAX_WORKERS (default: 10),
+            o lo ajusta el controlador adaptativo con CONCURRENCIA_ADAPTATIVA=si.
+
+    Returns:
+        List[Tuple[str, str, bytes]]: Lista de tuplas (url, nombre_archivo, contenido)
+            de las descargas exitosas.
+    """
+    controlador = None
+    if max_workers is None:
+        load_dotenv()
+        controlador = controlador_descargas()
+        max_workers = controlador.maximo if controlador else int(os.getenv("MAX_WORKERS", "10"))
+
+    contenidos = []
+    plazo_vencido = None
+    fallidas = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, _descargar_con_turno, controlador, descargar_contenido, url): url
+            for url in urls
+        }
+
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                nombre, contenido = future.result()
+                contenidos.append((url, nombre, contenido))
+            except PlazoVencido as exc:
+                plazo_vencido = exc
+            except Exception as exc:
+                fallidas += 1
+                registro.warning("Error descargando %s: %s", url, exc)
+
+    if plazo_vencido:
+        raise plazo_vencido
+    if fallidas:
+        verificar_plazo()
+    return contenidos
+
+
 def extraer_url_minio(response: Dict[str, Any], tipo: str) -> Optional[str]:
     """
     Extrae la URL de descarga alojada en MinIO para un tipo de comprobante.
@@ -148,9 +476,9 @@ def extraccion_urls_minio(response: Dict[str, Any]) -> Dict[str, Optional[str]]:
                 minio_mcr = None
 
     if not minio_mce:
-        print("No se encontró URL para emitidos en la respuesta")
+        registro.info("No se encontró URL para emitidos en la respuesta")
     if not minio_mcr:
-        print("No se encontró URL para recibidos en la respuesta")
+        registro.info("No se encontró URL para recibidos en la respuesta")
 
     return {"emitidos": minio_mce, "recibidos": minio_mcr}
 
@@ -173,20 +501,58 @@ def guardar_json(
     with open(ruta_json, "w", encoding="utf-8") as file:
         json.dump(datos, file, indent=2, ensure_ascii=False)
     
-    print(f"JSON guardado como: {ruta_json}")
+    registro.debug("JSON guardado como: %s", ruta_json)
+
+
+def leer_json(ruta: str) -> Any:
+    """
+    Lee un archivo JSON usando `orjson` si está instalado.
+
+    Tolera el BOM de UTF-8 igual que abrir el archivo con `utf-8-sig`.
+
+    Args:
+        ruta (str): Ruta del archivo JSON.
+
+    Returns:
+        Any: Contenido decodificado.
+    """
+    with open(ruta, 'rb') as file:
+        return decodificar_json(file.read())
+
+
+def decodificar_json(contenido: bytes) -> Any:
+    """
+    Decodifica un JSON en bytes con `orjson` si está instalado, tolerando el BOM de UTF-8.
+
+    Args:
+        contenido (bytes): JSON codificado en UTF-8.
+
+    Returns:
+        Any: Contenido decodificado.
+    """
+    if contenido.startswith(b'\xef\xbb\xbf'):
+        contenido = contenido[3:]
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
 
 
 def extraer_zip(
     ruta_zip: str,
     directorio_destino: str,
-) -> None:
+) -> List[str]:
     """
     Extrae el contenido del ZIP en el directorio destino especificado.
 
     Args:
         ruta_zip (str): Ruta al archivo ZIP.
         directorio_destino (str): Directorio donde se extraerán los archivos.
+
+    Returns:
+        List[str]: Rutas de los archivos extraídos y renombrados.
     """
+    rutas_extraidas = []
+
     with ZipFile(ruta_zip, 'r') as zip_ref:
         primer_archivo = zip_ref.namelist()[0]
         nombre_zip = os.path.basename(ruta_zip)
@@ -195,7 +561,7 @@ def extraer_zip(
         cuit_nombre_zip = nombre_zip.split('-')[4].strip() if nombre_zip else 'desconocido'
         
         if cuit_archivo != cuit_nombre_zip:
-            print(f"Advertencia: El CUIT en el nombre del archivo ({cuit_nombre_zip}) no coincide con el CUIT en el contenido ({cuit_archivo}).")
+            registro.warning("El CUIT en el nombre del archivo (%s) no coincide con el CUIT en el contenido (%s).", cuit_nombre_zip, cuit_archivo)
             
         else:
             if cuit_archivo == cuit_nombre_zip:
@@ -205,10 +571,49 @@ def extraer_zip(
                     ruta_origen = os.path.join(directorio_destino, archivo)
                     ruta_destino = os.path.join(directorio_destino, nombre_zip.replace('.zip', '.csv'))
                     shutil.move(ruta_origen, ruta_destino)
-                    print(f"Archivo extraído y renombrado a: {ruta_destino}")
+                    rutas_extraidas.append(ruta_destino)
+                    registro.debug("Archivo extraído y renombrado a: %s", ruta_destino)
                 
             else:
-                print("No se extrajo el archivo debido a la discrepancia en el CUIT.")
+                registro.warning("No se extrajo el archivo debido a la discrepancia en el CUIT.")
+
+    return rutas_extraidas
+
+
+def extraer_zip_memoria(
+    nombre_zip: str,
+    contenido: bytes,
+) -> List[Tuple[str, bytes]]:
+    """
+    Extrae en memoria el contenido de un ZIP de Mis Comprobantes.
+
+    Aplica la misma validación de CUIT que `extraer_zip` y renombra cada archivo
+    con el nombre del ZIP (cambiando la extensión a `.csv`).
+
+    Args:
+        nombre_zip (str): Nombre del archivo ZIP (sin directorio).
+        contenido (bytes): Contenido binario del ZIP.
+
+    Returns:
+        List[Tuple[str, bytes]]: Lista de tuplas (nombre_csv, contenido_csv).
+    """
+    extraidos = []
+
+    with ZipFile(io.BytesIO(contenido), 'r') as zip_ref:
+        miembros = zip_ref.namelist()
+        primer_archivo = miembros[0] if miembros else ''
+
+        cuit_archivo = primer_archivo.split('_')[5] if primer_archivo else 'desconocido'
+        cuit_nombre_zip = nombre_zip.split('-')[4].strip() if nombre_zip else 'desconocido'
+
+        if cuit_archivo != cuit_nombre_zip:
+            registro.warning("El CUIT en el nombre del archivo (%s) no coincide con el CUIT en el contenido (%s).", cuit_nombre_zip, cuit_archivo)
+            return extraidos
+
+        for archivo in miembros:
+            extraidos.append((nombre_zip.replace('.zip', '.csv'), zip_ref.read(archivo)))
+
+    return extraidos
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""
+Módulo de validación de los comprobantes leídos
+
+Revisa en bloque (con máscaras de pandas, sin recorrer filas) los comprobantes de
+Mis Comprobantes y la metadata de RCEL apenas se leen, antes de normalizar y
+prorratear. Las filas que corromperían los totales o harían fallar el control más
+adelante se ponen en cuarentena: se excluyen del cálculo y se listan con su motivo
+en la hoja 'Validación' del reporte.
+
+- Mis Comprobantes: tipo de cambio cero, faltante o no numérico; tipo, punto de
+  venta o número no numéricos; comprobantes emitidos repetidos en más de un
+  archivo (o dos veces en el mismo).
+- RCEL: período facturado con 'Hasta' anterior a 'Desde'; el comprobante se
+  controla como si no tuviera metadata RCEL.
+
+Con VALIDACION_ESTRICTA=si cualquier observación detiene el control antes de
+escribir el reporte.
+"""
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.helpers import normalizar_si_no
+
+HOJA_VALIDACION = "Validación"
+COLUMNAS_OBSERVACIONES = ["Origen", "Archivo", "CUIT Cliente", "Cliente", "Comprobante", "Motivo"]
+
+# Columnas de `leer_archivos_csv_batch` que identifican un comprobante emitido
+CLAVE_COMPROBANTE = ["Fin CUIT", "Tipo de Comprobante", "Punto de Venta", "Número Desde"]
+
+
+class ErrorValidacion(ValueError):
+    """Hay comprobantes observados y VALIDACION_ESTRICTA está activa."""
+
+    def __init__(self, observaciones: pd.DataFrame, ruta: str = ""):
+        self.observaciones = observaciones
+        self.ruta = ruta
+        resumen = observaciones["Motivo"].str.split("; ").explode().value_counts()
+        detalle = ", ".join(f"{motivo}: {cantidad}" for motivo, cantidad in resumen.items())
+        super().__init__(f"{len(observaciones)} comprobantes observados ({detalle})"
+                         + (f"; detalle en {ruta}" if ruta else ""))
+
+
+def validacion_estricta() -> bool:
+    """True si VALIDACION_ESTRICTA pide detener el control ante cualquier observación."""
+    return normalizar_si_no(os.getenv("VALIDACION_ESTRICTA", "no")) == "si"
+
+
+def _no_numerico(serie: pd.Series) -> np.ndarray:
+    return pd.to_numeric(serie, errors="coerce").isna().to_numpy()
+
+
+def _motivos(reglas: Sequence[Tuple[str, np.ndarray]], cantidad: int) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Combina las máscaras de las reglas.
+
+    Returns:
+        Tuple[np.ndarray, pd.Series]: Máscara de filas observadas y sus motivos separados por '; '
+    """
+    observada = np.zeros(cantidad, dtype=bool)
+    for _, mascara in reglas:
+        observada |= mascara
+    motivos = pd.Series("", index=np.flatnonzero(observada), dtype=object)
+    for motivo, mascara in reglas:
+        motivos = motivos + np.where(mascara[observada], f"{motivo}; ", "")
+    return observada, motivos.str[:-2]
+
+
+def _observaciones(origen: str, filas: pd.DataFrame, archivo: str, comprobante: pd.Series,
+                   motivos: pd.Series) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Origen": origen,
+        "Archivo": filas[archivo].to_numpy(),
+        "CUIT Cliente": filas["CUIT Cliente"].to_numpy(),
+        "Cliente": filas["Cliente"].to_numpy(),
+        "Comprobante": comprobante.to_numpy(),
+        "Motivo": motivos.to_numpy(),
+    }, columns=COLUMNAS_OBSERVACIONES)
+
+
+def validar_mc(comprobantes: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Pone en cuarentena los comprobantes de Mis Comprobantes que no se pueden controlar.
+
+    Args:
+        comprobantes: DataFrame retornado por `leer_archivos_csv_batch`
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Comprobantes válidos y observaciones (COLUMNAS_OBSERVACIONES)
+    """
+    if comprobantes.empty:
+        return comprobantes, pd.DataFrame(columns=COLUMNAS_OBSERVACIONES)
+
+    tipo_cambio = pd.to_numeric(comprobantes["Tipo Cambio"], errors="coerce").to_numpy(dtype=np.float64)
+    identificacion = _no_numerico(comprobantes["Tipo de Comprobante"]) | _no_numerico(comprobantes["Punto de Venta"])
+    numero = _no_numerico(comprobantes["Número Desde"])
+
+    # Solo los emitidos: en los recibidos la clave incluye al emisor, que no está en el número
+    emitido = (comprobantes["Archivo"].str.split("-").str[1].str.strip() == "MCE").to_numpy()
+    claves = comprobantes[CLAVE_COMPROBANTE].astype(str)
+    repetido = emitido & claves[emitido].duplicated().reindex(claves.index, fill_value=False).to_numpy()
+
+    reglas: List[Tuple[str, np.ndarray]] = [
+        ("Tipo de cambio cero o faltante", np.isnan(tipo_cambio) | (tipo_cambio == 0)),
+        ("Tipo o punto de venta no numérico", identificacion),
+        ("Número Desde no numérico", numero),
+        ("Comprobante emitido repetido", repetido),
+    ]
+    observada, motivos = _motivos(reglas, len(comprobantes))
+    if not observada.any():
+        return comprobantes, pd.DataFrame(columns=COLUMNAS_OBSERVACIONES)
+
+    filas = comprobantes[observada]
+    comprobante = (filas["Tipo de Comprobante"].astype(str) + "-" + filas["Punto de Venta"].astype(str)
+                   + "-" + filas["Número Desde"].astype(str))
+    observaciones = _observaciones("Mis Comprobantes", filas, "Archivo", comprobante, motivos)
+    return comprobantes[~observada].reset_index(drop=True), observaciones
+
+
+def validar_rcel(facturas: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Pone en cuarentena la metadata de RCEL con un período facturado inválido.
+
+    Args:
+        facturas: DataFrame retornado por `leer_archivos_json_batch`
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Facturas válidas y observaciones (COLUMNAS_OBSERVACIONES)
+    """
+    if facturas.empty:
+        return facturas, pd.DataFrame(columns=COLUMNAS_OBSERVACIONES)
+
+    desde = pd.to_datetime(facturas["Desde"], format="%d/%m/%Y", errors="coerce")
+    hasta = pd.to_datetime(facturas["Hasta"], format="%d/%m/%Y", errors="coerce")
+    reglas = [("Período RCEL con Hasta anterior a Desde", (hasta < desde).to_numpy())]
+    observada, motivos = _motivos(reglas, len(facturas))
+    if not observada.any():
+        return facturas, pd.DataFrame(columns=COLUMNAS_OBSERVACIONES)
+
+    filas = facturas[observada]
+    observaciones = _observaciones("RCEL", filas, "Archivo PDF", filas["AUX"], motivos)
+    return facturas[~observada].reset_index(drop=True), observaciones
+
+
+def unir_observaciones(observaciones: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Concatena observaciones omitiendo las vacías."""
+    observaciones = [o for o in observaciones if o is not None and not o.empty]
+    if not observaciones:
+        return pd.DataFrame(columns=COLUMNAS_OBSERVACIONES)
+    return pd.concat(observaciones, ignore_index=True)
+
+
+def ruta_validacion(ruta_reporte: str) -> str:
+    """Archivo con las observaciones cuando la validación estricta detiene el control."""
+    return f"{os.path.splitext(ruta_reporte)[0]}.validacion.xlsx"
@@ -0,0 +1,75 @@
+"""Pruebas de las agrupaciones del reporte calculadas en una sola pasada"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generador_datos import generar_escenario
+from control import control
+from lib.agregaciones import AGRUPACIONES, agrupaciones_desde_entorno, calcular_agrupaciones
+from lib.inventario import listar_archivos
+
+
+def _hoja(ruta, hoja, claves):
+    return pd.read_excel(ruta, sheet_name=hoja, index_col=list(range(len(claves))))
+
+
+def test_hojas_coinciden_con_pivot_table(tmp_path, monkeypatch):
+    monkeypatch.delenv("AGRUPACIONES_REPORTE", raising=False)
+    escenario = generar_escenario(str(tmp_path / "escenario"), clientes=3, comprobantes_por_cliente=40)
+    reporte = str(tmp_path / "reporte.xlsx")
+    control(listar_archivos(escenario["descargas_mc"], "mc"), [], listar_archivos(escenario["descargas_rcel"], "rcel"),
+            ruta_categorias=escenario["categorias"], nombre_archivo=reporte, perfilar="no", cache_dir="")
+
+    consolidado = pd.read_excel(reporte, sheet_name="Consolidado")
+    tabla = _hoja(reporte, "Tabla Dinámica", ["Cliente", "MC"])
+
+    # Los meses suman el importe prorrateado de la tabla dinámica
+    mensual = _hoja(reporte, "Mensual por Cliente", ["Cliente", "MC"])
+    meses = [columna for columna in mensual.columns if columna != "Total"]
+    assert len(meses) == 12
+    np.testing.assert_allclose(mensual[meses].sum(axis=1), mensual["Total"], rtol=1e-9)
+    np.testing.assert_allclose(mensual["Total"], tabla.loc[mensual.index, "Importe Prorrateado"], rtol=1e-9)
+
+    contraparte = _hoja(reporte, "Por Contraparte", ["Cliente", "MC", "Nro. Doc. Receptor/Emisor"])
+    esperado = consolidado.groupby(["Cliente", "MC", "Nro. Doc. Receptor/Emisor"]).agg(
+        cantidad=("Tipo", "count"), total=("Imp. Total", "sum"), prorrateado=("Importe Prorrateado", "sum"))
+    assert list(contraparte.index) == list(esperado.index)
+    assert list(contraparte["Cantidad de Comprobantes"]) == list(esperado["cantidad"])
+    np.testing.assert_allclose(contraparte["Imp. Total"], esperado["total"], rtol=1e-9)
+    np.testing.assert_allclose(contraparte["Importe Prorrateado"], esperado["prorrateado"], rtol=1e-9)
+
+    no_cruzados = _hoja(reporte, "No Cruzados", ["Cliente", "MC"])
+    conteo = consolidado[consolidado["Cruzado"] == "No"].groupby(["Cliente", "MC"]).size()
+    assert list(no_cruzados["No Cruzados"]) == list(conteo.reindex(no_cruzados.index, fill_value=0))
+    assert list(no_cruzados["Cantidad de Comprobantes"]) == list(tabla.loc[no_cruzados.index,
+                                                                          "Cantidad de Comprobantes"])
+
+
+def test_configuracion_y_codigos_compartidos(monkeypatch):
+    consolidado = pd.DataFrame({
+        "Cliente": ["B", "A", "B", "A"],
+        "MC": ["MCE", "MCE", "MCR", "MCE"],
+        "Nro. Doc. Receptor/Emisor": [1, np.nan, 2, np.nan],
+        "Denominación Receptor/Emisor": ["X", "Y", "Z", "W"],
+        "Imp. Total": [10.0, 20.0, 30.0, np.nan],
+        "Importe Prorrateado": [10.0, 20.0, 30.0, 5.0],
+        "Cruzado": ["Si", "No", "No", "Si"],
+    })
+    monkeypatch.setenv("AGRUPACIONES_REPORTE", "contraparte, no_cruzados")
+    resultados = dict((a.hoja, t) for a, t in calcular_agrupaciones(consolidado, agrupaciones_desde_entorno(),
+                                                                     "2024-01-01", "2024-12-31"))
+    assert list(resultados) == ["Por Contraparte", "No Cruzados"]
+
+    contraparte = resultados["Por Contraparte"]
+    # Sin documento forma su propio grupo; la denominación es la de la primera fila
+    fila = contraparte.loc[("A", "MCE", np.nan)]
+    assert fila["Cantidad de Comprobantes"] == 2 and fila["Imp. Total"] == 20.0 and fila["Denominación"] == "Y"
+    assert resultados["No Cruzados"].loc[("B", "MCR"), "Importe No Cruzado"] == 30.0
+
+    monkeypatch.setenv("AGRUPACIONES_REPORTE", "no")
+    assert agrupaciones_desde_entorno() == []
+    monkeypatch.setenv("AGRUPACIONES_REPORTE", "inexistente")
+    with pytest.raises(ValueError):
+        agrupaciones_desde_entorno()
+    assert set(AGRUPACIONES) == {"mensual", "contraparte", "no_cruzados"}
@@ -0,0 +1,75 @@
+"""Pruebas del almacén local de comprobantes"""
+
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.generador_datos import escribir_categorias, generar_escenario
+from control import control, leer_archivos_csv_batch
+from lib.almacen import AlmacenComprobantes
+from lib.inventario import listar_archivos
+from lib.metricas import metricas
+
+
+def _ejecutar(archivos_mc, escenario, reporte, almacen):
+    metricas.reiniciar()
+    control(archivos_mc, [], listar_archivos(escenario["descargas_rcel"], "rcel"),
+            ruta_categorias=escenario["categorias"], nombre_archivo=reporte, perfilar="no", cache_dir="",
+            almacen=almacen)
+    tabla = pd.read_excel(reporte, sheet_name="Tabla Dinámica")
+    return tabla, metricas.resumen()["contadores"]
+
+
+def test_ingesta_idempotente_y_consulta_por_ventana(tmp_path):
+    escenario = generar_escenario(str(tmp_path / "escenario"), clientes=2, comprobantes_por_cliente=40)
+    almacen = AlmacenComprobantes(str(tmp_path / "almacen.sqlite"))
+    archivos = escenario["archivos_mc"]
+
+    assert almacen.archivos_pendientes(archivos) == archivos
+    almacen.ingerir(archivos, leer_archivos_csv_batch(archivos))
+    assert almacen.archivos_pendientes(archivos) == []
+
+    # Volver a ingerir los mismos archivos no duplica comprobantes
+    almacen.ingerir(archivos, leer_archivos_csv_batch(archivos))
+    completo = leer_archivos_csv_batch(archivos)
+    todos = almacen.consultar(date(2000, 1, 1), date(2100, 1, 1))
+    assert len(todos) == len(completo)
+    assert list(todos.columns) == list(completo.columns)
+
+    ventana = almacen.consultar(date(2024, 4, 1), date(2024, 6, 30))
+    fechas = pd.to_datetime(completo["Fecha de Emisión"], format="ISO8601")
+    assert len(ventana) == ((fechas >= "2024-04-01") & (fechas <= "2024-06-30")).sum()
+    almacen.cerrar()
+
+
+def test_control_con_almacen_conserva_periodos_anteriores(tmp_path):
+    escenario = generar_escenario(str(tmp_path / "escenario"), clientes=3, comprobantes_por_cliente=40)
+    escribir_categorias(escenario["categorias"], date(2024, 4, 1), date(2024, 9, 30))
+    ruta_almacen = str(tmp_path / "almacen.sqlite")
+    archivos_mc = listar_archivos(escenario["descargas_mc"], "mc")
+
+    archivos, _ = _ejecutar(archivos_mc, escenario, str(tmp_path / "archivos.xlsx"), "")
+    con_almacen, contadores = _ejecutar(archivos_mc, escenario, str(tmp_path / "almacen.xlsx"), ruta_almacen)
+    assert contadores["archivos_ingeridos_almacen"] == len(archivos_mc)
+
+    # Los comprobantes fuera del período no se consultan, pero el importe prorrateado no cambia
+    columnas = ["Cliente", "MC", "Importe Prorrateado"]
+    pd.testing.assert_frame_equal(con_almacen[columnas], archivos[columnas])
+    assert con_almacen["Cantidad de Comprobantes"].sum() <= archivos["Cantidad de Comprobantes"].sum()
+
+    # Sin cambios en los CSV no se vuelve a ingerir nada
+    _, contadores = _ejecutar(archivos_mc, escenario, str(tmp_path / "almacen_2.xlsx"), ruta_almacen)
+    assert contadores.get("archivos_ingeridos_almacen", 0) == 0
+
+    # Se archivan los emitidos: el almacén los sigue aportando
+    emitidos = [a for a in archivos_mc if " - MCE - " in os.path.basename(a)]
+    destino = tmp_path / "archivados"
+    destino.mkdir()
+    for ruta in emitidos:
+        shutil.move(ruta, destino / os.path.basename(ruta))
+    restantes = [a for a in archivos_mc if a not in emitidos]
+
+    archivados, _ = _ejecutar(restantes, escenario, str(tmp_path / "archivados.xlsx"), ruta_almacen)
+    pd.testing.assert_frame_equal(archivados, con_almacen)
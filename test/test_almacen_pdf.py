@@ -0,0 +1,62 @@
+"""Pruebas del almacén de PDFs direccionado por contenido"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from benchmarks.carga_descargas import RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import procesar_descarga_rcel
+from lib.almacen_pdf import AlmacenPDF
+from lib.metricas import metricas
+
+
+def test_incorporar_deduplica_por_contenido(tmp_path):
+    almacen = AlmacenPDF(str(tmp_path))
+    metricas.reiniciar()
+    contenido = b"%PDF-1.4 factura"
+    digest = hashlib.sha256(contenido).hexdigest()
+
+    for cliente in ("a", "b"):
+        temporal = tmp_path / f"{cliente}.tmp"
+        temporal.write_bytes(contenido)
+        almacen.incorporar(str(temporal), digest, str(tmp_path / cliente / "factura.pdf"), "http://x/rcel/f.pdf?firma=1")
+    otro = tmp_path / "c" / "copia.pdf"
+    otro.parent.mkdir()
+    otro.write_bytes(contenido)
+    almacen.incorporar_archivo(str(otro))
+
+    objeto = Path(almacen.ruta_objeto(digest))
+    assert objeto.read_bytes() == contenido
+    assert all(os.path.samefile(objeto, tmp_path / c / n) for c, n in (("a", "factura.pdf"), ("b", "factura.pdf"),
+                                                                       ("c", "copia.pdf")))
+    assert sorted(p.name for p in tmp_path.rglob("*.tmp")) == []
+    assert metricas.resumen()["contadores"] == {"pdfs_almacenados": 1, "pdfs_deduplicados": 2,
+                                                "bytes_deduplicados": 2 * len(contenido)}
+    assert almacen.conocido("http://x/rcel/f.pdf?firma=2") == {"sha256": digest, "nombre": "factura.pdf"}
+
+
+def test_rcel_reutiliza_pdfs_almacenados(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALMACEN_PDF", "si")
+    fila = planilla_sintetica(1, fuentes=("rcel",)).iloc[0]
+    base = tmp_path / "rcel"
+
+    with ServidorSimulado(comprobantes_por_cliente=10, tamano_pdf=2000) as servidor:
+        rutas = procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, str(base))
+        descargados = servidor.estadisticas()["descargas_pdf"]
+        assert descargados == len(rutas) > 0
+
+        # Un PDF borrado del cliente se recupera del almacén por su hash, sin descargarlo
+        directorio = Path(rutas[0]).parent
+        pdfs = sorted(directorio.glob("*.pdf"))
+        pdfs[0].unlink()
+        metricas.reiniciar()
+        assert sorted(procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, str(base))) == sorted(rutas)
+        assert servidor.estadisticas()["descargas_pdf"] == descargados
+
+    assert metricas.resumen()["contadores"]["pdfs_reutilizados"] == len(rutas)
+    assert sorted(directorio.glob("*.pdf")) == pdfs
+    objetos = list((base / ".objetos").rglob("*.pdf"))
+    assert len(objetos) == len(pdfs)
+    assert all(os.path.samefile(pdf, AlmacenPDF(str(base)).ruta_objeto(hashlib.sha256(pdf.read_bytes()).hexdigest()))
+               for pdf in pdfs)
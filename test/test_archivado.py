@@ -0,0 +1,94 @@
+"""Pruebas del archivado comprimido de períodos cerrados"""
+
+import os
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import (leer_archivos_csv_batch, leer_archivos_json_batch, procesar_descarga_mc,
+                     procesar_descarga_rcel)
+from lib.archivado import archivar_periodo, indice_archivo, leer_factura_archivada, ubicar
+from lib.inventario import listar_archivos
+
+DESDE, HASTA = date(2024, 1, 1), date(2024, 6, 30)
+
+
+def _ordenar(df, columnas):
+    return df.drop(columns=["Archivo"], errors="ignore").sort_values(columnas).reset_index(drop=True)
+
+
+def test_lectores_leen_el_periodo_archivado(tmp_path):
+    fila = planilla_sintetica(1).iloc[0]
+    base_mc, base_rcel = str(tmp_path / "mc"), str(tmp_path / "rcel")
+
+    with ServidorSimulado(comprobantes_por_cliente=40) as servidor:
+        procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, base_mc)
+        procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, base_rcel)
+
+        csv_antes = leer_archivos_csv_batch(listar_archivos(base_mc, "mc"))
+        json_antes = leer_archivos_json_batch(listar_archivos(base_rcel, "rcel"))
+        sueltos_antes = sum(len(archivos) for _, _, archivos in os.walk(base_rcel))
+
+        totales_mc = archivar_periodo(base_mc, "mc", DESDE, HASTA)
+        totales_rcel = archivar_periodo(base_rcel, "rcel", DESDE, HASTA)
+        assert totales_mc["clientes"] == totales_rcel["clientes"] == 1
+        assert 0 < totales_rcel["archivos"] < sueltos_antes
+
+        # Los lectores ven lo mismo que antes de archivar, parte desde el ZIP
+        archivos_mc = listar_archivos(base_mc, "mc")
+        archivos_json = listar_archivos(base_rcel, "rcel")
+        assert any(ubicar(ruta) for ruta in archivos_mc) and any(ubicar(ruta) for ruta in archivos_json)
+        clave_mc = ["Tipo de Comprobante", "Punto de Venta", "Número Desde", "Nro. Doc. Receptor/Emisor"]
+        assert _ordenar(leer_archivos_csv_batch(archivos_mc), clave_mc).equals(_ordenar(csv_antes, clave_mc))
+        assert (_ordenar(leer_archivos_json_batch(archivos_json), ["AUX"])
+                .equals(_ordenar(json_antes, ["AUX"])))
+
+        # Acceso directo a una factura por AUX a través del índice
+        ruta_zip = ubicar(next(ruta for ruta in archivos_json if ubicar(ruta)))[0]
+        aux = next(iter(indice_archivo(ruta_zip)["facturas"]))
+        assert leer_factura_archivada(ruta_zip, aux).startswith(b"%PDF")
+
+        # Una nueva descarga no vuelve a bajar las facturas archivadas
+        descargas = servidor.estadisticas()["descargas_pdf"]
+        procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, base_rcel)
+        assert servidor.estadisticas()["descargas_pdf"] - descargas == len(json_antes) - len(
+            indice_archivo(ruta_zip)["facturas"])
+
+
+def test_comprobante_suelto_reemplaza_al_archivado(tmp_path):
+    fila = planilla_sintetica(1).iloc[0]
+    base = str(tmp_path)
+
+    with ServidorSimulado(comprobantes_por_cliente=30) as servidor:
+        procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, base)
+        archivar_periodo(base, "mc", DESDE, HASTA)
+        # Descarga completa posterior: el período archivado vuelve a quedar suelto
+        procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, base)
+
+    consolidado = leer_archivos_csv_batch(listar_archivos(base, "mc"))
+    clave = ["Tipo de Comprobante", "Punto de Venta", "Número Desde", "Nro. Doc. Receptor/Emisor"]
+    assert not consolidado.assign(MC=consolidado["Archivo"].str.split(" - ").str[1]).duplicated(
+        subset=clave + ["MC"]).any()
+    assert pd.to_datetime(consolidado["Fecha de Emisión"], format="ISO8601").dt.year.eq(2024).all()
+
+
+def test_pdf_enlazados_al_almacen_no_cuentan_como_liberados(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALMACEN_PDF", "si")
+    monkeypatch.setenv("CARGA_INLINE", "no")
+    fila = planilla_sintetica(1).iloc[0]
+    base = str(tmp_path / "rcel")
+
+    with ServidorSimulado(comprobantes_por_cliente=10, tamano_pdf=5000) as servidor:
+        procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, base)
+
+    cliente = next(nombre for nombre in os.listdir(base) if not nombre.startswith("."))
+    directorio = os.path.join(base, cliente)
+    pdfs = [n for n in os.listdir(directorio) if n.endswith(".pdf")]
+    assert pdfs and all(os.stat(os.path.join(directorio, n)).st_nlink > 1 for n in pdfs)
+    jsons = sum(os.path.getsize(os.path.join(directorio, n)) for n in os.listdir(directorio) if n.endswith(".json"))
+
+    totales = archivar_periodo(base, "rcel", date(2024, 1, 1), date(2024, 12, 31))
+    assert totales["archivos"] == 2 * len(pdfs)
+    assert totales["bytes"] == jsons
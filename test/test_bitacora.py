@@ -0,0 +1,133 @@
+"""Pruebas de la bitácora de descargas: reanudación de lotes y reintento de fallidos"""
+
+import pytest
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import _clave_fila, descargar_planilla, procesar_descarga_mc, procesar_descarga_rcel
+from lib.bitacora import COMPLETADO, CONSULTADO, FALLIDO, BitacoraDescargas
+
+
+def _descargar(servidor, planilla, tmp_path, bitacora, solo_fallidos=False):
+    return descargar_planilla(planilla, ("mc", "rcel"), "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT,
+                              RCEL_ENDPOINT, str(tmp_path / "mc"), str(tmp_path / "rcel"), bitacora=bitacora,
+                              solo_fallidos=solo_fallidos)
+
+
+def test_bitacora_tolera_linea_cortada(tmp_path):
+    ruta = str(tmp_path / "bitacora.jsonl")
+    bitacora = BitacoraDescargas(ruta)
+    bitacora.registrar("mc|1|a|b", CONSULTADO, fuente="mc")
+    bitacora.registrar("mc|1|a|b", FALLIDO, "timeout")
+    with open(ruta, "a", encoding="utf-8") as archivo:
+        archivo.write('{"clave": "mc|1|a|b", "est')
+
+    recargada = BitacoraDescargas(ruta)
+    assert recargada.estado("mc|1|a|b") == FALLIDO
+    assert recargada.trabajos(FALLIDO)[0]["motivo"] == "timeout"
+    assert recargada.debe_procesar("mc|1|a|b", solo_fallidos=True)
+
+
+def test_reanuda_lote_y_reintenta_fallidos(tmp_path):
+    planilla = planilla_sintetica(3)
+    bitacora = BitacoraDescargas(str(tmp_path / "bitacora.jsonl"))
+
+    # Lote interrumpido: el primer cliente terminó y el segundo quedó a mitad de MC
+    filas = [row for _, row in planilla.iterrows()]
+    bitacora.registrar(_clave_fila("mc", filas[0]), COMPLETADO)
+    bitacora.registrar(_clave_fila("rcel", filas[0]), COMPLETADO)
+    bitacora.registrar(_clave_fila("mc", filas[1]), CONSULTADO)
+
+    with ServidorSimulado(comprobantes_por_cliente=5, tamano_pdf=500) as servidor:
+        resumen = _descargar(servidor, planilla, tmp_path, bitacora)
+        assert resumen == {"procesados": 4, "omitidos": 2, "fallidos": 0, "diferidos": 0}
+        assert servidor.estadisticas()["consultas_mc"] == 2
+        assert servidor.estadisticas()["consultas_rcel"] == 2
+
+    # Lote terminado: la siguiente ejecución comienza uno nuevo; esta vez todo falla
+    with ServidorSimulado(comprobantes_por_cliente=5, tasa_error=1.0) as servidor:
+        resumen = _descargar(servidor, planilla, tmp_path, bitacora)
+    assert resumen == {"procesados": 6, "omitidos": 0, "fallidos": 6, "diferidos": 0}
+    assert all(t.get("motivo") for t in BitacoraDescargas(bitacora.ruta).trabajos(FALLIDO))
+
+    with ServidorSimulado(comprobantes_por_cliente=5, tamano_pdf=500) as servidor:
+        resumen = _descargar(servidor, planilla, tmp_path, bitacora, solo_fallidos=True)
+    assert resumen == {"procesados": 6, "omitidos": 0, "fallidos": 0, "diferidos": 0}
+    assert len(BitacoraDescargas(bitacora.ruta).trabajos(COMPLETADO)) == 6
+
+
+def test_descargas_fallidas_quedan_fallidas(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODO_INGESTA_MC", "zip")
+    monkeypatch.setenv("CARGA_INLINE", "no")
+    monkeypatch.setenv("ALMACEN_PDF", "no")
+    fila = planilla_sintetica(1).iloc[0]
+    estados = {"mc": [], "rcel": []}
+
+    # Las consultas responden pero MinIO devuelve 503 a los ZIP y a los PDFs
+    with ServidorSimulado(comprobantes_por_cliente=5, tamano_pdf=500, tasa_error_descarga=1.0) as servidor:
+        procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path / "mc"),
+                             notificar_estado=lambda estado, motivo=None: estados["mc"].append((estado, motivo)))
+        procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, str(tmp_path / "rcel"),
+                               notificar_estado=lambda estado, motivo=None: estados["rcel"].append((estado, motivo)))
+
+    for fuente in ("mc", "rcel"):
+        nombres = [estado for estado, _ in estados[fuente]]
+        assert nombres == [CONSULTADO, FALLIDO], (fuente, nombres)
+        assert "Descarga incompleta" in str(estados[fuente][-1][1])
+
+
+def test_lote_terminado_no_borra_otro_lote(tmp_path):
+    ruta = str(tmp_path / "bitacora.jsonl")
+    bitacora = BitacoraDescargas(ruta)
+    # MC terminó; RCEL quedó interrumpido en el mismo archivo
+    bitacora.registrar("mc|1|a|b", COMPLETADO, fuente="mc")
+    bitacora.registrar("mc|2|a|b", COMPLETADO, fuente="mc")
+    bitacora.registrar("rcel|1|a|b", COMPLETADO, fuente="rcel")
+    bitacora.registrar("rcel|2|a|b", FALLIDO, "timeout", fuente="rcel")
+    bitacora.registrar("rcel|3|a|b", CONSULTADO, fuente="rcel")
+
+    # Volver a correr el lote de MC comienza uno nuevo solo para MC
+    assert not bitacora.iniciar_lote(["mc|1|a|b", "mc|2|a|b"])
+    recargada = BitacoraDescargas(ruta)
+    assert recargada.estado("mc|1|a|b") is None
+    assert recargada.estado("rcel|1|a|b") == COMPLETADO
+    assert recargada.estado("rcel|3|a|b") == CONSULTADO
+    assert recargada.trabajos(FALLIDO)[0]["motivo"] == "timeout"
+    assert recargada.iniciar_lote(["rcel|1|a|b", "rcel|2|a|b", "rcel|3|a|b"])
+
+
+def test_fallido_permanente_no_deja_el_lote_reanudandose(tmp_path):
+    ruta = str(tmp_path / "bitacora.jsonl")
+    claves = ["mc|1|a|b", "mc|2|a|b"]
+    bitacora = BitacoraDescargas(ruta)
+    assert not bitacora.iniciar_lote(claves)
+
+    # La fila 2 falla siempre (p.ej. una clave de representante errónea)
+    for _ in range(3):
+        for clave in claves:
+            if bitacora.debe_procesar(clave):
+                bitacora.registrar(clave, COMPLETADO if clave == claves[0] else FALLIDO, "401")
+        bitacora = BitacoraDescargas(ruta)
+        assert not bitacora.iniciar_lote(claves)
+        assert bitacora.debe_procesar(claves[0]) and bitacora.debe_procesar(claves[1])
+
+    # Interrumpido a mitad: se reanuda y los fallidos siguen disponibles para reintentar
+    bitacora.registrar(claves[0], COMPLETADO)
+    bitacora.registrar(claves[1], CONSULTADO)
+    assert BitacoraDescargas(ruta).iniciar_lote(claves)
+
+
+def test_gui_comienza_lote_nuevo(tmp_path, monkeypatch):
+    pytest.importorskip("PIL.ImageTk")
+    import gui
+
+    ruta = str(tmp_path / "bitacora.jsonl")
+    monkeypatch.setenv("BITACORA_DESCARGAS", ruta)
+    monkeypatch.setattr(gui.messagebox, "askyesno", lambda *args: True)
+    bitacora = BitacoraDescargas(ruta)
+    bitacora.registrar("mc|1|a|b", COMPLETADO)
+    bitacora.registrar("mc|2|a|b", FALLIDO, "401")
+
+    gui.MonotributistasGUI.comenzar_lote_nuevo(None)
+    recargada = BitacoraDescargas(ruta)
+    assert recargada.trabajos() == [] and recargada.debe_procesar("mc|1|a|b")
@@ -0,0 +1,53 @@
+"""Pruebas del recálculo incremental del control con caché por cliente"""
+
+import os
+
+import pandas as pd
+
+from benchmarks.generador_datos import csv_mc_bytes, generar_comprobantes_mc, generar_escenario
+from control import control
+from lib.inventario import listar_archivos
+from lib.metricas import metricas
+
+
+def _reporte(ruta):
+    return {hoja: pd.read_excel(ruta, sheet_name=hoja) for hoja in ("Tabla Dinámica", "Consolidado")}
+
+
+def _ejecutar(escenario, reporte, cache_dir):
+    metricas.reiniciar()
+    control(listar_archivos(escenario["descargas_mc"], "mc"), [],
+            listar_archivos(escenario["descargas_rcel"], "rcel"),
+            ruta_categorias=escenario["categorias"], nombre_archivo=reporte, perfilar="no", cache_dir=cache_dir)
+    return _reporte(reporte), metricas.resumen()["contadores"]
+
+
+def test_recalcula_solo_clientes_modificados(tmp_path):
+    escenario = generar_escenario(str(tmp_path / "escenario"), clientes=4, comprobantes_por_cliente=30)
+    cache_dir = str(tmp_path / "cache")
+
+    sin_cache, _ = _ejecutar(escenario, str(tmp_path / "sin_cache.xlsx"), "")
+    frio, contadores = _ejecutar(escenario, str(tmp_path / "frio.xlsx"), cache_dir)
+    assert contadores["clientes_recalculados"] == 4
+
+    caliente, contadores = _ejecutar(escenario, str(tmp_path / "caliente.xlsx"), cache_dir)
+    assert contadores["clientes_recalculados"] == 0
+    assert contadores["clientes_en_cache"] == 4
+
+    for hoja in sin_cache:
+        pd.testing.assert_frame_equal(frio[hoja], sin_cache[hoja])
+        pd.testing.assert_frame_equal(caliente[hoja], sin_cache[hoja])
+
+    # Se modifican los emitidos de un cliente
+    ruta = next(r for r in escenario["archivos_mc"] if " - MCE - " in r)
+    cuit = os.path.basename(ruta).split("-")[4].strip()
+    df = generar_comprobantes_mc(cuit, "MCE", 45, pd.Timestamp("2024-01-01").date(),
+                                 pd.Timestamp("2024-12-31").date(), semilla=99)
+    with open(ruta, "wb") as archivo:
+        archivo.write(csv_mc_bytes(df))
+
+    incremental, contadores = _ejecutar(escenario, str(tmp_path / "incremental.xlsx"), cache_dir)
+    completo, _ = _ejecutar(escenario, str(tmp_path / "completo.xlsx"), "")
+    assert contadores["clientes_recalculados"] == 1
+    for hoja in completo:
+        pd.testing.assert_frame_equal(incremental[hoja], completo[hoja])
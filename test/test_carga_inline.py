@@ -0,0 +1,64 @@
+"""Pruebas de la carga en línea (base64) de ZIP y PDFs sin pasar por MinIO"""
+
+import base64
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+import lib.utils
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import leer_archivos_csv_batch, procesar_descarga_mc, procesar_descarga_rcel
+from lib.utils import decodificar_base64
+
+
+def test_decodificar_base64_por_bloques(monkeypatch):
+    monkeypatch.setattr(lib.utils, "TAMANO_BLOQUE_BASE64", 8)
+    datos = os.urandom(1000)
+    texto = base64.encodebytes(datos).decode("ascii")  # con saltos de línea cada 76 caracteres
+
+    destino = io.BytesIO()
+    assert decodificar_base64(texto, destino) == len(datos)
+    assert destino.getvalue() == datos
+
+    destino = io.BytesIO()
+    decodificar_base64("data:application/pdf;base64," + base64.b64encode(datos).decode("ascii"), destino)
+    assert destino.getvalue() == datos
+
+    with pytest.raises(ValueError):
+        decodificar_base64(base64.b64encode(datos).decode("ascii")[:-1], io.BytesIO())
+
+
+def test_carga_inline_segun_descarga_anterior(tmp_path, monkeypatch):
+    monkeypatch.setenv("CARGA_INLINE", "auto")
+    monkeypatch.setenv("UMBRAL_CARGA_INLINE", "10000000")
+    fila = planilla_sintetica(1).iloc[0]
+
+    def descargar(servidor):
+        mc = procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path / "mc"))
+        rcel = procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, str(tmp_path / "rcel"))
+        return mc, rcel
+
+    with ServidorSimulado(comprobantes_por_cliente=20, tamano_pdf=2000) as servidor:
+        # Sin descargas anteriores se usa MinIO
+        mc, rcel = descargar(servidor)
+        minio = servidor.estadisticas()
+        assert minio["descargas_zip"] == 2 and minio["descargas_pdf"] == len(rcel) > 0
+        comprobantes = leer_archivos_csv_batch(sorted(mc))
+        directorio_pdf = Path(rcel[0]).parent
+        pdfs = {ruta.name: ruta.read_bytes() for ruta in directorio_pdf.glob("*.pdf")}
+
+        # Cliente chico: los archivos llegan en la respuesta
+        mc, rcel_inline = descargar(servidor)
+        assert servidor.estadisticas()["descargas_zip"] == 2
+        assert servidor.estadisticas()["descargas_pdf"] == len(rcel)
+        assert sorted(rcel_inline) == sorted(rcel)
+        assert leer_archivos_csv_batch(sorted(mc)).equals(comprobantes)
+        assert {ruta.name: ruta.read_bytes() for ruta in directorio_pdf.glob("*.pdf")} == pdfs
+
+        # Por encima del umbral se vuelve a MinIO
+        monkeypatch.setenv("UMBRAL_CARGA_INLINE", "100")
+        descargar(servidor)
+        assert servidor.estadisticas()["descargas_zip"] == 4
@@ -0,0 +1,43 @@
+"""Pruebas del control adaptativo de la concurrencia de descargas"""
+
+import pytest
+
+from benchmarks.servidor_simulado import ServidorSimulado
+from lib.concurrencia import ControladorConcurrencia, controlador_descargas
+from lib.metricas import metricas
+from lib.utils import descargar_archivos_concurrente
+
+
+def test_reduce_ante_errores_y_aumenta_sin_congestion():
+    controlador = ControladorConcurrencia(minimo=1, maximo=8, inicial=6)
+    for _ in range(6):
+        with pytest.raises(ConnectionError):
+            with controlador.turno():
+                raise ConnectionError("503")
+    assert controlador.limite == 3 and controlador.decisiones[-1]["motivo"] == "errores"
+
+    for _ in range(4):
+        with controlador.turno() as medicion:
+            medicion["bytes"] = 1000
+    assert controlador.limite == 4 and controlador.decisiones[-1]["motivo"] == "aumento"
+    assert controlador.en_curso == 0
+
+
+def test_se_estabiliza_bajo_el_ancho_de_banda_del_servidor(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONCURRENCIA_ADAPTATIVA", "si")
+    monkeypatch.setenv("MIN_WORKERS", "1")
+    monkeypatch.setenv("MAX_WORKERS", "16")
+    metricas.reiniciar()
+
+    with ServidorSimulado(tamano_pdf=40_000, latencia_descarga=0.005, ancho_banda_total=8_000_000) as servidor:
+        urls = [(f"{servidor.url}/minio/rcel/factura_{i}.pdf", None, str(tmp_path)) for i in range(240)]
+        rutas = descargar_archivos_concurrente(urls)
+
+    controlador = controlador_descargas()
+    decisiones = metricas.resumen()["concurrencia"]
+    assert len(rutas) == 240
+    assert decisiones == controlador.decisiones
+    assert all(1 <= d["limite"] <= 16 for d in decisiones)
+    assert {"aumento", "latencia"} <= {d["motivo"] for d in decisiones}
+    # Con el ancho de banda saturado no tiene sentido llegar al máximo de descargas simultáneas
+    assert controlador.limite < 16
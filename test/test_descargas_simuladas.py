@@ -0,0 +1,49 @@
+"""Pruebas de la fase de descarga contra el servidor simulado de Mrbot/MinIO"""
+
+import os
+
+import pytest
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import leer_archivos_csv_batch, procesar_descarga_mc, procesar_descarga_rcel
+from lib.metricas import metricas
+
+
+@pytest.fixture
+def servidor():
+    with ServidorSimulado(comprobantes_por_cliente=20, tamano_pdf=2_000) as servidor:
+        yield servidor
+
+
+@pytest.fixture
+def fila():
+    return planilla_sintetica(1).iloc[0]
+
+
+def test_descarga_mc_disco_y_memoria(servidor, fila, tmp_path):
+    rutas = procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path))
+    en_memoria = procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path),
+                                      en_memoria=True)
+
+    assert sorted(os.path.basename(r) for r in rutas) == sorted(os.path.basename(r) for r, _ in en_memoria)
+    assert leer_archivos_csv_batch(sorted(rutas)).equals(leer_archivos_csv_batch(sorted(en_memoria)))
+    assert len(leer_archivos_csv_batch(rutas)) == 30
+
+
+def test_descarga_rcel(servidor, fila, tmp_path):
+    rutas = procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, str(tmp_path))
+
+    assert rutas
+    assert all(os.path.exists(os.path.splitext(r)[0] + ".pdf") for r in rutas)
+    assert servidor.estadisticas()["descargas_pdf"] == len(rutas)
+
+
+def test_errores_simulados(fila, tmp_path):
+    metricas.reiniciar()
+    with ServidorSimulado(comprobantes_por_cliente=5, tasa_error=1.0) as servidor:
+        rutas = procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path))
+
+    assert rutas == []
+    assert metricas.resumen()["contadores"]["clientes_mc_error"] == 1
+    assert metricas.resumen()["endpoints"]["mis_comprobantes"]["errores"] == 1
@@ -0,0 +1,93 @@
+"""Pruebas del modo en memoria: descarga -> lectura sin archivos intermedios"""
+
+import io
+import json
+import os
+from zipfile import ZipFile
+
+from control import COLUMNAS_RCEL, leer_archivos_csv_batch, leer_archivos_json_batch
+from lib.caller_rcel import guardar_facturas_rcel
+from lib.utils import extraer_zip, extraer_zip_memoria
+
+CUIT = "20374730429"
+NOMBRE_ZIP = f"9 - MCE - 01012025 - 31122025 - {CUIT} - CLIENTE PRUEBA.zip"
+
+CSV_MCE = (
+    "Fecha de Emisión;Tipo de Comprobante;Punto de Venta;Número Desde;Número Hasta;Cód. Autorización;"
+    "Tipo Doc. Receptor;Nro. Doc. Receptor;Denominación Receptor;Tipo Cambio;Moneda;"
+    "Imp. Neto Gravado Total;Imp. Neto No Gravado;Imp. Op. Exentas;Otros Tributos;Total IVA;Imp. Total\n"
+    "2025-01-15;11;1;1;1;75000000000001;80;30712345678;CLIENTE UNO;1;$;0;0;0;0;0;1000,50\n"
+    "2025-02-10;13;1;2;2;75000000000002;80;30712345678;CLIENTE UNO;1;$;0;0;0;0;0;200\n"
+)
+
+
+def _zip_mce():
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as zip_ref:
+        zip_ref.writestr(f"comprobantes_emitidos_01012025_31122025_9_{CUIT}_x.csv", CSV_MCE.encode("utf-8-sig"))
+    return buffer.getvalue()
+
+
+def test_extraer_zip_memoria_equivale_a_disco(tmp_path):
+    contenido = _zip_mce()
+    ruta_zip = tmp_path / NOMBRE_ZIP
+    ruta_zip.write_bytes(contenido)
+
+    rutas = extraer_zip(str(ruta_zip), str(tmp_path / "extraido"))
+    extraidos = extraer_zip_memoria(NOMBRE_ZIP, contenido)
+
+    assert [os.path.basename(r) for r in rutas] == [nombre for nombre, _ in extraidos]
+
+    desde_disco = leer_archivos_csv_batch(rutas)
+    desde_memoria = leer_archivos_csv_batch([(f"{tmp_path}/extraido/{n}", c) for n, c in extraidos])
+
+    assert len(desde_memoria) == 2
+    assert desde_memoria.equals(desde_disco)
+
+
+def test_extraer_zip_memoria_cuit_distinto():
+    assert extraer_zip_memoria(NOMBRE_ZIP.replace(CUIT, "20111111112"), _zip_mce()) == []
+
+
+def test_leer_json_desde_memoria():
+    metadata = {"AUX": f"{CUIT}-011-00001-00000001", "Desde": "01/01/2025", "Hasta": "31/01/2025"}
+    ruta = f"descargas_rcel/{CUIT}_CLIENTE PRUEBA/{CUIT}-011-00001-00000001.json"
+
+    df = leer_archivos_json_batch([(ruta, metadata)])
+
+    assert df.loc[0, "Cliente"] == "CLIENTE PRUEBA"
+    assert df.loc[0, "CUIT Cliente"] == int(CUIT)
+    assert "Archivo PDF" not in metadata
+
+
+def test_leer_facturas_solo_metadata(tmp_path):
+    directorio = tmp_path / f"{CUIT}_CLIENTE PRUEBA"
+    facturas = [
+        {"AUX": f"{CUIT}-011-00001-0000000{n}", "Desde": "01/01/2025", "Hasta": "31/01/2025",
+         "URL_MINIO": f"http://minio/rcel/{CUIT}-011-00001-0000000{n}.pdf?firma=abc"}
+        for n in (1, 2)
+    ]
+    ruta = guardar_facturas_rcel(facturas, str(directorio))
+
+    df = leer_archivos_json_batch([ruta])
+
+    assert list(df["AUX"]) == [f["AUX"] for f in facturas]
+    assert list(df["Archivo PDF"]) == [f"{CUIT}-011-00001-0000000{n}.json" for n in (1, 2)]
+    assert set(df["Cliente"]) == {"CLIENTE PRUEBA"}
+
+
+def test_leer_json_en_paralelo_proyecta_campos(tmp_path):
+    directorio = tmp_path / f"{CUIT}_CLIENTE PRUEBA"
+    directorio.mkdir()
+    rutas = []
+    for n in range(600):
+        aux = f"{CUIT}-011-00001-{n:08d}"
+        ruta = directorio / f"{aux}.json"
+        ruta.write_text(json.dumps({"AUX": aux, "Desde": "01/01/2025", "Hasta": "31/01/2025",
+                                    "DETALLE": [{"descripcion": "x"}]}), encoding="utf-8-sig")
+        rutas.append(str(ruta))
+
+    df = leer_archivos_json_batch(rutas, max_workers=4)
+
+    assert list(df.columns) == COLUMNAS_RCEL
+    assert list(df["AUX"]) == [f"{CUIT}-011-00001-{n:08d}" for n in range(600)]
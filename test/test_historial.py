@@ -0,0 +1,63 @@
+"""Pruebas del historial por cliente y del orden de mayor duración primero"""
+
+import json
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import descargar_planilla
+from lib.bitacora import PENDIENTE, BitacoraDescargas
+from lib.historial import HistorialClientes
+from lib.planificador import mas_largos_primero
+
+
+def test_mas_largos_primero():
+    assert mas_largos_primero([None, None, None]) == [0, 1, 2]
+    # Sin historial se estima con la mediana (3) y a igual duración se respeta el orden
+    assert mas_largos_primero([1, None, 5, 3]) == [2, 1, 3, 0]
+
+
+def test_lote_ordenado_por_historial_y_registrado(tmp_path):
+    planilla = planilla_sintetica(4, fuentes=("rcel",))
+    cuits = [str(cuit) for cuit in planilla["CUIT_Representado"]]
+    ruta_historial = str(tmp_path / "historial.json")
+
+    historial = HistorialClientes(ruta_historial)
+    for cuit, segundos in zip(cuits, [1.0, 8.0, 3.0]):
+        historial.registrar("rcel", cuit, segundos, 10, 1000)
+    bitacora = BitacoraDescargas(str(tmp_path / "bitacora.jsonl"))
+
+    with ServidorSimulado(comprobantes_por_cliente=10, tamano_pdf=1000) as servidor:
+        resumen = descargar_planilla(planilla, ("rcel",), "u", "k", servidor.url, None, RCEL_ENDPOINT,
+                                     None, str(tmp_path / "rcel"), bitacora=bitacora, historial=historial,
+                                     max_clientes=2)
+    assert resumen == {"procesados": 4, "omitidos": 0, "fallidos": 0, "diferidos": 0}
+
+    with open(bitacora.ruta, encoding="utf-8") as file:
+        eventos = [json.loads(linea) for linea in file]
+    despachados = [evento["cuit"] for evento in eventos if evento["estado"] == PENDIENTE]
+    # El cliente sin historial se estima con la mediana (3.0) y va después del que ya duró 3.0
+    assert despachados == [cuits[1], cuits[2], cuits[3], cuits[0]]
+
+    guardado = HistorialClientes(ruta_historial)
+    for cuit in cuits:
+        datos = guardado.cliente("rcel", cuit)
+        assert datos["archivos"] > 0 and datos["bytes"] >= datos["archivos"] * 1000
+    assert guardado.cliente("rcel", cuits[3])["ejecuciones"] == 1
+    assert guardado.cliente("rcel", cuits[1])["ejecuciones"] == 2
+    assert guardado.duracion_esperada("rcel", cuits[1]) < 8.0
+
+
+def test_sin_meses_faltantes_no_se_registra(tmp_path, monkeypatch):
+    monkeypatch.setenv("DESCARGA_INCREMENTAL", "si")
+    planilla = planilla_sintetica(1, fuentes=("mc",))
+    cuit = str(planilla["CUIT_Representado"].iloc[0])
+    historial = HistorialClientes(str(tmp_path / "historial.json"))
+
+    with ServidorSimulado(comprobantes_por_cliente=5) as servidor:
+        for _ in range(2):
+            descargar_planilla(planilla, ("mc",), "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, None,
+                               str(tmp_path / "mc"), None, historial=historial)
+        assert servidor.estadisticas()["consultas_mc"] == 1
+
+    # La segunda ejecución no consultó nada: no arrastra la duración esperada hacia cero
+    assert historial.cliente("mc", cuit)["ejecuciones"] == 1
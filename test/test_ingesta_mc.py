@@ -0,0 +1,49 @@
+"""Pruebas de la ingesta de Mis Comprobantes en JSON (sin el ZIP de MinIO)"""
+
+import os
+
+import pandas as pd
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import leer_archivos_csv_batch, procesar_descarga_mc
+
+
+def _descargar(servidor, fila, directorio, en_memoria=False):
+    return procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(directorio),
+                                en_memoria=en_memoria)
+
+
+def test_ingesta_json_equivale_al_zip(tmp_path, monkeypatch):
+    monkeypatch.setenv("DIVIDIR_RANGO", "trimestral")
+    fila = planilla_sintetica(1).iloc[0]
+
+    with ServidorSimulado(comprobantes_por_cliente=40) as servidor:
+        monkeypatch.setenv("MODO_INGESTA_MC", "zip")
+        por_zip = _descargar(servidor, fila, tmp_path / "zip", en_memoria=True)
+        assert servidor.estadisticas()["descargas_zip"] == 8
+
+        monkeypatch.setenv("MODO_INGESTA_MC", "json")
+        en_memoria = _descargar(servidor, fila, tmp_path / "zip", en_memoria=True)
+        en_disco = _descargar(servidor, fila, tmp_path / "json")
+        assert servidor.estadisticas()["descargas_zip"] == 8
+
+    assert all(isinstance(contenido, pd.DataFrame) for _, contenido in en_memoria)
+    assert sorted(os.path.basename(r) for r, _ in por_zip) == sorted(os.path.basename(r) for r, _ in en_memoria)
+    assert sorted(os.path.basename(r) for r in en_disco) == sorted(os.listdir(os.path.dirname(en_disco[0])))
+
+    esperado = leer_archivos_csv_batch(sorted(por_zip))
+    pd.testing.assert_frame_equal(leer_archivos_csv_batch(sorted(en_memoria)), esperado)
+    pd.testing.assert_frame_equal(leer_archivos_csv_batch(sorted(en_disco)), esperado)
+
+
+def test_ingesta_json_usa_el_zip_si_la_respuesta_no_trae_comprobantes(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODO_INGESTA_MC", "json")
+    fila = planilla_sintetica(1).iloc[0]
+
+    with ServidorSimulado(comprobantes_por_cliente=10, soporta_json=False) as servidor:
+        rutas = _descargar(servidor, fila, tmp_path)
+        assert servidor.estadisticas()["descargas_zip"] == 2
+
+    assert [n.split(" - ")[1] for n in sorted(os.path.basename(r) for r in rutas)] == ["MCE", "MCR"]
+    assert len(leer_archivos_csv_batch(rutas)) == 15
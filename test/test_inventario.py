@@ -0,0 +1,72 @@
+"""Pruebas del inventario de archivos descargados"""
+
+import glob
+import os
+
+from lib.inventario import DIRECTORIO_INVENTARIO, Inventario, listar_archivos
+
+HACE_UNA_HORA = 3600
+
+
+def _crear(ruta, contenido="{}"):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as file:
+        file.write(contenido)
+
+
+def _envejecer(base):
+    """Retrasa los mtime para que el inventario no los considere recién modificados."""
+    for raiz, directorios, _ in os.walk(base):
+        for directorio in directorios + [""]:
+            ruta = os.path.join(raiz, directorio)
+            stat = os.stat(ruta)
+            os.utime(ruta, (stat.st_atime - HACE_UNA_HORA, stat.st_mtime - HACE_UNA_HORA))
+
+
+def _arbol(base):
+    for cliente in ("20111111112_UNO", "20222222223_DOS"):
+        _crear(os.path.join(base, cliente, "extraido", f"9 - MCE - {cliente}.csv"), "a;b")
+        _crear(os.path.join(base, cliente, f"9 - MCE - {cliente}.zip"), "zip")
+        _crear(os.path.join(base, cliente, f"{cliente[:11]}-011-00001-00000001.json"))
+        _crear(os.path.join(base, cliente, f"{cliente[:11]}-011-00001-00000001.pdf"), "pdf")
+
+
+def test_equivale_a_glob(tmp_path):
+    base = str(tmp_path)
+    _arbol(base)
+
+    assert sorted(listar_archivos(base, "mc")) == sorted(glob.glob(f"{base}/**/extraido/*.csv", recursive=True))
+    assert sorted(listar_archivos(base, "rcel")) == sorted(glob.glob(f"{base}/**/*.json", recursive=True))
+    assert os.path.exists(os.path.join(base, DIRECTORIO_INVENTARIO, "rcel.json"))
+
+
+def test_solo_lista_directorios_modificados(tmp_path):
+    base = str(tmp_path)
+    _arbol(base)
+    _envejecer(base)
+    inventario = Inventario(base, "rcel")
+
+    assert inventario.actualizar() == 5
+    assert inventario.actualizar() == 0
+
+    nuevo = os.path.join(base, "20222222223_DOS", "20222222223-011-00001-00000002.json")
+    _crear(nuevo)
+    os.remove(os.path.join(base, "20111111112_UNO", "20111111112-011-00001-00000001.json"))
+
+    assert inventario.actualizar() == 2
+    assert [os.path.basename(r) for r in inventario.por_cliente()["20222222223_DOS"]] == [
+        "20222222223-011-00001-00000001.json", "20222222223-011-00001-00000002.json"]
+    assert "20111111112_UNO" not in inventario.por_cliente()
+
+
+def test_inventario_persistido_se_reutiliza(tmp_path):
+    base = str(tmp_path)
+    _arbol(base)
+    os.makedirs(os.path.join(base, DIRECTORIO_INVENTARIO))
+    _envejecer(base)
+    inventario = Inventario(base, "mc")
+    inventario.actualizar()
+    inventario.guardar()
+
+    assert Inventario(base, "mc").actualizar() == 0
+    assert Inventario(base, "rcel").actualizar() == 5
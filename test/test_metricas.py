@@ -0,0 +1,46 @@
+"""Pruebas del registro de métricas de ejecución"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.metricas import RegistroMetricas, percentil
+
+
+def test_percentil():
+    assert percentil([], 95) == 0.0
+    assert percentil([1, 2, 3, 4, 5], 50) == 3
+    assert percentil([0, 10], 95) == 9.5
+
+
+def test_resumen_por_etapa_cliente_y_endpoint(tmp_path):
+    registro = RegistroMetricas()
+    eventos = []
+    registro.suscribir(eventos.append)
+
+    with registro.contexto_cliente("20374730429"):
+        with registro.etapa("descarga_mc"):
+            registro.registrar_descarga(1024, 0.2)
+            registro.registrar_descarga(0, 1.0, exito=False)
+        registro.registrar_latencia("mis_comprobantes", 3.0)
+
+    resumen = registro.resumen()
+
+    assert resumen["etapas"]["descarga_mc"]["cantidad"] == 1
+    assert resumen["endpoints"]["minio"] == {**resumen["endpoints"]["minio"], "cantidad": 2, "errores": 1}
+    cliente = resumen["clientes"]["20374730429"]
+    assert cliente["contadores"] == {"archivos_descargados": 1, "bytes_descargados": 1024, "descargas_fallidas": 1}
+    assert "descarga_mc" in cliente["etapas_s"]
+    assert {e["evento"] for e in eventos} == {"inicio_etapa", "fin_etapa", "llamada"}
+
+    ruta = registro.guardar_resumen(str(tmp_path / "resumen.json"))
+    with open(ruta, encoding="utf-8") as f:
+        assert json.load(f)["totales"]["archivos_descargados"] == 1
+
+
+def test_contadores_concurrentes():
+    registro = RegistroMetricas()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: registro.incrementar("archivos"), range(1000)))
+
+    assert registro.resumen()["contadores"]["archivos"] == 1000
@@ -0,0 +1,48 @@
+"""Pruebas del perfilado por etapas del control"""
+
+import json
+import os
+
+from benchmarks.generador_datos import generar_escenario
+from control import control
+from lib.inventario import listar_archivos
+from lib.perfilado import PerfiladorEtapas, modo_perfilado
+
+
+def test_modo_perfilado(monkeypatch):
+    for valor, modo in (("no", "no"), ("tiempos", "tiempos"), ("SI", "si"), ("cprofile", "cprofile"),
+                        ("memoria", "no")):
+        monkeypatch.setenv("PERFILAR_CONTROL", valor)
+        assert modo_perfilado() == modo
+    monkeypatch.delenv("PERFILAR_CONTROL")
+    assert modo_perfilado() == "no"
+
+    assert not PerfiladorEtapas("otro").activo
+    tiempos = PerfiladorEtapas("tiempos")
+    assert tiempos.activo and not tiempos.memoria and not tiempos.cprofile
+    with tiempos.etapa("suma"):
+        sum(range(1000))
+    assert [e["etapa"] for e in tiempos.etapas] == ["suma"] and "memoria_pico_mb" not in tiempos.etapas[0]
+
+
+def test_control_con_cprofile_guarda_el_perfil(tmp_path):
+    escenario = generar_escenario(str(tmp_path / "escenario"), clientes=2, comprobantes_por_cliente=20)
+    reporte = str(tmp_path / "reporte.xlsx")
+    control(listar_archivos(escenario["descargas_mc"], "mc"), [],
+            listar_archivos(escenario["descargas_rcel"], "rcel"),
+            ruta_categorias=escenario["categorias"], nombre_archivo=reporte, perfilar="cprofile", cache_dir="",
+            almacen="")
+
+    base = str(tmp_path / "reporte")
+    for sufijo in (".perfil.json", ".prof", ".prof.txt"):
+        assert os.path.getsize(base + sufijo) > 0
+
+    with open(base + ".perfil.json", encoding="utf-8") as file:
+        perfil = json.load(file)
+    assert perfil["modo"] == "cprofile" and perfil["reporte"] == reporte
+    etapas = [e["etapa"] for e in perfil["etapas"]]
+    assert {"lectura_csv", "prorrateo", "exportar_excel", "formato_excel"} <= set(etapas)
+    assert all({"pared_s", "cpu_s", "memoria_delta_mb", "memoria_pico_mb"} <= set(e) for e in perfil["etapas"])
+
+    with open(base + ".prof.txt", encoding="utf-8") as file:
+        assert "cumulative" in file.read()
@@ -0,0 +1,156 @@
+"""Pruebas de la descarga incremental de Mis Comprobantes por meses faltantes"""
+
+import os
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import leer_archivos_csv_batch, procesar_descarga_mc, procesar_descarga_rcel
+from lib.periodos import CoberturaDescargas, meses_del_rango
+
+
+def test_cobertura_solo_meses_cerrados(tmp_path):
+    assert meses_del_rango(date(2024, 1, 15), date(2024, 3, 10)) == [
+        (date(2024, 1, 15), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 10)),
+    ]
+
+    cobertura = CoberturaDescargas(str(tmp_path))
+    cobertura.registrar(["emitidos", "recibidos"], date(2024, 1, 1), date(2024, 6, 30), hoy=date(2024, 6, 15))
+    cobertura.guardar()
+
+    cobertura = CoberturaDescargas(str(tmp_path))
+    assert cobertura.faltantes(["emitidos"], date(2024, 1, 1), date(2024, 6, 30)) == [
+        (date(2024, 6, 1), date(2024, 6, 30))
+    ]
+    # Un tipo sin cobertura obliga a pedir todo el rango
+    cobertura.reiniciar(["recibidos"])
+    assert cobertura.faltantes(["emitidos", "recibidos"], date(2024, 1, 1), date(2024, 6, 30)) == [
+        (date(2024, 1, 1), date(2024, 6, 30))
+    ]
+
+
+def test_descarga_solo_meses_faltantes(tmp_path, monkeypatch):
+    monkeypatch.setenv("DESCARGA_INCREMENTAL", "si")
+    monkeypatch.setenv("FORZAR_DESCARGA_COMPLETA", "no")
+    fila = planilla_sintetica(1).iloc[0].copy()
+
+    with ServidorSimulado(comprobantes_por_cliente=20) as servidor:
+        def descargar():
+            return procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path))
+
+        primera = descargar()
+        assert servidor.estadisticas()["consultas_mc"] == 1
+
+        # Período ya cubierto: no se consulta la API
+        assert sorted(descargar()) == sorted(primera)
+        assert servidor.estadisticas()["consultas_mc"] == 1
+
+        # Se extiende el período: solo se piden los meses nuevos y se fusionan con los anteriores
+        anterior = leer_archivos_csv_batch(primera)
+        fila["Hasta_MC"] = pd.Timestamp("2025-03-31")
+        rutas = descargar()
+        assert servidor.estadisticas()["consultas_mc"] == 2
+
+        monkeypatch.setenv("FORZAR_DESCARGA_COMPLETA", "si")
+        descargar()
+        assert servidor.estadisticas()["consultas_mc"] == 3
+
+    nombres = sorted(os.path.basename(r) for r in rutas)
+    assert [n.split(" - ")[1:4] for n in nombres] == [["MCE", "01012024", "31032025"], ["MCR", "01012024", "31032025"]]
+    assert sorted(os.listdir(os.path.dirname(rutas[0]))) == nombres
+
+    fusion = leer_archivos_csv_batch(rutas)
+    fechas = fusion["Fecha de Emisión"]
+    assert fechas.min() < "2025-01-01" <= fechas.max() <= "2025-03-31"
+    clave = ["Archivo", "Tipo de Comprobante", "Punto de Venta", "Número Desde", "Nro. Doc. Receptor/Emisor"]
+    assert not fusion.duplicated(subset=clave).any()
+    assert len(fusion) >= len(anterior)
+
+
+def test_rango_dividido_en_consultas_paralelas(tmp_path, monkeypatch):
+    monkeypatch.setenv("DIVIDIR_RANGO", "mensual")
+    fila = planilla_sintetica(1).iloc[0]
+
+    with ServidorSimulado(comprobantes_por_cliente=10) as servidor:
+        rutas = procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path))
+        en_memoria = procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path),
+                                          en_memoria=True)
+        assert servidor.estadisticas()["consultas_mc"] == 24
+
+        monkeypatch.setenv("DIVIDIR_RANGO", "trimestral")
+        facturas = procesar_descarga_rcel(fila, "u", "k", servidor.url, RCEL_ENDPOINT, str(tmp_path / "rcel"),
+                                          en_memoria=True, solo_metadata=True)
+        assert servidor.estadisticas()["consultas_rcel"] == 4
+
+    # Un CSV por tipo con el rango completo, igual en disco y en memoria
+    nombres = sorted(os.path.basename(r) for r in rutas)
+    assert [n.split(" - ")[1:4] for n in nombres] == [["MCE", "01012024", "31122024"], ["MCR", "01012024", "31122024"]]
+    assert sorted(os.listdir(os.path.dirname(rutas[0]))) == nombres
+    assert nombres == sorted(os.path.basename(r) for r, _ in en_memoria)
+    assert leer_archivos_csv_batch(sorted(rutas)).equals(leer_archivos_csv_batch(sorted(en_memoria)))
+
+    meses = pd.to_datetime(leer_archivos_csv_batch(rutas)["Fecha de Emisión"], format="ISO8601").dt.month
+    assert meses.nunique() == 12
+
+    auxs = [factura["AUX"] for _, factura in facturas]
+    assert auxs and len(auxs) == len(set(auxs))
+
+
+def test_descarga_fallida_no_queda_cubierta(tmp_path, monkeypatch):
+    monkeypatch.setenv("DESCARGA_INCREMENTAL", "si")
+    monkeypatch.setenv("FORZAR_DESCARGA_COMPLETA", "no")
+    monkeypatch.setenv("DIVIDIR_RANGO", "no")
+    monkeypatch.setenv("MODO_INGESTA_MC", "zip")
+    monkeypatch.setenv("CARGA_INLINE", "no")
+    fila = planilla_sintetica(1).iloc[0]
+
+    # MinIO responde 503 a los ZIP de emitidos y recibidos
+    with ServidorSimulado(comprobantes_por_cliente=10, tasa_error_descarga=1.0) as servidor:
+        def descargar():
+            return procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path))
+
+        assert descargar() == []
+        directorio_cliente = os.path.join(str(tmp_path), os.listdir(tmp_path)[0])
+        cobertura = CoberturaDescargas(directorio_cliente)
+        assert not cobertura.cubierto("emitidos", date(2024, 1, 1), date(2024, 1, 31))
+        assert not cobertura.cubierto("recibidos", date(2024, 1, 1), date(2024, 1, 31))
+
+        # Con MinIO disponible se vuelve a consultar y el período queda cubierto
+        servidor.tasa_error_descarga = 0.0
+        rutas = descargar()
+        assert servidor.estadisticas()["consultas_mc"] == 2
+
+    assert sorted(os.path.basename(r).split(" - ")[1] for r in rutas) == ["MCE", "MCR"]
+    assert CoberturaDescargas(directorio_cliente).cubierto("emitidos", date(2024, 1, 1), date(2024, 1, 31))
+
+
+def test_incremental_no_fusiona_csv_anteriores(tmp_path, monkeypatch):
+    monkeypatch.setenv("FORZAR_DESCARGA_COMPLETA", "no")
+    monkeypatch.setenv("DIVIDIR_RANGO", "no")
+    fila = planilla_sintetica(1).iloc[0].copy()
+
+    with ServidorSimulado(comprobantes_por_cliente=10) as servidor:
+        def descargar():
+            return procesar_descarga_mc(fila, "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT, str(tmp_path))
+
+        # Descarga previa a activar el modo incremental (por defecto desactivado)
+        fila["Desde_MC"], fila["Hasta_MC"] = pd.Timestamp("2023-01-01"), pd.Timestamp("2023-12-31")
+        previos = descargar()
+        contenido = {ruta: open(ruta, "rb").read() for ruta in previos}
+        assert not os.path.exists(os.path.join(os.path.dirname(os.path.dirname(previos[0])), ".cobertura.json"))
+
+        monkeypatch.setenv("DESCARGA_INCREMENTAL", "si")
+        fila["Desde_MC"], fila["Hasta_MC"] = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-12-31")
+        primera = descargar()
+        fila["Hasta_MC"] = pd.Timestamp("2025-03-31")
+        rutas = descargar()
+        assert servidor.estadisticas()["consultas_mc"] == 3
+
+    # Los CSV anteriores quedan intactos; solo se fusiona lo que registró la cobertura
+    assert all(open(ruta, "rb").read() == datos for ruta, datos in contenido.items())
+    assert not set(rutas) & set(previos) and not any(os.path.exists(r) for r in primera if r not in rutas)
+    assert sorted(os.path.basename(r).split(" - ")[2:4] for r in rutas) == [["01012024", "31032025"]] * 2
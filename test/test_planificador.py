@@ -0,0 +1,45 @@
+"""Pruebas de la planificación de descargas según el cupo de consultas disponibles"""
+
+from benchmarks.carga_descargas import MIS_COMPROBANTES_ENDPOINT, RCEL_ENDPOINT, planilla_sintetica
+from benchmarks.servidor_simulado import ServidorSimulado
+from control import _clave_fila, descargar_planilla
+from lib.bitacora import BitacoraDescargas
+from lib.planificador import CupoConsultas, planificar
+
+
+def test_planificar_por_prioridad_dentro_del_cupo():
+    trabajos = [("a", 4, 2), ("b", 3, 1), ("c", 0, 5), ("d", 2, float("inf")), ("e", 1, 2)]
+    assert planificar(trabajos, 6) == (["b", "e", "c", "d"], ["a"])
+    assert planificar(trabajos, None) == (["b", "a", "e", "c", "d"], [])
+
+
+def test_lote_limitado_por_cupo_y_reanudado(tmp_path, monkeypatch):
+    monkeypatch.setenv("DIVIDIR_RANGO", "trimestral")
+    monkeypatch.setenv("CUPO_REFRESCO_SEGUNDOS", "0")
+    planilla = planilla_sintetica(3)
+    planilla["Prioridad"] = [3, 1, 2]
+    bitacora = BitacoraDescargas(str(tmp_path / "bitacora.jsonl"))
+
+    def descargar(servidor):
+        cupo = CupoConsultas.desde_entorno("u", "k", servidor.url)
+        return descargar_planilla(planilla, ("mc", "rcel"), "u", "k", servidor.url, MIS_COMPROBANTES_ENDPOINT,
+                                  RCEL_ENDPOINT, str(tmp_path / "mc"), str(tmp_path / "rcel"), bitacora=bitacora,
+                                  cupo=cupo)
+
+    # Cada trabajo necesita 4 consultas (una por trimestre): con 18 solo entran cuatro
+    with ServidorSimulado(comprobantes_por_cliente=5, tamano_pdf=500, consultas_disponibles=18) as servidor:
+        resumen = descargar(servidor)
+        estadisticas = servidor.estadisticas()
+    assert resumen == {"procesados": 4, "omitidos": 0, "fallidos": 0, "diferidos": 2}
+    assert estadisticas["consultas_mc"] + estadisticas["consultas_rcel"] == 16
+    # El cupo se relee antes de cada trabajo
+    assert estadisticas["consultas_disponibles"] == 7
+
+    filas = [row for _, row in planilla.iterrows()]
+    assert bitacora.estado(_clave_fila("mc", filas[0])) is None
+    assert bitacora.estado(_clave_fila("rcel", filas[0])) is None
+
+    # Con cupo renovado se reanuda solo lo diferido
+    with ServidorSimulado(comprobantes_por_cliente=5, tamano_pdf=500) as servidor:
+        resumen = descargar(servidor)
+    assert resumen == {"procesados": 2, "omitidos": 4, "fallidos": 0, "diferidos": 0}
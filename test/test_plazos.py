@@ -0,0 +1,121 @@
+"""Pruebas de timeouts, plazo por cliente y descargas cubiertas"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import lib.plazos
+import lib.utils
+from benchmarks.servidor_simulado import ServidorSimulado
+from lib.concurrencia import ControladorConcurrencia
+from lib.metricas import metricas
+from lib.plazos import (DescargasEnCurso, HistorialLatencias, PlazoVencido, ejecutar_con_cobertura, plazo_cliente,
+                        timeout_descarga)
+from lib.utils import descargar_archivos_concurrente, descargar_contenidos_concurrente
+
+
+def test_timeout_y_plazo_del_cliente(tmp_path, monkeypatch):
+    monkeypatch.setenv("TIMEOUT_LECTURA", "0.2")
+    with ServidorSimulado(latencia_descarga=2.0, variacion=0) as servidor:
+        urls = [f"{servidor.url}/minio/rcel/factura_{i}.pdf" for i in range(4)]
+
+        inicio = time.perf_counter()
+        assert descargar_archivos_concurrente([(url, None, str(tmp_path)) for url in urls]) == []
+        assert time.perf_counter() - inicio < 1.5
+
+        monkeypatch.setenv("TIMEOUT_LECTURA", "60")
+        with plazo_cliente(0.3):
+            assert timeout_descarga()[1] <= 0.3
+            inicio = time.perf_counter()
+            with pytest.raises(PlazoVencido):
+                descargar_contenidos_concurrente(urls)
+            assert time.perf_counter() - inicio < 1.5
+            with pytest.raises(PlazoVencido):
+                timeout_descarga()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_descarga_cubierta_evita_las_trabadas(tmp_path, monkeypatch):
+    monkeypatch.setenv("DESCARGA_CUBIERTA", "si")
+    # Las trabadas que pierden vencen su timeout después de que ganó el duplicado
+    monkeypatch.setenv("TIMEOUT_LECTURA", "0.8")
+    historial = HistorialLatencias()
+    for _ in range(historial.minimo):
+        historial.registrar(0.05)
+    monkeypatch.setattr(lib.plazos, "latencias_descarga", historial)
+    en_curso = DescargasEnCurso()
+    monkeypatch.setattr(lib.utils, "descargas_en_curso", en_curso)
+    metricas.reiniciar()
+
+    with ServidorSimulado(tamano_pdf=5000, latencia_descarga=0.01, tasa_lentas=0.2, latencia_lenta=3.0) as servidor:
+        urls = [(f"{servidor.url}/minio/rcel/factura_{i}.pdf", None, str(tmp_path)) for i in range(30)]
+        inicio = time.perf_counter()
+        rutas = descargar_archivos_concurrente(urls, max_workers=10)
+        duracion = time.perf_counter() - inicio
+        trabadas = servidor.estadisticas().get("descargas_trabadas", 0)
+
+        # Los intentos perdidos conservan su lugar hasta terminar
+        assert en_curso.esperar_libres(timeout=5)
+
+    contadores = metricas.resumen()["contadores"]
+    assert trabadas > 0 and contadores["coberturas_ganadas"] >= trabadas
+    assert duracion < 2.5
+    assert sorted(rutas) == sorted(str(tmp_path / f"factura_{i}.pdf") for i in range(30))
+    assert sorted(os.listdir(tmp_path)) == sorted(f"factura_{i}.pdf" for i in range(30))
+    assert contadores["archivos_descargados"] == 30
+    # Los intentos perdidos no cuentan como descargas fallidas
+    assert contadores.get("descargas_fallidas", 0) == 0
+
+
+def test_cobertura_respeta_el_limite_de_concurrencia(monkeypatch):
+    controlador = ControladorConcurrencia(minimo=2, maximo=2)
+    metricas.reiniciar()
+    llamados, reservas = [], []
+    terminar, cubrir, liberado = threading.Event(), threading.Event(), threading.Event()
+
+    def intento(cancelar: threading.Event) -> int:
+        llamados.append(cancelar)
+        if len(llamados) == 1:
+            # El original se traba hasta que lo liberen o, si hay duplicado, hasta que lo cancelen
+            (cancelar if cubrir.is_set() else terminar).wait(5)
+        return len(llamados)
+
+    def reservar():
+        liberar = controlador.reservar()
+        reservas.append(liberar)
+        if liberar is None:
+            if len(reservas) == 3:
+                terminar.set()
+            return None
+
+        def liberar_y_avisar():
+            liberar()
+            liberado.set()
+        return liberar_y_avisar
+
+    # Límite ocupado: el duplicado no se lanza y se espera al intento original
+    with controlador.turno(), controlador.turno():
+        assert ejecutar_con_cobertura(intento, 0.05, reservar=reservar) == 1
+    assert len(llamados) == 1 and reservas == [None, None, None]
+    assert metricas.resumen()["contadores"]["coberturas_omitidas"] == 1
+
+    # Con lugar libre el duplicado lo ocupa hasta que termina también el intento perdido
+    llamados.clear()
+    cubrir.set()
+    with controlador.turno():
+        assert ejecutar_con_cobertura(intento, 0.05, reservar=reservar) == 2
+        assert liberado.wait(timeout=5)
+        assert controlador.en_curso == 1
+    assert metricas.resumen()["contadores"]["coberturas_ganadas"] == 1
+
+    # Sin controlador los duplicados no superan MAX_WORKERS descargas en curso
+    monkeypatch.setenv("MAX_WORKERS", "2")
+    en_curso = DescargasEnCurso()
+    with en_curso.ocupar():
+        liberar = en_curso.reservar()
+        assert liberar is not None and en_curso.reservar() is None
+        liberar()
+    assert en_curso.en_curso == 0
@@ -0,0 +1,46 @@
+"""Pruebas del registro no bloqueante (niveles, contexto de cliente y credenciales ocultas)"""
+
+import logging
+import logging.handlers
+import queue
+
+import lib.registro as registro_mod
+from lib.metricas import metricas
+from lib.registro import _FiltroContexto, obtener_registrador, ocultar_credenciales, recortar, registrar_secreto
+
+
+def test_ocultar_credenciales_y_recortar(monkeypatch):
+    texto = ocultar_credenciales('{"x-api-key": "abc123", "contrasena": "Secreta1", "cuit": "20123456789"}')
+    assert texto == '{"x-api-key": "***", "contrasena": "***", "cuit": "20123456789"}'
+    assert ocultar_credenciales("api_key=abc123 token: xyz") == "api_key=*** token: ***"
+
+    monkeypatch.setattr(registro_mod, "_secretos", set())
+    registrar_secreto("ClaveFiscal99")
+    registrar_secreto("abc")  # demasiado corto para buscarlo en los mensajes
+    assert ocultar_credenciales("login con ClaveFiscal99 ok abc") == "login con *** ok abc"
+
+    assert recortar("x" * 10, limite=20) == "x" * 10
+    assert recortar("x" * 30, limite=20) == "x" * 20 + "... (10 caracteres omitidos)"
+    monkeypatch.setenv("LOG_MAX_RESPUESTA", "5")
+    assert recortar("abcdefgh").startswith("abcde...")
+
+
+def test_mensajes_con_cliente_y_nivel():
+    cola = queue.Queue()
+    manejador = logging.handlers.QueueHandler(cola)
+    manejador.addFilter(_FiltroContexto())
+    registrador = obtener_registrador("prueba")
+    registrador.addHandler(manejador)
+    registrador.setLevel(logging.INFO)
+    try:
+        with metricas.contexto_cliente("20123456789"):
+            registrador.debug("respuesta completa")
+            registrador.warning("Error descargando %s: clave=%s", "http://x/a.zip", "mi_clave")
+        registrador.info("sin cliente")
+    finally:
+        registrador.removeHandler(manejador)
+        registrador.setLevel(logging.NOTSET)
+
+    registros = [cola.get_nowait() for _ in range(cola.qsize())]
+    assert [(r.levelname, r.cliente) for r in registros] == [("WARNING", "20123456789"), ("INFO", "-")]
+    assert registros[0].getMessage() == "Error descargando http://x/a.zip: clave=***"
@@ -0,0 +1,35 @@
+"""Pruebas del registro de tipos de comprobante"""
+
+import numpy as np
+import pandas as pd
+
+from control import normalizar_consolidado
+from lib.tipos_comprobante import DESCONOCIDO, FACTURA, NOTA_CREDITO, registro_tipos
+
+# Notas de crédito que el control restaba antes del registro
+NOTAS_DE_CREDITO = [3, 8, 13, 21, 38, 43, 44, 48, 53, 90, 110, 112, 113, 114, 119, 203, 208, 213]
+
+
+def test_signos_clases_y_desconocidos():
+    assert registro_tipos.codigos(NOTA_CREDITO) == NOTAS_DE_CREDITO
+
+    codigos = pd.Series([1, 3, 49, 213, 999, -5, None, 11.0, "8"])
+    np.testing.assert_array_equal(registro_tipos.signos(codigos), [1, -1, 0, -1, 1, 1, 1, 1, -1])
+    clases = registro_tipos.clases_de(codigos)
+    assert list(clases[[0, 1, 7]]) == [FACTURA, NOTA_CREDITO, FACTURA]
+    assert list(clases[[4, 5, 6]]) == [DESCONOCIDO] * 3
+    desconocidos = registro_tipos.desconocidos(codigos)
+    assert desconocidos[999] == 1 and desconocidos[-5] == 1 and sum(desconocidos.values()) == 3
+
+
+def test_normalizar_consolidado_aplica_signo_y_tipo_cambio():
+    filas = [
+        # Fecha, Tipo, PV, Desde, Hasta, CAE, TC, Moneda, 4 importes, Otros Tributos..., Total
+        ["2024-01-10", 11, 1, 1, 1, "1", 1.0, "$", 100, 0, 0, 0, 0, 100, 20, "A", "Emitidos - MCE - 20123", 20123, 20123, "X"],
+        ["2024-01-11", 13, 1, 2, 2, "2", 1.0, "$", 40, 0, 0, 0, 0, 40, 20, "A", "Emitidos - MCE - 20123", 20123, 20123, "X"],
+        ["2024-01-12", 19, 1, 3, 3, "3", 2.0, "USD", 10, 0, 0, 0, 0, 10, 20, "A", "Emitidos - MCE - 20123", 20123, 20123, "X"],
+        ["2024-01-13", 49, 1, 4, 4, "4", 1.0, "$", 30, 0, 0, 0, 0, 30, 20, "A", "Emitidos - MCE - 20123", 20123, 20123, "X"],
+        ["2024-01-14", 777, 1, 5, 5, "5", 1.0, "$", 5, 0, 0, 0, 0, 5, 20, "A", "Emitidos - MCE - 20123", 20123, 20123, "X"],
+    ]
+    consolidado = normalizar_consolidado(pd.DataFrame(filas))
+    assert list(consolidado['Imp. Total']) == [100, -40, 20, 0, 5]
@@ -0,0 +1,72 @@
+"""Pruebas de la validación y cuarentena de comprobantes antes del prorrateo"""
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.generador_datos import generar_escenario
+from control import control
+from lib.inventario import listar_archivos
+from lib.validacion import HOJA_VALIDACION, ErrorValidacion, ruta_validacion
+
+
+def _escenario_con_errores(directorio):
+    """Escenario con un tipo de cambio en cero, un MCE repetido y un período RCEL invertido."""
+    escenario = generar_escenario(str(directorio), clientes=2, comprobantes_por_cliente=30)
+    mce = next(a for a in escenario["archivos_mc"] if " - MCE - " in a)
+    datos = pd.read_csv(mce, sep=';', decimal=',', encoding='utf-8-sig')
+    datos.loc[0, 'Tipo Cambio'] = 0
+    datos.to_csv(mce, sep=';', decimal=',', index=False, encoding='utf-8-sig')
+    # Las tres primeras filas también llegan en otro archivo del mismo cliente
+    repetido = os.path.join(os.path.dirname(mce), "10" + os.path.basename(mce)[1:])
+    datos.iloc[1:4].to_csv(repetido, sep=';', decimal=',', index=False, encoding='utf-8-sig')
+
+    factura = escenario["archivos_json"][-1]
+    with open(factura, encoding="utf-8") as file:
+        metadata = json.load(file)
+    metadata["Desde"], metadata["Hasta"] = metadata["Hasta"], metadata["Desde"]
+    with open(factura, "w", encoding="utf-8") as file:
+        json.dump(metadata, file)
+    return escenario, metadata["AUX"]
+
+
+def _controlar(escenario, reporte, cache_dir=""):
+    control(listar_archivos(escenario["descargas_mc"], "mc"), [], listar_archivos(escenario["descargas_rcel"], "rcel"),
+            ruta_categorias=escenario["categorias"], nombre_archivo=reporte, perfilar="no", cache_dir=cache_dir)
+
+
+@pytest.mark.parametrize("con_cache", [False, True])
+def test_cuarentena_y_hoja_de_validacion(tmp_path, monkeypatch, con_cache):
+    monkeypatch.delenv("VALIDACION_ESTRICTA", raising=False)
+    escenario, aux = _escenario_con_errores(tmp_path / "escenario")
+    reporte = str(tmp_path / "reporte.xlsx")
+    cache_dir = str(tmp_path / "cache") if con_cache else ""
+    _controlar(escenario, reporte, cache_dir)
+    if con_cache:
+        # La segunda ejecución sale de la caché y conserva las observaciones
+        _controlar(escenario, reporte, cache_dir)
+
+    validacion = pd.read_excel(reporte, sheet_name=HOJA_VALIDACION)
+    motivos = validacion.groupby("Origen")["Motivo"].apply(list).to_dict()
+    assert sorted(motivos["Mis Comprobantes"]) == ["Comprobante emitido repetido"] * 3 + ["Tipo de cambio cero o faltante"]
+    assert motivos["RCEL"] == ["Período RCEL con Hasta anterior a Desde"]
+    assert validacion.loc[validacion["Origen"] == "RCEL", "Comprobante"].tolist() == [aux]
+
+    consolidado = pd.read_excel(reporte, sheet_name="Consolidado")
+    assert (consolidado["Dias de facturación"] > 0).all()
+    assert not consolidado.duplicated(["Fin CUIT", "Tipo", "Punto de Venta", "Número Desde", "MC"]).any()
+    assert consolidado.loc[consolidado["AUX"] == aux, "Cruzado"].tolist() == ["No"]
+
+
+def test_validacion_estricta_detiene_antes_del_reporte(tmp_path, monkeypatch):
+    monkeypatch.setenv("VALIDACION_ESTRICTA", "si")
+    escenario, _ = _escenario_con_errores(tmp_path / "escenario")
+    reporte = str(tmp_path / "reporte.xlsx")
+    with pytest.raises(ErrorValidacion) as error:
+        _controlar(escenario, reporte)
+
+    assert len(error.value.observaciones) == 5
+    assert not os.path.exists(reporte)
+    assert len(pd.read_excel(ruta_validacion(reporte), sheet_name=HOJA_VALIDACION)) == 5